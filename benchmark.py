@@ -0,0 +1,837 @@
+"""
+Benchmarks for pyd2d.
+
+Run all benchmarks with `python benchmark.py`,
+or only some of them with `python benchmark.py NAME...`.
+
+Use `--save FILE` to write the results as JSON and `--compare FILE` to fail
+if any result is slower than in a saved file by more than `--tolerance`.
+Build the extension with `python stub/build.py` to benchmark the wrapper
+without Windows; the stub interfaces do no work, so the `overhead` results
+are the cost of the Python wrapper alone.
+"""
+
+import argparse
+import array
+import asyncio
+import ctypes
+import json
+import re
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from ctypes import wintypes
+
+import pyd2d
+
+if sys.platform == "win32":
+    user32 = ctypes.windll.user32
+    user32.CreateWindowExW.restype = wintypes.HWND
+    user32.CreateWindowExW.argtypes = [
+        wintypes.DWORD,
+        wintypes.LPCWSTR,
+        wintypes.LPCWSTR,
+        wintypes.DWORD,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        wintypes.HWND,
+        wintypes.HMENU,
+        wintypes.HINSTANCE,
+        wintypes.LPVOID,
+    ]
+
+WS_OVERLAPPEDWINDOW = 0x00CF0000
+WS_VISIBLE = 0x10000000
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def create_window(width=400, height=300):
+    if sys.platform != "win32":
+        # Stub builds accept any window handle.
+        return 1
+    hwnd = user32.CreateWindowExW(
+        0,
+        "STATIC",
+        "pyd2d benchmark",
+        WS_OVERLAPPEDWINDOW | WS_VISIBLE,
+        0,
+        0,
+        width,
+        height,
+        None,
+        None,
+        None,
+        None,
+    )
+    if not hwnd:
+        raise OSError(ctypes.FormatError())
+    return hwnd
+
+
+def destroy_window(hwnd):
+    if sys.platform == "win32":
+        user32.DestroyWindow(hwnd)
+
+
+def count_in_thread(duration, render=None):
+    """
+    Counts loop iterations in a worker thread for `duration` seconds,
+    while the calling thread runs `render()` in a loop if given.
+    Returns the number of iterations per second.
+    """
+    stop = threading.Event()
+    result = []
+
+    def worker():
+        n = 0
+        while not stop.is_set():
+            n += 1
+        result.append(n)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        if render is not None:
+            render()
+        else:
+            time.sleep(0.001)
+    stop.set()
+    thread.join()
+    return result[0] / duration
+
+
+def time_call(func, repeat=5):
+    """
+    Returns the best time of `repeat` runs of `func()` in nanoseconds per call.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e9
+
+
+@benchmark
+def end_draw_gil(duration=3.0):
+    """
+    Worker thread throughput while a vsync-paced render loop runs.
+    EndDraw releases the GIL, so the worker should keep most of its
+    idle throughput.
+    """
+    hwnd = create_window()
+    factory = pyd2d.GetD2DFactory()
+    rt = factory.CreateHwndRenderTarget(hwnd, 400, 300)
+    brush = rt.CreateSolidColorBrush(1.0, 0.5, 0.0)
+    frames = 0
+
+    def render():
+        nonlocal frames
+        rt.BeginDraw()
+        rt.Clear(0.0, 0.0, 0.0)
+        rt.FillRectangle(10, 10, 100, 100, brush)
+        rt.EndDraw()
+        frames += 1
+
+    idle = count_in_thread(duration)
+    rendering = count_in_thread(duration, render)
+    destroy_window(hwnd)
+    print(f"  idle worker:      {idle:14,.0f} iterations/s")
+    print(f"  rendering worker: {rendering:14,.0f} iterations/s")
+    print(f"  frames presented: {frames / duration:14,.1f} frames/s")
+    print(f"  throughput kept:  {rendering / idle:14.1%}")
+
+
+async def measure_loop_latency(duration, render):
+    """
+    Runs `render()` as a task for `duration` seconds while a ticker on the same
+    event loop sleeps for 1 ms at a time.
+    Returns the mean and worst lateness of the ticker's wakeups in seconds.
+    """
+    stop = asyncio.Event()
+    delays = []
+
+    async def ticker():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            delays.append(time.perf_counter() - start - 0.001)
+
+    async def renderer():
+        while not stop.is_set():
+            await render()
+
+    tasks = [asyncio.create_task(ticker()), asyncio.create_task(renderer())]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return sum(delays) / len(delays), max(delays)
+
+
+@benchmark
+def end_draw_async(duration=3.0):
+    """
+    Event loop latency while a render loop shares the loop.
+    EndDrawAsync presents on a worker thread, so other tasks on the loop
+    are not held up while EndDraw waits for vertical sync.
+    """
+    hwnd = create_window()
+    factory = pyd2d.GetD2DFactory()
+    rt = factory.CreateHwndRenderTarget(hwnd, 400, 300)
+    brush = rt.CreateSolidColorBrush(1.0, 0.5, 0.0)
+
+    def draw(target):
+        target.Clear(0.0, 0.0, 0.0)
+        target.FillRectangle(10, 10, 100, 100, brush)
+
+    async def render_sync():
+        rt.BeginDraw()
+        draw(rt)
+        rt.EndDraw()
+        await asyncio.sleep(0)
+
+    async def render_async():
+        await rt.DrawFrameAsync(draw)
+
+    results = [
+        ("EndDraw", asyncio.run(measure_loop_latency(duration, render_sync))),
+        ("EndDrawAsync", asyncio.run(measure_loop_latency(duration, render_async))),
+    ]
+    destroy_window(hwnd)
+    for name, (mean, worst) in results:
+        print(
+            f"  {name + ':':13} mean {mean * 1e3:7.3f} ms, worst {worst * 1e3:7.3f} ms"
+        )
+
+
+@benchmark
+def device_recovery(resources=10000, used=100):
+    """
+    Time to draw the first frame after the device is lost.
+    Resources are recreated when they are first used, so the frame only pays
+    for the few it draws with. Needs a stub build, which can simulate the
+    device loss.
+    """
+    if not hasattr(pyd2d, "_stub_set_result"):
+        print("  skipped: device loss can only be simulated with a stub build")
+        return None
+    hwnd = create_window()
+    factory = pyd2d.GetD2DFactory()
+    rt = factory.CreateHwndRenderTarget(hwnd, 400, 300)
+    recovery = rt.EnableDeviceRecovery()
+    brushes = [
+        rt.CreateSolidColorBrush(i / resources, 0.0, 0.0) for i in range(resources)
+    ]
+    bitmaps = [rt.CreateBitmap(64, 64, bytes(64 * 64 * 4)) for i in range(used)]
+
+    def lose_device():
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0x8899000C)
+        rt.BeginDraw()
+        rt.EndDraw()
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0)
+
+    def draw_frame(count):
+        start = time.perf_counter()
+        rt.BeginDraw()
+        for i in range(count):
+            rt.FillRectangle(i, 0, i + 1, 1, brushes[i])
+        for bitmap in bitmaps:
+            rt.DrawBitmap(bitmap, 0, 0, 64, 64)
+        rt.EndDraw()
+        return time.perf_counter() - start
+
+    results = {}
+    for name, count in [("first frame", used), ("every resource", resources)]:
+        lose_device()
+        results[name] = draw_frame(count) * 1e3
+        print(
+            f"  {name + ':':16} {results[name]:8.3f} ms,"
+            f" {recovery.recreatedResources:6,} resources recreated"
+            f" in {recovery.recoveryTime * 1e3:8.3f} ms"
+        )
+    destroy_window(hwnd)
+    return results
+
+
+@benchmark
+def import_time(runs=20, budget=10.0):
+    """
+    Time to import pyd2d in a new interpreter, in milliseconds.
+    The best of `runs` interpreters started with `-X importtime` is compared
+    with `budget`. Importing pyd2d does no COM work, and the constants and
+    other modules it uses are imported when they are first needed.
+    """
+    times = []
+    for _ in range(runs):
+        log = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import pyd2d"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stderr
+        match = re.search(r"^import time:\s+\d+ \|\s+(\d+) \| pyd2d$", log, re.M)
+        times.append(int(match.group(1)) / 1e3)
+    results = {"import pyd2d": min(times)}
+    status = "within" if results["import pyd2d"] <= budget else "OVER"
+    print(
+        f"  import pyd2d: {results['import pyd2d']:8.3f} ms"
+        f" ({status} the budget of {budget:.1f} ms)"
+    )
+    return results
+
+
+def overhead_cases(hwnd):
+    """
+    Returns the cases of the overhead benchmark as (name, func, target) tuples.
+    `name` lists the methods that `func` calls, joined with "+", with the batch
+    size in brackets and any variant in parentheses. If `target` is not None,
+    the case is run between `target.BeginDraw()` and `target.EndDraw()`.
+    """
+    d2d = pyd2d.GetD2DFactory()
+    dwrite = pyd2d.GetDWriteFactory()
+    cached_dwrite = pyd2d.DWriteFactory()
+    cached_dwrite.EnableTextLayoutCache()
+    uncached_d2d = pyd2d.D2DFactory()
+    uncached_d2d.DisableStrokeStyleCache()
+    rt = d2d.CreateHwndRenderTarget(hwnd, 400, 300)
+    stats_rt = d2d.CreateHwndRenderTarget(hwnd, 400, 300)
+    stats_rt.EnableFrameStats()
+    damage_rt = d2d.CreateHwndRenderTarget(hwnd, 400, 300)
+    damage_rt.EnableDamageTracking()
+    recovery_rt = d2d.CreateHwndRenderTarget(hwnd, 400, 300)
+    recovery_rt.EnableDeviceRecovery()
+    realized_rt = d2d.CreateHwndRenderTarget(hwnd, 400, 300)
+    realized_rt.EnableGeometryRealizationCache()
+    # Ten price cells of a trading screen change per frame.
+    cells = [pyd2d.RectF(10, 10 + 20 * i, 90, 28 + 20 * i) for i in range(10)]
+    brush = rt.CreateSolidColorBrush(1.0, 0.5, 0.0)
+    brushes = [rt.CreateSolidColorBrush(i / 4, 0.0, 0.0) for i in range(4)]
+    stroke_style = d2d.CreateStrokeStyle()
+    geometry = d2d.CreatePathGeometryFromPolyline(
+        array.array("f", [0, 0, 10, 0, 10, 10]), closed=True
+    )
+    realized_brush = realized_rt.CreateSolidColorBrush(1.0, 0.5, 0.0)
+    text = "Hello, world!"
+    prepared_text = pyd2d.PreparedText(text)
+    text_format = dwrite.CreateTextFormat("Arial", 12.0)
+    text_layout = dwrite.CreateTextLayout(text, text_format, 200.0, 50.0)
+    column = ["row %d" % i for i in range(100)]
+    pixels = bytearray(256 * 256 * 4)
+    bitmap = rt.CreateBitmap(256, 256, pixels)
+    wic_rt = d2d.CreateWicBitmapRenderTarget(256, 256)
+    items = array.array("f", [10, 10, 50, 50] * 100)
+    # A scrolled list of 1000 rows, of which the 300 DIP high view shows 15.
+    rows = array.array("f")
+    for i in range(1000):
+        rows.extend([0, i * 20, 400, i * 20 + 18])
+    indices = array.array("i", [i % 4 for i in range(100)])
+    draw_list = pyd2d.DrawList()
+    for i in range(100):
+        draw_list.FillRectangle(i, i, i + 10, i + 10, brush)
+    # A 20000x16000 canvas of 200k items, of which the 400x300 view shows 80.
+    scene = pyd2d.Scene()
+    for i in range(200000):
+        x = (i % 500) * 40.0
+        y = (i // 500) * 40.0
+        scene.FillRectangle(x, y, x + 30.0, y + 30.0, brush)
+    scene.HitTest(0.0, 0.0)
+    # The segments are added to an open figure; figure_sink has none.
+    sink = d2d.CreatePathGeometry().Open()
+    sink.BeginFigure(0.0, 0.0)
+    figure_sink = d2d.CreatePathGeometry().Open()
+    points = array.array("f", [1, 2] * 100)
+    beziers = array.array("f", [1, 2, 3, 4, 5, 6] * 100)
+    quadratic_beziers = array.array("f", [1, 2, 3, 4] * 100)
+    point = pyd2d.Point2F(1, 2)
+    rect = pyd2d.RectF(10, 10, 50, 50)
+    ellipse = pyd2d.Ellipse(50, 50, 10, 10)
+    color = pyd2d.ColorF(1.0, 0.5, 0.0)
+    matrix = pyd2d.Matrix3x2F.Rotation(30.0) * pyd2d.Matrix3x2F.Translation(5, 5)
+    # Rotates in place without drifting, so it can be transformed repeatedly.
+    rotation = pyd2d.Matrix3x2F.Rotation(90.0)
+    rotated_points = array.array("f", [1, 2] * 100)
+
+    def begin_end_draw():
+        rt.BeginDraw()
+        rt.EndDraw()
+
+    def open_close_sink():
+        new_sink = d2d.CreatePathGeometry().Open()
+        new_sink.SetFillMode(1)
+        new_sink.Close()
+
+    def figure():
+        figure_sink.BeginFigure(0.0, 0.0)
+        figure_sink.EndFigure()
+
+    def cache_enable_disable():
+        dwrite.EnableTextLayoutCache()
+        dwrite.DisableTextLayoutCache()
+
+    def damage_enable_disable():
+        rt.EnableDamageTracking()
+        rt.DisableDamageTracking()
+
+    def draw_damaged():
+        for cell in cells:
+            damage_rt.Invalidate(cell)
+        damage_rt.DrawDamaged(lambda target, rect: target.FillRectangle(rect, brush))
+
+    def invalidate_all():
+        damage_rt.InvalidateAll()
+        damage_rt.GetDamageRects()
+
+    def frame_stats_enable_disable():
+        rt.EnableFrameStats()
+        rt.DisableFrameStats()
+
+    def realization_enable_disable():
+        rt.EnableGeometryRealizationCache()
+        rt.DisableGeometryRealizationCache()
+
+    scheduler = pyd2d.FrameScheduler(rt, lambda target, alpha: None)
+
+    def scheduled_frame():
+        scheduler.Invalidate()
+        scheduler.Tick()
+
+    def brush_pool_miss():
+        rt.ClearBrushPool()
+        rt.GetSolidColorBrush(1.0, 0.5, 0.0)
+
+    loop = asyncio.new_event_loop()
+
+    def draw_frame_async():
+        loop.run_until_complete(rt.DrawFrameAsync(lambda target: None))
+
+    def read_pixels():
+        with wic_rt.ReadPixels() as locked:
+            memoryview(locked).release()
+
+    def push_pop_clip():
+        rt.PushAxisAlignedClip(rect)
+        rt.PopAxisAlignedClip()
+
+    def push_pop_layer():
+        rt.PushLayer(contentBounds=rect)
+        rt.PopLayer()
+
+    def clipped_rows():
+        rt.PushAxisAlignedClip(0, 0, 400, 300)
+        rt.FillRectangles(rows, brush)
+        rt.PopAxisAlignedClip()
+
+    def clipped_row_calls():
+        rt.PushAxisAlignedClip(0, 0, 400, 300)
+        for i in range(100):
+            rt.FillRectangle(0, i * 20 + 1000, 400, i * 20 + 1018, brush)
+        rt.PopAxisAlignedClip()
+
+    def push_pop_transform():
+        rt.PushTransform(matrix)
+        rt.PopTransform()
+
+    return [
+        ("RenderTarget.BeginDraw+EndDraw", begin_end_draw, None),
+        ("RenderTarget.Clear", lambda: rt.Clear(0.0, 0.0, 0.0), rt),
+        ("RenderTarget.Clear(ColorF)", lambda: rt.Clear(color), rt),
+        ("RenderTarget.Clear(RGBA)", lambda: rt.Clear(0x000000FF), rt),
+        (
+            "RenderTarget.CreateSolidColorBrush",
+            lambda: rt.CreateSolidColorBrush(1.0, 0.5, 0.0),
+            None,
+        ),
+        (
+            "RenderTarget.CreateSolidColorBrush(device recovery)",
+            lambda: recovery_rt.CreateSolidColorBrush(1.0, 0.5, 0.0),
+            None,
+        ),
+        ("RenderTarget.CreateLayer", rt.CreateLayer, None),
+        (
+            "RenderTarget.CreateBitmap[256x256]",
+            lambda: rt.CreateBitmap(256, 256, pixels),
+            None,
+        ),
+        (
+            "Bitmap.CopyFromMemory[256x256]",
+            lambda: bitmap.CopyFromMemory(pixels),
+            None,
+        ),
+        (
+            "WICBitmapRenderTarget.ReadPixels+memoryview[256x256]",
+            read_pixels,
+            None,
+        ),
+        (
+            "RenderTarget.DrawBitmap",
+            lambda: rt.DrawBitmap(bitmap, 0, 0, 256, 256),
+            rt,
+        ),
+        (
+            "RenderTarget.DrawEllipse",
+            lambda: rt.DrawEllipse(50, 50, 10, 10, brush, 2.0, stroke_style),
+            rt,
+        ),
+        ("RenderTarget.DrawEllipses[100]", lambda: rt.DrawEllipses(items, brush), rt),
+        (
+            "RenderTarget.DrawFrameAsync+BeginDraw+EndDrawAsync",
+            draw_frame_async,
+            None,
+        ),
+        ("RenderTarget.DrawGeometry", lambda: rt.DrawGeometry(geometry, brush), rt),
+        ("RenderTarget.DrawLine", lambda: rt.DrawLine(0, 0, 50, 50, brush), rt),
+        ("RenderTarget.DrawLines[100]", lambda: rt.DrawLines(items, brush), rt),
+        ("RenderTarget.DrawRectangle", lambda: rt.DrawRectangle(0, 0, 5, 5, brush), rt),
+        (
+            "RenderTarget.DrawRectangles[100]",
+            lambda: rt.DrawRectangles(items, brush),
+            rt,
+        ),
+        ("RenderTarget.DrawScene[200k]", lambda: rt.DrawScene(scene), rt),
+        ("Scene.HitTest[200k]", lambda: scene.HitTest(10015.0, 8015.0), None),
+        (
+            "RenderTarget.DrawText",
+            lambda: rt.DrawText(text, text_format, 0, 0, 200, 50, brush),
+            rt,
+        ),
+        (
+            "RenderTarget.DrawText(PreparedText)",
+            lambda: rt.DrawText(prepared_text, text_format, 0, 0, 200, 50, brush),
+            rt,
+        ),
+        (
+            "RenderTarget.DrawTextLayout",
+            lambda: rt.DrawTextLayout(0, 0, text_layout, brush),
+            rt,
+        ),
+        (
+            "RenderTarget.Invalidate[10]+DrawDamaged+FillRectangle",
+            draw_damaged,
+            None,
+        ),
+        (
+            "RenderTarget.EnableDamageTracking+DisableDamageTracking",
+            damage_enable_disable,
+            None,
+        ),
+        ("RenderTarget.InvalidateAll+GetDamageRects", invalidate_all, None),
+        (
+            "RenderTarget.EnableFrameStats+DisableFrameStats",
+            frame_stats_enable_disable,
+            None,
+        ),
+        (
+            "RenderTarget.EnableGeometryRealizationCache"
+            "+DisableGeometryRealizationCache",
+            realization_enable_disable,
+            None,
+        ),
+        ("RenderTarget.FillEllipse", lambda: rt.FillEllipse(50, 50, 10, 10, brush), rt),
+        (
+            "RenderTarget.FillEllipse(Ellipse)",
+            lambda: rt.FillEllipse(ellipse, brush),
+            rt,
+        ),
+        ("RenderTarget.FillEllipses[100]", lambda: rt.FillEllipses(items, brush), rt),
+        ("RenderTarget.FillGeometry", lambda: rt.FillGeometry(geometry, brush), rt),
+        (
+            "RenderTarget.FillGeometry(realized)",
+            lambda: realized_rt.FillGeometry(geometry, realized_brush),
+            realized_rt,
+        ),
+        (
+            "RenderTarget.FillRectangle",
+            lambda: rt.FillRectangle(10, 10, 50, 50, brush),
+            rt,
+        ),
+        (
+            "RenderTarget.FillRectangle(float)",
+            lambda: rt.FillRectangle(10.0, 10.0, 50.0, 50.0, brush),
+            rt,
+        ),
+        (
+            "RenderTarget.FillRectangle(RectF)",
+            lambda: rt.FillRectangle(rect, brush),
+            rt,
+        ),
+        (
+            "RenderTarget.FillRectangle(frame stats)",
+            lambda: stats_rt.FillRectangle(10, 10, 50, 50, brush),
+            stats_rt,
+        ),
+        (
+            "RenderTarget.FillRectangles[100]",
+            lambda: rt.FillRectangles(items, brush),
+            rt,
+        ),
+        (
+            "RenderTarget.FillRectangles[100](brushIndices)",
+            lambda: rt.FillRectangles(items, brushes, indices),
+            rt,
+        ),
+        ("RenderTarget.GetFrameStats", stats_rt.GetFrameStats, None),
+        (
+            "RenderTarget.GetGeometryRealizationCache",
+            realized_rt.GetGeometryRealizationCache,
+            None,
+        ),
+        (
+            "RenderTarget.GetSolidColorBrush",
+            lambda: rt.GetSolidColorBrush(1.0, 0.5, 0.0),
+            None,
+        ),
+        (
+            "RenderTarget.GetSolidColorBrush(ColorF)",
+            lambda: rt.GetSolidColorBrush(color),
+            None,
+        ),
+        ("RenderTarget.ClearBrushPool+GetSolidColorBrush", brush_pool_miss, None),
+        ("RenderTarget.GetSize", rt.GetSize, None),
+        ("RenderTarget.GetTransform", rt.GetTransform, None),
+        ("RenderTarget.PushTransform+PopTransform", push_pop_transform, rt),
+        (
+            "RenderTarget.PushAxisAlignedClip+PopAxisAlignedClip",
+            push_pop_clip,
+            rt,
+        ),
+        ("RenderTarget.PushLayer+PopLayer", push_pop_layer, rt),
+        (
+            "RenderTarget.PushAxisAlignedClip+FillRectangles[1000](15 visible)"
+            "+PopAxisAlignedClip",
+            clipped_rows,
+            rt,
+        ),
+        (
+            "RenderTarget.PushAxisAlignedClip+FillRectangle[100](offscreen)"
+            "+PopAxisAlignedClip",
+            clipped_row_calls,
+            rt,
+        ),
+        ("RenderTarget.Replay[100]", lambda: rt.Replay(draw_list), rt),
+        ("RenderTarget.SetAntialiasMode", lambda: rt.SetAntialiasMode(0), rt),
+        ("RenderTarget.SetBrushPoolLimit", lambda: rt.SetBrushPoolLimit(256), None),
+        ("RenderTarget.SetTransform", lambda: rt.SetTransform(dx=1.0, dy=2.0), rt),
+        (
+            "RenderTarget.SetTransform(Matrix3x2F)",
+            lambda: rt.SetTransform(matrix),
+            rt,
+        ),
+        ("Matrix3x2F.__mul__", lambda: matrix * matrix, None),
+        (
+            "Matrix3x2F.TransformPoints[100]",
+            lambda: rotation.TransformPoints(rotated_points),
+            None,
+        ),
+        ("GeometrySink.AddArc", lambda: sink.AddArc(5, 5, 2, 2, 0, 0, 0), None),
+        ("GeometrySink.AddBezier", lambda: sink.AddBezier(1, 2, 3, 4, 5, 6), None),
+        ("GeometrySink.AddBeziers[100]", lambda: sink.AddBeziers(beziers), None),
+        ("GeometrySink.AddLine", lambda: sink.AddLine(1, 2), None),
+        ("GeometrySink.AddLine(Point2F)", lambda: sink.AddLine(point), None),
+        ("GeometrySink.AddLines[100]", lambda: sink.AddLines(points), None),
+        (
+            "GeometrySink.AddQuadraticBezier",
+            lambda: sink.AddQuadraticBezier(1, 2, 3, 4),
+            None,
+        ),
+        (
+            "GeometrySink.AddQuadraticBeziers[100]",
+            lambda: sink.AddQuadraticBeziers(quadratic_beziers),
+            None,
+        ),
+        ("GeometrySink.BeginFigure+EndFigure", figure, None),
+        (
+            "D2DFactory.CreatePathGeometry+PathGeometry.Open"
+            "+GeometrySink.SetFillMode+Close",
+            open_close_sink,
+            None,
+        ),
+        (
+            "D2DFactory.CreateStrokeStyle(dashes)",
+            lambda: d2d.CreateStrokeStyle(dashes=(4.0, 2.0)),
+            None,
+        ),
+        (
+            "D2DFactory.CreateStrokeStyle(dashes, uncached)",
+            lambda: uncached_d2d.CreateStrokeStyle(dashes=(4.0, 2.0)),
+            None,
+        ),
+        (
+            "FrameScheduler.Invalidate+Tick+RenderTarget.BeginDraw+EndDraw",
+            scheduled_frame,
+            None,
+        ),
+        (
+            "DWriteFactory.CreateTextFormat",
+            lambda: dwrite.CreateTextFormat("Arial", 12.0),
+            None,
+        ),
+        (
+            "DWriteFactory.CreateTextLayout",
+            lambda: dwrite.CreateTextLayout(text, text_format, 200.0, 50.0),
+            None,
+        ),
+        (
+            "DWriteFactory.CreateTextLayout(PreparedText)",
+            lambda: dwrite.CreateTextLayout(prepared_text, text_format, 200.0, 50.0),
+            None,
+        ),
+        (
+            "DWriteFactory.CreateTextLayout(cached)",
+            lambda: cached_dwrite.CreateTextLayout(text, text_format, 200.0, 50.0),
+            None,
+        ),
+        (
+            "DWriteFactory.EnableTextFormatCache",
+            cached_dwrite.EnableTextFormatCache,
+            None,
+        ),
+        (
+            "DWriteFactory.EnableTextLayoutCache+DisableTextLayoutCache",
+            cache_enable_disable,
+            None,
+        ),
+        (
+            "DWriteFactory.GetTextFormat",
+            lambda: dwrite.GetTextFormat("Arial", 12.0),
+            None,
+        ),
+        ("DWriteFactory.GetTextFormatCache", dwrite.GetTextFormatCache, None),
+        ("DWriteFactory.GetTextLayoutCache", cached_dwrite.GetTextLayoutCache, None),
+        (
+            "DWriteFactory.MeasureTexts[100]",
+            lambda: dwrite.MeasureTexts(column, text_format, 200.0, 50.0),
+            None,
+        ),
+        (
+            "DWriteFactory.CreateTextLayout+TextLayout.GetMetrics[100]",
+            lambda: [
+                dwrite.CreateTextLayout(cell, text_format, 200.0, 50.0).GetMetrics()
+                for cell in column
+            ],
+            None,
+        ),
+    ]
+
+
+# Classes whose methods the overhead benchmark should cover,
+# keyed on the class name used in the case names.
+OVERHEAD_CLASSES = {
+    "RenderTarget": [pyd2d.RenderTarget],
+    "GeometrySink": [pyd2d.GeometrySink, pyd2d.SimplifiedGeometrySink],
+    "DWriteFactory": [pyd2d.DWriteFactory],
+}
+
+
+def covered_methods(names):
+    """
+    Returns the "Class.Method" names called by the overhead cases with the
+    given names.
+    """
+    covered = set()
+    for name in names:
+        cls = None
+        for part in name.split("+"):
+            part = re.split(r"[\[(]", part)[0]
+            if "." in part:
+                cls, part = part.split(".")
+            covered.add(f"{cls}.{part}")
+    return covered
+
+
+@benchmark
+def overhead():
+    """
+    Time per call of the RenderTarget, GeometrySink and DWriteFactory methods.
+    The cost of calling an empty function is subtracted, so with a stub build
+    the results are the overhead of the wrapper itself.
+    """
+    hwnd = create_window()
+    empty = time_call(lambda: None)
+    results = {}
+    for name, func, target in overhead_cases(hwnd):
+        if target is not None:
+            target.BeginDraw()
+        try:
+            results[name] = max(time_call(func) - empty, 0.0)
+        finally:
+            if target is not None:
+                target.EndDraw()
+        print(f"  {name:<68} {results[name]:10,.1f} ns")
+    destroy_window(hwnd)
+    methods = {
+        f"{name}.{method}"
+        for name, classes in OVERHEAD_CLASSES.items()
+        for cls in classes
+        for method in vars(cls)
+        if not method.startswith("_") and method != "Release"
+    }
+    missing = sorted(methods - covered_methods(results))
+    if missing:
+        print(f"  not measured: {', '.join(missing)}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the results that are more than `tolerance` times slower than in
+    `baseline`, and returns the number of such regressions.
+    """
+    regressions = 0
+    for name, values in results.items():
+        for case, value in values.items():
+            old = baseline.get(name, {}).get(case)
+            if old and value > old * tolerance:
+                print(f"{name}: {case} regressed from {old:,.1f} to {value:,.1f}")
+                regressions += 1
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Runs pyd2d benchmarks.",
+        epilog=f"Benchmarks: {', '.join(BENCHMARKS)}",
+    )
+    parser.add_argument("names", nargs="*", metavar="NAME")
+    parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    parser.add_argument(
+        "--compare", metavar="FILE", help="compare with results written by --save"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.25,
+        help="slowdown factor reported as a regression (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark {name!r}; choose from {', '.join(BENCHMARKS)}")
+            return 1
+    pyd2d.InitializeCOM()
+    results = {}
+    for name in args.names or BENCHMARKS:
+        print(f"{name}: {BENCHMARKS[name].__doc__.strip().splitlines()[0]}")
+        result = BENCHMARKS[name]()
+        if result is not None:
+            results[name] = result
+    pyd2d.UninitializeCOM()
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
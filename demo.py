@@ -14,7 +14,6 @@ kernel32 = ctypes.windll.kernel32
 
 HCURSOR = wintypes.HANDLE
 LRESULT = wintypes.LPARAM
-UINT_PTR = wintypes.WPARAM
 
 WNDPROC = ctypes.WINFUNCTYPE(
     LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM
@@ -102,29 +101,29 @@ user32.EndPaint.argtypes = [wintypes.HWND, ctypes.POINTER(PAINTSTRUCT)]
 user32.GetClientRect.restype = wintypes.BOOL
 user32.GetClientRect.argtypes = [wintypes.HWND, ctypes.POINTER(wintypes.RECT)]
 
-user32.GetMessageW.restype = wintypes.BOOL
-user32.GetMessageW.argtypes = [
-    ctypes.POINTER(MSG),
-    wintypes.HWND,
-    wintypes.UINT,
-    wintypes.UINT,
-]
-
 kernel32.GetModuleHandleW.restype = wintypes.HMODULE
 kernel32.GetModuleHandleW.argtypes = [wintypes.LPCWSTR]
 
-user32.InvalidateRect.restype = wintypes.BOOL
-user32.InvalidateRect.argtypes = [
-    wintypes.HWND,
-    ctypes.POINTER(wintypes.RECT),
+user32.LoadCursorW.restype = HCURSOR
+user32.LoadCursorW.argtypes = [wintypes.HINSTANCE, wintypes.LPCWSTR]
+
+user32.MsgWaitForMultipleObjects.restype = wintypes.DWORD
+user32.MsgWaitForMultipleObjects.argtypes = [
+    wintypes.DWORD,
+    ctypes.POINTER(wintypes.HANDLE),
     wintypes.BOOL,
+    wintypes.DWORD,
+    wintypes.DWORD,
 ]
 
-user32.KillTimer.restype = wintypes.BOOL
-user32.KillTimer.argtypes = [wintypes.HWND, UINT_PTR]
-
-user32.LoadCursorW.restype = HCURSOR
-user32.LoadCursorW.argtypes = [wintypes.HINSTANCE, wintypes.LPCWSTR]
+user32.PeekMessageW.restype = wintypes.BOOL
+user32.PeekMessageW.argtypes = [
+    ctypes.POINTER(MSG),
+    wintypes.HWND,
+    wintypes.UINT,
+    wintypes.UINT,
+    wintypes.UINT,
+]
 
 user32.PostQuitMessage.restype = None
 user32.PostQuitMessage.argtypes = [wintypes.INT]
@@ -141,14 +140,6 @@ user32.SetCapture.argtypes = [wintypes.HWND]
 user32.SetCursor.restype = HCURSOR
 user32.SetCursor.argtypes = [HCURSOR]
 
-user32.SetTimer.restype = UINT_PTR
-user32.SetTimer.argtypes = [
-    wintypes.HWND,
-    UINT_PTR,
-    wintypes.UINT,
-    wintypes.LPVOID,
-]
-
 user32.ShowWindow.restype = wintypes.BOOL
 user32.ShowWindow.argtypes = [wintypes.HWND, ctypes.c_int]
 
@@ -167,13 +158,19 @@ CW_USEDEFAULT = 0x80000000
 IDC_ARROW = 32512
 IDC_HAND = 32649
 
+INFINITE = 0xFFFFFFFF
+
+PM_REMOVE = 0x0001
+
+QS_ALLINPUT = 0x04FF
+
 SW_SHOWDEFAULT = 10
 
 WM_CREATE = 0x0001
 WM_DESTROY = 0x0002
 WM_SIZE = 0x0005
 WM_PAINT = 0x000F
-WM_TIMER = 0x0113
+WM_QUIT = 0x0012
 WM_MOUSEMOVE = 0x0200
 WM_LBUTTONDOWN = 0x0201
 WM_LBUTTONUP = 0x0202
@@ -205,32 +202,63 @@ class PyD2DDemoWindow:
             int(self.hwnd), self.width, self.height
         )
         factory.Release()
+        # Brushes created from here on are recreated if the device is lost.
+        self.render_target.EnableDeviceRecovery()
         self.line_brush = self.render_target.CreateSolidColorBrush(1.0, 0.5, 0.5)
         self.text_brush = self.render_target.CreateSolidColorBrush(1.0, 1.0, 1.0, 0.5)
-        check(user32.SetTimer(self.hwnd, 123, 10, None))
+        # The main loop calls the scheduler, which advances the balls every
+        # 10 ms and redraws the window when they moved.
+        self.scheduler = pyd2d.FrameScheduler(
+            self.render_target, self.paint, self.update, timestep=0.01
+        )
         dwritefactory = pyd2d.GetDWriteFactory()
         self.text_format = dwritefactory.CreateTextFormat("Segoe UI", 12)
         dwritefactory.Release()
         self.mouse_is_down = False
         self.balls = []  # type: list[Ball]
+        # The balls are drawn from a scene, which also finds the ball under
+        # the mouse. Ball.node is the ball's node in the scene.
+        self.scene = pyd2d.Scene()
+        self.ball_nodes = {}  # type: dict[int, Ball]
         for _ in range(10):
             ball = Ball(
                 self.width / 2,
                 self.height - 50,
                 self.width,
                 self.height,
-                self.render_target.CreateSolidColorBrush(
+                self.render_target.GetSolidColorBrush(
                     random.random(), random.random(), random.random()
                 ),
             )
             ball.dx = random.randint(-100, 100)
             ball.dy = random.randint(-300, -100)
-            self.balls.append(ball)
+            self.add_ball(ball)
 
-    def destroy(self):
-        check(user32.KillTimer(self.hwnd, 123))
+    def add_ball(self, ball):
+        ball.node = self.scene.FillEllipse(ball.x, ball.y, 10, 10, ball.brush)
+        ball.node_x = ball.x
+        ball.node_y = ball.y
+        self.ball_nodes[ball.node] = ball
+        self.balls.append(ball)
+
+    def remove_ball(self, ball):
+        self.scene.Remove(ball.node)
+        del self.ball_nodes[ball.node]
+        self.balls.remove(ball)
+
+    def update_scene(self, alpha=1.0):
+        # Balls are drawn between their last two positions, `alpha` of the
+        # way to the current one, so that they move smoothly whatever the
+        # frame rate.
         for ball in self.balls:
-            ball.brush.Release()
+            x = ball.px + (ball.x - ball.px) * alpha
+            y = ball.py + (ball.y - ball.py) * alpha
+            if x != ball.node_x or y != ball.node_y:
+                self.scene.Translate(ball.node, x - ball.node_x, y - ball.node_y)
+                ball.node_x = x
+                ball.node_y = y
+
+    def destroy(self):
         self.text_brush.Release()
         self.line_brush.Release()
         self.render_target.Release()
@@ -246,9 +274,7 @@ class PyD2DDemoWindow:
             ball.width = self.width
             ball.height = self.height
 
-    def paint(self):
-        rt = self.render_target
-        rt.BeginDraw()
+    def paint(self, rt, alpha):
         rt.Clear(0.25, 0.25, 0.5)
         rt.DrawLine(
             10,
@@ -268,8 +294,8 @@ class PyD2DDemoWindow:
                 self.line_brush,
                 5,
             )
-        for ball in self.balls:
-            rt.FillEllipse(ball.x, ball.y, 10, 10, ball.brush)
+        self.update_scene(alpha)
+        rt.DrawScene(self.scene)
         if self.balls:
             ball = self.balls[-1]
             text = (
@@ -280,32 +306,45 @@ class PyD2DDemoWindow:
             )
         else:
             text = "Click and drag to throw balls."
+        p50, p99 = self.scheduler.GetFrameTimePercentiles((50, 99))
+        text += f"\nFrame time: {p50 * 1e3:.1f} ms (p99 {p99 * 1e3:.1f} ms)"
         rt.DrawText(text, self.text_format, 5, 5, 200, 200, self.text_brush)
-        rt.EndDraw()
 
     def mouse_move(self, x, y):
         if self.mouse_is_down:
-            self.balls[-1].x = x
-            self.balls[-1].y = y
-            check(user32.InvalidateRect(self.hwnd, None, False))
+            self.balls[-1].px = self.balls[-1].x = x
+            self.balls[-1].py = self.balls[-1].y = y
+            self.scheduler.Invalidate()
             user32.SetCursor(self.cursor_hand)
         else:
             user32.SetCursor(self.cursor_arrow)
 
     def mouse_down(self, x, y):
-        ball = Ball(
-            x,
-            y,
-            self.width,
-            self.height,
-            self.render_target.CreateSolidColorBrush(
-                random.random(), random.random(), random.random()
-            ),
-        )
-        self.balls.append(ball)
+        self.update_scene()
+        node = self.scene.HitTest(x, y, tolerance=2)
+        if node is not None:
+            # Pick up the ball under the mouse and throw it again.
+            ball = self.ball_nodes[node]
+            self.balls.remove(ball)
+            self.balls.append(ball)
+            ball.sx = ball.px = ball.x = x
+            ball.sy = ball.py = ball.y = y
+            ball.dx = ball.dy = 0
+            ball.stopped_since = None
+        else:
+            ball = Ball(
+                x,
+                y,
+                self.width,
+                self.height,
+                self.render_target.GetSolidColorBrush(
+                    random.random(), random.random(), random.random()
+                ),
+            )
+            self.add_ball(ball)
         self.mouse_is_down = True
         user32.SetCapture(self.hwnd)
-        check(user32.InvalidateRect(self.hwnd, None, False))
+        self.scheduler.Invalidate()
         user32.SetCursor(self.cursor_hand)
 
     def mouse_up(self, x, y):
@@ -316,14 +355,20 @@ class PyD2DDemoWindow:
             self.balls[-1].dy = y - self.balls[-1].sy
         self.mouse_is_down = False
         check(user32.ReleaseCapture())
-        check(user32.InvalidateRect(self.hwnd, None, False))
+        self.scheduler.Invalidate()
         user32.SetCursor(self.cursor_arrow)
 
-    def timer(self):
+    def update(self, dt):
+        # Returns whether any ball moved or was removed, so that frames are
+        # only drawn when something changed.
+        changed = False
         for i, ball in enumerate(self.balls):
+            ball.px = ball.x
+            ball.py = ball.y
             if self.mouse_is_down and i == len(self.balls) - 1:
                 continue
-            ball.timer()
+            ball.update()
+            changed = changed or ball.x != ball.px or ball.y != ball.py
         for a, b in itertools.combinations(self.balls, 2):
             dx = b.x - a.x
             dy = b.y - a.y
@@ -348,12 +393,13 @@ class PyD2DDemoWindow:
                 b.y += 0.5 * overlap * ny
                 a.stopped_since = None
                 b.stopped_since = None
+                changed = True
         now = time.time()
         for ball in list(self.balls):
             if ball.stopped_since and now - ball.stopped_since > 10:
-                ball.brush.Release()
-                self.balls.remove(ball)
-        check(user32.InvalidateRect(self.hwnd, None, False))
+                self.remove_ball(ball)
+                changed = True
+        return changed
 
 
 class Ball:
@@ -363,15 +409,17 @@ class Ball:
     air_resistance_factor = 0.005
 
     def __init__(self, x, y, w, h, brush):
-        self.sx = self.x = x
-        self.sy = self.y = y
+        self.sx = self.px = self.x = x
+        self.sy = self.py = self.y = y
         self.dx = self.dy = 0
         self.height = h
         self.width = w
         self.brush = brush
         self.stopped_since = None  # type: float | None
+        self.node = None  # type: int | None
+        self.node_x = self.node_y = 0.0
 
-    def timer(self):
+    def update(self):
         # Move along current trajectory
         self.x += self.dx * self.speed_factor
         self.y += self.dy * self.speed_factor
@@ -442,7 +490,7 @@ def wnd_proc_inner(hwnd, msg, wparam, lparam):
     if msg == WM_PAINT:
         ps = PAINTSTRUCT()
         check(user32.BeginPaint(hwnd, ctypes.byref(ps)))
-        win.paint()
+        win.scheduler.DrawFrame()
         user32.EndPaint(hwnd, ctypes.byref(ps))
         return 0
     if msg == WM_MOUSEMOVE:
@@ -454,9 +502,6 @@ def wnd_proc_inner(hwnd, msg, wparam, lparam):
     if msg == WM_LBUTTONUP:
         win.mouse_up(*get_mouse_pos(lparam))
         return 0
-    if msg == WM_TIMER:
-        win.timer()
-        return 0
     return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
 
 
@@ -498,16 +543,29 @@ def main():
     check(user32.UpdateWindow(hwnd))
 
     msg = MSG()
-    while True:
-        ret = user32.GetMessageW(ctypes.byref(msg), None, 0, 0)
-        if ret == 0:
-            break
-        elif ret == -1:
-            print("Failed to get window message:", ctypes.FormatError())
-            break
-        else:
+    running = True
+    while running:
+        while user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, PM_REMOVE):
+            if msg.message == WM_QUIT:
+                running = False
+                break
             user32.TranslateMessage(ctypes.byref(msg))
             user32.DispatchMessageW(ctypes.byref(msg))
+        win = hwnd2win.get(hwnd)
+        if not running or win is None:
+            continue
+        # Draw a frame if one is due, then sleep until the next one is or a
+        # message arrives. While the balls move, EndDraw waits for vertical
+        # sync and NextTick returns 0.
+        win.scheduler.Tick()
+        timeout = win.scheduler.NextTick()
+        user32.MsgWaitForMultipleObjects(
+            0,
+            None,
+            False,
+            INFINITE if timeout is None else math.ceil(timeout * 1000),
+            QS_ALLINPUT,
+        )
 
     check(user32.UnregisterClassW(class_name, wndclass.hInstance))
 
@@ -6,7 +6,20 @@ This module provides a Pythonic interface to Direct2D and DirectWrite,
 which are part of the Windows API.
 """
 
-from typing import Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+from typing_extensions import Buffer
 
 from _pyd2d_const import (
     ALPHA_MAX,
@@ -129,27 +142,49 @@ __all__ = [
     "Brush",
     "COMError",
     "COMObject",
+    "ColorF",
     "D2DFactory",
     "DWriteFactory",
-    "DWriteFactory",
+    "DeviceRecovery",
     "Direct2DError",
     "DirectWriteError",
+    "DrawList",
+    "Ellipse",
     "FontFace",
+    "FrameScheduler",
+    "FrameStats",
     "Geometry",
+    "GeometryRealization",
+    "GeometryRealizationCache",
     "GeometrySink",
     "GetD2DFactory",
     "GetDWriteFactory",
     "HWNDRenderTarget",
     "Image",
     "InitializeCOM",
+    "Layer",
+    "Matrix3x2F",
     "PathGeometry",
+    "PathGeometryCache",
+    "PixelBuffer",
+    "Point2F",
+    "PreparedText",
+    "RectF",
     "RenderTarget",
     "Resource",
+    "ResourceCache",
+    "RunFramesAsync",
+    "Scene",
     "SimplifiedGeometrySink",
     "SolidColorBrush",
     "StrokeStyle",
+    "StrokeStyleCache",
     "TextFormat",
+    "TextFormatCache",
     "TextLayout",
+    "TextLayoutCache",
+    "UninitializeCOM",
+    "WICBitmapRenderTarget",
 ]
 
 class COMError(OSError):
@@ -175,6 +210,18 @@ def UninitializeCOM() -> None:
     Uninitializes COM for the current thread by calling CoUninitialize.
     """
 
+async def RunFramesAsync(
+    renderTarget: "RenderTarget",
+    draw: Callable[["RenderTarget"], Any],
+    frames: Optional[int] = None,
+) -> int:
+    """
+    Draws frames with RenderTarget.DrawFrameAsync until `draw` returns False
+    or `frames` frames have been drawn, and returns the number of frames.
+    Frames are paced by EndDraw, which waits for vertical sync on a worker
+    thread while other tasks run on the event loop.
+    """
+
 class COMObject:
     """
     Base class for COM objects.
@@ -187,6 +234,226 @@ class COMObject:
         Objects are automatically released when they are garbage collected.
         """
 
+class PreparedText:
+    """
+    A string converted once to the wide-character form used by Direct2D and
+    DirectWrite.
+    Pass it in place of a str to RenderTarget.DrawText, DrawList.DrawText, or
+    DWriteFactory.CreateTextLayout when the same text is drawn repeatedly.
+    """
+
+    text: str
+    def __init__(self, text: str) -> None: ...
+    def __len__(self) -> int:
+        """
+        Returns the length of the converted text in UTF-16 code units.
+        """
+
+class Point2F:
+    """
+    A point with float x and y coordinates.
+    Accepted in place of a separate x and y by drawing and geometry sink methods.
+    """
+
+    x: float
+    y: float
+    def __init__(self, x: float = 0.0, y: float = 0.0) -> None: ...
+    def __iter__(self) -> Iterator[float]: ...
+
+class RectF:
+    """
+    A rectangle described by its left, top, right and bottom edges.
+    Accepted in place of separate edges by drawing methods.
+    """
+
+    left: float
+    top: float
+    right: float
+    bottom: float
+    def __init__(
+        self,
+        left: float = 0.0,
+        top: float = 0.0,
+        right: float = 0.0,
+        bottom: float = 0.0,
+    ) -> None: ...
+    def __iter__(self) -> Iterator[float]: ...
+
+class ColorF:
+    """
+    A color with float red, green, blue and alpha components from 0 to 1.
+    Accepted in place of separate components, as is a packed 0xRRGGBBAA integer.
+    """
+
+    r: float
+    g: float
+    b: float
+    a: float
+    def __init__(
+        self, r: float = 0.0, g: float = 0.0, b: float = 0.0, a: float = 1.0
+    ) -> None: ...
+    def __iter__(self) -> Iterator[float]: ...
+    @staticmethod
+    def FromRGBA(rgba: int) -> "ColorF":
+        """
+        Creates a ColorF from a packed 0xRRGGBBAA integer.
+        """
+
+class Ellipse:
+    """
+    An ellipse described by its center point and its x and y radii.
+    Accepted in place of separate values by the ellipse drawing methods.
+    """
+
+    cx: float
+    cy: float
+    rx: float
+    ry: float
+    def __init__(
+        self, cx: float = 0.0, cy: float = 0.0, rx: float = 0.0, ry: float = 0.0
+    ) -> None: ...
+    def __iter__(self) -> Iterator[float]: ...
+
+class Matrix3x2F:
+    """
+    A 3x2 affine transformation matrix, as used by RenderTarget.SetTransform.
+
+    Points are row vectors, so `a * b` is the transform that applies `a` first
+    and then `b`. Angles are in degrees, clockwise in screen coordinates.
+    """
+
+    m11: float
+    m12: float
+    m21: float
+    m22: float
+    dx: float
+    dy: float
+    def __init__(
+        self,
+        m11: float = 1.0,
+        m12: float = 0.0,
+        m21: float = 0.0,
+        m22: float = 1.0,
+        dx: float = 0.0,
+        dy: float = 0.0,
+    ) -> None: ...
+    @staticmethod
+    def Identity() -> "Matrix3x2F":
+        """
+        Creates an identity matrix.
+        """
+    @overload
+    @staticmethod
+    def Translation(offset: "Point2F") -> "Matrix3x2F": ...
+    @overload
+    @staticmethod
+    def Translation(x: float, y: float) -> "Matrix3x2F":
+        """
+        Creates a translation matrix.
+        """
+    @staticmethod
+    def Rotation(
+        angle: float, center: Union["Point2F", Tuple[float, float], None] = None
+    ) -> "Matrix3x2F":
+        """
+        Creates a matrix that rotates by `angle` degrees around `center`.
+        """
+    @staticmethod
+    def Scale(
+        sx: float,
+        sy: float,
+        center: Union["Point2F", Tuple[float, float], None] = None,
+    ) -> "Matrix3x2F":
+        """
+        Creates a matrix that scales by `sx` and `sy` around `center`.
+        """
+    @staticmethod
+    def Skew(
+        angleX: float,
+        angleY: float,
+        center: Union["Point2F", Tuple[float, float], None] = None,
+    ) -> "Matrix3x2F":
+        """
+        Creates a matrix that skews by `angleX` and `angleY` degrees around `center`.
+        """
+    def Determinant(self) -> float:
+        """
+        Returns the determinant of the matrix.
+        """
+    def Invert(self) -> "Matrix3x2F":
+        """
+        Returns the inverse of the matrix.
+        Raises ValueError if the matrix is not invertible.
+        """
+    def IsIdentity(self) -> bool:
+        """
+        Returns whether the matrix is the identity matrix.
+        """
+    def IsInvertible(self) -> bool:
+        """
+        Returns whether the matrix has an inverse.
+        """
+    @overload
+    def TransformPoint(self, point: "Point2F") -> "Point2F": ...
+    @overload
+    def TransformPoint(self, x: float, y: float) -> "Point2F":
+        """
+        Returns the specified point transformed by the matrix.
+        """
+    def TransformPoints(self, points: Buffer) -> None:
+        """
+        Transforms many points in place.
+
+        `points` is a writable C-contiguous float32 buffer of shape Nx2
+        (or flat 2N) holding x, y for each point.
+        """
+    def __mul__(self, other: "Matrix3x2F") -> "Matrix3x2F": ...
+    def __iter__(self) -> Iterator[float]: ...
+
+class ResourceCache:
+    """
+    Base class for the least-recently-used caches of shared resources.
+
+    Cached objects are shared between callers; a cached object that has been
+    released is dropped and recreated on its next lookup.
+    """
+
+    maxEntries: int
+    maxBytes: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    def __init__(self, maxEntries: int = 4096, maxBytes: int = 0) -> None: ...
+    def __len__(self) -> int:
+        """
+        Returns the number of cached objects.
+        """
+    def Clear(self) -> None:
+        """
+        Removes all cached objects. The counters are not reset.
+        """
+
+class PathGeometryCache(ResourceCache):
+    """
+    Least-recently-used cache of PathGeometry objects used by
+    D2DFactory.CreatePathGeometryFromSvg.
+
+    Entries are keyed on the path data and fill mode. The byte size of an entry
+    is estimated from the length of its path data.
+    """
+
+class StrokeStyleCache(ResourceCache):
+    """
+    Least-recently-used cache of StrokeStyle objects used by
+    D2DFactory.CreateStrokeStyle. Every D2DFactory starts with one holding up
+    to 4096 entries.
+
+    Entries are keyed on all of the stroke style properties and the dash
+    pattern, so equal stroke styles share one object. The byte size of an
+    entry is estimated from the size of its properties and dashes.
+    """
+
 def GetD2DFactory() -> "D2DFactory":
     """
     Returns the Direct2D factory object, creating it on the first call.
@@ -216,11 +483,36 @@ class D2DFactory(COMObject):
     ) -> "HWNDRenderTarget":
         """
         Creates a HwndRenderTarget.
+        The GIL is released while the render target is created.
         """
     def CreatePathGeometry(self) -> "PathGeometry":
         """
         Creates a PathGeometry.
         """
+    def CreatePathGeometryFromSvg(self, d: str, fillMode: int = 0) -> "PathGeometry":
+        """
+        Creates a PathGeometry from SVG path data, such as the `d` attribute
+        of an SVG `path` element.
+
+        All SVG path commands (M, L, H, V, C, S, Q, T, A, Z) are supported in both
+        absolute and relative forms. Raises ValueError if the path data is invalid.
+        If the SVG path cache is enabled, a previously created PathGeometry for the
+        same path data and fill mode is returned instead.
+        """
+    def CreatePathGeometryFromPolyline(
+        self,
+        points: Buffer,
+        closed: bool = False,
+        fillMode: int = 0,
+        figureBegin: int = 0,
+    ) -> "PathGeometry":
+        """
+        Creates a PathGeometry containing a single figure through the specified
+        points.
+
+        `points` is a C-contiguous float32 buffer of shape Nx2 (or flat 2N)
+        holding x, y for each point. N must be at least 1.
+        """
     def CreateStrokeStyle(
         self,
         startCap: int = 0,
@@ -230,9 +522,67 @@ class D2DFactory(COMObject):
         miterLimit: float = 10.0,
         dashStyle: int = 0,
         dashOffset: float = 0.0,
+        dashes: Optional[Sequence[float]] = None,
     ) -> "StrokeStyle":
         """
         Creates a StrokeStyle.
+        `dashes` gives the lengths of the dashes and gaps of a custom dash
+        pattern, in multiples of the stroke width, and selects
+        DASH_STYLE.CUSTOM if `dashStyle` is left at DASH_STYLE.SOLID.
+        While the stroke style cache is enabled, which it is by default, a
+        style with the same properties and dashes as an earlier one is
+        returned from the cache.
+        """
+    def CreateWicBitmapRenderTarget(
+        self,
+        width: int,
+        height: int,
+        rtType: int = 0,
+        dpiX: float = 0,
+        dpiY: float = 0,
+        usage: int = 0,
+        featureLevel: int = 0,
+    ) -> "WICBitmapRenderTarget":
+        """
+        Creates a render target that draws into a new offscreen bitmap of the
+        specified pixel size, with no window.
+        Pixels are 32-bit premultiplied BGRA. The Windows Imaging Component
+        factory is created on the first call and kept until the factory is
+        released. The GIL is released while the bitmap and render target are
+        created.
+        """
+    def DisableSvgPathCache(self) -> None:
+        """
+        Disables and discards the SVG path cache.
+        """
+    def EnableSvgPathCache(
+        self, maxEntries: int = 4096, maxBytes: int = 0
+    ) -> "PathGeometryCache":
+        """
+        Enables a least-recently-used cache behind CreatePathGeometryFromSvg,
+        replacing any existing cache, and returns it.
+        A limit of 0 means unlimited.
+        """
+    def GetSvgPathCache(self) -> Optional["PathGeometryCache"]:
+        """
+        Returns the SVG path cache, or None if it is not enabled.
+        """
+    def DisableStrokeStyleCache(self) -> None:
+        """
+        Disables and discards the stroke style cache, so every
+        CreateStrokeStyle call creates a new StrokeStyle.
+        """
+    def EnableStrokeStyleCache(
+        self, maxEntries: int = 4096, maxBytes: int = 0
+    ) -> "StrokeStyleCache":
+        """
+        Enables a least-recently-used cache behind CreateStrokeStyle,
+        replacing any existing cache, and returns it.
+        A limit of 0 means unlimited.
+        """
+    def GetStrokeStyleCache(self) -> Optional["StrokeStyleCache"]:
+        """
+        Returns the stroke style cache, or None if it is not enabled.
         """
 
 class Resource(COMObject):
@@ -240,6 +590,81 @@ class Resource(COMObject):
     Base class representing a Direct2D drawing resource.
     """
 
+class FrameStats:
+    """
+    Statistics of the last frame drawn on a RenderTarget, returned by
+    RenderTarget.GetFrameStats.
+
+    `drawCalls` maps RenderTarget method names to the number of primitives
+    drawn; batched and replayed primitives are counted individually.
+    `culledDraws` counts the primitives skipped because they were outside the
+    clip, which are not in `drawCalls`.
+    `textDraws` counts DrawText and DrawTextLayout calls, and
+    `charactersConverted` counts characters converted from str to wide strings.
+    Object creation and text conversion are counted per thread rather than
+    per render target: work done on other threads is not included, but
+    objects created on the drawing thread for other targets during the frame
+    are, so these counts are approximate when several targets draw at once.
+
+    Times are in seconds. `frameTime` is measured from BeginDraw to the end of
+    EndDraw. `frameTimes` holds the frame times of the recent frames, oldest
+    first, and `histogram` counts them in buckets as (upper bound, count)
+    pairs; the last bound is infinity.
+    """
+
+    frames: int
+    drawCalls: Dict[str, int]
+    culledDraws: int
+    textDraws: int
+    charactersConverted: int
+    brushesCreated: int
+    geometriesCreated: int
+    textLayoutsCreated: int
+    transformChanges: int
+    endDrawTime: float
+    frameTime: float
+    frameTimes: Tuple[float, ...]
+    histogram: Tuple[Tuple[float, int], ...]
+
+class GeometryRealizationCache(ResourceCache):
+    """
+    Least-recently-used cache of geometry rendered to bitmaps, used by
+    RenderTarget.FillGeometry and RenderTarget.DrawGeometry.
+
+    Entries are keyed on the geometry, the brush and its color, the stroke
+    width and the stroke style. The byte size of an entry is the size of its
+    bitmap.
+    """
+
+    scaleTolerance: float
+    invalidations: int
+    def __init__(
+        self,
+        maxEntries: int = 256,
+        maxBytes: int = 64 * 1024 * 1024,
+        scaleTolerance: float = 0.25,
+    ) -> None: ...
+
+class DeviceRecovery:
+    """
+    Records how the device-dependent resources of an HWNDRenderTarget were
+    created, so that they can be recreated after the device is lost. Returned
+    by HWNDRenderTarget.EnableDeviceRecovery.
+
+    `len()` is the number of resources recorded that are still alive. `lost`
+    is True from a device loss until the render target has been recreated,
+    and `pendingResources` counts the resources that have not been recreated
+    yet. `recreatedResources` and `recoveryTime`, in seconds, cover the
+    recreation of the target and its resources since the last device loss.
+    """
+
+    lost: bool
+    deviceLosses: int
+    recreatedResources: int
+    recoveryTime: float
+    pendingResources: int
+    def __len__(self) -> int: ...
+
 class RenderTarget(Resource):
     """
     Base class representing an object that can receive drawing commands.
@@ -251,16 +676,76 @@ class RenderTarget(Resource):
         """
         Initiates drawing on this render target.
         """
+    @overload
+    def Clear(self, color: Union["ColorF", int]) -> None: ...
+    @overload
     def Clear(self, r: float, g: float, b: float, a: float = 1.0) -> None:
         """
         Clears the drawing area to the specified color.
         """
+    def ClearBrushPool(self) -> None:
+        """
+        Drops all brushes from the pool used by GetSolidColorBrush.
+        """
+    def CreateBitmap(
+        self,
+        width: int,
+        height: int,
+        buffer: Optional[Buffer] = None,
+        pitch: int = 0,
+        pixelFormat: int = DXGI_FORMAT.B8G8R8A8_UNORM,
+        alphaMode: int = ALPHA_MODE.PREMULTIPLIED,
+        dpiX: float = 96.0,
+        dpiY: float = 96.0,
+    ) -> "Bitmap":
+        """
+        Creates a Bitmap, optionally initialized from a buffer.
+
+        `buffer` can be any C-contiguous buffer-protocol object (bytes,
+        bytearray, array, memoryview or a numpy array) holding `height` rows
+        of `width` pixels, each row starting `pitch` bytes after the previous
+        one; a pitch of 0 means the rows are tightly packed. The pixels are
+        copied, with the GIL released, and the buffer is not used afterwards.
+        Without a buffer, the bitmap contents are undefined until
+        Bitmap.CopyFromMemory is called.
+        """
+    def CreateLayer(self) -> "Layer":
+        """
+        Creates a Layer for use with PushLayer.
+        """
+    @overload
+    def CreateSolidColorBrush(
+        self, color: Union["ColorF", int], opacity: float = 1.0
+    ) -> "SolidColorBrush": ...
+    @overload
     def CreateSolidColorBrush(
         self, r: float, g: float, b: float, a: float = 1.0, opacity: float = 1.0
     ) -> "SolidColorBrush":
         """
         Creates a SolidColorBrush.
         """
+    def DisableDamageTracking(self) -> None:
+        """
+        Stops damage tracking and discards the dirty rectangles.
+        """
+    def DisableFrameStats(self) -> None:
+        """
+        Stops recording frame statistics and discards the recorded data.
+        """
+    def DisableGeometryRealizationCache(self) -> None:
+        """
+        Disables and discards the geometry realization cache.
+        """
+    @overload
+    def DrawBitmap(
+        self,
+        bitmap: "Bitmap",
+        rect: "RectF",
+        opacity: float = 1.0,
+        interpolationMode: int = 1,
+        srcRect: Union["RectF", Tuple[float, float, float, float], None] = None,
+    ) -> None: ...
+    @overload
     def DrawBitmap(
         self,
         bitmap: "Bitmap",
@@ -276,6 +761,30 @@ class RenderTarget(Resource):
         Draws the specified bitmap after scaling it to the size of the specified
         rectangle.
         """
+    def DrawDamaged(self, draw: Callable[["RenderTarget", "RectF"], Any]) -> bool:
+        """
+        Redraws the dirty rectangles returned by GetDamageRects.
+
+        Returns False without drawing if nothing is dirty. Otherwise it calls
+        BeginDraw, then `draw(self, rect)` once per rectangle with drawing
+        clipped to that rectangle, then EndDraw, and returns True. `draw` can
+        skip anything outside `rect`. The dirty rectangles are cleared when
+        drawing starts. They are restored if `draw` or EndDraw raises.
+        Rectangles invalidated during `draw` are kept for the next frame.
+
+        The rectangles and clips are in target coordinates whatever the
+        current transform is; `draw` is called with that transform in place.
+        Raises ValueError if damage tracking is not enabled.
+        """
+    @overload
+    def DrawEllipse(
+        self,
+        ellipse: "Ellipse",
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> None: ...
+    @overload
     def DrawEllipse(
         self,
         cx: float,
@@ -289,6 +798,27 @@ class RenderTarget(Resource):
         """
         Draws the outline of the specified ellipse using the specified stroke style.
         """
+    def DrawEllipses(
+        self,
+        ellipses: Buffer,
+        brush: Union["Brush", Sequence["Brush"]],
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+        brushIndices: Optional[Buffer] = None,
+    ) -> None:
+        """
+        Draws the outlines of many ellipses in one call.
+
+        `ellipses` is a C-contiguous float32 buffer of shape Nx4 (or flat 4N)
+        holding cx, cy, rx, ry for each ellipse.
+        If `brush` is a sequence of brushes, `brushIndices` must be a buffer
+        of N 32-bit integers selecting the brush for each ellipse.
+        """
+    async def DrawFrameAsync(self, draw: Callable[["RenderTarget"], Any]) -> Any:
+        """
+        Draws one frame: calls BeginDraw, then `draw(self)`, then awaits
+        EndDrawAsync, even if `draw` raises. Returns the result of `draw`.
+        """
     def DrawGeometry(
         self,
         geometry: "Geometry",
@@ -299,6 +829,16 @@ class RenderTarget(Resource):
         """
         Draws the outline of the specified geometry using the specified stroke style.
         """
+    @overload
+    def DrawLine(
+        self,
+        point0: "Point2F",
+        point1: "Point2F",
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> None: ...
+    @overload
     def DrawLine(
         self,
         x1: float,
@@ -312,6 +852,31 @@ class RenderTarget(Resource):
         """
         Draws a line between the specified points using the specified stroke style.
         """
+    def DrawLines(
+        self,
+        segments: Buffer,
+        brush: Union["Brush", Sequence["Brush"]],
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+        brushIndices: Optional[Buffer] = None,
+    ) -> None:
+        """
+        Draws many independent line segments in one call.
+
+        `segments` is a C-contiguous float32 buffer of shape Nx4 (or flat 4N)
+        holding x1, y1, x2, y2 for each segment.
+        If `brush` is a sequence of brushes, `brushIndices` must be a buffer
+        of N 32-bit integers selecting the brush for each segment.
+        """
+    @overload
+    def DrawRectangle(
+        self,
+        rect: "RectF",
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> None: ...
+    @overload
     def DrawRectangle(
         self,
         l: float,
@@ -326,9 +891,47 @@ class RenderTarget(Resource):
         Draws the outline of a rectangle that has the specified dimensions and stroke
         style.
         """
+    def DrawRectangles(
+        self,
+        rects: Buffer,
+        brush: Union["Brush", Sequence["Brush"]],
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+        brushIndices: Optional[Buffer] = None,
+    ) -> None:
+        """
+        Draws the outlines of many rectangles in one call.
+
+        `rects` is a C-contiguous float32 buffer of shape Nx4 (or flat 4N)
+        holding l, t, r, b for each rectangle.
+        If `brush` is a sequence of brushes, `brushIndices` must be a buffer
+        of N 32-bit integers selecting the brush for each rectangle.
+        """
+    def DrawScene(
+        self,
+        scene: "Scene",
+        rect: Union["RectF", Tuple[float, float, float, float], None] = None,
+    ) -> int:
+        """
+        Draws the nodes of a Scene that intersect `rect`, in the order they were
+        recorded, and returns how many were drawn. If `rect` is None, the area of
+        the scene that the current transform maps onto the render target is used.
+        Raises ValueError if any object referenced by the Scene has been released.
+        """
+    @overload
+    def DrawText(
+        self,
+        text: Union[str, "PreparedText"],
+        textFormat: "TextFormat",
+        rect: "RectF",
+        brush: "Brush",
+        options: int = 0,
+        measuringMode: int = 0,
+    ) -> None: ...
+    @overload
     def DrawText(
         self,
-        text: str,
+        text: Union[str, "PreparedText"],
         textFormat: "TextFormat",
         l: float,
         t: float,
@@ -341,7 +944,17 @@ class RenderTarget(Resource):
         """
         Draws the specified text using the format information provided by a TextFormat
         object.
+        Pass a PreparedText to avoid converting the same string on every call.
         """
+    @overload
+    def DrawTextLayout(
+        self,
+        origin: "Point2F",
+        textLayout: "TextLayout",
+        brush: "Brush",
+        options: int = 0,
+    ) -> None: ...
+    @overload
     def DrawTextLayout(
         self,
         x: float,
@@ -353,37 +966,245 @@ class RenderTarget(Resource):
         """
         Draws the formatted text described by the specified TextLayout object.
         """
-    def EndDraw(self) -> None:
+    def EnableDamageTracking(self, maxRects: int = 8) -> None:
+        """
+        Starts tracking the dirty areas of the render target for DrawDamaged.
+        Any earlier dirty rectangles are discarded.
+        The whole target is dirty at first, because nothing has been drawn
+        yet.
+
+        Invalidated areas are coalesced into at most `maxRects` rectangles,
+        merging the pairs that waste the least area. For an HWNDRenderTarget,
+        create it with PRESENT_OPTIONS.RETAIN_CONTENTS so that areas that are
+        not redrawn keep their previous contents.
+        """
+    def EnableFrameStats(self, historySize: int = 120) -> None:
+        """
+        Starts recording statistics for each frame drawn between BeginDraw and
+        EndDraw, discarding any previously recorded data.
+
+        The frame times of the last `historySize` frames are kept for the
+        histogram returned by GetFrameStats.
+        """
+    def EnableGeometryRealizationCache(
+        self,
+        maxEntries: int = 256,
+        maxBytes: int = 64 * 1024 * 1024,
+        scaleTolerance: float = 0.25,
+    ) -> "GeometryRealizationCache":
+        """
+        Enables a least-recently-used cache of geometry rendered to bitmaps
+        behind FillGeometry and DrawGeometry, replacing any existing cache,
+        and returns it. A limit of 0 means unlimited.
+
+        Cached geometry is drawn with DrawBitmap while the transform only
+        scales and translates. An entry is rendered again when the scale
+        differs from the one it was rendered at by more than
+        `scaleTolerance` (a fraction of that scale). The bitmap is drawn at
+        whole device pixels, so under a fractional translation it may be up to
+        half a pixel from where the geometry would be.
+        """
+    def EndDraw(self) -> bool:
         """
         Ends drawing operations on the render target and indicates the current error
-        state and associated tags.
+        state and associated tags. Returns True if the frame was presented.
+        The GIL is released while Direct2D flushes and presents the frame,
+        which may include waiting for vertical sync.
+
+        With device recovery enabled, D2DERR_RECREATE_TARGET does not raise:
+        the frame is dropped, EndDraw returns False, and the target and its
+        resources are recreated when they are next used.
+        """
+    async def EndDrawAsync(self) -> bool:
+        """
+        Runs EndDraw on a worker thread and returns its result when the frame
+        has been presented, so the event loop keeps running while Direct2D
+        waits for vertical sync.
+        The render target must not be used until EndDrawAsync returns.
         """
+    @overload
+    def FillEllipse(self, ellipse: "Ellipse", brush: "Brush") -> None: ...
+    @overload
     def FillEllipse(
         self, cx: float, cy: float, rx: float, ry: float, brush: "Brush"
     ) -> None:
         """
         Paints the interior of the specified ellipse.
         """
+    def FillEllipses(
+        self,
+        ellipses: Buffer,
+        brush: Union["Brush", Sequence["Brush"]],
+        brushIndices: Optional[Buffer] = None,
+    ) -> None:
+        """
+        Paints the interiors of many ellipses in one call.
+
+        `ellipses` is a C-contiguous float32 buffer of shape Nx4 (or flat 4N)
+        holding cx, cy, rx, ry for each ellipse.
+        If `brush` is a sequence of brushes, `brushIndices` must be a buffer
+        of N 32-bit integers selecting the brush for each ellipse.
+        """
     def FillGeometry(self, geometry: "Geometry", brush: "Brush") -> None:
         """
         Paints the interior of the specified geometry.
         """
+    @overload
+    def FillRectangle(self, rect: "RectF", brush: "Brush") -> None: ...
+    @overload
     def FillRectangle(
         self, l: float, t: float, r: float, b: float, brush: "Brush"
     ) -> None:
         """
         Paints the interior of the specified rectangle.
         """
+    def FillRectangles(
+        self,
+        rects: Buffer,
+        brush: Union["Brush", Sequence["Brush"]],
+        brushIndices: Optional[Buffer] = None,
+    ) -> None:
+        """
+        Paints the interiors of many rectangles in one call.
+
+        `rects` is a C-contiguous float32 buffer of shape Nx4 (or flat 4N)
+        holding l, t, r, b for each rectangle.
+        If `brush` is a sequence of brushes, `brushIndices` must be a buffer
+        of N 32-bit integers selecting the brush for each rectangle.
+        """
+    def GetDamageRects(self) -> List["RectF"]:
+        """
+        Returns the dirty rectangles, snapped outward to whole pixels. If the
+        whole target is dirty, returns a single rectangle covering it.
+        Raises ValueError if damage tracking is not enabled.
+        """
+    def GetFrameStats(self) -> Optional["FrameStats"]:
+        """
+        Returns the statistics of the last completed frame, or None if frame
+        statistics are not enabled.
+        """
+    def GetGeometryRealizationCache(self) -> Optional["GeometryRealizationCache"]:
+        """
+        Returns the geometry realization cache, or None if it is not enabled.
+        """
+    @overload
+    def GetSolidColorBrush(
+        self, color: Union["ColorF", int], opacity: float = 1.0
+    ) -> "SolidColorBrush": ...
+    @overload
+    def GetSolidColorBrush(
+        self, r: float, g: float, b: float, a: float = 1.0, opacity: float = 1.0
+    ) -> "SolidColorBrush":
+        """
+        Returns a shared SolidColorBrush from a pool owned by this render target.
+
+        The color components and opacity are quantized to 8 bits, so requests for
+        nearly identical colors share one brush. The least recently used brush is
+        dropped when the pool exceeds its limit (256 brushes by default), and the
+        pool is emptied when the render target is released.
+        Pooled brushes are shared, so their SetColor and Release methods raise
+        ValueError.
+        """
+    def GetSize(self) -> Tuple[float, float]:
+        """
+        Returns the size of the render target in device-independent pixels.
+        """
     def GetTransform(self) -> Tuple[float, float, float, float, float, float]:
         """
         Gets the current transform of the render target.
         """
+    @overload
+    def Invalidate(self, rect: "RectF") -> None: ...
+    @overload
+    def Invalidate(self, l: float, t: float, r: float, b: float) -> None:
+        """
+        Marks a rectangle as dirty, so that the next DrawDamaged call redraws
+        it. Coordinates are in device-independent pixels, with no transform.
+        Raises ValueError if damage tracking is not enabled.
+        """
+    def InvalidateAll(self) -> None:
+        """
+        Marks the whole render target as dirty. HWNDRenderTarget.Resize does
+        this automatically.
+        Raises ValueError if damage tracking is not enabled.
+        """
+    def PopAxisAlignedClip(self) -> None:
+        """
+        Removes the clip pushed by the matching PushAxisAlignedClip call.
+        Raises ValueError if the last clip pushed was a layer or there is none.
+        """
+    def PopLayer(self) -> None:
+        """
+        Stops redirecting drawing to the layer pushed by the matching PushLayer
+        call. Raises ValueError if the last clip pushed was an axis-aligned clip
+        or there is none.
+        """
+    def PopTransform(self) -> None:
+        """
+        Restores the transform that was current before the matching
+        PushTransform call.
+        Raises ValueError if the transform stack is empty.
+        """
+    @overload
+    def PushAxisAlignedClip(self, rect: "RectF", antialiasMode: int = 0) -> None: ...
+    @overload
+    def PushAxisAlignedClip(
+        self, l: float, t: float, r: float, b: float, antialiasMode: int = 0
+    ) -> None:
+        """
+        Clips drawing to the rectangle, in the current transform, until the
+        matching PopAxisAlignedClip call. Clips nest, and every clip must be
+        popped before EndDraw.
+
+        While a clip or layer is pushed, the drawing methods, their batched
+        variants, Replay and DrawScene skip primitives whose bounds fall
+        entirely outside the clip without calling Direct2D. Text is only
+        skipped when drawn with DRAW_TEXT_OPTIONS.CLIP, and text layouts are
+        never skipped. FrameStats.culledDraws counts the skipped primitives.
+        """
+    def PushLayer(
+        self,
+        layer: Optional["Layer"] = None,
+        geometricMask: Optional["Geometry"] = None,
+        contentBounds: Union["RectF", Tuple[float, float, float, float], None] = None,
+        opacity: float = 1.0,
+        maskAntialiasMode: int = 0,
+        maskTransform: Optional["Matrix3x2F"] = None,
+        opacityBrush: Optional["Brush"] = None,
+        layerOptions: int = 0,
+    ) -> None:
+        """
+        Redirects drawing to a layer until the matching PopLayer call, which
+        composites it clipped to `contentBounds` and `geometricMask` and
+        multiplied by `opacity`. If `layer` is None, a layer owned by the
+        render target is reused. Drawing outside the bounds of the clip is
+        skipped as for PushAxisAlignedClip.
+        """
+    def PushTransform(self, transform: "Matrix3x2F") -> None:
+        """
+        Saves the current transform on a stack owned by the render target and
+        replaces it with `transform` applied before the current transform.
+        Nested calls compose, so children can be drawn in their parent's space.
+        """
+    def Replay(self, drawList: "DrawList") -> None:
+        """
+        Executes every command recorded in the specified DrawList, in order,
+        without returning to Python between commands.
+        Raises ValueError if any object referenced by the DrawList has been released.
+        """
     def SetAntialiasMode(self, mode: int) -> None:
         """
         Sets the antialiasing mode of the render target.
         The antialiasing mode applies to all subsequent drawing operations,
         excluding text and glyph drawing operations.
         """
+    def SetBrushPoolLimit(self, maxBrushes: int) -> None:
+        """
+        Sets the maximum number of brushes kept by GetSolidColorBrush.
+        """
+    @overload
+    def SetTransform(self, transform: "Matrix3x2F") -> None: ...
+    @overload
     def SetTransform(
         self,
         m11: float = 1,
@@ -403,9 +1224,386 @@ class HWNDRenderTarget(RenderTarget):
     """
     Renders drawing instructions to a window.
     """
+    def DisableDeviceRecovery(self) -> None:
+        """
+        Stops recording resources and lets EndDraw raise on device loss again.
+        """
+    def EnableDeviceRecovery(self) -> DeviceRecovery:
+        """
+        Makes the render target survive the loss of its device, for example
+        after a display driver reset or a remote desktop reconnect.
+
+        Brushes, bitmaps and layers created from the target afterwards record
+        how they were created. When EndDraw reports D2DERR_RECREATE_TARGET,
+        they are released, and each one is recreated, as the same Python
+        object, the first time it is used again. The target itself is recreated
+        by the next BeginDraw or resource creation. Each bitmap keeps a copy of
+        its pixels, updated by CopyFromMemory, to be recreated from, so it
+        holds as much memory again as its pixels; the buffer it was created
+        from is not kept. EndDraw returns False for the frame it drops.
+        Stroke styles, geometries and text objects belong to the factories and
+        are not affected by device loss.
+        """
+    def GetDeviceRecovery(self) -> Optional[DeviceRecovery]:
+        """
+        Returns the DeviceRecovery of the render target, or None if device
+        recovery is not enabled.
+        """
     def Resize(self, width: int, height: int) -> None:
         """
         Changes the size of the render target to the specified pixel size.
+        The GIL is released during the resize.
+        """
+    async def ResizeAsync(self, width: int, height: int) -> None:
+        """
+        Runs Resize on the worker thread used by RenderTarget.EndDrawAsync and
+        returns when the resize is done.
+        """
+
+class WICBitmapRenderTarget(RenderTarget):
+    """
+    Renders drawing instructions to an offscreen bitmap.
+    """
+
+    width: int
+    height: int
+    def ReadPixels(self) -> "PixelBuffer":
+        """
+        Locks the bitmap for reading and returns its pixels without copying
+        them. Call it after EndDraw; the GIL is released while Direct2D
+        finishes drawing into the bitmap.
+
+        EndDraw fails while the pixels are locked, so release the returned
+        PixelBuffer before drawing the next frame.
+        """
+
+class PixelBuffer(COMObject):
+    """
+    The locked pixels of a WICBitmapRenderTarget, exposed through the
+    read-only buffer protocol with shape (height, width, 4), in BGRA order.
+
+    Rows start `stride` bytes apart and may be padded, in which case only
+    strided consumers such as memoryview and numpy can use the buffer.
+    Use it as a context manager, or call Release, to unlock the bitmap.
+    Release raises BufferError while views of the buffer still exist.
+    """
+
+    width: int
+    height: int
+    stride: int
+    def __buffer__(self, flags: int) -> memoryview: ...
+    def __enter__(self) -> "PixelBuffer": ...
+    def __exit__(self, *args: Any) -> None: ...
+
+class FrameScheduler:
+    """
+    Drives BeginDraw and EndDraw on a render target from an application's
+    message loop, replacing redraws driven by WM_TIMER.
+
+    `update(timestep)` advances the simulation by `timestep` seconds. It is
+    called as many times per Tick as the elapsed time requires, but at most
+    `maxUpdates` times; the time it could not catch up on is counted in
+    `droppedUpdates`. It returns False if nothing changed. `draw(target, alpha)`
+    draws a frame, where `alpha` is the fraction of a timestep the
+    simulation is behind the clock, for interpolating between the previous
+    and current states. Without `update`, frames are only drawn after
+    Invalidate.
+
+    A frame is drawn only if an update changed something or Invalidate was
+    called; otherwise the frame is counted in `skippedFrames`. Frames are
+    paced by vertical sync in EndDraw unless `maxFrameRate` is set. With
+    `adaptive`, frames that take longer than `1 / frameRate` before EndDraw
+    lower `frameRate` to a whole fraction of `maxFrameRate` (at most a
+    quarter), and faster frames raise it again. `frameCost` is the moving
+    average of that time.
+
+    `clock` returns the current time in seconds and defaults to the
+    performance counter.
+    """
+
+    renderTarget: "RenderTarget"
+    timestep: float
+    maxFrameRate: float
+    frameRate: float
+    adaptive: bool
+    maxUpdates: int
+    frames: int
+    skippedFrames: int
+    updates: int
+    droppedUpdates: int
+    alpha: float
+    frameCost: float
+    def __init__(
+        self,
+        renderTarget: "RenderTarget",
+        draw: Callable[["RenderTarget", float], Any],
+        update: Optional[Callable[[float], Optional[bool]]] = None,
+        timestep: float = 1.0 / 60,
+        maxFrameRate: float = 0.0,
+        adaptive: bool = True,
+        maxUpdates: int = 5,
+        historySize: int = 240,
+        clock: Optional[Callable[[], float]] = None,
+    ) -> None: ...
+    def DrawFrame(self) -> None:
+        """
+        Draws a frame now, for example in response to WM_PAINT, regardless of
+        the frame rate cap and whether anything changed.
+        """
+    def GetFrameTimePercentiles(
+        self, percentiles: Sequence[float] = (50, 90, 99)
+    ) -> Tuple[float, ...]:
+        """
+        Returns the given percentiles of the times between the last
+        `historySize` frames, in seconds, or zeros if fewer than two frames
+        have been drawn.
+        """
+    def Invalidate(self) -> None:
+        """
+        Makes the next Tick draw a frame, for example after user input.
+        """
+    def NextTick(self) -> Optional[float]:
+        """
+        Returns the number of seconds until Tick next has work to do, or None
+        if there is none until Invalidate is called. Wait this long for window
+        messages before calling Tick.
+        """
+    def Tick(self) -> bool:
+        """
+        Runs the updates that are due and draws a frame if one is due and
+        anything changed. Returns whether a frame was drawn.
+        """
+
+class DrawList:
+    """
+    Records drawing commands into a compact native buffer so they can be
+    executed later with RenderTarget.Replay.
+
+    The recording methods take the same arguments as the RenderTarget methods
+    of the same name. A DrawList keeps references to the brushes, geometries,
+    text formats and other objects it records, and does not need a render target
+    or Direct2D to record or inspect commands.
+
+    Each recording method returns the index of the command it recorded.
+    """
+    def __init__(self) -> None: ...
+    def __len__(self) -> int:
+        """
+        Returns the number of recorded commands.
+        """
+    def Reset(self) -> None:
+        """
+        Removes all recorded commands and drops the references to recorded objects.
+        """
+    def GetCommands(self) -> List[Optional[Tuple[str, Tuple[Any, ...]]]]:
+        """
+        Returns the recorded commands as (method name, arguments) tuples.
+        Nodes removed from a Scene are None.
+        """
+    @overload
+    def Clear(self, color: Union["ColorF", int]) -> int: ...
+    @overload
+    def Clear(self, r: float, g: float, b: float, a: float = 1.0) -> int: ...
+    @overload
+    def DrawBitmap(
+        self,
+        bitmap: "Bitmap",
+        rect: "RectF",
+        opacity: float = 1.0,
+        interpolationMode: int = 1,
+        srcRect: Union["RectF", Tuple[float, float, float, float], None] = None,
+    ) -> int: ...
+    @overload
+    def DrawBitmap(
+        self,
+        bitmap: "Bitmap",
+        l: float,
+        t: float,
+        r: float,
+        b: float,
+        opacity: float = 1.0,
+        interpolationMode: int = 1,
+        srcRect: Optional[Tuple[float, float, float, float]] = None,
+    ) -> int: ...
+    @overload
+    def DrawEllipse(
+        self,
+        ellipse: "Ellipse",
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> int: ...
+    @overload
+    def DrawEllipse(
+        self,
+        cx: float,
+        cy: float,
+        rx: float,
+        ry: float,
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> int: ...
+    def DrawGeometry(
+        self,
+        geometry: "Geometry",
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> int: ...
+    @overload
+    def DrawLine(
+        self,
+        point0: "Point2F",
+        point1: "Point2F",
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> int: ...
+    @overload
+    def DrawLine(
+        self,
+        x1: float,
+        y1: float,
+        x2: float,
+        y2: float,
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> int: ...
+    @overload
+    def DrawRectangle(
+        self,
+        rect: "RectF",
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> int: ...
+    @overload
+    def DrawRectangle(
+        self,
+        l: float,
+        t: float,
+        r: float,
+        b: float,
+        brush: "Brush",
+        strokeWidth: float = 1.0,
+        strokeStyle: Optional["StrokeStyle"] = None,
+    ) -> int: ...
+    @overload
+    def DrawText(
+        self,
+        text: Union[str, "PreparedText"],
+        textFormat: "TextFormat",
+        rect: "RectF",
+        brush: "Brush",
+        options: int = 0,
+        measuringMode: int = 0,
+    ) -> int: ...
+    @overload
+    def DrawText(
+        self,
+        text: Union[str, "PreparedText"],
+        textFormat: "TextFormat",
+        l: float,
+        t: float,
+        r: float,
+        b: float,
+        brush: "Brush",
+        options: int = 0,
+        measuringMode: int = 0,
+    ) -> int: ...
+    @overload
+    def DrawTextLayout(
+        self,
+        origin: "Point2F",
+        textLayout: "TextLayout",
+        brush: "Brush",
+        options: int = 0,
+    ) -> int: ...
+    @overload
+    def DrawTextLayout(
+        self,
+        x: float,
+        y: float,
+        textLayout: "TextLayout",
+        brush: "Brush",
+        options: int = 0,
+    ) -> int: ...
+    @overload
+    def FillEllipse(self, ellipse: "Ellipse", brush: "Brush") -> int: ...
+    @overload
+    def FillEllipse(
+        self, cx: float, cy: float, rx: float, ry: float, brush: "Brush"
+    ) -> int: ...
+    def FillGeometry(self, geometry: "Geometry", brush: "Brush") -> int: ...
+    @overload
+    def FillRectangle(self, rect: "RectF", brush: "Brush") -> int: ...
+    @overload
+    def FillRectangle(
+        self, l: float, t: float, r: float, b: float, brush: "Brush"
+    ) -> int: ...
+    def SetAntialiasMode(self, mode: int) -> int: ...
+    @overload
+    def SetTransform(self, transform: "Matrix3x2F") -> int: ...
+    @overload
+    def SetTransform(
+        self,
+        m11: float = 1,
+        m12: float = 0,
+        m21: float = 0,
+        m22: float = 1,
+        dx: float = 0,
+        dy: float = 0,
+    ) -> int: ...
+
+class Scene(DrawList):
+    """
+    A DrawList whose commands are nodes that can be found by position.
+
+    Each recording method returns the id of the node it added; ids are the
+    indexes of the commands and stay valid until Reset. The nodes are indexed
+    in a uniform grid of `cellSize` x `cellSize` cells, so RenderTarget.DrawScene
+    only draws the nodes that intersect the view and HitTest only tests the
+    nodes near the point. Clear, SetAntialiasMode and SetTransform cannot be
+    recorded into a Scene and raise TypeError.
+    """
+    def __init__(self, cellSize: float = 256.0) -> None: ...
+    @property
+    def cellSize(self) -> float:
+        """
+        The width and height of the cells of the spatial index.
+        """
+    def __len__(self) -> int:
+        """
+        Returns the number of nodes that have not been removed.
+        """
+    def GetBounds(self, node: int) -> "RectF":
+        """
+        Returns the bounding rectangle of a node, including the stroke width of
+        outlines. Raises IndexError if there is no such node.
+        """
+    def HitTest(self, x: float, y: float, tolerance: float = 0.0) -> Optional[int]:
+        """
+        Returns the topmost node (the one recorded last) that contains the point,
+        or None. Outlines and lines are hit within half their stroke width plus
+        `tolerance`; fills within `tolerance` of their shape.
+        """
+    @overload
+    def Query(self, rect: "RectF") -> List[int]: ...
+    @overload
+    def Query(self, l: float, t: float, r: float, b: float) -> List[int]:
+        """
+        Returns the nodes whose bounds intersect the rectangle, in drawing order.
+        """
+    def Remove(self, node: int) -> None:
+        """
+        Removes a node. It is no longer drawn, hit or returned by Query.
+        """
+    def Translate(self, node: int, dx: float, dy: float) -> None:
+        """
+        Moves a node by (dx, dy) and updates the index.
+        Raises ValueError for geometry nodes, which cannot be moved.
         """
 
 class Brush(Resource):
@@ -422,6 +1620,9 @@ class SolidColorBrush(Brush):
     """
     Paints an area with a solid color.
     """
+    @overload
+    def SetColor(self, color: Union["ColorF", int]) -> None: ...
+    @overload
     def SetColor(self, r: float, g: float, b: float, a: float = 1.0) -> None:
         """
         Specifies the color of this solid color brush.
@@ -432,6 +1633,11 @@ class StrokeStyle(Resource):
     Describes the caps, miter limit, line join, and dash information for a stroke.
     """
 
+class Layer(Resource):
+    """
+    Represents the backing store for a layer pushed with RenderTarget.PushLayer.
+    """
+
 class Geometry(Resource):
     """
     Base class representing a geometry resource.
@@ -453,6 +1659,24 @@ class SimplifiedGeometrySink(COMObject):
     """
     Describes a geometric path that does not contain quadratic bezier curves or arcs.
     """
+    def AddBeziers(self, points: Buffer) -> None:
+        """
+        Creates a sequence of cubic Bezier curves and adds them to the geometry sink.
+
+        `points` is a C-contiguous float32 buffer of shape Nx6 (or flat 6N)
+        holding x1, y1, x2, y2, x3, y3 for each curve.
+        """
+    def AddLines(self, points: Buffer) -> None:
+        """
+        Creates a sequence of lines using the specified points
+        and adds them to the geometry sink.
+
+        `points` is a C-contiguous float32 buffer of shape Nx2 (or flat 2N)
+        holding x, y for each point.
+        """
+    @overload
+    def BeginFigure(self, point: "Point2F", figureBegin: int = 0) -> None: ...
+    @overload
     def BeginFigure(self, x: float, y: float, figureBegin: int = 0) -> None:
         """
         Starts a new figure at the specified point.
@@ -477,6 +1701,17 @@ class GeometrySink(SimplifiedGeometrySink):
     Describes a geometric path that can contain lines, arcs,
     cubic Bezier curves, and quadratic Bezier curves.
     """
+    @overload
+    def AddArc(
+        self,
+        point: "Point2F",
+        rx: float,
+        ry: float,
+        rotationAngle: float,
+        sweepDirection: int,
+        arcSize: int,
+    ) -> None: ...
+    @overload
     def AddArc(
         self,
         x: float,
@@ -490,6 +1725,11 @@ class GeometrySink(SimplifiedGeometrySink):
         """
         Adds a single arc to the path geometry.
         """
+    @overload
+    def AddBezier(
+        self, point1: "Point2F", point2: "Point2F", point3: "Point2F"
+    ) -> None: ...
+    @overload
     def AddBezier(
         self, x1: float, y1: float, x2: float, y2: float, x3: float, y3: float
     ) -> None:
@@ -497,16 +1737,29 @@ class GeometrySink(SimplifiedGeometrySink):
         Creates a cubic Bezier curve between the current point and the specified end
         point.
         """
+    @overload
+    def AddLine(self, point: "Point2F") -> None: ...
+    @overload
     def AddLine(self, x: float, y: float) -> None:
         """
         Creates a line segment between the current point and the specified end point
         and adds it to the geometry sink.
         """
+    @overload
+    def AddQuadraticBezier(self, point1: "Point2F", point2: "Point2F") -> None: ...
+    @overload
     def AddQuadraticBezier(self, x1: float, y1: float, x2: float, y2: float) -> None:
         """
         Creates a quadratic Bezier curve between the current point and the specified end
         point.
         """
+    def AddQuadraticBeziers(self, points: Buffer) -> None:
+        """
+        Adds a sequence of quadratic Bezier segments to the geometry sink.
+
+        `points` is a C-contiguous float32 buffer of shape Nx4 (or flat 4N)
+        holding x1, y1, x2, y2 for each segment.
+        """
 
 class Image(Resource):
     """
@@ -517,6 +1770,39 @@ class Bitmap(Image):
     """
     Represents a bitmap that has been bound to a RenderTarget.
     """
+    def CopyFromMemory(
+        self,
+        buffer: Buffer,
+        rect: Optional[Tuple[int, int, int, int]] = None,
+        pitch: int = 0,
+    ) -> None:
+        """
+        Copies pixels from a buffer into the bitmap.
+
+        `rect` is the (left, top, right, bottom) pixel rectangle to update,
+        or None for the whole bitmap. `buffer` must be a C-contiguous buffer
+        holding the rows of that rectangle, each starting `pitch` bytes after
+        the previous one; a pitch of 0 means the rows are tightly packed.
+        The GIL is released during the copy.
+        """
+    def GetPixelFormat(self) -> Tuple[int, int]:
+        """
+        Returns the DXGI_FORMAT and ALPHA_MODE of the bitmap.
+        """
+    def GetPixelSize(self) -> Tuple[int, int]:
+        """
+        Returns the size of the bitmap in pixels.
+        """
+    def GetSize(self) -> Tuple[float, float]:
+        """
+        Returns the size of the bitmap in device-independent pixels.
+        """
+
+class GeometryRealization(Bitmap):
+    """
+    A geometry rendered to a bitmap by the geometry realization cache of a
+    RenderTarget. Instances are created and drawn by the cache.
+    """
 
 def GetDWriteFactory() -> "DWriteFactory":
     """
@@ -543,17 +1829,111 @@ class DWriteFactory(COMObject):
         weight: int = 500,
         style: int = 0,
         stretch: int = 5,
+        locale: str = "",
     ) -> "TextFormat":
         """
         Creates a text format object used for text layout.
+        The GIL is released while DirectWrite creates the format.
         """
     def CreateTextLayout(
-        self, text: str, textFormat: "TextFormat", maxWidth: float, maxHeight: float
+        self,
+        text: Union[str, "PreparedText"],
+        textFormat: "TextFormat",
+        maxWidth: float,
+        maxHeight: float,
     ) -> "TextLayout":
         """
         Takes a string, text format, and associated constraints,
         and produces an object that represents the fully analyzed and formatted result.
+        Pass a PreparedText to avoid converting the same string on every call.
+
+        If the text layout cache is enabled, a previously created TextLayout with the
+        same text, TextFormat object, and constraints is returned instead.
+        The GIL is released while DirectWrite lays out the text.
+        """
+    def DisableTextLayoutCache(self) -> None:
         """
+        Disables and discards the text layout cache.
+        """
+    def EnableTextFormatCache(
+        self, maxEntries: int = 256, maxBytes: int = 0
+    ) -> "TextFormatCache":
+        """
+        Replaces the cache behind GetTextFormat with an empty one with the
+        given limits, and returns it. A limit of 0 means unlimited.
+        """
+    def EnableTextLayoutCache(
+        self, maxEntries: int = 4096, maxBytes: int = 0
+    ) -> "TextLayoutCache":
+        """
+        Enables a least-recently-used cache behind CreateTextLayout,
+        replacing any existing cache, and returns it.
+        A limit of 0 means unlimited.
+        """
+    def GetTextFormat(
+        self,
+        familyName: str,
+        size: float,
+        weight: int = 500,
+        style: int = 0,
+        stretch: int = 5,
+        locale: str = "",
+    ) -> "TextFormat":
+        """
+        Returns a text format shared by all callers asking for the same
+        properties, creating it with CreateTextFormat on first use.
+        Formats are kept in a least-recently-used cache; this method can be
+        called from several threads at once. Don't release the returned
+        format.
+        """
+    def GetTextFormatCache(self) -> "TextFormatCache":
+        """
+        Returns the cache used by GetTextFormat.
+        """
+    def GetTextLayoutCache(self) -> Optional["TextLayoutCache"]:
+        """
+        Returns the text layout cache, or None if it is not enabled.
+        """
+    def MeasureTexts(
+        self,
+        strings: Sequence[Union[str, "PreparedText"]],
+        textFormat: "TextFormat",
+        maxWidth: float,
+        maxHeight: float,
+        out: Optional[Buffer] = None,
+    ) -> Any:
+        """
+        Measures many strings laid out with the same format and size, as
+        CreateTextLayout followed by TextLayout.GetMetrics would.
+
+        Returns a float32 array.array of 9 values per string: left, top, width,
+        widthIncludingTrailingWhitespace, height, layoutWidth, layoutHeight,
+        maxBidiReorderingDepth and lineCount. If `out` is given, it must be a
+        writable C-contiguous float32 buffer of shape Nx9 (or flat 9N); the
+        metrics are written to it and it is returned instead.
+        The text layouts are created and released with the GIL released, and
+        the measured strings are not added to the text layout cache.
+        """
+
+class TextFormatCache(ResourceCache):
+    """
+    Least-recently-used cache of TextFormat objects used by
+    DWriteFactory.GetTextFormat.
+
+    Entries are keyed on the family name, size, weight, style, stretch and
+    locale. The byte size of an entry is estimated from the length of its
+    family name and locale.
+    """
+
+class TextLayoutCache(ResourceCache):
+    """
+    Least-recently-used cache of TextLayout objects used by
+    DWriteFactory.CreateTextLayout.
+
+    Entries are keyed on the text, the identity of the TextFormat, and the
+    maximum width and height. The byte size of an entry is estimated from
+    the length of its text.
+    """
 
 class FontFace(COMObject):
     """
@@ -1,10 +1,152 @@
 # cython: language_level=3
 # cython: freethreading_compatible=True
 
-include "_pyd2d_const.pyi"
-from libc.stdint cimport int32_t, uint32_t, uint64_t, intptr_t
+# Importing the module does no COM or factory work, and the modules it needs
+# (including the constants in _pyd2d_const) are imported when first used, so
+# that processes which import pyd2d but rarely draw start quickly.
+
+from libc.math cimport ceil, cos, fabs, floor, pow, sin, sqrt, tan, M_PI
+from libc.stdint cimport int32_t, int64_t, uint32_t, uint64_t, intptr_t
+from libc.stdlib cimport qsort
 from libc.stddef cimport wchar_t
-from cpython.mem cimport PyMem_Free
+from libc.string cimport memcpy, memset, strlen
+from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
+from cpython.bytearray cimport PyByteArray_AS_STRING
+from cpython.float cimport PyFloat_AS_DOUBLE, PyFloat_CheckExact
+from cpython.ref cimport PyObject
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_C_CONTIGUOUS, PyBUF_FORMAT, PyBUF_WRITABLE
+from cpython.buffer cimport PyBUF_ANY_CONTIGUOUS, PyBUF_F_CONTIGUOUS, PyBUF_ND, PyBUF_STRIDES
+
+
+cdef object _missing = object()
+
+
+def __getattr__(name):
+    # The constant namespaces (ALPHA_MODE, DXGI_FORMAT, ...) are loaded from
+    # _pyd2d_const on first access and then stored in the module.
+    if not name.startswith("_"):
+        import _pyd2d_const
+        value = getattr(_pyd2d_const, name, _missing)
+        if value is not _missing:
+            globals()[name] = value
+            return value
+    raise AttributeError("module 'pyd2d' has no attribute %r" % name)
+
+
+def __dir__():
+    import _pyd2d_const
+    return sorted(set(globals()).union(n for n in vars(_pyd2d_const) if not n.startswith("_")))
+
+
+# Listing the constant namespaces here makes "from pyd2d import *" load them
+# through __getattr__.
+__all__ = [
+    "ALPHA_MAX",
+    "ALPHA_MODE",
+    "ANTIALIAS_MODE",
+    "ARC_SIZE",
+    "BITMAP_INTERPOLATION_MODE",
+    "BREAK_CONDITION",
+    "CAP_STYLE",
+    "COMBINE_MODE",
+    "COMPATIBLE_RENDER_TARGET_OPTIONS",
+    "D2D_FACTORY_TYPE",
+    "DASH_STYLE",
+    "DC_INITIALIZE_MODE",
+    "DEBUG_LEVEL",
+    "DRAW_TEXT_OPTIONS",
+    "DWRITE_FACTORY_TYPE",
+    "DXGI_FORMAT",
+    "EXTEND_MODE",
+    "FEATURE_LEVEL",
+    "FIGURE_BEGIN",
+    "FIGURE_END",
+    "FILL_MODE",
+    "FLOW_DIRECTION",
+    "FONT_FACE_TYPE",
+    "FONT_FEATURE_TAG",
+    "FONT_FILE_TYPE",
+    "FONT_SIMULATIONS",
+    "FONT_STRETCH",
+    "FONT_STYLE",
+    "FONT_WEIGHT",
+    "GAMMA",
+    "GEOMETRY_RELATION",
+    "GEOMETRY_SIMPLIFICATION_OPTION",
+    "INFORMATIONAL_STRING_ID",
+    "INTERPOLATION_MODE_DEFINITION",
+    "LAYER_OPTIONS",
+    "LINE_JOIN",
+    "LINE_SPACING_METHOD",
+    "MEASURING_MODE",
+    "NUMBER_SUBSTITUTION_METHOD",
+    "OPACITY_MASK_CONTENT",
+    "PARAGRAPH_ALIGNMENT",
+    "PATH_SEGMENT",
+    "PIXEL_GEOMETRY",
+    "PRESENT_OPTIONS",
+    "READING_DIRECTION",
+    "RENDERING_MODE",
+    "RENDER_TARGET_TYPE",
+    "RENDER_TARGET_USAGE",
+    "SCRIPT_SHAPES",
+    "SWEEP_DIRECTION",
+    "TEXTURE_TYPE",
+    "TEXT_ALIGNMENT",
+    "TEXT_ANTIALIAS_MODE",
+    "TEXT_METRICS",
+    "TRIMMING_GRANULARITY",
+    "WINDOW_STATE",
+    "WORD_WRAPPING",
+    "Bitmap",
+    "Brush",
+    "COMError",
+    "COMObject",
+    "ColorF",
+    "D2DFactory",
+    "DWriteFactory",
+    "DeviceRecovery",
+    "Direct2DError",
+    "DirectWriteError",
+    "DrawList",
+    "Ellipse",
+    "FontFace",
+    "FrameScheduler",
+    "FrameStats",
+    "Geometry",
+    "GeometryRealization",
+    "GeometryRealizationCache",
+    "GeometrySink",
+    "GetD2DFactory",
+    "GetDWriteFactory",
+    "HWNDRenderTarget",
+    "Image",
+    "InitializeCOM",
+    "Layer",
+    "Matrix3x2F",
+    "PathGeometry",
+    "PathGeometryCache",
+    "PixelBuffer",
+    "Point2F",
+    "PreparedText",
+    "RectF",
+    "RenderTarget",
+    "Resource",
+    "ResourceCache",
+    "RunFramesAsync",
+    "Scene",
+    "SimplifiedGeometrySink",
+    "SolidColorBrush",
+    "StrokeStyle",
+    "StrokeStyleCache",
+    "TextFormat",
+    "TextFormatCache",
+    "TextLayout",
+    "TextLayoutCache",
+    "UninitializeCOM",
+    "WICBitmapRenderTarget",
+]
+
 
 cdef extern from *:
     """
@@ -12,6 +154,7 @@ cdef extern from *:
     #define _UNICODE
     """
     wchar_t* PyUnicode_AsWideCharString(object unicode, Py_ssize_t *size)
+    Py_ssize_t PyUnicode_AsWideChar(object unicode, wchar_t *wstr, Py_ssize_t size) except -1
     object PyUnicode_FromWideChar(wchar_t *wstr, Py_ssize_t size)
 
 cdef extern from "windows.h":
@@ -23,6 +166,7 @@ cdef extern from "windows.h":
     ctypedef uint64_t UINT64
     ctypedef uint32_t UINT
     ctypedef wchar_t WCHAR
+    ctypedef int BOOL
 
     ctypedef struct GUID:
         unsigned long Data1
@@ -41,15 +185,57 @@ cdef extern from "windows.h":
     bint SUCCEEDED(HRESULT hr) noexcept nogil
     bint FAILED(HRESULT hr) noexcept nogil
 
+    ctypedef struct LARGE_INTEGER:
+        long long QuadPart
+
+    bint QueryPerformanceCounter(LARGE_INTEGER *lpPerformanceCount) noexcept nogil
+    bint QueryPerformanceFrequency(LARGE_INTEGER *lpFrequency) noexcept nogil
+
 cdef extern from "objbase.h":
     HRESULT CoInitializeEx(
         void* pvReserved,
         unsigned long dwCoInit) noexcept nogil
     void CoUninitialize() noexcept nogil
+    HRESULT CoCreateInstance(
+        const GUID& rclsid,
+        IUnknown *pUnkOuter,
+        unsigned long dwClsContext,
+        const GUID& riid,
+        void **ppv) noexcept nogil
 
     cdef cppclass IUnknown:
+        ULONG AddRef() noexcept nogil
         void Release() noexcept nogil
 
+cdef extern from "wincodec.h":
+    ctypedef unsigned char BYTE
+    ctypedef GUID WICPixelFormatGUID
+    ctypedef int WICBitmapCreateCacheOption
+
+    ctypedef struct WICRect:
+        int X
+        int Y
+        int Width
+        int Height
+
+    cdef cppclass IWICBitmapLock:
+        HRESULT GetDataPointer(UINT *bufferSize, BYTE **data) noexcept nogil
+        HRESULT GetSize(UINT *width, UINT *height) noexcept nogil
+        HRESULT GetStride(UINT *stride) noexcept nogil
+    cdef cppclass IWICBitmap:
+        HRESULT Lock(const WICRect *lockRect, unsigned long flags, IWICBitmapLock **lock) noexcept nogil
+    cdef cppclass IWICImagingFactory:
+        HRESULT CreateBitmap(
+            UINT width,
+            UINT height,
+            const WICPixelFormatGUID& pixelFormat,
+            WICBitmapCreateCacheOption option,
+            IWICBitmap **bitmap) noexcept nogil
+
+    cdef const GUID CLSID_WICImagingFactory
+    cdef const GUID IID_IWICImagingFactory
+    cdef const GUID GUID_WICPixelFormat32bppPBGRA
+
 cdef extern from "dwrite.h":
     """
     #define IID_IDWriteFactory __uuidof(IDWriteFactory)
@@ -121,6 +307,10 @@ cdef extern from "d2d1.h":
     ctypedef int DWRITE_MEASURING_MODE
     ctypedef int D2D1_FIGURE_BEGIN
     ctypedef int D2D1_FIGURE_END
+    ctypedef int D2D1_LAYER_OPTIONS
+    ctypedef int D2D1_COMPATIBLE_RENDER_TARGET_OPTIONS
+
+    HRESULT D2DERR_RECREATE_TARGET
 
     ctypedef struct D2D1_FACTORY_OPTIONS:
         D2D1_DEBUG_LEVEL debugLevel
@@ -137,6 +327,11 @@ cdef extern from "d2d1.h":
     ctypedef struct D2D1_SIZE_U:
         UINT32 width
         UINT32 height
+    ctypedef struct D2D1_RECT_U:
+        UINT32 left
+        UINT32 top
+        UINT32 right
+        UINT32 bottom
     ctypedef struct D2D1_HWND_RENDER_TARGET_PROPERTIES:
        HWND                 hwnd
        D2D1_SIZE_U          pixelSize
@@ -199,7 +394,13 @@ cdef extern from "d2d1.h":
         FLOAT             dpiX
         FLOAT             dpiY
 
-    cdef cppclass ID2D1Bitmap
+    cdef cppclass ID2D1Bitmap:
+        HRESULT CopyFromMemory(const D2D1_RECT_U *dstRect, const void *srcData, UINT32 pitch) noexcept nogil
+        D2D1_PIXEL_FORMAT GetPixelFormat() noexcept nogil
+        D2D1_SIZE_U GetPixelSize() noexcept nogil
+        D2D1_SIZE_F GetSize() noexcept nogil
+    cdef cppclass ID2D1BitmapRenderTarget:
+        HRESULT GetBitmap(ID2D1Bitmap **bitmap) noexcept nogil
     cdef cppclass ID2D1Brush:
         FLOAT GetOpacity() noexcept nogil
     cdef cppclass ID2D1PathGeometry:
@@ -210,31 +411,81 @@ cdef extern from "d2d1.h":
             const D2D1_RENDER_TARGET_PROPERTIES *renderTargetProperties,
             const D2D1_HWND_RENDER_TARGET_PROPERTIES *hwndRenderTargetProperties,
             ID2D1HwndRenderTarget **hwndRenderTarget) noexcept nogil
+        HRESULT CreateWicBitmapRenderTarget(
+            IWICBitmap *target,
+            const D2D1_RENDER_TARGET_PROPERTIES *renderTargetProperties,
+            ID2D1RenderTarget **renderTarget) noexcept nogil
         HRESULT CreatePathGeometry(ID2D1PathGeometry **pathGeometry) noexcept nogil
         HRESULT CreateStrokeStyle(
             const D2D1_STROKE_STYLE_PROPERTIES *strokeStyleProperties,
             const FLOAT *dashes,
             UINT dashesCount,
             ID2D1StrokeStyle **strokeStyle) noexcept nogil
-    cdef cppclass ID2D1Geometry
+    cdef cppclass ID2D1Geometry:
+        HRESULT FillContainsPoint(
+            D2D1_POINT_2F point,
+            const D2D1_MATRIX_3X2_F *worldTransform,
+            FLOAT flatteningTolerance,
+            BOOL *contains) noexcept nogil
+        HRESULT GetBounds(const D2D1_MATRIX_3X2_F *worldTransform, D2D1_RECT_F *bounds) noexcept nogil
+        HRESULT GetWidenedBounds(
+            FLOAT strokeWidth,
+            ID2D1StrokeStyle *strokeStyle,
+            const D2D1_MATRIX_3X2_F *worldTransform,
+            FLOAT flatteningTolerance,
+            D2D1_RECT_F *bounds) noexcept nogil
+        HRESULT StrokeContainsPoint(
+            D2D1_POINT_2F point,
+            FLOAT strokeWidth,
+            ID2D1StrokeStyle *strokeStyle,
+            const D2D1_MATRIX_3X2_F *worldTransform,
+            FLOAT flatteningTolerance,
+            BOOL *contains) noexcept nogil
     cdef cppclass ID2D1GeometrySink:
         void AddArc(const D2D1_ARC_SEGMENT *arc) noexcept nogil
         void AddBezier(const D2D1_BEZIER_SEGMENT *bezier) noexcept nogil
+        void AddBeziers(const D2D1_BEZIER_SEGMENT *beziers, UINT32 beziersCount) noexcept nogil
         void AddLine(D2D1_POINT_2F point) noexcept nogil
+        void AddLines(const D2D1_POINT_2F *points, UINT32 pointsCount) noexcept nogil
         void AddQuadraticBezier(const D2D1_QUADRATIC_BEZIER_SEGMENT *bezier) noexcept nogil
+        void AddQuadraticBeziers(
+            const D2D1_QUADRATIC_BEZIER_SEGMENT *beziers,
+            UINT32 beziersCount) noexcept nogil
         void BeginFigure(D2D1_POINT_2F startPoint, D2D1_FIGURE_BEGIN figureBegin) noexcept nogil
         HRESULT Close() noexcept nogil
         void EndFigure(D2D1_FIGURE_END figureEnd) noexcept nogil
         void SetFillMode(D2D1_FILL_MODE fillMode) noexcept nogil
     cdef cppclass ID2D1HwndRenderTarget:
         HRESULT Resize(const D2D1_SIZE_U *pixelSize) noexcept nogil
+    cdef cppclass ID2D1Layer
+    ctypedef struct D2D1_LAYER_PARAMETERS:
+        D2D1_RECT_F        contentBounds
+        ID2D1Geometry      *geometricMask
+        D2D1_ANTIALIAS_MODE maskAntialiasMode
+        D2D1_MATRIX_3X2_F  maskTransform
+        FLOAT              opacity
+        ID2D1Brush         *opacityBrush
+        D2D1_LAYER_OPTIONS layerOptions
     cdef cppclass ID2D1RenderTarget:
         void BeginDraw() noexcept nogil
         void Clear(const D2D1_COLOR_F *clearColor) noexcept nogil
+        HRESULT CreateBitmap(
+            D2D1_SIZE_U size,
+            const void *srcData,
+            UINT32 pitch,
+            const D2D1_BITMAP_PROPERTIES *bitmapProperties,
+            ID2D1Bitmap **bitmap) noexcept nogil
         HRESULT CreateBitmapFromWicBitmap(
             IWICBitmapSource *wicBitmapSource,
             const D2D1_BITMAP_PROPERTIES *bitmapProperties,
             ID2D1Bitmap **bitmap) noexcept nogil
+        HRESULT CreateCompatibleRenderTarget(
+            const D2D1_SIZE_F *desiredSize,
+            const D2D1_SIZE_U *desiredPixelSize,
+            const D2D1_PIXEL_FORMAT *desiredFormat,
+            D2D1_COMPATIBLE_RENDER_TARGET_OPTIONS options,
+            ID2D1BitmapRenderTarget **bitmapRenderTarget) noexcept nogil
+        HRESULT CreateLayer(const D2D1_SIZE_F *size, ID2D1Layer **layer) noexcept nogil
         HRESULT CreateSolidColorBrush(
             const D2D1_COLOR_F *color,
             const D2D1_BRUSH_PROPERTIES *brushProperties,
@@ -286,10 +537,18 @@ cdef extern from "d2d1.h":
             ID2D1Brush *brush,
             ID2D1Brush *opacityBrush) noexcept nogil
         void FillRectangle(const D2D1_RECT_F *rect, ID2D1Brush *brush) noexcept nogil
+        void GetDpi(FLOAT *dpiX, FLOAT *dpiY) noexcept nogil
+        D2D1_SIZE_F GetSize() noexcept nogil
         void GetTransform(D2D1_MATRIX_3X2_F *transform) noexcept nogil
+        void PopAxisAlignedClip() noexcept nogil
+        void PopLayer() noexcept nogil
+        void PushAxisAlignedClip(const D2D1_RECT_F *clipRect, D2D1_ANTIALIAS_MODE antialiasMode) noexcept nogil
+        void PushLayer(const D2D1_LAYER_PARAMETERS *layerParameters, ID2D1Layer *layer) noexcept nogil
         void SetAntialiasMode(D2D1_ANTIALIAS_MODE antialiasMode) noexcept nogil
         void SetTransform(const D2D1_MATRIX_3X2_F *transform) noexcept nogil
     cdef cppclass ID2D1SimplifiedGeometrySink:
+        void AddBeziers(const D2D1_BEZIER_SEGMENT *beziers, UINT32 beziersCount) noexcept nogil
+        void AddLines(const D2D1_POINT_2F *points, UINT32 pointsCount) noexcept nogil
         void BeginFigure(D2D1_POINT_2F startPoint, int figureBegin) noexcept nogil
         HRESULT Close() noexcept nogil
         void EndFigure(int figureEnd) noexcept nogil
@@ -307,6 +566,579 @@ cdef extern from "d2d1.h":
         void **ppIFactory) noexcept nogil
 
 
+# Running totals used to attribute object creation to rendered frames. They
+# are per thread, so frames only count objects created on the drawing
+# thread and the counters need no locking.
+cdef extern from *:
+    """
+    struct ObjectTotals {
+        Py_ssize_t charactersConverted;
+        Py_ssize_t brushes;
+        Py_ssize_t geometries;
+        Py_ssize_t textLayouts;
+    };
+    static thread_local ObjectTotals objectTotals;
+    """
+    cdef struct ObjectTotals:
+        Py_ssize_t charactersConverted
+        Py_ssize_t brushes
+        Py_ssize_t geometries
+        Py_ssize_t textLayouts
+
+    ObjectTotals objectTotals
+
+
+cdef class PreparedText:
+    cdef wchar_t *buf
+    cdef Py_ssize_t length
+    cdef readonly str text
+
+    def __cinit__(self, str text):
+        self.buf = PyUnicode_AsWideCharString(text, &self.length)
+        if self.buf == NULL:
+            raise MemoryError
+        self.text = text
+
+    def __dealloc__(self):
+        PyMem_Free(self.buf)
+
+    def __len__(self):
+        return self.length
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return "PreparedText(%r)" % self.text
+
+
+cdef wchar_t* wideText(object text, Py_ssize_t *length, bint *owned) except NULL:
+    # Returns the wide-character buffer for a str or PreparedText.
+    # If owned is set, the caller must free the buffer with PyMem_Free.
+    cdef wchar_t *buf
+    if isinstance(text, PreparedText):
+        owned[0] = False
+        length[0] = (<PreparedText>text).length
+        return (<PreparedText>text).buf
+    buf = PyUnicode_AsWideCharString(<str?>text, length)
+    if buf == NULL:
+        raise MemoryError
+    owned[0] = True
+    objectTotals.charactersConverted += length[0]
+    return buf
+
+
+cdef class Point2F:
+    cdef D2D1_POINT_2F value
+
+    def __init__(self, float x=0.0, float y=0.0):
+        self.value.x = x
+        self.value.y = y
+
+    @property
+    def x(self):
+        return self.value.x
+
+    @x.setter
+    def x(self, float x):
+        self.value.x = x
+
+    @property
+    def y(self):
+        return self.value.y
+
+    @y.setter
+    def y(self, float y):
+        self.value.y = y
+
+    def __eq__(self, other):
+        if not isinstance(other, Point2F):
+            return NotImplemented
+        return self.value.x == (<Point2F>other).value.x and self.value.y == (<Point2F>other).value.y
+
+    def __iter__(self):
+        return iter((self.value.x, self.value.y))
+
+    def __repr__(self):
+        return "Point2F(%r, %r)" % (self.value.x, self.value.y)
+
+
+cdef class RectF:
+    cdef D2D1_RECT_F value
+
+    def __init__(self, float left=0.0, float top=0.0, float right=0.0, float bottom=0.0):
+        self.value.left = left
+        self.value.top = top
+        self.value.right = right
+        self.value.bottom = bottom
+
+    @property
+    def left(self):
+        return self.value.left
+
+    @left.setter
+    def left(self, float left):
+        self.value.left = left
+
+    @property
+    def top(self):
+        return self.value.top
+
+    @top.setter
+    def top(self, float top):
+        self.value.top = top
+
+    @property
+    def right(self):
+        return self.value.right
+
+    @right.setter
+    def right(self, float right):
+        self.value.right = right
+
+    @property
+    def bottom(self):
+        return self.value.bottom
+
+    @bottom.setter
+    def bottom(self, float bottom):
+        self.value.bottom = bottom
+
+    def __eq__(self, other):
+        if not isinstance(other, RectF):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __iter__(self):
+        return iter((self.value.left, self.value.top, self.value.right, self.value.bottom))
+
+    def __repr__(self):
+        return "RectF(%r, %r, %r, %r)" % (self.value.left, self.value.top, self.value.right, self.value.bottom)
+
+
+cdef class ColorF:
+    cdef D2D1_COLOR_F value
+
+    def __init__(self, float r=0.0, float g=0.0, float b=0.0, float a=1.0):
+        self.value.r = r
+        self.value.g = g
+        self.value.b = b
+        self.value.a = a
+
+    @staticmethod
+    def FromRGBA(rgba):
+        cdef ColorF color = ColorF.__new__(ColorF)
+        readRGBA(rgba, &color.value)
+        return color
+
+    @property
+    def r(self):
+        return self.value.r
+
+    @r.setter
+    def r(self, float r):
+        self.value.r = r
+
+    @property
+    def g(self):
+        return self.value.g
+
+    @g.setter
+    def g(self, float g):
+        self.value.g = g
+
+    @property
+    def b(self):
+        return self.value.b
+
+    @b.setter
+    def b(self, float b):
+        self.value.b = b
+
+    @property
+    def a(self):
+        return self.value.a
+
+    @a.setter
+    def a(self, float a):
+        self.value.a = a
+
+    def __eq__(self, other):
+        if not isinstance(other, ColorF):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __iter__(self):
+        return iter((self.value.r, self.value.g, self.value.b, self.value.a))
+
+    def __repr__(self):
+        return "ColorF(%r, %r, %r, %r)" % (self.value.r, self.value.g, self.value.b, self.value.a)
+
+
+cdef class Ellipse:
+    cdef D2D1_ELLIPSE value
+
+    def __init__(self, float cx=0.0, float cy=0.0, float rx=0.0, float ry=0.0):
+        self.value.point.x = cx
+        self.value.point.y = cy
+        self.value.radiusX = rx
+        self.value.radiusY = ry
+
+    @property
+    def cx(self):
+        return self.value.point.x
+
+    @cx.setter
+    def cx(self, float cx):
+        self.value.point.x = cx
+
+    @property
+    def cy(self):
+        return self.value.point.y
+
+    @cy.setter
+    def cy(self, float cy):
+        self.value.point.y = cy
+
+    @property
+    def rx(self):
+        return self.value.radiusX
+
+    @rx.setter
+    def rx(self, float rx):
+        self.value.radiusX = rx
+
+    @property
+    def ry(self):
+        return self.value.radiusY
+
+    @ry.setter
+    def ry(self, float ry):
+        self.value.radiusY = ry
+
+    def __eq__(self, other):
+        if not isinstance(other, Ellipse):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __iter__(self):
+        return iter((self.value.point.x, self.value.point.y, self.value.radiusX, self.value.radiusY))
+
+    def __repr__(self):
+        return "Ellipse(%r, %r, %r, %r)" % (
+            self.value.point.x, self.value.point.y, self.value.radiusX, self.value.radiusY)
+
+
+# The read* helpers below accept either a value object or the separate floats
+# it replaces. When a method is called with a value object, the positional
+# arguments that follow it land in the parameters of the omitted floats, and
+# the method moves them back to the parameters they belong to. Separate float
+# arguments are checked for first, so the plain float form costs one exact
+# type check over the typed float parameters it replaced.
+
+cdef inline void unpackColor(uint32_t rgba, D2D1_COLOR_F *color) noexcept:
+    color.r = ((rgba >> 24) & 0xFF) / 255.0
+    color.g = ((rgba >> 16) & 0xFF) / 255.0
+    color.b = ((rgba >> 8) & 0xFF) / 255.0
+    color.a = (rgba & 0xFF) / 255.0
+
+
+cdef int readRGBA(object rgba, D2D1_COLOR_F *color) except -1:
+    # Floats would be truncated by the uint32_t conversion, so only ints are
+    # taken as packed colors.
+    if not isinstance(rgba, int):
+        raise TypeError("Expected a packed 0xRRGGBBAA int, got %s" % type(rgba).__name__)
+    unpackColor(rgba, color)
+    return 0
+
+
+cdef inline int readColor(object r, object g, object b, float a, D2D1_COLOR_F *color) except -1:
+    # Reads a ColorF or a packed 0xRRGGBBAA integer from r if b is omitted,
+    # and returns 1; otherwise reads the separate components and returns 0.
+    if PyFloat_CheckExact(r) and b is not None:
+        color.r = <float>PyFloat_AS_DOUBLE(r)
+    elif isinstance(r, ColorF):
+        color[0] = (<ColorF>r).value
+        return 1
+    elif b is None:
+        readRGBA(r, color)
+        return 1
+    else:
+        color.r = r
+    color.g = g
+    color.b = b
+    color.a = a
+    return 0
+
+
+cdef inline int readPoint(object x, object y, D2D1_POINT_2F *point) except -1:
+    # Reads a Point2F from x and returns 1, or reads x and y and returns 0.
+    if PyFloat_CheckExact(x):
+        point.x = <float>PyFloat_AS_DOUBLE(x)
+    elif isinstance(x, Point2F):
+        point[0] = (<Point2F>x).value
+        return 1
+    else:
+        point.x = x
+    point.y = y
+    return 0
+
+
+cdef inline int readRect(object l, object t, object r, object b, D2D1_RECT_F *rect) except -1:
+    # Reads a RectF from l and returns 1, or reads l, t, r and b and returns 0.
+    if PyFloat_CheckExact(l):
+        rect.left = <float>PyFloat_AS_DOUBLE(l)
+    elif isinstance(l, RectF):
+        rect[0] = (<RectF>l).value
+        return 1
+    else:
+        rect.left = l
+    rect.top = t
+    rect.right = r
+    rect.bottom = b
+    return 0
+
+
+cdef inline int readEllipse(object cx, object cy, object rx, object ry, D2D1_ELLIPSE *el) except -1:
+    # Reads an Ellipse from cx and returns 1, or reads cx, cy, rx and ry
+    # and returns 0.
+    if PyFloat_CheckExact(cx):
+        el.point.x = <float>PyFloat_AS_DOUBLE(cx)
+    elif isinstance(cx, Ellipse):
+        el[0] = (<Ellipse>cx).value
+        return 1
+    else:
+        el.point.x = cx
+    el.point.y = cy
+    el.radiusX = rx
+    el.radiusY = ry
+    return 0
+
+
+cdef int readSourceRect(object srcRect, D2D1_RECT_F *rect) except -1:
+    # Reads an optional RectF or (l, t, r, b) sequence and returns 1 if given.
+    if srcRect is None:
+        return 0
+    if isinstance(srcRect, RectF):
+        rect[0] = (<RectF>srcRect).value
+    else:
+        rect.left, rect.top, rect.right, rect.bottom = srcRect
+    return 1
+
+
+cdef D2D1_POINT_2F readCenter(object center) except *:
+    # Reads an optional Point2F or (x, y) sequence, defaulting to the origin.
+    cdef D2D1_POINT_2F c
+    if center is None:
+        c.x = 0
+        c.y = 0
+    elif isinstance(center, Point2F):
+        c = (<Point2F>center).value
+    else:
+        c.x, c.y = center
+    return c
+
+
+cdef inline void multiplyMatrix(const D2D1_MATRIX_3X2_F *a, const D2D1_MATRIX_3X2_F *b, D2D1_MATRIX_3X2_F *out) noexcept nogil:
+    # out = a * b, so that a is applied first; out may alias a or b.
+    cdef D2D1_MATRIX_3X2_F m
+    m.m11 = a.m11 * b.m11 + a.m12 * b.m21
+    m.m12 = a.m11 * b.m12 + a.m12 * b.m22
+    m.m21 = a.m21 * b.m11 + a.m22 * b.m21
+    m.m22 = a.m21 * b.m12 + a.m22 * b.m22
+    m.dx = a.dx * b.m11 + a.dy * b.m21 + b.dx
+    m.dy = a.dx * b.m12 + a.dy * b.m22 + b.dy
+    out[0] = m
+
+
+cdef inline void setMatrix(D2D1_MATRIX_3X2_F *m, float m11, float m12, float m21, float m22, float dx, float dy) noexcept nogil:
+    m.m11 = m11
+    m.m12 = m12
+    m.m21 = m21
+    m.m22 = m22
+    m.dx = dx
+    m.dy = dy
+
+
+cdef inline bint invertMatrix(const D2D1_MATRIX_3X2_F *m, D2D1_MATRIX_3X2_F *inverse) noexcept nogil:
+    # Sets inverse to the inverse of m and returns False if m is singular.
+    cdef float det = m.m11 * m.m22 - m.m12 * m.m21
+    if det == 0:
+        return False
+    setMatrix(
+        inverse,
+        m.m22 / det,
+        -m.m12 / det,
+        -m.m21 / det,
+        m.m11 / det,
+        (m.m21 * m.dy - m.m22 * m.dx) / det,
+        (m.m12 * m.dx - m.m11 * m.dy) / det)
+    return True
+
+
+cdef inline D2D1_POINT_2F transformPoint(const D2D1_MATRIX_3X2_F *m, D2D1_POINT_2F pt) noexcept nogil:
+    cdef D2D1_POINT_2F result
+    result.x = pt.x * m.m11 + pt.y * m.m21 + m.dx
+    result.y = pt.x * m.m12 + pt.y * m.m22 + m.dy
+    return result
+
+
+cdef inline Matrix3x2F newMatrix(const D2D1_MATRIX_3X2_F *m):
+    cdef Matrix3x2F obj = Matrix3x2F.__new__(Matrix3x2F)
+    obj.value = m[0]
+    return obj
+
+
+cdef class Matrix3x2F:
+    cdef D2D1_MATRIX_3X2_F value
+
+    def __init__(self, float m11=1.0, float m12=0.0, float m21=0.0, float m22=1.0, float dx=0.0, float dy=0.0):
+        setMatrix(&self.value, m11, m12, m21, m22, dx, dy)
+
+    @staticmethod
+    def Identity():
+        cdef Matrix3x2F obj = Matrix3x2F.__new__(Matrix3x2F)
+        setMatrix(&obj.value, 1, 0, 0, 1, 0, 0)
+        return obj
+
+    @staticmethod
+    def Translation(x, y=None):
+        cdef Matrix3x2F obj = Matrix3x2F.__new__(Matrix3x2F)
+        cdef D2D1_POINT_2F pt
+        readPoint(x, y, &pt)
+        setMatrix(&obj.value, 1, 0, 0, 1, pt.x, pt.y)
+        return obj
+
+    @staticmethod
+    def Rotation(float angle, center=None):
+        cdef Matrix3x2F obj = Matrix3x2F.__new__(Matrix3x2F)
+        cdef D2D1_POINT_2F c = readCenter(center)
+        cdef double rad = angle * (M_PI / 180.0)
+        cdef double s = sin(rad)
+        cdef double co = cos(rad)
+        setMatrix(&obj.value, co, s, -s, co, c.x - c.x * co + c.y * s, c.y - c.x * s - c.y * co)
+        return obj
+
+    @staticmethod
+    def Scale(float sx, float sy, center=None):
+        cdef Matrix3x2F obj = Matrix3x2F.__new__(Matrix3x2F)
+        cdef D2D1_POINT_2F c = readCenter(center)
+        setMatrix(&obj.value, sx, 0, 0, sy, c.x - sx * c.x, c.y - sy * c.y)
+        return obj
+
+    @staticmethod
+    def Skew(float angleX, float angleY, center=None):
+        cdef Matrix3x2F obj = Matrix3x2F.__new__(Matrix3x2F)
+        cdef D2D1_POINT_2F c = readCenter(center)
+        cdef float tx = tan(angleX * (M_PI / 180.0))
+        cdef float ty = tan(angleY * (M_PI / 180.0))
+        setMatrix(&obj.value, 1, ty, tx, 1, -c.y * tx, -c.x * ty)
+        return obj
+
+    @property
+    def m11(self):
+        return self.value.m11
+
+    @m11.setter
+    def m11(self, float m11):
+        self.value.m11 = m11
+
+    @property
+    def m12(self):
+        return self.value.m12
+
+    @m12.setter
+    def m12(self, float m12):
+        self.value.m12 = m12
+
+    @property
+    def m21(self):
+        return self.value.m21
+
+    @m21.setter
+    def m21(self, float m21):
+        self.value.m21 = m21
+
+    @property
+    def m22(self):
+        return self.value.m22
+
+    @m22.setter
+    def m22(self, float m22):
+        self.value.m22 = m22
+
+    @property
+    def dx(self):
+        return self.value.dx
+
+    @dx.setter
+    def dx(self, float dx):
+        self.value.dx = dx
+
+    @property
+    def dy(self):
+        return self.value.dy
+
+    @dy.setter
+    def dy(self, float dy):
+        self.value.dy = dy
+
+    def Determinant(self):
+        return self.value.m11 * self.value.m22 - self.value.m12 * self.value.m21
+
+    def Invert(self):
+        cdef Matrix3x2F obj = Matrix3x2F.__new__(Matrix3x2F)
+        if not invertMatrix(&self.value, &obj.value):
+            raise ValueError("matrix is not invertible")
+        return obj
+
+    def IsIdentity(self):
+        cdef const D2D1_MATRIX_3X2_F *m = &self.value
+        return m.m11 == 1 and m.m12 == 0 and m.m21 == 0 and m.m22 == 1 and m.dx == 0 and m.dy == 0
+
+    def IsInvertible(self):
+        return self.value.m11 * self.value.m22 - self.value.m12 * self.value.m21 != 0
+
+    def TransformPoint(self, x, y=None):
+        cdef D2D1_POINT_2F pt
+        readPoint(x, y, &pt)
+        cdef Point2F obj = Point2F.__new__(Point2F)
+        obj.value = transformPoint(&self.value, pt)
+        return obj
+
+    def TransformPoints(self, points):
+        cdef Py_buffer view
+        cdef Py_ssize_t count = getFloatRows(points, &view, 2, "points", PyBUF_WRITABLE)
+        cdef D2D1_POINT_2F *pts = <D2D1_POINT_2F*>view.buf
+        cdef D2D1_MATRIX_3X2_F m = self.value
+        cdef Py_ssize_t i
+        cdef float x
+        with nogil:
+            for i in range(count):
+                x = pts[i].x
+                pts[i].x = x * m.m11 + pts[i].y * m.m21 + m.dx
+                pts[i].y = x * m.m12 + pts[i].y * m.m22 + m.dy
+        PyBuffer_Release(&view)
+
+    def __mul__(self, other):
+        if not isinstance(self, Matrix3x2F) or not isinstance(other, Matrix3x2F):
+            return NotImplemented
+        cdef D2D1_MATRIX_3X2_F m
+        multiplyMatrix(&(<Matrix3x2F>self).value, &(<Matrix3x2F>other).value, &m)
+        return newMatrix(&m)
+
+    def __eq__(self, other):
+        if not isinstance(other, Matrix3x2F):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __iter__(self):
+        return iter((self.value.m11, self.value.m12, self.value.m21, self.value.m22, self.value.dx, self.value.dy))
+
+    def __repr__(self):
+        return "Matrix3x2F(%r, %r, %r, %r, %r, %r)" % tuple(self)
+
+
 cdef getHRESULTstring(int hr):
     cdef int strBufLen = 0x1000
     cdef wchar_t[0x1000] strBuf
@@ -358,6 +1190,69 @@ cdef class COMObject:
         self.Release()
 
 
+cdef class ResourceCache:
+    cdef object entries
+    cdef readonly Py_ssize_t maxEntries
+    cdef readonly Py_ssize_t maxBytes
+    cdef readonly Py_ssize_t bytes
+    cdef readonly Py_ssize_t hits
+    cdef readonly Py_ssize_t misses
+    cdef readonly Py_ssize_t evictions
+
+    def __init__(self, Py_ssize_t maxEntries=4096, Py_ssize_t maxBytes=0):
+        if maxEntries < 0 or maxBytes < 0:
+            raise ValueError("cache limits must not be negative")
+        from collections import OrderedDict
+        self.entries = OrderedDict()
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+
+    def __len__(self):
+        return len(self.entries)
+
+    cdef COMObject lookup(self, tuple key):
+        cdef tuple entry = self.entries.get(key)
+        cdef COMObject obj
+        if entry is not None:
+            obj = <COMObject>entry[0]
+            if obj.ptr != NULL:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return obj
+            # The caller released the cached object; forget about it.
+            del self.entries[key]
+            self.bytes -= <Py_ssize_t>entry[1]
+        self.misses += 1
+        return None
+
+    cdef store(self, tuple key, COMObject obj, Py_ssize_t nbytes):
+        self.entries[key] = (obj, nbytes)
+        self.bytes += nbytes
+        while self.entries and (
+                (self.maxEntries and len(self.entries) > self.maxEntries)
+                or (self.maxBytes and self.bytes > self.maxBytes)):
+            entry = self.entries.popitem(last=False)[1]
+            self.bytes -= <Py_ssize_t>entry[1]
+            self.evictions += 1
+
+    cdef discard(self, tuple key):
+        cdef tuple entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= <Py_ssize_t>entry[1]
+
+    def Clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+
+cdef class PathGeometryCache(ResourceCache):
+    pass
+
+
+cdef class StrokeStyleCache(ResourceCache):
+    pass
+
+
 _d2d_factory = None
 
 def GetD2DFactory():
@@ -368,7 +1263,38 @@ def GetD2DFactory():
 
 from libc.stdio cimport printf
 
+_present_executor = None
+
+cdef object getPresentExecutor():
+    # The blocking calls made by the *Async methods run on one worker thread,
+    # so they are executed in the order they were awaited.
+    global _present_executor
+    if _present_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _present_executor = ThreadPoolExecutor(1, thread_name_prefix="pyd2d-present")
+    return _present_executor
+
+
+cdef object runBlocking(func, tuple args):
+    # Starts func(*args) on the worker thread and returns an asyncio future
+    # that completes on the running event loop.
+    import asyncio
+    return asyncio.get_running_loop().run_in_executor(getPresentExecutor(), func, *args)
+
+
+async def RunFramesAsync(RenderTarget renderTarget, draw, frames=None):
+    cdef Py_ssize_t count = 0
+    while frames is None or count < frames:
+        count += 1
+        if await renderTarget.DrawFrameAsync(draw) is False:
+            break
+    return count
+
 cdef class D2DFactory(COMObject):
+    cdef PathGeometryCache svgPathCache
+    cdef StrokeStyleCache strokeStyleCache
+    cdef IWICImagingFactory *wicFactory
+
     def __init__(self, int factoryType=0, int debugLevel=0):
         cdef D2D1_FACTORY_OPTIONS options
         cdef ID2D1Factory* factory
@@ -377,6 +1303,14 @@ cdef class D2DFactory(COMObject):
         if FAILED(res):
             raise Direct2DError(res)
         self.ptr = <void*>factory
+        # Stroke styles are immutable, so equal ones can always be shared.
+        self.strokeStyleCache = StrokeStyleCache(4096, 0)
+
+    cpdef Release(self):
+        if self.wicFactory != NULL:
+            (<IUnknown*>self.wicFactory).Release()
+            self.wicFactory = NULL
+        COMObject.Release(self)
 
     def CreateHwndRenderTarget(
             self,
@@ -405,11 +1339,17 @@ cdef class D2DFactory(COMObject):
         hrtp.pixelSize.height = height
         hrtp.presentOptions = <D2D1_PRESENT_OPTIONS>presentOptions
         cdef ID2D1HwndRenderTarget* target
-        res = (<ID2D1Factory*>self.ptr).CreateHwndRenderTarget(&rtp, &hrtp, <ID2D1HwndRenderTarget**>&target)
+        cdef HRESULT res
+        with nogil:
+            res = (<ID2D1Factory*>self.ptr).CreateHwndRenderTarget(&rtp, &hrtp, <ID2D1HwndRenderTarget**>&target)
         if FAILED(res):
             raise Direct2DError(res)
         cdef HWNDRenderTarget obj = HWNDRenderTarget.__new__(HWNDRenderTarget)
         obj.ptr = <void*>target
+        obj.factory = <ID2D1Factory*>self.ptr
+        (<IUnknown*>obj.factory).AddRef()
+        obj.properties = rtp
+        obj.hwndProperties = hrtp
         return obj
 
     def CreatePathGeometry(self):
@@ -419,8 +1359,66 @@ cdef class D2DFactory(COMObject):
             raise Direct2DError(res)
         cdef PathGeometry obj = PathGeometry.__new__(PathGeometry)
         obj.ptr = <void*>pgm
+        objectTotals.geometries += 1
         return obj
 
+    def CreatePathGeometryFromSvg(self, str d, int fillMode=0):
+        cdef tuple key = None
+        cdef PathGeometry cached
+        if self.svgPathCache is not None:
+            key = (d, fillMode)
+            cached = <PathGeometry>self.svgPathCache.lookup(key)
+            if cached is not None:
+                return cached
+        cdef bytes data = d.encode("ascii")
+        cdef const char *s = data
+        cdef Py_ssize_t n = len(data)
+        cdef Py_ssize_t errorPos
+        cdef PathGeometry geometry = self.CreatePathGeometry()
+        cdef ID2D1GeometrySink *sink
+        cdef HRESULT res = (<ID2D1PathGeometry*>geometry.ptr).Open(&sink)
+        if FAILED(res):
+            raise Direct2DError(res)
+        with nogil:
+            sink.SetFillMode(<D2D1_FILL_MODE>fillMode)
+            errorPos = parseSvgPath(s, n, sink)
+            res = sink.Close()
+            (<IUnknown*>sink).Release()
+        if errorPos >= 0:
+            raise ValueError("invalid SVG path data at offset %d: %r" % (errorPos, d[errorPos:errorPos + 10]))
+        if FAILED(res):
+            raise Direct2DError(res)
+        if key is not None:
+            self.svgPathCache.store(key, geometry, n)
+        return geometry
+
+    def CreatePathGeometryFromPolyline(self, points, bint closed=False, int fillMode=0, int figureBegin=0):
+        cdef Py_buffer view
+        cdef Py_ssize_t count = getFloatRows(points, &view, 2, "points")
+        cdef const D2D1_POINT_2F *pts = <const D2D1_POINT_2F*>view.buf
+        cdef PathGeometry geometry
+        cdef ID2D1GeometrySink *sink
+        cdef HRESULT res
+        try:
+            if count == 0:
+                raise ValueError("points must contain at least one point")
+            geometry = self.CreatePathGeometry()
+            res = (<ID2D1PathGeometry*>geometry.ptr).Open(&sink)
+            if FAILED(res):
+                raise Direct2DError(res)
+            with nogil:
+                sink.SetFillMode(<D2D1_FILL_MODE>fillMode)
+                sink.BeginFigure(pts[0], <D2D1_FIGURE_BEGIN>figureBegin)
+                sink.AddLines(pts + 1, <UINT32>(count - 1))
+                sink.EndFigure(<D2D1_FIGURE_END>(1 if closed else 0))
+                res = sink.Close()
+                (<IUnknown*>sink).Release()
+            if FAILED(res):
+                raise Direct2DError(res)
+        finally:
+            PyBuffer_Release(&view)
+        return geometry
+
     def CreateStrokeStyle(
             self,
             int startCap=0,
@@ -429,7 +1427,28 @@ cdef class D2DFactory(COMObject):
             int lineJoin=0,
             float miterLimit=10.0,
             int dashStyle=0,
-            float dashOffset=0.0):
+            float dashOffset=0.0,
+            dashes=None):
+        cdef tuple pattern = None
+        if dashes is not None:
+            pattern = tuple([<float>d for d in dashes])
+            if not pattern:
+                raise ValueError("dashes must not be empty")
+            # A dash pattern implies DASH_STYLE.CUSTOM (5) unless another
+            # style was asked for.
+            if dashStyle == 0:
+                dashStyle = 5
+            elif dashStyle != 5:
+                raise ValueError("dashes can only be given with DASH_STYLE.CUSTOM")
+        elif dashStyle == 5:
+            raise ValueError("DASH_STYLE.CUSTOM requires dashes")
+        cdef tuple key = None
+        cdef StrokeStyle cached
+        if self.strokeStyleCache is not None:
+            key = (startCap, endCap, dashCap, lineJoin, miterLimit, dashStyle, dashOffset, pattern)
+            cached = <StrokeStyle>self.strokeStyleCache.lookup(key)
+            if cached is not None:
+                return cached
         cdef D2D1_STROKE_STYLE_PROPERTIES ssp
         ssp.startCap = <D2D1_CAP_STYLE>startCap
         ssp.endCap = <D2D1_CAP_STYLE>endCap
@@ -438,110 +1457,1321 @@ cdef class D2DFactory(COMObject):
         ssp.miterLimit = miterLimit
         ssp.dashStyle = <D2D1_DASH_STYLE>dashStyle
         ssp.dashOffset = dashOffset
+        cdef UINT count = 0
+        cdef float *buf = NULL
+        cdef Py_ssize_t i
+        if pattern is not None:
+            count = <UINT>len(pattern)
+            buf = <float*>PyMem_Malloc(count * sizeof(float))
+            if buf == NULL:
+                raise MemoryError()
+            for i in range(count):
+                buf[i] = pattern[i]
         cdef ID2D1StrokeStyle *sstyle
-        res = (<ID2D1Factory*>self.ptr).CreateStrokeStyle(&ssp, NULL, 0, <ID2D1StrokeStyle**>&sstyle)
+        res = (<ID2D1Factory*>self.ptr).CreateStrokeStyle(&ssp, buf, count, <ID2D1StrokeStyle**>&sstyle)
+        PyMem_Free(buf)
         if FAILED(res):
             raise Direct2DError(res)
         cdef StrokeStyle obj = StrokeStyle.__new__(StrokeStyle)
         obj.ptr = <void*>sstyle
+        if key is not None:
+            self.strokeStyleCache.store(key, obj, sizeof(D2D1_STROKE_STYLE_PROPERTIES) + count * sizeof(float))
+        return obj
+
+    def CreateWicBitmapRenderTarget(
+            self,
+            UINT width,
+            UINT height,
+            int rtType=0,
+            float dpiX=0,
+            float dpiY=0,
+            int usage=0,
+            int featureLevel=0):
+        if width == 0 or height == 0:
+            raise ValueError("width and height must be positive")
+        cdef HRESULT res
+        if self.wicFactory == NULL:
+            # The imaging factory is only needed for offscreen targets,
+            # so it is created on first use and kept for later targets.
+            res = CoCreateInstance(
+                CLSID_WICImagingFactory, NULL, 1, IID_IWICImagingFactory, <void**>&self.wicFactory)
+            if FAILED(res):
+                raise COMError(res)
+        cdef D2D1_RENDER_TARGET_PROPERTIES rtp
+        rtp.type = <D2D1_RENDER_TARGET_TYPE>rtType
+        # Premultiplied B8G8R8A8, the format of the WIC bitmap below.
+        rtp.pixelFormat.format = <DXGI_FORMAT>87
+        rtp.pixelFormat.alphaMode = <D2D1_ALPHA_MODE>1
+        rtp.dpiX = dpiX
+        rtp.dpiY = dpiY
+        rtp.usage = <D2D1_RENDER_TARGET_USAGE>usage
+        rtp.minLevel = <D2D1_FEATURE_LEVEL>featureLevel
+        cdef IWICBitmap *bitmap
+        cdef ID2D1RenderTarget *target
+        with nogil:
+            # WICBitmapCacheOnLoad allocates the pixel memory up front.
+            res = self.wicFactory.CreateBitmap(width, height, GUID_WICPixelFormat32bppPBGRA, 2, &bitmap)
+            if SUCCEEDED(res):
+                res = (<ID2D1Factory*>self.ptr).CreateWicBitmapRenderTarget(bitmap, &rtp, &target)
+                if FAILED(res):
+                    (<IUnknown*>bitmap).Release()
+        if FAILED(res):
+            raise Direct2DError(res)
+        cdef WICBitmapRenderTarget obj = WICBitmapRenderTarget.__new__(WICBitmapRenderTarget)
+        obj.ptr = <void*>target
+        obj.bitmap = bitmap
+        obj.width = width
+        obj.height = height
         return obj
 
+    def DisableSvgPathCache(self):
+        self.svgPathCache = None
+
+    def EnableSvgPathCache(self, Py_ssize_t maxEntries=4096, Py_ssize_t maxBytes=0):
+        self.svgPathCache = PathGeometryCache(maxEntries, maxBytes)
+        return self.svgPathCache
+
+    def GetSvgPathCache(self):
+        return self.svgPathCache
+
+    def DisableStrokeStyleCache(self):
+        self.strokeStyleCache = None
+
+    def EnableStrokeStyleCache(self, Py_ssize_t maxEntries=4096, Py_ssize_t maxBytes=0):
+        self.strokeStyleCache = StrokeStyleCache(maxEntries, maxBytes)
+        return self.strokeStyleCache
+
+    def GetStrokeStyleCache(self):
+        return self.strokeStyleCache
+
 
 cdef class Resource(COMObject):
-    pass
+    # Set on resources created by a render target with device recovery
+    # enabled: (target, recipe kind, creation arguments).
+    cdef tuple recipe
+    # Whether the resource was released because its device was lost and
+    # is to be recreated on first use.
+    cdef bint lost
+    cdef object __weakref__
 
+    cpdef Release(self):
+        self.lost = False
+        COMObject.Release(self)
 
-cdef class RenderTarget(Resource):
-    def BeginDraw(self):
-        (<ID2D1RenderTarget*>self.ptr).BeginDraw()
 
-    def Clear(self, float r, float g, float b, float a=1.0):
-        cdef D2D1_COLOR_F color
-        color.r = r
-        color.g = g
-        color.b = b
-        color.a = a
-        (<ID2D1RenderTarget*>self.ptr).Clear(&color)
+cdef enum BatchKind:
+    BATCH_FILL_RECTANGLE
+    BATCH_DRAW_RECTANGLE
+    BATCH_DRAW_LINE
+    BATCH_FILL_ELLIPSE
+    BATCH_DRAW_ELLIPSE
 
-    # def CreateBitmapFromWicBitmap(self, source, int dxgiFormat=0, int alphaMode=0, float dpiX=0.0, float dpiY=0.0):
-    #     cdef D2D1_BITMAP_PROPERTIES properties
-    #     properties.pixelFormat.format = dxgiFormat
-    #     properties.pixelFormat.alphaMode = alphaMode
-    #     properties.dpiX = dpiX
-    #     properties.dpiY = dpiY
-    #     cdef ID2D1Bitmap *bitmap
-    #     res = (<ID2D1RenderTarget*>self.ptr).CreateBitmapFromWicBitmap(
-    #         <IWICBitmapSource*>source.ptr,
-    #         &properties,
-    #         &bitmap)
-    #     if FAILED(res):
-    #         raise Direct2DError(res)
-    #     cdef Bitmap obj = Bitmap.__new__(Bitmap)
-    #     obj.ptr = <void*>bitmap
-    #     return obj
-
-    def CreateSolidColorBrush(self, float r, float g, float b, float a=1.0, float opacity=1.0):
-        cdef D2D1_COLOR_F color
-        color.r = r
-        color.g = g
-        color.b = b
-        color.a = a
-        cdef D2D1_BRUSH_PROPERTIES bprop
-        bprop.opacity = opacity
-        cdef ID2D1SolidColorBrush *brush
-        res = (<ID2D1RenderTarget*>self.ptr).CreateSolidColorBrush(&color, &bprop, &brush)
-        if FAILED(res):
-            raise Direct2DError(res)
-        cdef SolidColorBrush obj = SolidColorBrush.__new__(SolidColorBrush)
-        obj.ptr = <void*>brush
-        return obj
 
-    def DrawBitmap(
-            self,
-            Bitmap bitmap,
-            float l,
-            float t,
-            float r,
-            float b,
-            float opacity=1.0,
-            interpolationMode=1,
-            srcRect=None):
-        cdef D2D1_RECT_F dest, src
-        dest.left = l
-        dest.top = t
-        dest.right = r
-        dest.bottom = b
-        cdef D2D1_RECT_F *srcRectPtr = NULL
-        if srcRect is not None:
-            src.left, src.top, src.right, src.bottom = srcRect
-            srcRectPtr = &src
-        (<ID2D1RenderTarget*>self.ptr).DrawBitmap(
-            <ID2D1Bitmap*>bitmap.ptr,
-            dest,
-            opacity,
-            <D2D1_BITMAP_INTERPOLATION_MODE>interpolationMode,
-            srcRectPtr)
+cdef enum DrawOp:
+    OP_CLEAR
+    OP_DRAW_BITMAP
+    OP_DRAW_ELLIPSE
+    OP_DRAW_GEOMETRY
+    OP_DRAW_LINE
+    OP_DRAW_RECTANGLE
+    OP_DRAW_TEXT
+    OP_DRAW_TEXT_LAYOUT
+    OP_FILL_ELLIPSE
+    OP_FILL_GEOMETRY
+    OP_FILL_RECTANGLE
+    OP_SET_ANTIALIAS_MODE
+    OP_SET_TRANSFORM
+    OP_COUNT
+    # A node removed from a Scene; it is skipped and not counted.
+    OP_NONE
 
-    def DrawEllipse(
-            self,
-            float cx,
-            float cy,
-            float rx,
-            float ry,
-            Brush brush,
+
+cdef inline DrawOp batchDrawOp(BatchKind kind) noexcept:
+    if kind == BATCH_FILL_RECTANGLE:
+        return OP_FILL_RECTANGLE
+    if kind == BATCH_DRAW_RECTANGLE:
+        return OP_DRAW_RECTANGLE
+    if kind == BATCH_DRAW_LINE:
+        return OP_DRAW_LINE
+    if kind == BATCH_FILL_ELLIPSE:
+        return OP_FILL_ELLIPSE
+    return OP_DRAW_ELLIPSE
+
+
+cdef struct DrawCommand:
+    DrawOp op
+    # Coordinates, colour components, or matrix elements depending on op.
+    float v[8]
+    # Stroke width or opacity.
+    float width
+    int option0
+    int option1
+    # Borrowed references; the owning DrawList keeps the objects alive.
+    PyObject *resource0
+    PyObject *resource1
+    PyObject *resource2
+    wchar_t *text
+    UINT32 textLength
+
+
+cdef inline char formatCode(const Py_buffer *view) noexcept:
+    # Returns the type code at the end of the struct format of view, such as
+    # 'f' for "<f", or 0 if the exporter gave no format.
+    if view.format == NULL or view.format[0] == 0:
+        return 0
+    return view.format[strlen(view.format) - 1]
+
+
+cdef Py_ssize_t getFloatRows(object obj, Py_buffer *view, Py_ssize_t width, str name, int flags=0) except -1:
+    # Accepts a C-contiguous float32 buffer that is either flat (N*width)
+    # or shaped (N, width) and returns N.
+    PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | flags)
+    cdef bint ok = view.itemsize == 4 and formatCode(view) == c'f' and view.ndim <= 2
+    if ok and view.ndim == 2:
+        ok = view.shape[1] == width
+    if ok:
+        ok = (view.len // 4) % width == 0
+    if not ok:
+        PyBuffer_Release(view)
+        raise ValueError("%s must be a C-contiguous float32 buffer of shape Nx%d" % (name, width))
+    return (view.len // 4) // width
+
+
+cdef Py_ssize_t getIndices(object obj, Py_buffer *view, Py_ssize_t count, Py_ssize_t limit) except -1:
+    # Accepts a C-contiguous buffer of 32-bit integers with one entry per item,
+    # each of which must be a valid index below limit.
+    PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT)
+    cdef bint ok = view.itemsize == 4 and formatCode(view) in b'iIlL'
+    cdef str msg = "brushIndices must be a C-contiguous buffer of 32-bit integers"
+    if ok and view.len // 4 != count:
+        ok = False
+        msg = "brushIndices must have one entry per item"
+    cdef const uint32_t *idx = <const uint32_t*>view.buf
+    cdef Py_ssize_t i
+    if ok:
+        for i in range(count):
+            if idx[i] >= <uint64_t>limit:
+                ok = False
+                msg = "brush index %d out of range" % (<int32_t>idx[i])
+                break
+    if not ok:
+        PyBuffer_Release(view)
+        raise ValueError(msg)
+    return count
+
+
+cdef Py_ssize_t bytesPerPixel(int pixelFormat) noexcept:
+    # Returns the pixel size of the DXGI formats Direct2D bitmaps support, or 0.
+    if pixelFormat in (24, 28, 29, 87, 88, 91):
+        return 4
+    if pixelFormat in (10, 11):
+        return 8
+    if pixelFormat == 2:
+        return 16
+    if pixelFormat in (61, 65):
+        return 1
+    return 0
+
+
+cdef Py_ssize_t getPixels(object obj, Py_buffer *view, UINT32 width, UINT32 height, Py_ssize_t pitch, int pixelFormat) except -1:
+    # Accepts a C-contiguous buffer holding height rows of width pixels whose
+    # starts are pitch bytes apart, and returns the pitch, computing it if 0.
+    cdef Py_ssize_t bpp = bytesPerPixel(pixelFormat)
+    if bpp == 0:
+        raise ValueError("unsupported pixel format %d" % pixelFormat)
+    cdef Py_ssize_t rowBytes = width * bpp
+    if pitch == 0:
+        pitch = rowBytes
+    elif pitch < rowBytes:
+        raise ValueError("pitch must be at least %d bytes" % rowBytes)
+    PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS)
+    cdef Py_ssize_t needed = pitch * (height - 1) + rowBytes if height else 0
+    if view.len < needed:
+        PyBuffer_Release(view)
+        raise ValueError("buffer must hold at least %d bytes" % needed)
+    return pitch
+
+
+cdef inline uint64_t quantizeColorComponent(float value) noexcept:
+    if value <= 0.0:
+        return 0
+    if value >= 1.0:
+        return 255
+    return <uint64_t>(value * 255.0 + 0.5)
+
+
+# Names of the DrawOp values counted as draw calls in FrameStats.drawCalls.
+cdef tuple drawCallNames = (
+    "Clear",
+    "DrawBitmap",
+    "DrawEllipse",
+    "DrawGeometry",
+    "DrawLine",
+    "DrawRectangle",
+    "DrawText",
+    "DrawTextLayout",
+    "FillEllipse",
+    "FillGeometry",
+    "FillRectangle",
+)
+
+# Upper bounds in seconds of the frame time histogram buckets.
+cdef tuple frameTimeBuckets = (0.005, 0.010, 0.017, 0.034, 0.050, 0.100, float("inf"))
+
+
+cdef struct FrameRecorder:
+    # Counts for the frame in progress.
+    Py_ssize_t draws[<int>OP_COUNT]
+    Py_ssize_t culled
+    ObjectTotals baseline
+    long long beginTicks
+    bint inFrame
+    # Counts for the last completed frame.
+    Py_ssize_t lastDraws[<int>OP_COUNT]
+    Py_ssize_t lastCulled
+    ObjectTotals lastCreated
+    double lastEndDrawTime
+    double lastFrameTime
+    Py_ssize_t frames
+    double tickSeconds
+    # Ring buffer of recent frame times.
+    double *history
+    Py_ssize_t historySize
+    Py_ssize_t historyCount
+    Py_ssize_t historyPos
+
+
+cdef inline long long performanceCounter() noexcept nogil:
+    cdef LARGE_INTEGER ticks
+    QueryPerformanceCounter(&ticks)
+    return ticks.QuadPart
+
+
+cdef inline void countDraws(FrameRecorder *rec, DrawOp op, Py_ssize_t n) noexcept:
+    if rec != NULL:
+        rec.draws[<int>op] += n
+
+
+cdef void freeFrameRecorder(FrameRecorder *rec) noexcept:
+    if rec != NULL:
+        PyMem_Free(rec.history)
+        PyMem_Free(rec)
+
+
+cdef class FrameStats:
+    cdef readonly Py_ssize_t frames
+    cdef readonly dict drawCalls
+    cdef readonly Py_ssize_t culledDraws
+    cdef readonly Py_ssize_t textDraws
+    cdef readonly Py_ssize_t charactersConverted
+    cdef readonly Py_ssize_t brushesCreated
+    cdef readonly Py_ssize_t geometriesCreated
+    cdef readonly Py_ssize_t textLayoutsCreated
+    cdef readonly Py_ssize_t transformChanges
+    cdef readonly double endDrawTime
+    cdef readonly double frameTime
+    cdef readonly tuple frameTimes
+    cdef readonly tuple histogram
+
+    def __init__(self):
+        raise TypeError("This class cannot be instantiated directly.")
+
+    def __repr__(self):
+        return "<FrameStats frames=%d drawCalls=%d frameTime=%.6f>" % (
+            self.frames, sum(self.drawCalls.values()), self.frameTime)
+
+
+cdef FrameStats snapshotFrameStats(FrameRecorder *rec):
+    cdef FrameStats stats = FrameStats.__new__(FrameStats)
+    cdef Py_ssize_t i
+    stats.frames = rec.frames
+    stats.drawCalls = {name: rec.lastDraws[i] for i, name in enumerate(drawCallNames)}
+    stats.culledDraws = rec.lastCulled
+    stats.textDraws = rec.lastDraws[<int>OP_DRAW_TEXT] + rec.lastDraws[<int>OP_DRAW_TEXT_LAYOUT]
+    stats.charactersConverted = rec.lastCreated.charactersConverted
+    stats.brushesCreated = rec.lastCreated.brushes
+    stats.geometriesCreated = rec.lastCreated.geometries
+    stats.textLayoutsCreated = rec.lastCreated.textLayouts
+    stats.transformChanges = rec.lastDraws[<int>OP_SET_TRANSFORM]
+    stats.endDrawTime = rec.lastEndDrawTime
+    stats.frameTime = rec.lastFrameTime
+    # Oldest first.
+    start = rec.historyPos - rec.historyCount
+    if start < 0:
+        start += rec.historySize
+    stats.frameTimes = tuple([rec.history[(start + i) % rec.historySize] for i in range(rec.historyCount)])
+    counts = [0] * len(frameTimeBuckets)
+    for t in stats.frameTimes:
+        for i, bound in enumerate(frameTimeBuckets):
+            if t <= bound:
+                counts[i] += 1
+                break
+    stats.histogram = tuple(zip(frameTimeBuckets, counts))
+    return stats
+
+
+cdef enum RecipeKind:
+    RECIPE_SOLID_COLOR_BRUSH
+    RECIPE_BITMAP
+    RECIPE_LAYER
+
+
+cdef class DeviceRecovery:
+    # Weak references to the resources to recreate after a device loss.
+    cdef object resources
+    cdef double tickSeconds
+    cdef readonly bint lost
+    cdef readonly Py_ssize_t deviceLosses
+    cdef readonly Py_ssize_t recreatedResources
+    cdef readonly double recoveryTime
+
+    def __init__(self):
+        raise TypeError("This class cannot be instantiated directly.")
+
+    def __len__(self):
+        return len(self.resources)
+
+    def __repr__(self):
+        return "<DeviceRecovery resources=%d deviceLosses=%d recoveryTime=%.6f>" % (
+            len(self.resources), self.deviceLosses, self.recoveryTime)
+
+    @property
+    def pendingResources(self):
+        cdef Resource resource
+        cdef Py_ssize_t count = 0
+        for resource in self.resources:
+            if resource.lost:
+                count += 1
+        return count
+
+
+cdef struct DamageTracker:
+    # Dirty rectangles in pixel-snapped DIPs, with room for one more
+    # than maxRects while a new rectangle is merged in.
+    D2D1_RECT_F *rects
+    Py_ssize_t count
+    Py_ssize_t maxRects
+    bint full
+
+
+cdef inline double rectArea(const D2D1_RECT_F *r) noexcept nogil:
+    if r.right <= r.left or r.bottom <= r.top:
+        return 0
+    return (<double>r.right - r.left) * (<double>r.bottom - r.top)
+
+
+cdef inline void unionRect(const D2D1_RECT_F *a, const D2D1_RECT_F *b, D2D1_RECT_F *out) noexcept nogil:
+    out.left = a.left if a.left < b.left else b.left
+    out.top = a.top if a.top < b.top else b.top
+    out.right = a.right if a.right > b.right else b.right
+    out.bottom = a.bottom if a.bottom > b.bottom else b.bottom
+
+
+cdef double mergeCost(const D2D1_RECT_F *a, const D2D1_RECT_F *b) noexcept nogil:
+    # The area that merging a and b would redraw without being dirty.
+    # It is 0 when one contains the other or they are aligned neighbours.
+    cdef D2D1_RECT_F u, i
+    unionRect(a, b, &u)
+    i.left = a.left if a.left > b.left else b.left
+    i.top = a.top if a.top > b.top else b.top
+    i.right = a.right if a.right < b.right else b.right
+    i.bottom = a.bottom if a.bottom < b.bottom else b.bottom
+    return rectArea(&u) - rectArea(a) - rectArea(b) + rectArea(&i)
+
+
+cdef void addDamage(DamageTracker *dt, D2D1_RECT_F rect) noexcept nogil:
+    cdef Py_ssize_t i, j, bestI, bestJ
+    cdef double cost, bestCost
+    # Snap outwards to whole pixels so that aliased clips cover the
+    # antialiased edges of what was drawn there.
+    rect.left = floor(rect.left)
+    rect.top = floor(rect.top)
+    rect.right = ceil(rect.right)
+    rect.bottom = ceil(rect.bottom)
+    if dt.full or rectArea(&rect) == 0:
+        return
+    # Absorb every rectangle that merges with the new one for free.
+    i = 0
+    while i < dt.count:
+        if mergeCost(&dt.rects[i], &rect) <= 0:
+            unionRect(&dt.rects[i], &rect, &rect)
+            dt.count -= 1
+            dt.rects[i] = dt.rects[dt.count]
+            i = 0
+        else:
+            i += 1
+    dt.rects[dt.count] = rect
+    dt.count += 1
+    if dt.count <= dt.maxRects:
+        return
+    # Too many rectangles: merge the pair that wastes the least area.
+    bestI = 0
+    bestJ = 1
+    bestCost = -1
+    for i in range(dt.count):
+        for j in range(i + 1, dt.count):
+            cost = mergeCost(&dt.rects[i], &dt.rects[j])
+            if bestCost < 0 or cost < bestCost:
+                bestCost = cost
+                bestI = i
+                bestJ = j
+    unionRect(&dt.rects[bestI], &dt.rects[bestJ], &dt.rects[bestI])
+    dt.count -= 1
+    dt.rects[bestJ] = dt.rects[dt.count]
+
+
+cdef void freeDamageTracker(DamageTracker *dt) noexcept:
+    if dt != NULL:
+        PyMem_Free(dt.rects)
+        PyMem_Free(dt)
+
+
+cdef enum:
+    # D2D1_DRAW_TEXT_OPTIONS_CLIP
+    DRAW_TEXT_OPTIONS_CLIP = 2
+
+
+# The clip mirror is widened by this many DIPs on each side, so that pixel
+# snapping of aliased clips never makes it smaller than the real clip.
+cdef float clipMargin = 1.0
+
+
+cdef struct ClipEntry:
+    # The clip in effect after a push, in DIPs of the render target (after
+    # the transform that was current when it was pushed).
+    D2D1_RECT_F clip
+    bint layer
+
+
+cdef inline void transformBounds(const D2D1_MATRIX_3X2_F *m, const D2D1_RECT_F *rect, D2D1_RECT_F *bounds) noexcept nogil:
+    # Sets bounds to the bounding box of rect transformed by m; bounds may alias rect.
+    cdef D2D1_RECT_F r = rect[0]
+    cdef D2D1_POINT_2F corner
+    cdef int k
+    if m.m12 == 0 and m.m21 == 0:
+        bounds.left = r.left * m.m11 + m.dx
+        bounds.right = r.right * m.m11 + m.dx
+        bounds.top = r.top * m.m22 + m.dy
+        bounds.bottom = r.bottom * m.m22 + m.dy
+        if bounds.left > bounds.right:
+            bounds.left, bounds.right = bounds.right, bounds.left
+        if bounds.top > bounds.bottom:
+            bounds.top, bounds.bottom = bounds.bottom, bounds.top
+        return
+    for k in range(4):
+        corner.x = r.right if k & 1 else r.left
+        corner.y = r.bottom if k & 2 else r.top
+        corner = transformPoint(m, corner)
+        if k == 0:
+            bounds.left = bounds.right = corner.x
+            bounds.top = bounds.bottom = corner.y
+        else:
+            bounds.left = min(bounds.left, corner.x)
+            bounds.top = min(bounds.top, corner.y)
+            bounds.right = max(bounds.right, corner.x)
+            bounds.bottom = max(bounds.bottom, corner.y)
+
+
+cdef void shapeBounds(DrawOp op, const float *v, float width, D2D1_RECT_F *bounds) noexcept nogil:
+    # Sets bounds to the area covered by a rectangle, ellipse, line, text or
+    # bitmap command with the coordinates v and stroke width.
+    cdef float grow = 0
+    if op == OP_FILL_ELLIPSE or op == OP_DRAW_ELLIPSE:
+        bounds.left = v[0] - fabs(v[2])
+        bounds.top = v[1] - fabs(v[3])
+        bounds.right = v[0] + fabs(v[2])
+        bounds.bottom = v[1] + fabs(v[3])
+        if op == OP_DRAW_ELLIPSE:
+            grow = width / 2
+    else:
+        # The others are given by two corners.
+        bounds.left = v[0] if v[0] < v[2] else v[2]
+        bounds.top = v[1] if v[1] < v[3] else v[3]
+        bounds.right = v[2] if v[0] < v[2] else v[0]
+        bounds.bottom = v[3] if v[1] < v[3] else v[1]
+        if op == OP_DRAW_RECTANGLE:
+            grow = width / 2
+        elif op == OP_DRAW_LINE:
+            # Square caps reach further than half the stroke width.
+            grow = width
+    bounds.left -= grow
+    bounds.top -= grow
+    bounds.right += grow
+    bounds.bottom += grow
+
+
+cdef inline bint outsideClip(const D2D1_RECT_F *clip, const D2D1_RECT_F *bounds) noexcept nogil:
+    # NaN bounds compare false and are never culled.
+    return (
+        clip.left >= clip.right or clip.top >= clip.bottom
+        or bounds.right < clip.left or bounds.left > clip.right
+        or bounds.bottom < clip.top or bounds.top > clip.bottom)
+
+
+cdef void executeCommand(ID2D1RenderTarget *rt, DrawCommand *cmd) noexcept:
+    # Issues one recorded command; shared by RenderTarget.Replay and DrawScene.
+    cdef D2D1_COLOR_F color
+    cdef D2D1_RECT_F rect, src
+    cdef D2D1_ELLIPSE el
+    cdef D2D1_POINT_2F point0, point1
+    cdef D2D1_MATRIX_3X2_F mat
+    if cmd.op == OP_CLEAR:
+        color.r = cmd.v[0]
+        color.g = cmd.v[1]
+        color.b = cmd.v[2]
+        color.a = cmd.v[3]
+        rt.Clear(&color)
+    elif cmd.op == OP_FILL_RECTANGLE or cmd.op == OP_DRAW_RECTANGLE:
+        rect.left = cmd.v[0]
+        rect.top = cmd.v[1]
+        rect.right = cmd.v[2]
+        rect.bottom = cmd.v[3]
+        if cmd.op == OP_FILL_RECTANGLE:
+            rt.FillRectangle(&rect, <ID2D1Brush*>resourcePtr(cmd.resource0))
+        else:
+            rt.DrawRectangle(
+                &rect,
+                <ID2D1Brush*>resourcePtr(cmd.resource0),
+                cmd.width,
+                <ID2D1StrokeStyle*>resourcePtr(cmd.resource1))
+    elif cmd.op == OP_FILL_ELLIPSE or cmd.op == OP_DRAW_ELLIPSE:
+        el.point.x = cmd.v[0]
+        el.point.y = cmd.v[1]
+        el.radiusX = cmd.v[2]
+        el.radiusY = cmd.v[3]
+        if cmd.op == OP_FILL_ELLIPSE:
+            rt.FillEllipse(&el, <ID2D1Brush*>resourcePtr(cmd.resource0))
+        else:
+            rt.DrawEllipse(
+                &el,
+                <ID2D1Brush*>resourcePtr(cmd.resource0),
+                cmd.width,
+                <ID2D1StrokeStyle*>resourcePtr(cmd.resource1))
+    elif cmd.op == OP_DRAW_LINE:
+        point0.x = cmd.v[0]
+        point0.y = cmd.v[1]
+        point1.x = cmd.v[2]
+        point1.y = cmd.v[3]
+        rt.DrawLine(
+            point0,
+            point1,
+            <ID2D1Brush*>resourcePtr(cmd.resource0),
+            cmd.width,
+            <ID2D1StrokeStyle*>resourcePtr(cmd.resource1))
+    elif cmd.op == OP_FILL_GEOMETRY:
+        rt.FillGeometry(
+            <ID2D1Geometry*>resourcePtr(cmd.resource0),
+            <ID2D1Brush*>resourcePtr(cmd.resource1),
+            NULL)
+    elif cmd.op == OP_DRAW_GEOMETRY:
+        rt.DrawGeometry(
+            <ID2D1Geometry*>resourcePtr(cmd.resource0),
+            <ID2D1Brush*>resourcePtr(cmd.resource1),
+            cmd.width,
+            <ID2D1StrokeStyle*>resourcePtr(cmd.resource2))
+    elif cmd.op == OP_DRAW_TEXT:
+        rect.left = cmd.v[0]
+        rect.top = cmd.v[1]
+        rect.right = cmd.v[2]
+        rect.bottom = cmd.v[3]
+        rt.DrawTextW(
+            cmd.text,
+            cmd.textLength,
+            <IDWriteTextFormat*>resourcePtr(cmd.resource0),
+            rect,
+            <ID2D1Brush*>resourcePtr(cmd.resource1),
+            <D2D1_DRAW_TEXT_OPTIONS>cmd.option0,
+            <DWRITE_MEASURING_MODE>cmd.option1)
+    elif cmd.op == OP_DRAW_TEXT_LAYOUT:
+        point0.x = cmd.v[0]
+        point0.y = cmd.v[1]
+        rt.DrawTextLayout(
+            point0,
+            <IDWriteTextLayout*>resourcePtr(cmd.resource0),
+            <ID2D1Brush*>resourcePtr(cmd.resource1),
+            <D2D1_DRAW_TEXT_OPTIONS>cmd.option0)
+    elif cmd.op == OP_DRAW_BITMAP:
+        rect.left = cmd.v[0]
+        rect.top = cmd.v[1]
+        rect.right = cmd.v[2]
+        rect.bottom = cmd.v[3]
+        src.left = cmd.v[4]
+        src.top = cmd.v[5]
+        src.right = cmd.v[6]
+        src.bottom = cmd.v[7]
+        rt.DrawBitmap(
+            <ID2D1Bitmap*>resourcePtr(cmd.resource0),
+            rect,
+            cmd.width,
+            <D2D1_BITMAP_INTERPOLATION_MODE>cmd.option0,
+            &src if cmd.option1 else NULL)
+    elif cmd.op == OP_SET_ANTIALIAS_MODE:
+        rt.SetAntialiasMode(<D2D1_ANTIALIAS_MODE>cmd.option0)
+    elif cmd.op == OP_SET_TRANSFORM:
+        mat.m11 = cmd.v[0]
+        mat.m12 = cmd.v[1]
+        mat.m21 = cmd.v[2]
+        mat.m22 = cmd.v[3]
+        mat.dx = cmd.v[4]
+        mat.dy = cmd.v[5]
+        rt.SetTransform(&mat)
+
+
+cdef class RenderTarget(Resource):
+    cdef object brushPool
+    cdef Py_ssize_t brushPoolLimit
+    cdef FrameRecorder *frameRecorder
+    cdef DamageTracker *damage
+    cdef D2D1_MATRIX_3X2_F *transformStack
+    cdef Py_ssize_t transformDepth
+    cdef Py_ssize_t transformCapacity
+    # Mirror of the pushed clips and layers, used to skip drawing calls
+    # that fall entirely outside the clip.
+    cdef ClipEntry *clipStack
+    cdef Py_ssize_t clipDepth
+    cdef Py_ssize_t clipCapacity
+    # Layers reused by PushLayer, one per nesting level.
+    cdef list layerPool
+    cdef Py_ssize_t layerDepth
+    cdef DeviceRecovery recovery
+    cdef GeometryRealizationCache realizations
+
+    def __cinit__(self):
+        from collections import OrderedDict
+        self.brushPool = OrderedDict()
+        self.brushPoolLimit = 256
+        self.layerPool = []
+
+    def __dealloc__(self):
+        freeFrameRecorder(self.frameRecorder)
+        self.frameRecorder = NULL
+        freeDamageTracker(self.damage)
+        self.damage = NULL
+        PyMem_Free(self.transformStack)
+        self.transformStack = NULL
+        PyMem_Free(self.clipStack)
+        self.clipStack = NULL
+        # Release while brushPool is still set; the base class
+        # calls Release again after the fields have been cleared.
+        self.Release()
+
+    cpdef Release(self):
+        if self.ptr == NULL:
+            return
+        if self.brushPool is not None:
+            self.brushPool.clear()
+        if self.layerPool is not None:
+            for layer in self.layerPool:
+                layer.Release()
+            self.layerPool.clear()
+        if self.realizations is not None:
+            self.realizations.Clear()
+        Resource.Release(self)
+
+    cdef SolidColorBrush createSolidColorBrush(self, float r, float g, float b, float a, float opacity):
+        if self.recovery is not None and self.recovery.lost:
+            self.restoreTarget()
+        cdef D2D1_COLOR_F color
+        color.r = r
+        color.g = g
+        color.b = b
+        color.a = a
+        cdef D2D1_BRUSH_PROPERTIES bprop
+        bprop.opacity = opacity
+        cdef ID2D1SolidColorBrush *brush
+        res = (<ID2D1RenderTarget*>self.ptr).CreateSolidColorBrush(&color, &bprop, &brush)
+        if FAILED(res):
+            raise Direct2DError(res)
+        cdef SolidColorBrush obj = SolidColorBrush.__new__(SolidColorBrush)
+        obj.ptr = <void*>brush
+        objectTotals.brushes += 1
+        return obj
+
+    cdef Bitmap createBitmap(
+            self,
+            UINT32 width,
+            UINT32 height,
+            object buffer,
+            Py_ssize_t pitch,
+            int pixelFormat,
+            int alphaMode,
+            float dpiX,
+            float dpiY):
+        if self.recovery is not None and self.recovery.lost:
+            self.restoreTarget()
+        cdef D2D1_SIZE_U size
+        size.width = width
+        size.height = height
+        cdef D2D1_BITMAP_PROPERTIES props
+        props.pixelFormat.format = <DXGI_FORMAT>pixelFormat
+        props.pixelFormat.alphaMode = <D2D1_ALPHA_MODE>alphaMode
+        props.dpiX = dpiX
+        props.dpiY = dpiY
+        cdef Py_buffer view
+        cdef const void *data = NULL
+        if buffer is not None:
+            pitch = getPixels(buffer, &view, width, height, pitch, pixelFormat)
+            data = view.buf
+        cdef ID2D1Bitmap *bitmap
+        cdef HRESULT res
+        with nogil:
+            res = (<ID2D1RenderTarget*>self.ptr).CreateBitmap(size, data, <UINT32>pitch, &props, &bitmap)
+        if buffer is not None:
+            PyBuffer_Release(&view)
+        if FAILED(res):
+            raise Direct2DError(res)
+        cdef Bitmap obj = Bitmap.__new__(Bitmap)
+        obj.ptr = <void*>bitmap
+        return obj
+
+    cdef Layer createLayer(self):
+        if self.recovery is not None and self.recovery.lost:
+            self.restoreTarget()
+        cdef ID2D1Layer *layer
+        cdef HRESULT res = (<ID2D1RenderTarget*>self.ptr).CreateLayer(NULL, &layer)
+        if FAILED(res):
+            raise Direct2DError(res)
+        cdef Layer obj = Layer.__new__(Layer)
+        obj.ptr = <void*>layer
+        return obj
+
+    cdef track(self, Resource obj, RecipeKind kind, tuple args):
+        # Records how obj was created, so that it can be recreated after
+        # the device is lost.
+        obj.recipe = (self, kind, args)
+        self.recovery.resources.add(obj)
+
+    cdef deviceLost(self):
+        # Called when EndDraw reports D2DERR_RECREATE_TARGET. The resources
+        # of the lost device are released now, and they and the target are
+        # recreated when they are next used, so that a frame only pays for
+        # the resources it draws with.
+        cdef DeviceRecovery recovery = self.recovery
+        cdef Resource resource
+        for resource in list(recovery.resources):
+            if resource.ptr != NULL:
+                (<IUnknown*>resource.ptr).Release()
+                resource.ptr = NULL
+                resource.lost = True
+        for layer in self.layerPool:
+            layer.Release()
+        self.layerPool.clear()
+        if self.realizations is not None:
+            self.realizations.Clear()
+        recovery.lost = True
+        recovery.deviceLosses += 1
+        recovery.recreatedResources = 0
+        recovery.recoveryTime = 0
+        if self.damage != NULL:
+            self.damage.full = True
+            self.damage.count = 0
+
+    cdef int recreateTarget(self) except -1:
+        raise ValueError("this render target cannot be recreated")
+
+    cdef int restoreTarget(self) except -1:
+        cdef long long start = performanceCounter()
+        self.recreateTarget()
+        self.recovery.lost = False
+        self.recovery.recoveryTime += (performanceCounter() - start) * self.recovery.tickSeconds
+        return 0
+
+    cdef int recreateResource(self, Resource obj) except -1:
+        if self.ptr == NULL:
+            raise ValueError("render target has been released")
+        cdef long long start = performanceCounter()
+        cdef RecipeKind kind = obj.recipe[1]
+        cdef tuple args = obj.recipe[2]
+        cdef Resource fresh
+        if kind == RECIPE_SOLID_COLOR_BRUSH:
+            r, g, b, a, opacity = args
+            fresh = self.createSolidColorBrush(r, g, b, a, opacity)
+        elif kind == RECIPE_BITMAP:
+            width, height, buffer, pitch, pixelFormat, alphaMode, dpiX, dpiY = args
+            fresh = self.createBitmap(width, height, buffer, pitch, pixelFormat, alphaMode, dpiX, dpiY)
+        else:
+            fresh = self.createLayer()
+        obj.ptr = fresh.ptr
+        fresh.ptr = NULL
+        obj.lost = False
+        if self.recovery is not None:
+            self.recovery.recreatedResources += 1
+            self.recovery.recoveryTime += (performanceCounter() - start) * self.recovery.tickSeconds
+        return 0
+
+    cdef GeometryRealization realize(
+            self,
+            DrawOp op,
+            Geometry geometry,
+            Brush brush,
+            float strokeWidth,
+            StrokeStyle strokeStyle,
+            float scaleX,
+            float scaleY):
+        # Renders geometry at the given scale into a bitmap, or returns None
+        # if it is empty or too large to cache.
+        cdef ID2D1Geometry *geo = <ID2D1Geometry*>geometry.ptr
+        cdef ID2D1Brush *br = <ID2D1Brush*>devicePtr(brush)
+        cdef ID2D1StrokeStyle *sstyle = NULL
+        if strokeStyle is not None:
+            sstyle = <ID2D1StrokeStyle*>strokeStyle.ptr
+        cdef D2D1_RECT_F bounds
+        cdef HRESULT res
+        if op == OP_DRAW_GEOMETRY:
+            res = geo.GetWidenedBounds(strokeWidth, sstyle, NULL, 0.25, &bounds)
+        else:
+            res = geo.GetBounds(NULL, &bounds)
+        if FAILED(res):
+            raise Direct2DError(res)
+        if not (bounds.right > bounds.left and bounds.bottom > bounds.top):
+            return None
+        # A margin of one DIP keeps the antialiased edges inside the bitmap.
+        cdef D2D1_SIZE_F size
+        size.width = ceil((bounds.right - bounds.left) * scaleX) + 2
+        size.height = ceil((bounds.bottom - bounds.top) * scaleY) + 2
+        if size.width > realizationMaxSize or size.height > realizationMaxSize:
+            return None
+        cdef Py_ssize_t nbytes = <Py_ssize_t>size.width * <Py_ssize_t>size.height * 4
+        if self.realizations.maxBytes and nbytes > self.realizations.maxBytes:
+            return None
+        cdef ID2D1BitmapRenderTarget *bitmapTarget
+        res = (<ID2D1RenderTarget*>self.ptr).CreateCompatibleRenderTarget(&size, NULL, NULL, 0, &bitmapTarget)
+        if FAILED(res):
+            raise Direct2DError(res)
+        cdef ID2D1RenderTarget *rt = <ID2D1RenderTarget*>bitmapTarget
+        cdef D2D1_COLOR_F transparent
+        transparent.r = transparent.g = transparent.b = transparent.a = 0
+        cdef D2D1_MATRIX_3X2_F m
+        setMatrix(&m, scaleX, 0, 0, scaleY, 1 - bounds.left * scaleX, 1 - bounds.top * scaleY)
+        cdef ID2D1Bitmap *bitmap
+        rt.BeginDraw()
+        rt.Clear(&transparent)
+        rt.SetTransform(&m)
+        if op == OP_DRAW_GEOMETRY:
+            rt.DrawGeometry(geo, br, strokeWidth, sstyle)
+        else:
+            rt.FillGeometry(geo, br, NULL)
+        res = rt.EndDraw(NULL, NULL)
+        if SUCCEEDED(res):
+            res = bitmapTarget.GetBitmap(&bitmap)
+        (<IUnknown*>bitmapTarget).Release()
+        if FAILED(res):
+            raise Direct2DError(res)
+        cdef GeometryRealization realization = GeometryRealization.__new__(GeometryRealization)
+        realization.ptr = <void*>bitmap
+        realization.rect.left = bounds.left - 1 / scaleX
+        realization.rect.top = bounds.top - 1 / scaleY
+        realization.rect.right = realization.rect.left + size.width / scaleX
+        realization.rect.bottom = realization.rect.top + size.height / scaleY
+        realization.scaleX = scaleX
+        realization.scaleY = scaleY
+        realization.nbytes = nbytes
+        return realization
+
+    cdef bint drawRealized(
+            self,
+            DrawOp op,
+            Geometry geometry,
+            Brush brush,
+            float strokeWidth,
+            StrokeStyle strokeStyle) except -1:
+        # Draws geometry as a cached bitmap, rendering the bitmap first if
+        # needed. Returns False if the geometry has to be drawn directly.
+        cdef ID2D1RenderTarget *rt = <ID2D1RenderTarget*>self.ptr
+        cdef D2D1_MATRIX_3X2_F m
+        rt.GetTransform(&m)
+        # Bitmaps are only reused under transforms that scale and translate.
+        if m.m12 != 0 or m.m21 != 0 or m.m11 <= 0 or m.m22 <= 0:
+            return False
+        cdef tuple key = (op, geometry, brush, brush.version, strokeStyle, strokeWidth)
+        cdef GeometryRealization realization = self.realizations.lookupScaled(key, m.m11, m.m22)
+        if realization is None:
+            realization = self.realize(op, geometry, brush, strokeWidth, strokeStyle, m.m11, m.m22)
+            if realization is None:
+                return False
+            self.realizations.store(key, realization, realization.nbytes)
+        # The bitmap was rendered at one sub-pixel offset, so it is moved onto
+        # whole device pixels rather than resampled, which would blur it
+        # under a fractional translation.
+        cdef D2D1_RECT_F dest = realization.rect
+        cdef FLOAT dpiX, dpiY
+        rt.GetDpi(&dpiX, &dpiY)
+        cdef double x = (dest.left * m.m11 + m.dx) * dpiX / 96
+        cdef double y = (dest.top * m.m22 + m.dy) * dpiY / 96
+        cdef float shiftX = <float>((floor(x + 0.5) - x) * 96 / dpiX / m.m11)
+        cdef float shiftY = <float>((floor(y + 0.5) - y) * 96 / dpiY / m.m22)
+        dest.left += shiftX
+        dest.right += shiftX
+        dest.top += shiftY
+        dest.bottom += shiftY
+        rt.DrawBitmap(
+            <ID2D1Bitmap*>realization.ptr,
+            dest,
+            1.0,
+            <D2D1_BITMAP_INTERPOLATION_MODE>1,
+            NULL)
+        return True
+
+    cdef int pushClip(self, D2D1_RECT_F clip, bint layer) except -1:
+        # Pushes clip, in DIPs of the target, onto the clip mirror.
+        cdef Py_ssize_t capacity
+        cdef ClipEntry *stack
+        cdef const D2D1_RECT_F *outer
+        if self.clipDepth == self.clipCapacity:
+            capacity = self.clipCapacity * 2 if self.clipCapacity else 16
+            stack = <ClipEntry*>PyMem_Realloc(self.clipStack, capacity * sizeof(ClipEntry))
+            if stack == NULL:
+                raise MemoryError
+            self.clipStack = stack
+            self.clipCapacity = capacity
+        clip.left -= clipMargin
+        clip.top -= clipMargin
+        clip.right += clipMargin
+        clip.bottom += clipMargin
+        if self.clipDepth:
+            outer = &self.clipStack[self.clipDepth - 1].clip
+            clip.left = max(clip.left, outer.left)
+            clip.top = max(clip.top, outer.top)
+            clip.right = min(clip.right, outer.right)
+            clip.bottom = min(clip.bottom, outer.bottom)
+        self.clipStack[self.clipDepth].clip = clip
+        self.clipStack[self.clipDepth].layer = layer
+        self.clipDepth += 1
+        return 0
+
+    cdef bint culled(self, const D2D1_RECT_F *bounds) noexcept:
+        # Whether bounds, in DIPs of the target, are outside the clip.
+        if outsideClip(&self.clipStack[self.clipDepth - 1].clip, bounds):
+            if self.frameRecorder != NULL:
+                self.frameRecorder.culled += 1
+            return True
+        return False
+
+    cdef bint shapeClipped(self, DrawOp op, const float *v, float width) noexcept:
+        # Whether a shape drawn with the current transform is entirely
+        # outside the clip, so that drawing it can be skipped.
+        cdef D2D1_MATRIX_3X2_F m
+        cdef D2D1_RECT_F bounds
+        if self.clipDepth == 0:
+            return False
+        (<ID2D1RenderTarget*>self.ptr).GetTransform(&m)
+        shapeBounds(op, v, width, &bounds)
+        transformBounds(&m, &bounds, &bounds)
+        return self.culled(&bounds)
+
+    cdef bint geometryClipped(
+            self,
+            ID2D1Geometry *geometry,
+            bint stroke,
+            float width,
+            ID2D1StrokeStyle *strokeStyle) noexcept:
+        cdef D2D1_MATRIX_3X2_F m
+        cdef D2D1_RECT_F bounds
+        cdef HRESULT res
+        if self.clipDepth == 0:
+            return False
+        (<ID2D1RenderTarget*>self.ptr).GetTransform(&m)
+        if stroke:
+            res = geometry.GetWidenedBounds(width, strokeStyle, &m, 0.25, &bounds)
+        else:
+            res = geometry.GetBounds(&m, &bounds)
+        return not FAILED(res) and self.culled(&bounds)
+
+    cdef bint commandClipped(self, DrawCommand *cmd) noexcept:
+        # Text is only culled when it is clipped to its layout rectangle,
+        # and text layouts are never culled, since text can overflow.
+        if self.clipDepth == 0:
+            return False
+        if cmd.op == OP_FILL_GEOMETRY:
+            return self.geometryClipped(<ID2D1Geometry*>resourcePtr(cmd.resource0), False, 0, NULL)
+        if cmd.op == OP_DRAW_GEOMETRY:
+            return self.geometryClipped(
+                <ID2D1Geometry*>resourcePtr(cmd.resource0),
+                True,
+                cmd.width,
+                <ID2D1StrokeStyle*>resourcePtr(cmd.resource2))
+        if cmd.op == OP_DRAW_TEXT:
+            return cmd.option0 & DRAW_TEXT_OPTIONS_CLIP and self.shapeClipped(cmd.op, cmd.v, 0)
+        if (cmd.op == OP_CLEAR or cmd.op == OP_DRAW_TEXT_LAYOUT or cmd.op == OP_SET_ANTIALIAS_MODE
+                or cmd.op == OP_SET_TRANSFORM):
+            return False
+        return self.shapeClipped(cmd.op, cmd.v, cmd.width)
+
+    cdef drawBatch(
+            self,
+            BatchKind kind,
+            object items,
+            object brush,
+            object brushIndices,
+            float strokeWidth,
+            StrokeStyle strokeStyle):
+        cdef Py_buffer itemView
+        cdef Py_buffer indexView
+        cdef Py_ssize_t count, nbrushes, i
+        cdef ID2D1Brush **brushTable
+        cdef ID2D1Brush *br
+        cdef const uint32_t *indices = NULL
+        cdef const float *values
+        cdef const float *v
+        cdef D2D1_RECT_F rect, bounds
+        cdef D2D1_ELLIPSE el
+        cdef D2D1_POINT_2F point0, point1
+        cdef D2D1_MATRIX_3X2_F m
+        cdef const D2D1_RECT_F *clip = NULL
+        cdef DrawOp op = batchDrawOp(kind)
+        cdef Py_ssize_t culled = 0
+        cdef ID2D1StrokeStyle *sstyle = NULL
+        if strokeStyle is not None:
+            sstyle = <ID2D1StrokeStyle*>strokeStyle.ptr
+        brushes = (brush,) if isinstance(brush, Brush) else tuple(brush)
+        nbrushes = len(brushes)
+        if nbrushes == 0:
+            raise ValueError("at least one brush is required")
+        if nbrushes > 1 and brushIndices is None:
+            raise ValueError("brushIndices is required when several brushes are given")
+        brushTable = <ID2D1Brush**>PyMem_Malloc(nbrushes * sizeof(ID2D1Brush*))
+        if brushTable == NULL:
+            raise MemoryError
+        try:
+            for i in range(nbrushes):
+                brushTable[i] = <ID2D1Brush*>devicePtr(<Brush?>brushes[i])
+            count = getFloatRows(items, &itemView, 4, "items")
+            if self.clipDepth:
+                (<ID2D1RenderTarget*>self.ptr).GetTransform(&m)
+                clip = &self.clipStack[self.clipDepth - 1].clip
+            try:
+                if brushIndices is not None:
+                    getIndices(brushIndices, &indexView, count, nbrushes)
+                    indices = <const uint32_t*>indexView.buf
+                try:
+                    values = <const float*>itemView.buf
+                    br = brushTable[0]
+                    for i in range(count):
+                        v = values + 4 * i
+                        if clip != NULL:
+                            shapeBounds(op, v, strokeWidth, &bounds)
+                            transformBounds(&m, &bounds, &bounds)
+                            if outsideClip(clip, &bounds):
+                                culled += 1
+                                continue
+                        if indices != NULL:
+                            br = brushTable[indices[i]]
+                        if kind == BATCH_FILL_RECTANGLE or kind == BATCH_DRAW_RECTANGLE:
+                            rect.left = v[0]
+                            rect.top = v[1]
+                            rect.right = v[2]
+                            rect.bottom = v[3]
+                            if kind == BATCH_FILL_RECTANGLE:
+                                (<ID2D1RenderTarget*>self.ptr).FillRectangle(&rect, br)
+                            else:
+                                (<ID2D1RenderTarget*>self.ptr).DrawRectangle(&rect, br, strokeWidth, sstyle)
+                        elif kind == BATCH_DRAW_LINE:
+                            point0.x = v[0]
+                            point0.y = v[1]
+                            point1.x = v[2]
+                            point1.y = v[3]
+                            (<ID2D1RenderTarget*>self.ptr).DrawLine(point0, point1, br, strokeWidth, sstyle)
+                        else:
+                            el.point.x = v[0]
+                            el.point.y = v[1]
+                            el.radiusX = v[2]
+                            el.radiusY = v[3]
+                            if kind == BATCH_FILL_ELLIPSE:
+                                (<ID2D1RenderTarget*>self.ptr).FillEllipse(&el, br)
+                            else:
+                                (<ID2D1RenderTarget*>self.ptr).DrawEllipse(&el, br, strokeWidth, sstyle)
+                finally:
+                    if indices != NULL:
+                        PyBuffer_Release(&indexView)
+            finally:
+                PyBuffer_Release(&itemView)
+            countDraws(self.frameRecorder, op, count - culled)
+            if self.frameRecorder != NULL:
+                self.frameRecorder.culled += culled
+        finally:
+            PyMem_Free(brushTable)
+
+    def BeginDraw(self):
+        if self.recovery is not None and self.recovery.lost:
+            self.restoreTarget()
+        cdef FrameRecorder *rec = self.frameRecorder
+        if rec != NULL:
+            memset(rec.draws, 0, sizeof(rec.draws))
+            rec.culled = 0
+            rec.baseline = objectTotals
+            rec.inFrame = True
+            rec.beginTicks = performanceCounter()
+        # Direct2D fails EndDraw if a clip or layer is left pushed, so a new
+        # frame always starts with none.
+        self.clipDepth = 0
+        self.layerDepth = 0
+        (<ID2D1RenderTarget*>self.ptr).BeginDraw()
+
+    def Clear(self, r, g=None, b=None, float a=1.0):
+        cdef D2D1_COLOR_F color
+        readColor(r, g, b, a, &color)
+        countDraws(self.frameRecorder, OP_CLEAR, 1)
+        (<ID2D1RenderTarget*>self.ptr).Clear(&color)
+
+    def ClearBrushPool(self):
+        self.brushPool.clear()
+
+    def CreateBitmap(
+            self,
+            UINT32 width,
+            UINT32 height,
+            buffer=None,
+            Py_ssize_t pitch=0,
+            int pixelFormat=87,
+            int alphaMode=1,
+            float dpiX=96.0,
+            float dpiY=96.0):
+        cdef Bitmap obj = self.createBitmap(width, height, buffer, pitch, pixelFormat, alphaMode, dpiX, dpiY)
+        if self.recovery is not None:
+            # The bitmap is recreated from a copy of its pixels, which
+            # CopyFromMemory keeps up to date, so the caller's buffer is
+            # neither kept alive nor read again.
+            pixels = None if buffer is None else bytearray(memoryview(buffer).cast("B"))
+            self.track(obj, RECIPE_BITMAP, (width, height, pixels, pitch, pixelFormat, alphaMode, dpiX, dpiY))
+        return obj
+
+    def CreateLayer(self):
+        cdef Layer obj = self.createLayer()
+        if self.recovery is not None:
+            self.track(obj, RECIPE_LAYER, ())
+        return obj
+
+    def CreateSolidColorBrush(self, r, g=None, b=None, float a=1.0, float opacity=1.0):
+        cdef D2D1_COLOR_F color
+        if readColor(r, g, b, a, &color) and g is not None:
+            opacity = g
+        cdef SolidColorBrush obj = self.createSolidColorBrush(color.r, color.g, color.b, color.a, opacity)
+        if self.recovery is not None:
+            self.track(obj, RECIPE_SOLID_COLOR_BRUSH, (color.r, color.g, color.b, color.a, opacity))
+        return obj
+
+    def DisableDamageTracking(self):
+        freeDamageTracker(self.damage)
+        self.damage = NULL
+
+    def DisableFrameStats(self):
+        freeFrameRecorder(self.frameRecorder)
+        self.frameRecorder = NULL
+
+    def DisableGeometryRealizationCache(self):
+        self.realizations = None
+
+    def DrawBitmap(
+            self,
+            Bitmap bitmap,
+            l,
+            t=None,
+            r=None,
+            b=None,
+            float opacity=1.0,
+            interpolationMode=1,
+            srcRect=None):
+        cdef D2D1_RECT_F dest, src
+        if readRect(l, t, r, b, &dest):
+            if t is not None:
+                opacity = t
+            if r is not None:
+                interpolationMode = r
+            if b is not None:
+                srcRect = b
+        if self.shapeClipped(OP_DRAW_BITMAP, <const float*>&dest, 0):
+            return
+        cdef D2D1_RECT_F *srcRectPtr = NULL
+        if readSourceRect(srcRect, &src):
+            srcRectPtr = &src
+        countDraws(self.frameRecorder, OP_DRAW_BITMAP, 1)
+        (<ID2D1RenderTarget*>self.ptr).DrawBitmap(
+            <ID2D1Bitmap*>devicePtr(bitmap),
+            dest,
+            opacity,
+            <D2D1_BITMAP_INTERPOLATION_MODE>interpolationMode,
+            srcRectPtr)
+
+    def DrawDamaged(self, draw):
+        if self.damage == NULL:
+            raise ValueError("damage tracking is not enabled")
+        rects = self.GetDamageRects()
+        if not rects:
+            return False
+        cdef D2D1_MATRIX_3X2_F identity, saved
+        setMatrix(&identity, 1, 0, 0, 1, 0, 0)
+        # Rectangles invalidated while drawing are kept for the next frame.
+        self.damage.count = 0
+        self.damage.full = False
+        try:
+            self.BeginDraw()
+            try:
+                # The rectangles are in target coordinates, so the clip is
+                # pushed without the transform left over from earlier frames,
+                # and draw is called with that transform restored.
+                (<ID2D1RenderTarget*>self.ptr).GetTransform(&saved)
+                for rect in rects:
+                    # Aliased, because the rectangles are snapped to pixels.
+                    # Drawing calls outside the rectangle are culled.
+                    (<ID2D1RenderTarget*>self.ptr).SetTransform(&identity)
+                    self.PushAxisAlignedClip(rect, 1)
+                    (<ID2D1RenderTarget*>self.ptr).SetTransform(&saved)
+                    try:
+                        draw(self, rect)
+                    finally:
+                        self.PopAxisAlignedClip()
+            finally:
+                self.EndDraw()
+        except BaseException:
+            if self.damage != NULL:
+                for rect in rects:
+                    addDamage(self.damage, (<RectF>rect).value)
+            raise
+        return True
+
+    def DrawEllipse(
+            self,
+            cx,
+            cy=None,
+            rx=None,
+            ry=None,
+            brush=None,
             float strokeWidth=1.0,
             StrokeStyle strokeStyle=None):
         cdef D2D1_ELLIPSE el
-        el.point.x = cx
-        el.point.y = cy
-        el.radiusX = rx
-        el.radiusY = ry
+        if readEllipse(cx, cy, rx, ry, &el):
+            if cy is not None:
+                brush = cy
+            if rx is not None:
+                strokeWidth = rx
+            if ry is not None:
+                strokeStyle = ry
         cdef ID2D1StrokeStyle *sstyle
         if strokeStyle is None:
             sstyle = NULL
         else:
             sstyle = <ID2D1StrokeStyle*>strokeStyle.ptr
-        (<ID2D1RenderTarget*>self.ptr).DrawEllipse(&el, <ID2D1Brush*>brush.ptr, strokeWidth, sstyle)
+        if self.shapeClipped(OP_DRAW_ELLIPSE, <const float*>&el, strokeWidth):
+            return
+        countDraws(self.frameRecorder, OP_DRAW_ELLIPSE, 1)
+        (<ID2D1RenderTarget*>self.ptr).DrawEllipse(&el, <ID2D1Brush*>devicePtr(<Brush?>brush), strokeWidth, sstyle)
+
+    def DrawEllipses(
+            self,
+            ellipses,
+            brush,
+            float strokeWidth=1.0,
+            StrokeStyle strokeStyle=None,
+            brushIndices=None):
+        self.drawBatch(BATCH_DRAW_ELLIPSE, ellipses, brush, brushIndices, strokeWidth, strokeStyle)
+
+    async def DrawFrameAsync(self, draw):
+        self.BeginDraw()
+        try:
+            result = draw(self)
+        finally:
+            await self.EndDrawAsync()
+        return result
 
     def DrawGeometry(self, Geometry geometry, Brush brush, float strokeWidth=1.0, StrokeStyle strokeStyle=None):
         cdef ID2D1StrokeStyle *sstyle
@@ -549,170 +2779,1772 @@ cdef class RenderTarget(Resource):
             sstyle = NULL
         else:
             sstyle = <ID2D1StrokeStyle*>strokeStyle.ptr
+        if self.geometryClipped(<ID2D1Geometry*>geometry.ptr, True, strokeWidth, sstyle):
+            return
+        countDraws(self.frameRecorder, OP_DRAW_GEOMETRY, 1)
+        if self.realizations is not None and self.drawRealized(
+                OP_DRAW_GEOMETRY, geometry, brush, strokeWidth, strokeStyle):
+            return
         (<ID2D1RenderTarget*>self.ptr).DrawGeometry(
             <ID2D1Geometry*>geometry.ptr,
-            <ID2D1Brush*>brush.ptr,
+            <ID2D1Brush*>devicePtr(brush),
             strokeWidth,
             sstyle)
 
     def DrawLine(
             self,
-            float x1,
-            float y1,
-            float x2,
-            float y2,
-            Brush brush,
+            x1,
+            y1,
+            x2=None,
+            y2=None,
+            brush=None,
             float strokeWidth=1.0,
             StrokeStyle strokeStyle=None):
-        cdef D2D1_POINT_2F point0
-        point0.x = x1
-        point0.y = y1
-        cdef D2D1_POINT_2F point1
-        point1.x = x2
-        point1.y = y2
+        cdef D2D1_POINT_2F point0, point1
+        if not PyFloat_CheckExact(x1) and isinstance(x1, Point2F):
+            point0 = (<Point2F>x1).value
+            point1 = (<Point2F?>y1).value
+            if x2 is not None:
+                if brush is not None:
+                    strokeStyle = brush
+                brush = x2
+            if y2 is not None:
+                strokeWidth = y2
+        else:
+            point0.x = x1
+            point0.y = y1
+            readPoint(x2, y2, &point1)
         cdef ID2D1StrokeStyle *sstyle
         if strokeStyle is None:
             sstyle = NULL
         else:
             sstyle = <ID2D1StrokeStyle*>strokeStyle.ptr
-        (<ID2D1RenderTarget*>self.ptr).DrawLine(point0, point1, <ID2D1Brush*>brush.ptr, strokeWidth, sstyle)
+        cdef D2D1_POINT_2F line[2]
+        line[0] = point0
+        line[1] = point1
+        if self.shapeClipped(OP_DRAW_LINE, <const float*>line, strokeWidth):
+            return
+        countDraws(self.frameRecorder, OP_DRAW_LINE, 1)
+        (<ID2D1RenderTarget*>self.ptr).DrawLine(point0, point1, <ID2D1Brush*>devicePtr(<Brush?>brush), strokeWidth, sstyle)
+
+    def DrawLines(
+            self,
+            segments,
+            brush,
+            float strokeWidth=1.0,
+            StrokeStyle strokeStyle=None,
+            brushIndices=None):
+        self.drawBatch(BATCH_DRAW_LINE, segments, brush, brushIndices, strokeWidth, strokeStyle)
 
     def DrawRectangle(
             self,
-            float l,
-            float t,
-            float r,
-            float b,
-            Brush brush,
+            l,
+            t=None,
+            r=None,
+            b=None,
+            brush=None,
             float strokeWidth=1.0,
             StrokeStyle strokeStyle=None):
         cdef D2D1_RECT_F rect
-        rect.left = l
-        rect.top = t
-        rect.right = r
-        rect.bottom = b
+        if readRect(l, t, r, b, &rect):
+            if t is not None:
+                brush = t
+            if r is not None:
+                strokeWidth = r
+            if b is not None:
+                strokeStyle = b
         cdef ID2D1StrokeStyle *sstyle
         if strokeStyle is None:
             sstyle = NULL
         else:
             sstyle = <ID2D1StrokeStyle*>strokeStyle.ptr
-        (<ID2D1RenderTarget*>self.ptr).DrawRectangle(&rect, <ID2D1Brush*>brush.ptr, strokeWidth, sstyle)
+        if self.shapeClipped(OP_DRAW_RECTANGLE, <const float*>&rect, strokeWidth):
+            return
+        countDraws(self.frameRecorder, OP_DRAW_RECTANGLE, 1)
+        (<ID2D1RenderTarget*>self.ptr).DrawRectangle(&rect, <ID2D1Brush*>devicePtr(<Brush?>brush), strokeWidth, sstyle)
+
+    def DrawRectangles(
+            self,
+            rects,
+            brush,
+            float strokeWidth=1.0,
+            StrokeStyle strokeStyle=None,
+            brushIndices=None):
+        self.drawBatch(BATCH_DRAW_RECTANGLE, rects, brush, brushIndices, strokeWidth, strokeStyle)
+
+    def DrawScene(self, Scene scene, rect=None):
+        cdef ID2D1RenderTarget *rt = <ID2D1RenderTarget*>self.ptr
+        cdef D2D1_RECT_F view
+        cdef D2D1_MATRIX_3X2_F mat, inverse
+        cdef D2D1_SIZE_F size
+        cdef D2D1_POINT_2F corner
+        cdef FrameRecorder *rec = self.frameRecorder
+        cdef DrawCommand *cmd
+        cdef Py_ssize_t i, count, drawn
+        cdef int k
+        if not readSourceRect(rect, &view):
+            # Cull to the part of the scene that the current transform
+            # maps onto the target.
+            size = rt.GetSize()
+            rt.GetTransform(&mat)
+            if not invertMatrix(&mat, &inverse):
+                return 0
+            view.left = view.top = float("inf")
+            view.right = view.bottom = float("-inf")
+            for k in range(4):
+                corner.x = size.width if k & 1 else 0
+                corner.y = size.height if k & 2 else 0
+                corner = transformPoint(&inverse, corner)
+                view.left = min(view.left, corner.x)
+                view.top = min(view.top, corner.y)
+                view.right = max(view.right, corner.x)
+                view.bottom = max(view.bottom, corner.y)
+        count = scene.query(&view)
+        drawn = 0
+        for i in range(count):
+            cmd = &scene.commands[scene.results[i]]
+            if self.commandClipped(cmd):
+                continue
+            if rec != NULL:
+                rec.draws[<int>cmd.op] += 1
+            executeCommand(rt, cmd)
+            drawn += 1
+        return drawn
 
     def DrawText(
             self,
-            str text,
+            text,
             TextFormat textFormat,
-            float l,
-            float t,
-            float r,
-            float b,
-            Brush brush,
+            l,
+            t=None,
+            r=None,
+            b=None,
+            brush=None,
             int options=0,
             int measuringMode=0):
         cdef D2D1_RECT_F rect
-        rect.left = l
-        rect.top = t
-        rect.right = r
-        rect.bottom = b
+        if readRect(l, t, r, b, &rect):
+            if t is not None:
+                brush = t
+            if r is not None:
+                options = r
+            if b is not None:
+                measuringMode = b
+        cdef ID2D1Brush *br = <ID2D1Brush*>devicePtr(<Brush?>brush)
+        if options & DRAW_TEXT_OPTIONS_CLIP and self.shapeClipped(OP_DRAW_TEXT, <const float*>&rect, 0):
+            return
         cdef wchar_t *textBuf
         cdef Py_ssize_t _textLength
-        textBuf = PyUnicode_AsWideCharString(text, &_textLength)
+        cdef bint owned
+        textBuf = wideText(text, &_textLength, &owned)
         cdef UINT textLength
         textLength = <UINT>_textLength
-        if textBuf == NULL:
-            raise MemoryError
+        countDraws(self.frameRecorder, OP_DRAW_TEXT, 1)
         (<ID2D1RenderTarget*>self.ptr).DrawTextW(
             textBuf,
             <UINT>textLength,
             <IDWriteTextFormat*>textFormat.ptr,
             rect,
-            <ID2D1Brush*>brush.ptr,
+            br,
             <D2D1_DRAW_TEXT_OPTIONS>options,
             <DWRITE_MEASURING_MODE>measuringMode)
-        PyMem_Free(<void*>textBuf)
+        if owned:
+            PyMem_Free(<void*>textBuf)
 
-    def DrawTextLayout(self, float x, float y, TextLayout textLayout, Brush brush, int options=0):
+    def DrawTextLayout(self, x, y=None, textLayout=None, brush=None, int options=0):
         cdef D2D1_POINT_2F pt
-        pt.x = x
-        pt.y = y
+        if readPoint(x, y, &pt) and y is not None:
+            if brush is not None:
+                options = brush
+            brush = textLayout
+            textLayout = y
+        countDraws(self.frameRecorder, OP_DRAW_TEXT_LAYOUT, 1)
         (<ID2D1RenderTarget*>self.ptr).DrawTextLayout(
             pt,
-            <IDWriteTextLayout*>textLayout.ptr,
-            <ID2D1Brush*>brush.ptr,
+            <IDWriteTextLayout*>(<TextLayout?>textLayout).ptr,
+            <ID2D1Brush*>devicePtr(<Brush?>brush),
             <D2D1_DRAW_TEXT_OPTIONS>options)
 
+    def EnableDamageTracking(self, Py_ssize_t maxRects=8):
+        if maxRects < 1:
+            raise ValueError("maxRects must be positive")
+        cdef DamageTracker *dt = <DamageTracker*>PyMem_Malloc(sizeof(DamageTracker))
+        if dt == NULL:
+            raise MemoryError
+        dt.rects = <D2D1_RECT_F*>PyMem_Malloc((maxRects + 1) * sizeof(D2D1_RECT_F))
+        if dt.rects == NULL:
+            PyMem_Free(dt)
+            raise MemoryError
+        dt.count = 0
+        dt.maxRects = maxRects
+        # Nothing has been drawn yet, so the first frame redraws everything.
+        dt.full = True
+        freeDamageTracker(self.damage)
+        self.damage = dt
+
+    def EnableFrameStats(self, Py_ssize_t historySize=120):
+        if historySize < 1:
+            raise ValueError("historySize must be positive")
+        cdef FrameRecorder *rec = <FrameRecorder*>PyMem_Malloc(sizeof(FrameRecorder))
+        if rec == NULL:
+            raise MemoryError
+        memset(rec, 0, sizeof(FrameRecorder))
+        rec.history = <double*>PyMem_Malloc(historySize * sizeof(double))
+        if rec.history == NULL:
+            PyMem_Free(rec)
+            raise MemoryError
+        rec.historySize = historySize
+        cdef LARGE_INTEGER frequency
+        QueryPerformanceFrequency(&frequency)
+        rec.tickSeconds = 1.0 / <double>frequency.QuadPart
+        freeFrameRecorder(self.frameRecorder)
+        self.frameRecorder = rec
+
+    def EnableGeometryRealizationCache(
+            self,
+            Py_ssize_t maxEntries=256,
+            Py_ssize_t maxBytes=64 * 1024 * 1024,
+            float scaleTolerance=0.25):
+        self.realizations = GeometryRealizationCache(maxEntries, maxBytes, scaleTolerance)
+        return self.realizations
+
     def EndDraw(self):
-        res = (<ID2D1RenderTarget*>self.ptr).EndDraw(NULL, NULL)
+        cdef HRESULT res
+        cdef FrameRecorder *rec = self.frameRecorder
+        cdef long long start = 0
+        cdef long long end
+        if rec != NULL:
+            start = performanceCounter()
+        with nogil:
+            res = (<ID2D1RenderTarget*>self.ptr).EndDraw(NULL, NULL)
+        if rec != NULL and rec.inFrame:
+            end = performanceCounter()
+            rec.inFrame = False
+            memcpy(rec.lastDraws, rec.draws, sizeof(rec.draws))
+            rec.lastCulled = rec.culled
+            rec.lastCreated.charactersConverted = objectTotals.charactersConverted - rec.baseline.charactersConverted
+            rec.lastCreated.brushes = objectTotals.brushes - rec.baseline.brushes
+            rec.lastCreated.geometries = objectTotals.geometries - rec.baseline.geometries
+            rec.lastCreated.textLayouts = objectTotals.textLayouts - rec.baseline.textLayouts
+            rec.lastEndDrawTime = (end - start) * rec.tickSeconds
+            rec.lastFrameTime = (end - rec.beginTicks) * rec.tickSeconds
+            rec.frames += 1
+            rec.history[rec.historyPos] = rec.lastFrameTime
+            rec.historyPos = (rec.historyPos + 1) % rec.historySize
+            if rec.historyCount < rec.historySize:
+                rec.historyCount += 1
         if FAILED(res):
+            if res == D2DERR_RECREATE_TARGET and self.recovery is not None:
+                self.deviceLost()
+                return False
             raise Direct2DError(res)
+        return True
 
-    def FillEllipse(self, float cx, float cy, float rx, float ry, Brush brush):
+    async def EndDrawAsync(self):
+        return await runBlocking(self.EndDraw, ())
+
+    def FillEllipse(self, cx, cy=None, rx=None, ry=None, brush=None):
         cdef D2D1_ELLIPSE el
-        el.point.x = cx
-        el.point.y = cy
-        el.radiusX = rx
-        el.radiusY = ry
-        (<ID2D1RenderTarget*>self.ptr).FillEllipse(&el, <ID2D1Brush*>brush.ptr)
+        if readEllipse(cx, cy, rx, ry, &el) and cy is not None:
+            brush = cy
+        cdef ID2D1Brush *br = <ID2D1Brush*>devicePtr(<Brush?>brush)
+        if self.shapeClipped(OP_FILL_ELLIPSE, <const float*>&el, 0):
+            return
+        countDraws(self.frameRecorder, OP_FILL_ELLIPSE, 1)
+        (<ID2D1RenderTarget*>self.ptr).FillEllipse(&el, br)
+
+    def FillEllipses(self, ellipses, brush, brushIndices=None):
+        self.drawBatch(BATCH_FILL_ELLIPSE, ellipses, brush, brushIndices, 1.0, None)
 
     def FillGeometry(self, Geometry geometry, Brush brush):
-        (<ID2D1RenderTarget*>self.ptr).FillGeometry(<ID2D1Geometry*>geometry.ptr, <ID2D1Brush*>brush.ptr, NULL)
+        if self.geometryClipped(<ID2D1Geometry*>geometry.ptr, False, 0, NULL):
+            return
+        countDraws(self.frameRecorder, OP_FILL_GEOMETRY, 1)
+        if self.realizations is not None and self.drawRealized(OP_FILL_GEOMETRY, geometry, brush, 0, None):
+            return
+        (<ID2D1RenderTarget*>self.ptr).FillGeometry(<ID2D1Geometry*>geometry.ptr, <ID2D1Brush*>devicePtr(brush), NULL)
 
-    def FillRectangle(self, float l, float t, float r, float b, Brush brush):
+    def FillRectangle(self, l, t=None, r=None, b=None, brush=None):
         cdef D2D1_RECT_F rect
-        rect.left = l
-        rect.top = t
-        rect.right = r
-        rect.bottom = b
-        (<ID2D1RenderTarget*>self.ptr).FillRectangle(&rect, <ID2D1Brush*>brush.ptr)
+        if readRect(l, t, r, b, &rect) and t is not None:
+            brush = t
+        cdef ID2D1Brush *br = <ID2D1Brush*>devicePtr(<Brush?>brush)
+        if self.shapeClipped(OP_FILL_RECTANGLE, <const float*>&rect, 0):
+            return
+        countDraws(self.frameRecorder, OP_FILL_RECTANGLE, 1)
+        (<ID2D1RenderTarget*>self.ptr).FillRectangle(&rect, br)
+
+    def FillRectangles(self, rects, brush, brushIndices=None):
+        self.drawBatch(BATCH_FILL_RECTANGLE, rects, brush, brushIndices, 1.0, None)
+
+    def GetDamageRects(self):
+        if self.damage == NULL:
+            raise ValueError("damage tracking is not enabled")
+        cdef RectF rect
+        if self.damage.full:
+            rect = RectF.__new__(RectF)
+            rect.value.right, rect.value.bottom = self.GetSize()
+            return [rect]
+        cdef list rects = []
+        for i in range(self.damage.count):
+            rect = RectF.__new__(RectF)
+            rect.value = self.damage.rects[i]
+            rects.append(rect)
+        return rects
+
+    def GetFrameStats(self):
+        if self.frameRecorder == NULL:
+            return None
+        return snapshotFrameStats(self.frameRecorder)
+
+    def GetGeometryRealizationCache(self):
+        return self.realizations
+
+    def GetSolidColorBrush(self, r, g=None, b=None, float a=1.0, float opacity=1.0):
+        cdef D2D1_COLOR_F color
+        if readColor(r, g, b, a, &color) and g is not None:
+            opacity = g
+        cdef uint64_t qr = quantizeColorComponent(color.r)
+        cdef uint64_t qg = quantizeColorComponent(color.g)
+        cdef uint64_t qb = quantizeColorComponent(color.b)
+        cdef uint64_t qa = quantizeColorComponent(color.a)
+        cdef uint64_t qo = quantizeColorComponent(opacity)
+        key = (qr << 32) | (qg << 24) | (qb << 16) | (qa << 8) | qo
+        cdef SolidColorBrush obj = self.brushPool.get(key)
+        if obj is not None and (obj.ptr != NULL or obj.lost):
+            self.brushPool.move_to_end(key)
+            return obj
+        obj = self.createSolidColorBrush(qr / 255.0, qg / 255.0, qb / 255.0, qa / 255.0, qo / 255.0)
+        if self.recovery is not None:
+            self.track(obj, RECIPE_SOLID_COLOR_BRUSH, (qr / 255.0, qg / 255.0, qb / 255.0, qa / 255.0, qo / 255.0))
+        obj.pooled = True
+        self.brushPool[key] = obj
+        while len(self.brushPool) > self.brushPoolLimit:
+            self.brushPool.popitem(last=False)
+        return obj
+
+    def GetSize(self):
+        cdef D2D1_SIZE_F size = (<ID2D1RenderTarget*>self.ptr).GetSize()
+        return size.width, size.height
 
     def GetTransform(self):
         cdef D2D1_MATRIX_3X2_F mat
         (<ID2D1RenderTarget*>self.ptr).GetTransform(&mat)
         return mat.m11, mat.m12, mat.m21, mat.m22, mat.dx, mat.dy
 
+    def Invalidate(self, l, t=None, r=None, b=None):
+        if self.damage == NULL:
+            raise ValueError("damage tracking is not enabled")
+        cdef D2D1_RECT_F rect
+        readRect(l, t, r, b, &rect)
+        addDamage(self.damage, rect)
+
+    def InvalidateAll(self):
+        if self.damage == NULL:
+            raise ValueError("damage tracking is not enabled")
+        self.damage.full = True
+        self.damage.count = 0
+
+    def PopAxisAlignedClip(self):
+        if self.clipDepth == 0 or self.clipStack[self.clipDepth - 1].layer:
+            raise ValueError("no axis-aligned clip to pop")
+        self.clipDepth -= 1
+        (<ID2D1RenderTarget*>self.ptr).PopAxisAlignedClip()
+
+    def PopLayer(self):
+        if self.clipDepth == 0 or not self.clipStack[self.clipDepth - 1].layer:
+            raise ValueError("no layer to pop")
+        self.clipDepth -= 1
+        self.layerDepth -= 1
+        (<ID2D1RenderTarget*>self.ptr).PopLayer()
+
+    def PopTransform(self):
+        if self.transformDepth == 0:
+            raise ValueError("transform stack is empty")
+        self.transformDepth -= 1
+        countDraws(self.frameRecorder, OP_SET_TRANSFORM, 1)
+        (<ID2D1RenderTarget*>self.ptr).SetTransform(&self.transformStack[self.transformDepth])
+
+    def PushAxisAlignedClip(self, l, t=None, r=None, b=None, int antialiasMode=0):
+        cdef D2D1_RECT_F rect, clip
+        cdef D2D1_MATRIX_3X2_F m
+        if readRect(l, t, r, b, &rect) and t is not None:
+            antialiasMode = t
+        cdef ID2D1RenderTarget *rt = <ID2D1RenderTarget*>self.ptr
+        # Direct2D clips to the bounds of the transformed rectangle.
+        rt.GetTransform(&m)
+        transformBounds(&m, &rect, &clip)
+        self.pushClip(clip, False)
+        rt.PushAxisAlignedClip(&rect, <D2D1_ANTIALIAS_MODE>antialiasMode)
+
+    def PushLayer(
+            self,
+            Layer layer=None,
+            Geometry geometricMask=None,
+            contentBounds=None,
+            float opacity=1.0,
+            int maskAntialiasMode=0,
+            Matrix3x2F maskTransform=None,
+            Brush opacityBrush=None,
+            int layerOptions=0):
+        cdef D2D1_LAYER_PARAMETERS params
+        cdef D2D1_MATRIX_3X2_F m, world
+        cdef D2D1_RECT_F clip, maskBounds
+        cdef ID2D1RenderTarget *rt = <ID2D1RenderTarget*>self.ptr
+        if layer is None:
+            while len(self.layerPool) <= self.layerDepth:
+                self.layerPool.append(self.createLayer())
+            layer = self.layerPool[self.layerDepth]
+        cdef ID2D1Layer *d2dLayer = <ID2D1Layer*>devicePtr(layer)
+        rt.GetTransform(&m)
+        clip.left = clip.top = float("-inf")
+        clip.right = clip.bottom = float("inf")
+        params.contentBounds = clip
+        if readSourceRect(contentBounds, &params.contentBounds):
+            transformBounds(&m, &params.contentBounds, &clip)
+        params.geometricMask = NULL
+        if maskTransform is None:
+            setMatrix(&params.maskTransform, 1, 0, 0, 1, 0, 0)
+        else:
+            params.maskTransform = maskTransform.value
+        if geometricMask is not None:
+            params.geometricMask = <ID2D1Geometry*>geometricMask.ptr
+            multiplyMatrix(&params.maskTransform, &m, &world)
+            if not FAILED(params.geometricMask.GetBounds(&world, &maskBounds)):
+                clip.left = max(clip.left, maskBounds.left)
+                clip.top = max(clip.top, maskBounds.top)
+                clip.right = min(clip.right, maskBounds.right)
+                clip.bottom = min(clip.bottom, maskBounds.bottom)
+        params.maskAntialiasMode = <D2D1_ANTIALIAS_MODE>maskAntialiasMode
+        params.opacity = opacity
+        params.opacityBrush = NULL
+        if opacityBrush is not None:
+            params.opacityBrush = <ID2D1Brush*>devicePtr(opacityBrush)
+        params.layerOptions = <D2D1_LAYER_OPTIONS>layerOptions
+        self.pushClip(clip, True)
+        self.layerDepth += 1
+        rt.PushLayer(&params, d2dLayer)
+
+    def PushTransform(self, Matrix3x2F transform not None):
+        cdef Py_ssize_t capacity
+        cdef D2D1_MATRIX_3X2_F *stack
+        if self.transformDepth == self.transformCapacity:
+            capacity = self.transformCapacity * 2 if self.transformCapacity else 16
+            stack = <D2D1_MATRIX_3X2_F*>PyMem_Realloc(self.transformStack, capacity * sizeof(D2D1_MATRIX_3X2_F))
+            if stack == NULL:
+                raise MemoryError
+            self.transformStack = stack
+            self.transformCapacity = capacity
+        cdef ID2D1RenderTarget *rt = <ID2D1RenderTarget*>self.ptr
+        cdef D2D1_MATRIX_3X2_F *saved = &self.transformStack[self.transformDepth]
+        cdef D2D1_MATRIX_3X2_F mat
+        rt.GetTransform(saved)
+        multiplyMatrix(&transform.value, saved, &mat)
+        self.transformDepth += 1
+        countDraws(self.frameRecorder, OP_SET_TRANSFORM, 1)
+        rt.SetTransform(&mat)
+
+    def Replay(self, DrawList drawList):
+        cdef ID2D1RenderTarget *rt = <ID2D1RenderTarget*>self.ptr
+        cdef DrawCommand *cmd
+        cdef Py_ssize_t i
+        cdef COMObject resource
+        cdef FrameRecorder *rec = self.frameRecorder
+        for resource in drawList.resources:
+            if resource.ptr == NULL and not restoreLost(resource):
+                raise ValueError("DrawList refers to a released object")
+        for i in range(drawList.count):
+            cmd = &drawList.commands[i]
+            if cmd.op == OP_NONE or self.commandClipped(cmd):
+                continue
+            if rec != NULL:
+                rec.draws[<int>cmd.op] += 1
+            executeCommand(rt, cmd)
+
     def SetAntialiasMode(self, int mode):
         (<ID2D1RenderTarget*>self.ptr).SetAntialiasMode(<D2D1_ANTIALIAS_MODE>mode)
 
-    def SetTransform(self, float m11=1, float m12=0, float m21=0, float m22=1, float dx=0, float dy=0):
+    def SetBrushPoolLimit(self, Py_ssize_t maxBrushes):
+        if maxBrushes < 0:
+            raise ValueError("maxBrushes must not be negative")
+        self.brushPoolLimit = maxBrushes
+        while len(self.brushPool) > self.brushPoolLimit:
+            self.brushPool.popitem(last=False)
+
+    def SetTransform(self, m11=1, float m12=0, float m21=0, float m22=1, float dx=0, float dy=0):
         cdef D2D1_MATRIX_3X2_F mat
-        mat.m11 = m11
-        mat.m12 = m12
-        mat.m21 = m21
-        mat.m22 = m22
-        mat.dx = dx
-        mat.dy = dy
+        if isinstance(m11, Matrix3x2F):
+            mat = (<Matrix3x2F>m11).value
+        else:
+            setMatrix(&mat, m11, m12, m21, m22, dx, dy)
+        countDraws(self.frameRecorder, OP_SET_TRANSFORM, 1)
         (<ID2D1RenderTarget*>self.ptr).SetTransform(&mat)
 
 
 cdef class HWNDRenderTarget(RenderTarget):
+    # How the target was created, for recreating it after a device loss.
+    cdef ID2D1Factory *factory
+    cdef D2D1_RENDER_TARGET_PROPERTIES properties
+    cdef D2D1_HWND_RENDER_TARGET_PROPERTIES hwndProperties
+
+    cpdef Release(self):
+        RenderTarget.Release(self)
+        if self.factory != NULL:
+            (<IUnknown*>self.factory).Release()
+            self.factory = NULL
+
+    cdef int recreateTarget(self) except -1:
+        cdef ID2D1HwndRenderTarget *target
+        cdef HRESULT res
+        with nogil:
+            res = self.factory.CreateHwndRenderTarget(&self.properties, &self.hwndProperties, &target)
+        if FAILED(res):
+            raise Direct2DError(res)
+        (<IUnknown*>self.ptr).Release()
+        self.ptr = <void*>target
+        return 0
+
+    def DisableDeviceRecovery(self):
+        self.recovery = None
+
+    def EnableDeviceRecovery(self):
+        import weakref
+        cdef DeviceRecovery recovery = DeviceRecovery.__new__(DeviceRecovery)
+        recovery.resources = weakref.WeakSet()
+        cdef LARGE_INTEGER frequency
+        QueryPerformanceFrequency(&frequency)
+        recovery.tickSeconds = 1.0 / <double>frequency.QuadPart
+        self.recovery = recovery
+        return recovery
+
+    def GetDeviceRecovery(self):
+        return self.recovery
+
     def Resize(self, int width, int height):
         cdef D2D1_SIZE_U size
         size.width = width
         size.height = height
-        res = (<ID2D1HwndRenderTarget*>self.ptr).Resize(&size)
+        # A lost target is recreated at the new size when it is next used.
+        self.hwndProperties.pixelSize = size
+        cdef HRESULT res
+        if self.recovery is None or not self.recovery.lost:
+            with nogil:
+                res = (<ID2D1HwndRenderTarget*>self.ptr).Resize(&size)
+            if FAILED(res):
+                raise Direct2DError(res)
+        if self.damage != NULL:
+            self.damage.full = True
+            self.damage.count = 0
+
+    async def ResizeAsync(self, int width, int height):
+        await runBlocking(self.Resize, (width, height))
+
+
+cdef class WICBitmapRenderTarget(RenderTarget):
+    cdef IWICBitmap *bitmap
+    cdef readonly UINT width
+    cdef readonly UINT height
+
+    cpdef Release(self):
+        RenderTarget.Release(self)
+        if self.bitmap != NULL:
+            (<IUnknown*>self.bitmap).Release()
+            self.bitmap = NULL
+
+    def ReadPixels(self):
+        if self.bitmap == NULL:
+            raise ValueError("render target has been released")
+        cdef IWICBitmapLock *lock
+        cdef UINT width, height, stride, size
+        cdef BYTE *data
+        cdef HRESULT res
+        with nogil:
+            # Locking for reading waits for Direct2D to flush its pending
+            # drawing into the bitmap; the lock then maps its memory.
+            res = self.bitmap.Lock(NULL, 1, &lock)
+            if SUCCEEDED(res):
+                res = lock.GetSize(&width, &height)
+                if SUCCEEDED(res):
+                    res = lock.GetStride(&stride)
+                if SUCCEEDED(res):
+                    res = lock.GetDataPointer(&size, &data)
+                if FAILED(res):
+                    (<IUnknown*>lock).Release()
+        if FAILED(res):
+            raise COMError(res)
+        cdef PixelBuffer pixels = PixelBuffer.__new__(PixelBuffer)
+        pixels.ptr = <void*>lock
+        pixels.target = self
+        pixels.data = data
+        pixels.width = width
+        pixels.height = height
+        pixels.stride = stride
+        if height > 0 and <Py_ssize_t>size < <Py_ssize_t>(height - 1) * stride + <Py_ssize_t>width * 4:
+            pixels.Release()
+            raise ValueError("locked bitmap memory is smaller than its size")
+        return pixels
+
+
+cdef class PixelBuffer(COMObject):
+    cdef object target
+    cdef BYTE *data
+    cdef readonly UINT width
+    cdef readonly UINT height
+    cdef readonly UINT stride
+    cdef Py_ssize_t exports
+    cdef Py_ssize_t shape[3]
+    cdef Py_ssize_t strides[3]
+
+    def __dealloc__(self):
+        # Release while target is still set; the base class
+        # calls Release again after the fields have been cleared.
+        self.Release()
+
+    cpdef Release(self):
+        if self.ptr == NULL:
+            return
+        if self.exports > 0:
+            raise BufferError("pixel buffer is still exported")
+        COMObject.Release(self)
+        self.data = NULL
+        self.target = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.Release()
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        if self.ptr == NULL:
+            raise ValueError("pixel buffer has been released")
+        if flags & PyBUF_WRITABLE:
+            raise BufferError("pixel buffer is read-only")
+        if (flags & PyBUF_F_CONTIGUOUS) == PyBUF_F_CONTIGUOUS:
+            raise BufferError("pixel buffer is not Fortran contiguous")
+        if self.stride != <Py_ssize_t>self.width * 4 and (
+                (flags & PyBUF_STRIDES) != PyBUF_STRIDES
+                or (flags & PyBUF_C_CONTIGUOUS) == PyBUF_C_CONTIGUOUS
+                or (flags & PyBUF_ANY_CONTIGUOUS) == PyBUF_ANY_CONTIGUOUS):
+            raise BufferError("pixel rows are padded, so the buffer is not contiguous")
+        self.shape[0] = self.height
+        self.shape[1] = self.width
+        self.shape[2] = 4
+        self.strides[0] = self.stride
+        self.strides[1] = 4
+        self.strides[2] = 1
+        buffer.buf = self.data
+        buffer.obj = self
+        buffer.len = <Py_ssize_t>self.height * self.width * 4
+        buffer.readonly = 1
+        buffer.itemsize = 1
+        buffer.format = NULL
+        if flags & PyBUF_FORMAT:
+            buffer.format = b"B"
+        if flags & PyBUF_ND:
+            buffer.ndim = 3
+            buffer.shape = self.shape
+        else:
+            buffer.ndim = 1
+            buffer.shape = NULL
+        buffer.strides = NULL
+        if (flags & PyBUF_STRIDES) == PyBUF_STRIDES:
+            buffer.strides = self.strides
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+        self.exports += 1
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        self.exports -= 1
+
+
+# The frame rate cap of a FrameScheduler drops to at most this fraction of
+# maxFrameRate when frames take too long.
+cdef int maxRateDivisor = 4
+# Times closer than this are treated as equal, so that sleeping for the time
+# returned by FrameScheduler.NextTick is never too short because of rounding.
+cdef double timeEpsilon = 1e-6
+
+
+cdef class FrameScheduler:
+    cdef readonly RenderTarget renderTarget
+    cdef object draw
+    cdef object update
+    cdef object clock
+    cdef readonly double timestep
+    cdef readonly double maxFrameRate
+    cdef readonly double frameRate
+    cdef readonly bint adaptive
+    cdef readonly Py_ssize_t maxUpdates
+    cdef readonly Py_ssize_t frames
+    cdef readonly Py_ssize_t skippedFrames
+    cdef readonly Py_ssize_t updates
+    cdef readonly Py_ssize_t droppedUpdates
+    cdef readonly double alpha
+    cdef readonly double frameCost
+    cdef bint dirty
+    cdef bint started
+    cdef double lastTime
+    cdef double lastFrameTime
+    cdef double nextFrameTime
+    cdef double accumulator
+    cdef int rateDivisor
+    cdef double tickSeconds
+    # Ring buffer of the times between recent frames.
+    cdef double *history
+    cdef Py_ssize_t historySize
+    cdef Py_ssize_t historyCount
+    cdef Py_ssize_t historyPos
+
+    def __init__(
+            self,
+            RenderTarget renderTarget not None,
+            draw,
+            update=None,
+            double timestep=1.0 / 60,
+            double maxFrameRate=0.0,
+            bint adaptive=True,
+            Py_ssize_t maxUpdates=5,
+            Py_ssize_t historySize=240,
+            clock=None):
+        if timestep <= 0:
+            raise ValueError("timestep must be positive")
+        if maxFrameRate < 0:
+            raise ValueError("maxFrameRate must not be negative")
+        if maxUpdates < 1 or historySize < 1:
+            raise ValueError("maxUpdates and historySize must be positive")
+        cdef double *history = <double*>PyMem_Malloc(historySize * sizeof(double))
+        if history == NULL:
+            raise MemoryError
+        PyMem_Free(self.history)
+        self.history = history
+        self.historySize = historySize
+        self.historyCount = 0
+        self.historyPos = 0
+        self.renderTarget = renderTarget
+        self.draw = draw
+        self.update = update
+        self.clock = clock
+        self.timestep = timestep
+        self.maxFrameRate = maxFrameRate
+        self.frameRate = maxFrameRate
+        self.adaptive = adaptive
+        self.maxUpdates = maxUpdates
+        self.rateDivisor = 1
+        self.alpha = 1.0
+        self.dirty = True
+        cdef LARGE_INTEGER frequency
+        QueryPerformanceFrequency(&frequency)
+        self.tickSeconds = 1.0 / <double>frequency.QuadPart
+
+    def __dealloc__(self):
+        PyMem_Free(self.history)
+
+    def __repr__(self):
+        return "<FrameScheduler frames=%d frameRate=%g>" % (self.frames, self.frameRate)
+
+    cdef double now(self) except? -1:
+        if self.clock is None:
+            return <double>performanceCounter() * self.tickSeconds
+        return self.clock()
+
+    cdef drawFrame(self, double start):
+        self.dirty = False
+        cdef double workEnd
+        self.renderTarget.BeginDraw()
+        try:
+            self.draw(self.renderTarget, self.alpha)
+        finally:
+            # The time spent in EndDraw is mostly spent waiting for vertical
+            # sync, so it is not part of the cost of the frame.
+            workEnd = self.now()
+            self.renderTarget.EndDraw()
+        cdef double cost = workEnd - start
+        if self.frames == 0:
+            self.frameCost = cost
+        else:
+            self.frameCost += (cost - self.frameCost) * 0.1
+            self.history[self.historyPos] = start - self.lastFrameTime
+            self.historyPos = (self.historyPos + 1) % self.historySize
+            if self.historyCount < self.historySize:
+                self.historyCount += 1
+        self.lastFrameTime = start
+        self.frames += 1
+        if self.maxFrameRate > 0:
+            self.pace(start)
+
+    cdef void pace(self, double start) noexcept:
+        # Frames that take too long are shown at a whole fraction of the
+        # maximum rate, so that they are evenly spaced instead of missing
+        # every other refresh at random.
+        cdef int divisor = self.rateDivisor
+        if self.adaptive:
+            if self.frameCost > 0.95 * divisor / self.maxFrameRate and divisor < maxRateDivisor:
+                divisor += 1
+            elif divisor > 1 and self.frameCost < 0.75 * (divisor - 1) / self.maxFrameRate:
+                divisor -= 1
+        self.rateDivisor = divisor
+        self.frameRate = self.maxFrameRate / divisor
+        cdef double interval = 1.0 / self.frameRate
+        self.nextFrameTime += interval
+        if self.nextFrameTime <= start:
+            self.nextFrameTime = start + interval
+
+    def DrawFrame(self):
+        self.drawFrame(self.now())
+
+    def GetFrameTimePercentiles(self, percentiles=(50, 90, 99)):
+        cdef list times = sorted([self.history[i] for i in range(self.historyCount)])
+        cdef Py_ssize_t n = len(times)
+        cdef list result = []
+        cdef double p
+        for p in percentiles:
+            if not 0 <= p <= 100:
+                raise ValueError("percentiles must be between 0 and 100")
+            if n == 0:
+                result.append(0.0)
+            else:
+                # Nearest-rank percentile.
+                result.append(times[max(<Py_ssize_t>ceil(p / 100 * n), 1) - 1])
+        return tuple(result)
+
+    def Invalidate(self):
+        self.dirty = True
+
+    def NextTick(self):
+        cdef double t = self.now()
+        cdef double wait
+        if self.update is None:
+            if not self.dirty:
+                return None
+            wait = 0
+        else:
+            wait = self.timestep - self.accumulator - (t - self.lastTime) if self.started else 0
+            if self.dirty:
+                wait = 0
+        if self.dirty and self.maxFrameRate > 0:
+            wait = max(wait, self.nextFrameTime - t)
+        return max(wait, 0.0)
+
+    def Tick(self):
+        cdef double t = self.now()
+        if not self.started:
+            self.started = True
+            self.lastTime = t
+        cdef double elapsed = t - self.lastTime
+        self.lastTime = t
+        cdef Py_ssize_t n = 0
+        cdef Py_ssize_t dropped
+        if self.update is not None:
+            self.accumulator += elapsed
+            while self.accumulator + timeEpsilon >= self.timestep:
+                if n == self.maxUpdates:
+                    # Too far behind to catch up; the simulation slows down
+                    # instead of spending every frame on updates.
+                    dropped = <Py_ssize_t>(self.accumulator / self.timestep)
+                    self.droppedUpdates += dropped
+                    self.accumulator -= dropped * self.timestep
+                    break
+                if self.update(self.timestep) is not False:
+                    self.dirty = True
+                self.accumulator -= self.timestep
+                self.updates += 1
+                n += 1
+            self.alpha = max(self.accumulator, 0.0) / self.timestep
+        if self.maxFrameRate > 0 and t + timeEpsilon < self.nextFrameTime:
+            return False
+        if not self.dirty:
+            self.skippedFrames += 1
+            return False
+        self.drawFrame(t)
+        return True
+
+
+cdef bint restoreLost(COMObject obj) except -1:
+    # Recreates obj if it was released because its device was lost, and
+    # returns whether it was.
+    if not isinstance(obj, Resource) or not (<Resource>obj).lost:
+        return False
+    (<RenderTarget>(<Resource>obj).recipe[0]).recreateResource(<Resource>obj)
+    return True
+
+
+cdef inline void* devicePtr(COMObject obj) except NULL:
+    # Returns the COM pointer of obj, recreating it first if it was lost
+    # along with its device.
+    if obj.ptr == NULL and not restoreLost(obj):
+        raise ValueError("%s has been released" % type(obj).__name__)
+    return obj.ptr
+
+
+cdef inline void* resourcePtr(PyObject *obj) noexcept:
+    # Returns the COM pointer of a resource recorded in a DrawList, or NULL
+    # if no resource was recorded (e.g. an omitted stroke style).
+    if obj == NULL:
+        return NULL
+    return (<COMObject>obj).ptr
+
+
+cdef class DrawList:
+    cdef DrawCommand *commands
+    cdef Py_ssize_t count
+    cdef Py_ssize_t capacity
+    cdef set resources
+
+    def __cinit__(self):
+        self.resources = set()
+
+    def __dealloc__(self):
+        self.freeText()
+        PyMem_Free(self.commands)
+
+    def __len__(self):
+        return self.count
+
+    cdef DrawCommand* append(self, DrawOp op) except NULL:
+        cdef Py_ssize_t capacity
+        cdef DrawCommand *commands
+        if self.count == self.capacity:
+            capacity = self.capacity * 2 if self.capacity else 64
+            commands = <DrawCommand*>PyMem_Realloc(self.commands, capacity * sizeof(DrawCommand))
+            if commands == NULL:
+                raise MemoryError
+            self.commands = commands
+            self.capacity = capacity
+        cdef DrawCommand *cmd = &self.commands[self.count]
+        memset(cmd, 0, sizeof(DrawCommand))
+        cmd.op = op
+        self.count += 1
+        return cmd
+
+    cdef PyObject* keep(self, COMObject obj, str name) except NULL:
+        # Resources are kept before the command is appended, so a rejected
+        # resource never leaves a half-filled command behind.
+        if obj is None:
+            raise TypeError("%s must not be None" % name)
+        if obj.ptr == NULL and not restoreLost(obj):
+            raise ValueError("Cannot record a released object")
+        self.resources.add(obj)
+        return <PyObject*>obj
+
+    cdef PyObject* keepOptional(self, COMObject obj) except? NULL:
+        if obj is None:
+            return NULL
+        return self.keep(obj, None)
+
+    cdef void freeText(self) noexcept:
+        cdef Py_ssize_t i
+        for i in range(self.count):
+            if self.commands[i].text != NULL:
+                PyMem_Free(self.commands[i].text)
+                self.commands[i].text = NULL
+
+    def Reset(self):
+        self.freeText()
+        self.count = 0
+        self.resources.clear()
+
+    def Clear(self, r, g=None, b=None, float a=1.0):
+        cdef D2D1_COLOR_F color
+        readColor(r, g, b, a, &color)
+        cdef DrawCommand *cmd = self.append(OP_CLEAR)
+        cmd.v[0] = color.r
+        cmd.v[1] = color.g
+        cmd.v[2] = color.b
+        cmd.v[3] = color.a
+        return self.count - 1
+
+    def DrawBitmap(
+            self,
+            Bitmap bitmap,
+            l,
+            t=None,
+            r=None,
+            b=None,
+            float opacity=1.0,
+            interpolationMode=1,
+            srcRect=None):
+        cdef D2D1_RECT_F dest, src
+        if readRect(l, t, r, b, &dest):
+            if t is not None:
+                opacity = t
+            if r is not None:
+                interpolationMode = r
+            if b is not None:
+                srcRect = b
+        cdef bint hasSrcRect = readSourceRect(srcRect, &src)
+        cdef PyObject *resource0 = self.keep(bitmap, "bitmap")
+        cdef DrawCommand *cmd = self.append(OP_DRAW_BITMAP)
+        cmd.resource0 = resource0
+        cmd.v[0] = dest.left
+        cmd.v[1] = dest.top
+        cmd.v[2] = dest.right
+        cmd.v[3] = dest.bottom
+        if hasSrcRect:
+            cmd.v[4] = src.left
+            cmd.v[5] = src.top
+            cmd.v[6] = src.right
+            cmd.v[7] = src.bottom
+            cmd.option1 = 1
+        cmd.width = opacity
+        cmd.option0 = interpolationMode
+        return self.count - 1
+
+    def DrawEllipse(
+            self,
+            cx,
+            cy=None,
+            rx=None,
+            ry=None,
+            brush=None,
+            float strokeWidth=1.0,
+            StrokeStyle strokeStyle=None):
+        cdef D2D1_ELLIPSE el
+        if readEllipse(cx, cy, rx, ry, &el):
+            if cy is not None:
+                brush = cy
+            if rx is not None:
+                strokeWidth = rx
+            if ry is not None:
+                strokeStyle = ry
+        cdef PyObject *resource0 = self.keep(<Brush?>brush, "brush")
+        cdef PyObject *resource1 = self.keepOptional(strokeStyle)
+        cdef DrawCommand *cmd = self.append(OP_DRAW_ELLIPSE)
+        cmd.resource0 = resource0
+        cmd.resource1 = resource1
+        cmd.v[0] = el.point.x
+        cmd.v[1] = el.point.y
+        cmd.v[2] = el.radiusX
+        cmd.v[3] = el.radiusY
+        cmd.width = strokeWidth
+        return self.count - 1
+
+    def DrawGeometry(self, Geometry geometry, Brush brush, float strokeWidth=1.0, StrokeStyle strokeStyle=None):
+        cdef PyObject *resource0 = self.keep(geometry, "geometry")
+        cdef PyObject *resource1 = self.keep(brush, "brush")
+        cdef PyObject *resource2 = self.keepOptional(strokeStyle)
+        cdef DrawCommand *cmd = self.append(OP_DRAW_GEOMETRY)
+        cmd.resource0 = resource0
+        cmd.resource1 = resource1
+        cmd.resource2 = resource2
+        cmd.width = strokeWidth
+        return self.count - 1
+
+    def DrawLine(
+            self,
+            x1,
+            y1,
+            x2=None,
+            y2=None,
+            brush=None,
+            float strokeWidth=1.0,
+            StrokeStyle strokeStyle=None):
+        cdef D2D1_POINT_2F point0, point1
+        if not PyFloat_CheckExact(x1) and isinstance(x1, Point2F):
+            point0 = (<Point2F>x1).value
+            point1 = (<Point2F?>y1).value
+            if x2 is not None:
+                if brush is not None:
+                    strokeStyle = brush
+                brush = x2
+            if y2 is not None:
+                strokeWidth = y2
+        else:
+            point0.x = x1
+            point0.y = y1
+            readPoint(x2, y2, &point1)
+        cdef PyObject *resource0 = self.keep(<Brush?>brush, "brush")
+        cdef PyObject *resource1 = self.keepOptional(strokeStyle)
+        cdef DrawCommand *cmd = self.append(OP_DRAW_LINE)
+        cmd.resource0 = resource0
+        cmd.resource1 = resource1
+        cmd.v[0] = point0.x
+        cmd.v[1] = point0.y
+        cmd.v[2] = point1.x
+        cmd.v[3] = point1.y
+        cmd.width = strokeWidth
+        return self.count - 1
+
+    def DrawRectangle(
+            self,
+            l,
+            t=None,
+            r=None,
+            b=None,
+            brush=None,
+            float strokeWidth=1.0,
+            StrokeStyle strokeStyle=None):
+        cdef D2D1_RECT_F rect
+        if readRect(l, t, r, b, &rect):
+            if t is not None:
+                brush = t
+            if r is not None:
+                strokeWidth = r
+            if b is not None:
+                strokeStyle = b
+        cdef PyObject *resource0 = self.keep(<Brush?>brush, "brush")
+        cdef PyObject *resource1 = self.keepOptional(strokeStyle)
+        cdef DrawCommand *cmd = self.append(OP_DRAW_RECTANGLE)
+        cmd.resource0 = resource0
+        cmd.resource1 = resource1
+        cmd.v[0] = rect.left
+        cmd.v[1] = rect.top
+        cmd.v[2] = rect.right
+        cmd.v[3] = rect.bottom
+        cmd.width = strokeWidth
+        return self.count - 1
+
+    def DrawText(
+            self,
+            text,
+            TextFormat textFormat,
+            l,
+            t=None,
+            r=None,
+            b=None,
+            brush=None,
+            int options=0,
+            int measuringMode=0):
+        cdef D2D1_RECT_F rect
+        if readRect(l, t, r, b, &rect):
+            if t is not None:
+                brush = t
+            if r is not None:
+                options = r
+            if b is not None:
+                measuringMode = b
+        cdef PyObject *resource0 = self.keep(textFormat, "textFormat")
+        cdef PyObject *resource1 = self.keep(<Brush?>brush, "brush")
+        cdef Py_ssize_t textLength
+        cdef bint owned
+        cdef wchar_t *textBuf = wideText(text, &textLength, &owned)
+        cdef wchar_t *copy
+        if not owned:
+            # The PreparedText may be freed before the DrawList is replayed.
+            copy = <wchar_t*>PyMem_Malloc((textLength + 1) * sizeof(wchar_t))
+            if copy == NULL:
+                raise MemoryError
+            memcpy(copy, textBuf, (textLength + 1) * sizeof(wchar_t))
+            textBuf = copy
+        cdef DrawCommand *cmd
+        try:
+            cmd = self.append(OP_DRAW_TEXT)
+        except:
+            PyMem_Free(textBuf)
+            raise
+        cmd.text = textBuf
+        cmd.textLength = <UINT32>textLength
+        cmd.resource0 = resource0
+        cmd.resource1 = resource1
+        cmd.v[0] = rect.left
+        cmd.v[1] = rect.top
+        cmd.v[2] = rect.right
+        cmd.v[3] = rect.bottom
+        cmd.option0 = options
+        cmd.option1 = measuringMode
+        return self.count - 1
+
+    def DrawTextLayout(self, x, y=None, textLayout=None, brush=None, int options=0):
+        cdef D2D1_POINT_2F pt
+        if readPoint(x, y, &pt) and y is not None:
+            if brush is not None:
+                options = brush
+            brush = textLayout
+            textLayout = y
+        cdef PyObject *resource0 = self.keep(<TextLayout?>textLayout, "textLayout")
+        cdef PyObject *resource1 = self.keep(<Brush?>brush, "brush")
+        cdef DrawCommand *cmd = self.append(OP_DRAW_TEXT_LAYOUT)
+        cmd.resource0 = resource0
+        cmd.resource1 = resource1
+        cmd.v[0] = pt.x
+        cmd.v[1] = pt.y
+        cmd.option0 = options
+        return self.count - 1
+
+    def FillEllipse(self, cx, cy=None, rx=None, ry=None, brush=None):
+        cdef D2D1_ELLIPSE el
+        if readEllipse(cx, cy, rx, ry, &el) and cy is not None:
+            brush = cy
+        cdef PyObject *resource0 = self.keep(<Brush?>brush, "brush")
+        cdef DrawCommand *cmd = self.append(OP_FILL_ELLIPSE)
+        cmd.resource0 = resource0
+        cmd.v[0] = el.point.x
+        cmd.v[1] = el.point.y
+        cmd.v[2] = el.radiusX
+        cmd.v[3] = el.radiusY
+        return self.count - 1
+
+    def FillGeometry(self, Geometry geometry, Brush brush):
+        cdef PyObject *resource0 = self.keep(geometry, "geometry")
+        cdef PyObject *resource1 = self.keep(brush, "brush")
+        cdef DrawCommand *cmd = self.append(OP_FILL_GEOMETRY)
+        cmd.resource0 = resource0
+        cmd.resource1 = resource1
+        return self.count - 1
+
+    def FillRectangle(self, l, t=None, r=None, b=None, brush=None):
+        cdef D2D1_RECT_F rect
+        if readRect(l, t, r, b, &rect) and t is not None:
+            brush = t
+        cdef PyObject *resource0 = self.keep(<Brush?>brush, "brush")
+        cdef DrawCommand *cmd = self.append(OP_FILL_RECTANGLE)
+        cmd.resource0 = resource0
+        cmd.v[0] = rect.left
+        cmd.v[1] = rect.top
+        cmd.v[2] = rect.right
+        cmd.v[3] = rect.bottom
+        return self.count - 1
+
+    def GetCommands(self):
+        cdef list commands = []
+        cdef DrawCommand *cmd
+        cdef Py_ssize_t i
+        for i in range(self.count):
+            cmd = &self.commands[i]
+            commands.append(describeCommand(cmd))
+        return commands
+
+    def SetAntialiasMode(self, int mode):
+        cdef DrawCommand *cmd = self.append(OP_SET_ANTIALIAS_MODE)
+        cmd.option0 = mode
+        return self.count - 1
+
+    def SetTransform(self, m11=1, float m12=0, float m21=0, float m22=1, float dx=0, float dy=0):
+        cdef DrawCommand *cmd = self.append(OP_SET_TRANSFORM)
+        cdef D2D1_MATRIX_3X2_F mat
+        if isinstance(m11, Matrix3x2F):
+            mat = (<Matrix3x2F>m11).value
+        else:
+            setMatrix(&mat, m11, m12, m21, m22, dx, dy)
+        cmd.v[0] = mat.m11
+        cmd.v[1] = mat.m12
+        cmd.v[2] = mat.m21
+        cmd.v[3] = mat.m22
+        cmd.v[4] = mat.dx
+        cmd.v[5] = mat.dy
+        return self.count - 1
+
+
+cdef enum NodeState:
+    NODE_UNINDEXED
+    NODE_GRID
+    NODE_OVERSIZED
+
+
+cdef enum:
+    # Nodes spanning more grid cells than this are kept in a separate list
+    # that every query checks, instead of being added to every cell.
+    SCENE_MAX_NODE_CELLS = 64
+
+
+cdef struct SceneNode:
+    D2D1_RECT_F bounds
+    int32_t ix0
+    int32_t iy0
+    int32_t ix1
+    int32_t iy1
+    uint32_t stamp
+    NodeState state
+
+
+cdef struct GridCell:
+    bint used
+    int64_t key
+    Py_ssize_t *ids
+    Py_ssize_t count
+    Py_ssize_t capacity
+
+
+cdef inline int64_t cellKey(int32_t ix, int32_t iy) noexcept nogil:
+    return (<int64_t>ix << 32) | <uint32_t>iy
+
+
+cdef inline Py_ssize_t cellSlot(int64_t key, Py_ssize_t capacity) noexcept nogil:
+    # Fibonacci hashing; capacity is a power of two.
+    return <Py_ssize_t>((<uint64_t>key * <uint64_t>0x9E3779B97F4A7C15ULL) >> 20) & (capacity - 1)
+
+
+cdef inline int32_t cellIndex(float coordinate, float cellSize) noexcept nogil:
+    cdef double c = floor(coordinate / cellSize)
+    if c < -1073741824:
+        return -1073741824
+    if c > 1073741823:
+        return 1073741823
+    return <int32_t>c
+
+
+cdef inline bint rectsIntersect(const D2D1_RECT_F *a, const D2D1_RECT_F *b) noexcept nogil:
+    return a.left <= b.right and b.left <= a.right and a.top <= b.bottom and b.top <= a.bottom
+
+
+cdef int appendId(Py_ssize_t **ids, Py_ssize_t *count, Py_ssize_t *capacity, Py_ssize_t id) except -1:
+    cdef Py_ssize_t newCapacity
+    cdef Py_ssize_t *grown
+    if count[0] == capacity[0]:
+        newCapacity = capacity[0] * 2 if capacity[0] else 8
+        grown = <Py_ssize_t*>PyMem_Realloc(ids[0], newCapacity * sizeof(Py_ssize_t))
+        if grown == NULL:
+            raise MemoryError
+        ids[0] = grown
+        capacity[0] = newCapacity
+    ids[0][count[0]] = id
+    count[0] += 1
+    return 0
+
+
+cdef void removeId(Py_ssize_t *ids, Py_ssize_t *count, Py_ssize_t id) noexcept nogil:
+    cdef Py_ssize_t i
+    for i in range(count[0]):
+        if ids[i] == id:
+            count[0] -= 1
+            ids[i] = ids[count[0]]
+            return
+
+
+cdef int compareIds(const void *a, const void *b) noexcept nogil:
+    cdef Py_ssize_t x = (<const Py_ssize_t*>a)[0]
+    cdef Py_ssize_t y = (<const Py_ssize_t*>b)[0]
+    return (x > y) - (x < y)
+
+
+cdef inline float pointSegmentDistance(float px, float py, const float *v) noexcept nogil:
+    cdef double dx = v[2] - v[0]
+    cdef double dy = v[3] - v[1]
+    cdef double lengthSquared = dx * dx + dy * dy
+    cdef double t = 0
+    if lengthSquared > 0:
+        t = ((px - v[0]) * dx + (py - v[1]) * dy) / lengthSquared
+        t = 0 if t < 0 else 1 if t > 1 else t
+    dx = px - (v[0] + t * dx)
+    dy = py - (v[1] + t * dy)
+    return <float>sqrt(dx * dx + dy * dy)
+
+
+cdef inline bint insideEllipse(float px, float py, const float *v, float grow) noexcept nogil:
+    # Whether the point is inside the ellipse at v with both radii grown by grow.
+    cdef double rx = fabs(v[2]) + grow
+    cdef double ry = fabs(v[3]) + grow
+    if rx <= 0 or ry <= 0:
+        return False
+    cdef double x = (px - v[0]) / rx
+    cdef double y = (py - v[1]) / ry
+    return x * x + y * y <= 1
+
+
+cdef class Scene(DrawList):
+    cdef SceneNode *nodes
+    cdef Py_ssize_t nodeCapacity
+    cdef Py_ssize_t indexed
+    cdef Py_ssize_t removed
+    cdef uint32_t stamp
+    cdef GridCell *cells
+    cdef Py_ssize_t cellCapacity
+    cdef Py_ssize_t cellsUsed
+    cdef Py_ssize_t *oversized
+    cdef Py_ssize_t oversizedCount
+    cdef Py_ssize_t oversizedCapacity
+    # Scratch buffer holding the ids found by the last query.
+    cdef Py_ssize_t *results
+    cdef Py_ssize_t resultCount
+    cdef Py_ssize_t resultCapacity
+    cdef readonly float cellSize
+
+    def __init__(self, float cellSize=256.0):
+        if not cellSize > 0:
+            raise ValueError("cellSize must be positive")
+        self.cellSize = cellSize
+
+    def __dealloc__(self):
+        self.freeIndex()
+        PyMem_Free(self.nodes)
+        PyMem_Free(self.results)
+
+    def __len__(self):
+        return self.count - self.removed
+
+    cdef void freeIndex(self) noexcept:
+        cdef Py_ssize_t i
+        for i in range(self.cellCapacity):
+            PyMem_Free(self.cells[i].ids)
+        PyMem_Free(self.cells)
+        self.cells = NULL
+        self.cellCapacity = 0
+        self.cellsUsed = 0
+        PyMem_Free(self.oversized)
+        self.oversized = NULL
+        self.oversizedCount = 0
+        self.oversizedCapacity = 0
+        self.indexed = 0
+
+    cdef DrawCommand* append(self, DrawOp op) except NULL:
+        cdef DrawCommand *cmd = DrawList.append(self, op)
+        cdef SceneNode *nodes
+        if self.nodeCapacity < self.capacity:
+            nodes = <SceneNode*>PyMem_Realloc(self.nodes, self.capacity * sizeof(SceneNode))
+            if nodes == NULL:
+                self.count -= 1
+                raise MemoryError
+            self.nodes = nodes
+            self.nodeCapacity = self.capacity
+        memset(&self.nodes[self.count - 1], 0, sizeof(SceneNode))
+        return cmd
+
+    cdef GridCell* findCell(self, int64_t key, bint create) except? NULL:
+        cdef Py_ssize_t i, slot, oldCapacity
+        cdef GridCell *old
+        if self.cellCapacity == 0:
+            if not create:
+                return NULL
+        elif not create or (self.cellsUsed + 1) * 2 <= self.cellCapacity:
+            slot = cellSlot(key, self.cellCapacity)
+            while self.cells[slot].used:
+                if self.cells[slot].key == key:
+                    return &self.cells[slot]
+                slot = (slot + 1) & (self.cellCapacity - 1)
+            if not create:
+                return NULL
+            self.cells[slot].used = True
+            self.cells[slot].key = key
+            self.cellsUsed += 1
+            return &self.cells[slot]
+        # Grow the table; cells that no node uses any more are dropped.
+        old = self.cells
+        oldCapacity = self.cellCapacity
+        self.cellCapacity = oldCapacity * 2 if oldCapacity else 64
+        self.cells = <GridCell*>PyMem_Malloc(self.cellCapacity * sizeof(GridCell))
+        if self.cells == NULL:
+            self.cells = old
+            self.cellCapacity = oldCapacity
+            raise MemoryError
+        memset(self.cells, 0, self.cellCapacity * sizeof(GridCell))
+        self.cellsUsed = 0
+        for i in range(oldCapacity):
+            if old[i].count == 0:
+                PyMem_Free(old[i].ids)
+                continue
+            slot = cellSlot(old[i].key, self.cellCapacity)
+            while self.cells[slot].used:
+                slot = (slot + 1) & (self.cellCapacity - 1)
+            self.cells[slot] = old[i]
+            self.cellsUsed += 1
+        PyMem_Free(old)
+        return self.findCell(key, True)
+
+    cdef int nodeBounds(self, Py_ssize_t id, D2D1_RECT_F *bounds) except -1:
+        cdef DrawCommand *cmd = &self.commands[id]
+        cdef const float *v = cmd.v
+        cdef HRESULT res = 0
+        cdef DWRITE_TEXT_METRICS metrics
+        if cmd.op == OP_FILL_GEOMETRY:
+            res = (<ID2D1Geometry*>resourcePtr(cmd.resource0)).GetBounds(NULL, bounds)
+        elif cmd.op == OP_DRAW_GEOMETRY:
+            res = (<ID2D1Geometry*>resourcePtr(cmd.resource0)).GetWidenedBounds(
+                cmd.width, <ID2D1StrokeStyle*>resourcePtr(cmd.resource2), NULL, 0.25, bounds)
+        elif cmd.op == OP_DRAW_TEXT_LAYOUT:
+            res = (<IDWriteTextLayout*>resourcePtr(cmd.resource0)).GetMetrics(&metrics)
+            bounds.left = v[0] + metrics.left
+            bounds.top = v[1] + metrics.top
+            bounds.right = bounds.left + metrics.widthIncludingTrailingWhitespace
+            bounds.bottom = bounds.top + metrics.height
+        else:
+            shapeBounds(cmd.op, v, cmd.width, bounds)
+        if FAILED(res):
+            raise Direct2DError(res)
+        return 0
+
+    cdef int indexNode(self, Py_ssize_t id) except -1:
+        cdef SceneNode *node = &self.nodes[id]
+        cdef GridCell *cell
+        cdef int32_t ix, iy
+        self.nodeBounds(id, &node.bounds)
+        node.ix0 = cellIndex(node.bounds.left, self.cellSize)
+        node.iy0 = cellIndex(node.bounds.top, self.cellSize)
+        node.ix1 = cellIndex(node.bounds.right, self.cellSize)
+        node.iy1 = cellIndex(node.bounds.bottom, self.cellSize)
+        if (<int64_t>node.ix1 - node.ix0 + 1) * (<int64_t>node.iy1 - node.iy0 + 1) > SCENE_MAX_NODE_CELLS:
+            appendId(&self.oversized, &self.oversizedCount, &self.oversizedCapacity, id)
+            node.state = NODE_OVERSIZED
+            return 0
+        for ix in range(node.ix0, node.ix1 + 1):
+            for iy in range(node.iy0, node.iy1 + 1):
+                cell = self.findCell(cellKey(ix, iy), True)
+                appendId(&cell.ids, &cell.count, &cell.capacity, id)
+        node.state = NODE_GRID
+        return 0
+
+    cdef void unindexNode(self, Py_ssize_t id) noexcept:
+        cdef SceneNode *node = &self.nodes[id]
+        cdef GridCell *cell
+        cdef int32_t ix, iy
+        if node.state == NODE_OVERSIZED:
+            removeId(self.oversized, &self.oversizedCount, id)
+        elif node.state == NODE_GRID:
+            for ix in range(node.ix0, node.ix1 + 1):
+                for iy in range(node.iy0, node.iy1 + 1):
+                    cell = self.findCell(cellKey(ix, iy), False)
+                    if cell != NULL:
+                        removeId(cell.ids, &cell.count, id)
+        node.state = NODE_UNINDEXED
+
+    cdef int updateIndex(self) except -1:
+        # Nodes are indexed when the scene is first queried after they were
+        # recorded, so building a scene costs no more than a DrawList.
+        # The resources are checked here because the bounds and hit tests
+        # of geometry and text layout nodes call into them.
+        cdef COMObject resource
+        for resource in self.resources:
+            if resource.ptr == NULL and not restoreLost(resource):
+                raise ValueError("Scene refers to a released object")
+        while self.indexed < self.count:
+            if self.commands[self.indexed].op != OP_NONE:
+                self.indexNode(self.indexed)
+            self.indexed += 1
+        return 0
+
+    cdef int addCandidates(self, Py_ssize_t *ids, Py_ssize_t count, const D2D1_RECT_F *rect) except -1:
+        cdef Py_ssize_t i
+        cdef SceneNode *node
+        for i in range(count):
+            node = &self.nodes[ids[i]]
+            if node.stamp != self.stamp and rectsIntersect(&node.bounds, rect):
+                node.stamp = self.stamp
+                appendId(&self.results, &self.resultCount, &self.resultCapacity, ids[i])
+        return 0
+
+    cdef Py_ssize_t query(self, const D2D1_RECT_F *rect) except -1:
+        # Fills results with the ids of the nodes whose bounds intersect
+        # rect, in drawing order, and returns how many there are.
+        cdef Py_ssize_t i
+        cdef int32_t ix, iy
+        cdef GridCell *cell
+        self.updateIndex()
+        self.resultCount = 0
+        self.stamp += 1
+        if self.stamp == 0:
+            for i in range(self.count):
+                self.nodes[i].stamp = 0
+            self.stamp = 1
+        cdef int32_t ix0 = cellIndex(rect.left, self.cellSize)
+        cdef int32_t iy0 = cellIndex(rect.top, self.cellSize)
+        cdef int32_t ix1 = cellIndex(rect.right, self.cellSize)
+        cdef int32_t iy1 = cellIndex(rect.bottom, self.cellSize)
+        if (<int64_t>ix1 - ix0 + 1) * (<int64_t>iy1 - iy0 + 1) > self.cellsUsed:
+            # The query spans more cells than exist; visit the existing ones.
+            for i in range(self.cellCapacity):
+                cell = &self.cells[i]
+                if cell.used and cell.count:
+                    ix = <int32_t>(cell.key >> 32)
+                    iy = <int32_t>(cell.key & 0xFFFFFFFF)
+                    if ix0 <= ix <= ix1 and iy0 <= iy <= iy1:
+                        self.addCandidates(cell.ids, cell.count, rect)
+        else:
+            for ix in range(ix0, ix1 + 1):
+                for iy in range(iy0, iy1 + 1):
+                    cell = self.findCell(cellKey(ix, iy), False)
+                    if cell != NULL:
+                        self.addCandidates(cell.ids, cell.count, rect)
+        self.addCandidates(self.oversized, self.oversizedCount, rect)
+        qsort(self.results, self.resultCount, sizeof(Py_ssize_t), compareIds)
+        return self.resultCount
+
+    cdef bint hitNode(self, Py_ssize_t id, float x, float y, float tolerance) except -1:
+        cdef DrawCommand *cmd = &self.commands[id]
+        cdef const float *v = cmd.v
+        cdef float half = cmd.width / 2 + tolerance
+        cdef D2D1_POINT_2F point
+        cdef D2D1_RECT_F inner
+        cdef BOOL contains = False
+        cdef HRESULT res = 0
+        point.x = x
+        point.y = y
+        if cmd.op == OP_FILL_ELLIPSE:
+            return insideEllipse(x, y, v, tolerance)
+        if cmd.op == OP_DRAW_ELLIPSE:
+            return insideEllipse(x, y, v, half) and not insideEllipse(x, y, v, -half)
+        if cmd.op == OP_DRAW_LINE:
+            return pointSegmentDistance(x, y, v) <= half
+        if cmd.op == OP_DRAW_RECTANGLE:
+            # The hole inside the stroke, shrunk by the tolerance.
+            shapeBounds(OP_FILL_RECTANGLE, v, 0, &inner)
+            inner.left += half
+            inner.top += half
+            inner.right -= half
+            inner.bottom -= half
+            return not (inner.left < x < inner.right and inner.top < y < inner.bottom)
+        if cmd.op == OP_FILL_GEOMETRY:
+            res = (<ID2D1Geometry*>resourcePtr(cmd.resource0)).FillContainsPoint(point, NULL, 0.25, &contains)
+        elif cmd.op == OP_DRAW_GEOMETRY:
+            res = (<ID2D1Geometry*>resourcePtr(cmd.resource0)).StrokeContainsPoint(
+                point, cmd.width + 2 * tolerance, <ID2D1StrokeStyle*>resourcePtr(cmd.resource2), NULL, 0.25,
+                &contains)
+        else:
+            # Filled rectangles, text and bitmaps cover their bounds.
+            return True
         if FAILED(res):
             raise Direct2DError(res)
+        return contains
+
+    cdef Py_ssize_t checkNode(self, Py_ssize_t node) except -1:
+        if node < 0 or node >= self.count or self.commands[node].op == OP_NONE:
+            raise IndexError("no node %d in the scene" % node)
+        if self.commands[node].op in (OP_CLEAR, OP_SET_ANTIALIAS_MODE, OP_SET_TRANSFORM):
+            raise IndexError("command %d is not a node" % node)
+        return node
+
+    def Clear(self, *args, **kwargs):
+        raise TypeError("a Scene has no Clear command; clear the target before DrawScene")
+
+    def SetAntialiasMode(self, *args, **kwargs):
+        raise TypeError("a Scene cannot change the antialias mode")
+
+    def SetTransform(self, *args, **kwargs):
+        raise TypeError("a Scene cannot change the transform")
+
+    def Reset(self):
+        DrawList.Reset(self)
+        self.freeIndex()
+        self.removed = 0
+
+    def GetBounds(self, Py_ssize_t node):
+        self.checkNode(node)
+        self.updateIndex()
+        cdef RectF rect = RectF.__new__(RectF)
+        rect.value = self.nodes[node].bounds
+        return rect
+
+    def HitTest(self, float x, float y, float tolerance=0.0):
+        cdef D2D1_RECT_F rect
+        rect.left = x - tolerance
+        rect.top = y - tolerance
+        rect.right = x + tolerance
+        rect.bottom = y + tolerance
+        cdef Py_ssize_t i = self.query(&rect)
+        # The results are in drawing order, so the topmost node is last.
+        while i > 0:
+            i -= 1
+            if self.hitNode(self.results[i], x, y, tolerance):
+                return self.results[i]
+        return None
+
+    def Query(self, l, t=None, r=None, b=None):
+        cdef D2D1_RECT_F rect
+        readRect(l, t, r, b, &rect)
+        cdef Py_ssize_t count = self.query(&rect)
+        return [self.results[i] for i in range(count)]
+
+    def Remove(self, Py_ssize_t node):
+        self.checkNode(node)
+        self.unindexNode(node)
+        self.commands[node].op = OP_NONE
+        self.removed += 1
+
+    def Translate(self, Py_ssize_t node, float dx, float dy):
+        self.checkNode(node)
+        cdef DrawCommand *cmd = &self.commands[node]
+        if cmd.op == OP_FILL_GEOMETRY or cmd.op == OP_DRAW_GEOMETRY:
+            raise ValueError("geometry nodes cannot be moved")
+        cmd.v[0] += dx
+        cmd.v[1] += dy
+        if cmd.op != OP_FILL_ELLIPSE and cmd.op != OP_DRAW_ELLIPSE and cmd.op != OP_DRAW_TEXT_LAYOUT:
+            cmd.v[2] += dx
+            cmd.v[3] += dy
+        if self.nodes[node].state != NODE_UNINDEXED:
+            self.updateIndex()
+            self.unindexNode(node)
+            self.indexNode(node)
+
+
+cdef object optionalResource(PyObject *obj):
+    if obj == NULL:
+        return None
+    return <object>obj
+
+
+cdef tuple describeCommand(DrawCommand *cmd):
+    # Returns the method name and arguments that recorded the command,
+    # so a DrawList can be inspected without a render target.
+    cdef float *v = cmd.v
+    if cmd.op == OP_NONE:
+        return None
+    if cmd.op == OP_CLEAR:
+        return "Clear", (v[0], v[1], v[2], v[3])
+    if cmd.op == OP_DRAW_BITMAP:
+        return "DrawBitmap", (
+            <object>cmd.resource0, v[0], v[1], v[2], v[3], cmd.width, cmd.option0,
+            (v[4], v[5], v[6], v[7]) if cmd.option1 else None)
+    if cmd.op == OP_DRAW_ELLIPSE:
+        return "DrawEllipse", (
+            v[0], v[1], v[2], v[3], <object>cmd.resource0, cmd.width, optionalResource(cmd.resource1))
+    if cmd.op == OP_DRAW_GEOMETRY:
+        return "DrawGeometry", (
+            <object>cmd.resource0, <object>cmd.resource1, cmd.width, optionalResource(cmd.resource2))
+    if cmd.op == OP_DRAW_LINE:
+        return "DrawLine", (
+            v[0], v[1], v[2], v[3], <object>cmd.resource0, cmd.width, optionalResource(cmd.resource1))
+    if cmd.op == OP_DRAW_RECTANGLE:
+        return "DrawRectangle", (
+            v[0], v[1], v[2], v[3], <object>cmd.resource0, cmd.width, optionalResource(cmd.resource1))
+    if cmd.op == OP_DRAW_TEXT:
+        return "DrawText", (
+            PyUnicode_FromWideChar(cmd.text, cmd.textLength), <object>cmd.resource0,
+            v[0], v[1], v[2], v[3], <object>cmd.resource1, cmd.option0, cmd.option1)
+    if cmd.op == OP_DRAW_TEXT_LAYOUT:
+        return "DrawTextLayout", (v[0], v[1], <object>cmd.resource0, <object>cmd.resource1, cmd.option0)
+    if cmd.op == OP_FILL_ELLIPSE:
+        return "FillEllipse", (v[0], v[1], v[2], v[3], <object>cmd.resource0)
+    if cmd.op == OP_FILL_GEOMETRY:
+        return "FillGeometry", (<object>cmd.resource0, <object>cmd.resource1)
+    if cmd.op == OP_FILL_RECTANGLE:
+        return "FillRectangle", (v[0], v[1], v[2], v[3], <object>cmd.resource0)
+    if cmd.op == OP_SET_ANTIALIAS_MODE:
+        return "SetAntialiasMode", (cmd.option0,)
+    return "SetTransform", (v[0], v[1], v[2], v[3], v[4], v[5])
 
 
 cdef class Brush(Resource):
+    # Changed whenever the brush is changed, so that geometry realizations
+    # drawn with an older state of the brush are not reused.
+    cdef Py_ssize_t version
+
     def GetOpacity(self):
-        return (<ID2D1Brush*>self.ptr).GetOpacity()
+        return (<ID2D1Brush*>devicePtr(self)).GetOpacity()
 
 
 cdef class SolidColorBrush(Brush):
-    def SetColor(self, float r, float g, float b, float a=1.0):
+    # Set on brushes handed out by RenderTarget.GetSolidColorBrush, which are
+    # shared by every caller asking for the same color.
+    cdef bint pooled
+
+    def __dealloc__(self):
+        # Runs before COMObject.__dealloc__ releases the brush.
+        self.pooled = False
+
+    cpdef Release(self):
+        if self.pooled:
+            raise ValueError("Cannot release a pooled brush; use RenderTarget.ClearBrushPool")
+        Resource.Release(self)
+
+    def SetColor(self, r, g=None, b=None, float a=1.0):
+        if self.pooled:
+            raise ValueError("Cannot change the color of a pooled brush; use CreateSolidColorBrush")
         cdef D2D1_COLOR_F color
-        color.r = r
-        color.g = g
-        color.b = b
-        color.a = a
-        (<ID2D1SolidColorBrush*>self.ptr).SetColor(&color)
+        readColor(r, g, b, a, &color)
+        (<ID2D1SolidColorBrush*>devicePtr(self)).SetColor(&color)
+        self.version += 1
+        if self.recipe is not None:
+            target, kind, args = self.recipe
+            self.recipe = (target, kind, (color.r, color.g, color.b, color.a, args[4]))
+
 
 
 cdef class StrokeStyle(Resource):
     pass
 
 
+cdef class Layer(Resource):
+    pass
+
+
 cdef class Geometry(Resource):
     pass
 
@@ -729,10 +4561,26 @@ cdef class PathGeometry(Geometry):
 
 
 cdef class SimplifiedGeometrySink(COMObject):
-    def BeginFigure(self, float x, float y, int figureBegin=0):
+    def AddBeziers(self, points):
+        cdef Py_buffer view
+        cdef UINT32 count = <UINT32>getFloatRows(points, &view, 6, "points")
+        cdef const D2D1_BEZIER_SEGMENT *beziers = <const D2D1_BEZIER_SEGMENT*>view.buf
+        with nogil:
+            (<ID2D1SimplifiedGeometrySink*>self.ptr).AddBeziers(beziers, count)
+        PyBuffer_Release(&view)
+
+    def AddLines(self, points):
+        cdef Py_buffer view
+        cdef UINT32 count = <UINT32>getFloatRows(points, &view, 2, "points")
+        cdef const D2D1_POINT_2F *pts = <const D2D1_POINT_2F*>view.buf
+        with nogil:
+            (<ID2D1SimplifiedGeometrySink*>self.ptr).AddLines(pts, count)
+        PyBuffer_Release(&view)
+
+    def BeginFigure(self, x, y=None, int figureBegin=0):
         cdef D2D1_POINT_2F pt
-        pt.x = x
-        pt.y = y
+        if readPoint(x, y, &pt) and y is not None:
+            figureBegin = y
         (<ID2D1SimplifiedGeometrySink*>self.ptr).BeginFigure(pt, <D2D1_FIGURE_BEGIN>figureBegin)
 
     def Close(self):
@@ -748,48 +4596,394 @@ cdef class SimplifiedGeometrySink(COMObject):
 
 
 cdef class GeometrySink(SimplifiedGeometrySink):
-    def AddArc(self, float x, float y, float rx, float ry, float rotationAngle, int sweepDirection, int arcSize):
+    def AddArc(self, x, y, rx, ry, rotationAngle, sweepDirection, arcSize=None):
         cdef D2D1_ARC_SEGMENT arc
-        arc.point.x = x
-        arc.point.y = y
+        if not PyFloat_CheckExact(x) and isinstance(x, Point2F):
+            arc.point = (<Point2F>x).value
+            rx, ry, rotationAngle, sweepDirection, arcSize = y, rx, ry, rotationAngle, sweepDirection
+        else:
+            arc.point.x = x
+            arc.point.y = y
+            if arcSize is None:
+                raise TypeError("AddArc() missing required argument 'arcSize'")
         arc.size.width = rx
         arc.size.height = ry
         arc.rotationAngle = rotationAngle
-        arc.sweepDirection = <D2D1_SWEEP_DIRECTION>sweepDirection
-        arc.arcSize = <D2D1_ARC_SIZE>arcSize
+        arc.sweepDirection = <D2D1_SWEEP_DIRECTION><int>sweepDirection
+        arc.arcSize = <D2D1_ARC_SIZE><int>arcSize
         (<ID2D1GeometrySink*>self.ptr).AddArc(&arc)
 
-    def AddBezier(self, float x1, float y1, float x2, float y2, float x3, float y3):
+    def AddBezier(self, x1, y1, x2=None, y2=None, x3=None, y3=None):
         cdef D2D1_BEZIER_SEGMENT bz
-        bz.point1.x = x1
-        bz.point1.y = y1
-        bz.point2.x = x2
-        bz.point2.y = y2
-        bz.point3.x = x3
-        bz.point3.y = y3
+        if not PyFloat_CheckExact(x1) and isinstance(x1, Point2F):
+            bz.point1 = (<Point2F>x1).value
+            bz.point2 = (<Point2F?>y1).value
+            bz.point3 = (<Point2F?>x2).value
+        else:
+            bz.point1.x = x1
+            bz.point1.y = y1
+            readPoint(x2, y2, &bz.point2)
+            readPoint(x3, y3, &bz.point3)
         (<ID2D1GeometrySink*>self.ptr).AddBezier(&bz)
 
-    def AddLine(self, float x, float y):
+    def AddLine(self, x, y=None):
         cdef D2D1_POINT_2F pt
-        pt.x = x
-        pt.y = y
+        readPoint(x, y, &pt)
         (<ID2D1GeometrySink*>self.ptr).AddLine(pt)
 
-    def AddQuadraticBezier(self, float x1, float y1, float x2, float y2):
+    def AddQuadraticBezier(self, x1, y1, x2=None, y2=None):
         cdef D2D1_QUADRATIC_BEZIER_SEGMENT bz
-        bz.point1.x = x1
-        bz.point1.y = y1
-        bz.point2.x = x2
-        bz.point2.y = y2
+        if not PyFloat_CheckExact(x1) and isinstance(x1, Point2F):
+            bz.point1 = (<Point2F>x1).value
+            bz.point2 = (<Point2F?>y1).value
+        else:
+            bz.point1.x = x1
+            bz.point1.y = y1
+            readPoint(x2, y2, &bz.point2)
         (<ID2D1GeometrySink*>self.ptr).AddQuadraticBezier(&bz)
 
+    def AddQuadraticBeziers(self, points):
+        cdef Py_buffer view
+        cdef UINT32 count = <UINT32>getFloatRows(points, &view, 4, "points")
+        cdef const D2D1_QUADRATIC_BEZIER_SEGMENT *beziers = <const D2D1_QUADRATIC_BEZIER_SEGMENT*>view.buf
+        with nogil:
+            (<ID2D1GeometrySink*>self.ptr).AddQuadraticBeziers(beziers, count)
+        PyBuffer_Release(&view)
+
+
+cdef struct SvgScanner:
+    const char *s
+    Py_ssize_t pos
+    Py_ssize_t n
+
+
+cdef inline void svgSkip(SvgScanner *sc) noexcept nogil:
+    cdef char c
+    while sc.pos < sc.n:
+        c = sc.s[sc.pos]
+        if c == c' ' or c == c',' or c == c'\t' or c == c'\n' or c == c'\r' or c == c'\f':
+            sc.pos += 1
+        else:
+            break
+
+
+cdef inline bint svgDigit(SvgScanner *sc) noexcept nogil:
+    return sc.pos < sc.n and c'0' <= sc.s[sc.pos] <= c'9'
+
+
+cdef bint svgNumber(SvgScanner *sc, float *out) noexcept nogil:
+    # Parses an SVG number (sign, digits, fraction, exponent) into out.
+    # Returns False without consuming anything if there is no number.
+    svgSkip(sc)
+    cdef Py_ssize_t start = sc.pos
+    cdef double value = 0.0
+    cdef double scale = 1.0
+    cdef double sign = 1.0
+    cdef int exponent = 0
+    cdef int expSign = 1
+    cdef bint digits = False
+    if sc.pos < sc.n and (sc.s[sc.pos] == c'+' or sc.s[sc.pos] == c'-'):
+        if sc.s[sc.pos] == c'-':
+            sign = -1.0
+        sc.pos += 1
+    while svgDigit(sc):
+        value = value * 10.0 + (sc.s[sc.pos] - c'0')
+        sc.pos += 1
+        digits = True
+    if sc.pos < sc.n and sc.s[sc.pos] == c'.':
+        sc.pos += 1
+        while svgDigit(sc):
+            scale *= 0.1
+            value += (sc.s[sc.pos] - c'0') * scale
+            sc.pos += 1
+            digits = True
+    if not digits:
+        sc.pos = start
+        return False
+    if sc.pos + 1 < sc.n and (sc.s[sc.pos] == c'e' or sc.s[sc.pos] == c'E'):
+        start = sc.pos
+        sc.pos += 1
+        if sc.s[sc.pos] == c'+' or sc.s[sc.pos] == c'-':
+            if sc.s[sc.pos] == c'-':
+                expSign = -1
+            sc.pos += 1
+        if not svgDigit(sc):
+            sc.pos = start
+        else:
+            while svgDigit(sc):
+                exponent = exponent * 10 + (sc.s[sc.pos] - c'0')
+                sc.pos += 1
+            value *= pow(10.0, expSign * exponent)
+    out[0] = <float>(sign * value)
+    return True
+
+
+cdef bint svgFlag(SvgScanner *sc, int *out) noexcept nogil:
+    # Arc flags are a single 0 or 1 and need no separator after them.
+    svgSkip(sc)
+    if sc.pos < sc.n and (sc.s[sc.pos] == c'0' or sc.s[sc.pos] == c'1'):
+        out[0] = sc.s[sc.pos] - c'0'
+        sc.pos += 1
+        return True
+    return False
+
+
+cdef bint svgPoint(SvgScanner *sc, D2D1_POINT_2F *pt, D2D1_POINT_2F origin) noexcept nogil:
+    if not svgNumber(sc, &pt.x) or not svgNumber(sc, &pt.y):
+        return False
+    pt.x += origin.x
+    pt.y += origin.y
+    return True
+
+
+cdef Py_ssize_t parseSvgPath(const char *d, Py_ssize_t n, ID2D1GeometrySink *sink) noexcept nogil:
+    # Feeds SVG path data to the geometry sink.
+    # Returns -1 on success or the offset at which parsing failed.
+    cdef SvgScanner sc
+    sc.s = d
+    sc.pos = 0
+    sc.n = n
+    cdef char cmd = 0
+    cdef char op
+    cdef char prevOp = 0
+    cdef char c
+    cdef bint inFigure = False
+    cdef bint ok
+    cdef D2D1_POINT_2F cur, start, ctrl, origin, pt
+    cdef D2D1_BEZIER_SEGMENT bz
+    cdef D2D1_QUADRATIC_BEZIER_SEGMENT qbz
+    cdef D2D1_ARC_SEGMENT arc
+    cdef int largeArc, sweep
+    cur.x = cur.y = 0.0
+    start = ctrl = cur
+    while True:
+        svgSkip(&sc)
+        if sc.pos >= n:
+            break
+        c = d[sc.pos]
+        if (c'A' <= c <= c'Z' or c'a' <= c <= c'z') and c != c'e' and c != c'E':
+            if (c & ~0x20) not in b'MLHVCSQTAZ':
+                return sc.pos
+            cmd = c
+            sc.pos += 1
+            if cmd == c'Z' or cmd == c'z':
+                if prevOp == 0:
+                    return sc.pos - 1
+                if inFigure:
+                    sink.EndFigure(<D2D1_FIGURE_END>1)
+                    inFigure = False
+                cur = ctrl = start
+                prevOp = c'Z'
+                continue
+        elif cmd == 0 or cmd == c'Z' or cmd == c'z':
+            return sc.pos
+        op = cmd & ~0x20
+        if prevOp == 0 and op != c'M':
+            return sc.pos
+        if cmd >= c'a':
+            origin = cur
+        else:
+            origin.x = origin.y = 0.0
+        ok = True
+        if op == c'M':
+            ok = svgPoint(&sc, &pt, origin)
+            if ok:
+                if inFigure:
+                    sink.EndFigure(<D2D1_FIGURE_END>0)
+                sink.BeginFigure(pt, <D2D1_FIGURE_BEGIN>0)
+                inFigure = True
+                cur = start = ctrl = pt
+                # Further coordinate pairs are implicit line commands.
+                cmd = c'l' if cmd == c'm' else c'L'
+        else:
+            if not inFigure:
+                # A drawing command directly after Z starts a new figure
+                # at the start point of the closed one.
+                sink.BeginFigure(cur, <D2D1_FIGURE_BEGIN>0)
+                inFigure = True
+                start = cur
+            if op == c'L':
+                ok = svgPoint(&sc, &pt, origin)
+                if ok:
+                    sink.AddLine(pt)
+            elif op == c'H':
+                pt.y = cur.y
+                ok = svgNumber(&sc, &pt.x)
+                if ok:
+                    pt.x += origin.x
+                    sink.AddLine(pt)
+            elif op == c'V':
+                pt.x = cur.x
+                ok = svgNumber(&sc, &pt.y)
+                if ok:
+                    pt.y += origin.y
+                    sink.AddLine(pt)
+            elif op == c'C' or op == c'S':
+                if op == c'C':
+                    ok = svgPoint(&sc, &bz.point1, origin)
+                elif prevOp == c'C' or prevOp == c'S':
+                    bz.point1.x = 2 * cur.x - ctrl.x
+                    bz.point1.y = 2 * cur.y - ctrl.y
+                else:
+                    bz.point1 = cur
+                ok = ok and svgPoint(&sc, &bz.point2, origin) and svgPoint(&sc, &bz.point3, origin)
+                if ok:
+                    sink.AddBezier(&bz)
+                    ctrl = bz.point2
+                    pt = bz.point3
+            elif op == c'Q' or op == c'T':
+                if op == c'Q':
+                    ok = svgPoint(&sc, &qbz.point1, origin)
+                elif prevOp == c'Q' or prevOp == c'T':
+                    qbz.point1.x = 2 * cur.x - ctrl.x
+                    qbz.point1.y = 2 * cur.y - ctrl.y
+                else:
+                    qbz.point1 = cur
+                ok = ok and svgPoint(&sc, &qbz.point2, origin)
+                if ok:
+                    sink.AddQuadraticBezier(&qbz)
+                    ctrl = qbz.point1
+                    pt = qbz.point2
+            else:
+                # Elliptical arc.
+                ok = (svgNumber(&sc, &arc.size.width)
+                      and svgNumber(&sc, &arc.size.height)
+                      and svgNumber(&sc, &arc.rotationAngle)
+                      and svgFlag(&sc, &largeArc)
+                      and svgFlag(&sc, &sweep)
+                      and svgPoint(&sc, &arc.point, origin))
+                if ok:
+                    if arc.size.width == 0 or arc.size.height == 0:
+                        sink.AddLine(arc.point)
+                    else:
+                        if arc.size.width < 0:
+                            arc.size.width = -arc.size.width
+                        if arc.size.height < 0:
+                            arc.size.height = -arc.size.height
+                        # SVG's positive-angle sweep is clockwise in Direct2D's
+                        # y-down coordinate space.
+                        arc.sweepDirection = <D2D1_SWEEP_DIRECTION>sweep
+                        arc.arcSize = <D2D1_ARC_SIZE>largeArc
+                        sink.AddArc(&arc)
+                    pt = arc.point
+        if not ok:
+            if inFigure:
+                sink.EndFigure(<D2D1_FIGURE_END>0)
+            return sc.pos
+        if op != c'C' and op != c'S' and op != c'Q' and op != c'T':
+            ctrl = pt
+        cur = pt
+        prevOp = op
+    if prevOp == 0 and n > 0:
+        return sc.pos
+    if inFigure:
+        sink.EndFigure(<D2D1_FIGURE_END>0)
+    return -1
+
 
 cdef class Image(Resource):
     pass
 
 
 cdef class Bitmap(Image):
-    pass
+    def CopyFromMemory(self, buffer, rect=None, Py_ssize_t pitch=0):
+        cdef ID2D1Bitmap *bitmap = <ID2D1Bitmap*>devicePtr(self)
+        cdef D2D1_SIZE_U size = bitmap.GetPixelSize()
+        cdef D2D1_RECT_U dst
+        if rect is None:
+            dst.left = 0
+            dst.top = 0
+            dst.right = size.width
+            dst.bottom = size.height
+        else:
+            dst.left, dst.top, dst.right, dst.bottom = rect
+            if dst.left > dst.right or dst.top > dst.bottom or dst.right > size.width or dst.bottom > size.height:
+                raise ValueError("rect must lie within the bitmap")
+        cdef Py_buffer view
+        pitch = getPixels(buffer, &view, dst.right - dst.left, dst.bottom - dst.top, pitch, bitmap.GetPixelFormat().format)
+        cdef HRESULT res
+        with nogil:
+            res = bitmap.CopyFromMemory(&dst, view.buf, <UINT32>pitch)
+        try:
+            if FAILED(res):
+                raise Direct2DError(res)
+            if self.recipe is not None:
+                self.keepPixels(&dst, <const char*>view.buf, pitch)
+        finally:
+            PyBuffer_Release(&view)
+
+    cdef keepPixels(self, const D2D1_RECT_U *dst, const char *src, Py_ssize_t srcPitch):
+        # Copies updated pixels into the copy that the bitmap is recreated
+        # from after a device loss.
+        target, kind, args = self.recipe
+        width, height, pixels, pitch, pixelFormat, alphaMode, dpiX, dpiY = args
+        cdef Py_ssize_t bpp = bytesPerPixel(pixelFormat)
+        if pitch == 0:
+            pitch = width * bpp
+        if pixels is None:
+            pixels = bytearray(pitch * height)
+            self.recipe = (target, kind, (width, height, pixels, pitch, pixelFormat, alphaMode, dpiX, dpiY))
+        cdef char *buf = PyByteArray_AS_STRING(pixels)
+        cdef Py_ssize_t stride = pitch
+        cdef Py_ssize_t rowBytes = (dst.right - dst.left) * bpp
+        cdef Py_ssize_t row
+        for row in range(dst.bottom - dst.top):
+            memcpy(buf + (dst.top + row) * stride + dst.left * bpp, src + row * srcPitch, rowBytes)
+
+    def GetPixelFormat(self):
+        cdef D2D1_PIXEL_FORMAT fmt = (<ID2D1Bitmap*>devicePtr(self)).GetPixelFormat()
+        return fmt.format, fmt.alphaMode
+
+    def GetPixelSize(self):
+        cdef D2D1_SIZE_U size = (<ID2D1Bitmap*>devicePtr(self)).GetPixelSize()
+        return size.width, size.height
+
+    def GetSize(self):
+        cdef D2D1_SIZE_F size = (<ID2D1Bitmap*>devicePtr(self)).GetSize()
+        return size.width, size.height
+
+
+# Longest side, in DIPs, of a geometry realization.
+cdef float realizationMaxSize = 4096
+
+
+cdef class GeometryRealization(Bitmap):
+    # The rectangle that the bitmap covers in the coordinates of the
+    # geometry, and the scale it was rendered at.
+    cdef D2D1_RECT_F rect
+    cdef float scaleX
+    cdef float scaleY
+    cdef Py_ssize_t nbytes
+
+
+cdef class GeometryRealizationCache(ResourceCache):
+    cdef readonly float scaleTolerance
+    cdef readonly Py_ssize_t invalidations
+
+    def __init__(
+            self,
+            Py_ssize_t maxEntries=256,
+            Py_ssize_t maxBytes=64 * 1024 * 1024,
+            float scaleTolerance=0.25):
+        if scaleTolerance < 0:
+            raise ValueError("scaleTolerance must not be negative")
+        ResourceCache.__init__(self, maxEntries, maxBytes)
+        self.scaleTolerance = scaleTolerance
+
+    cdef GeometryRealization lookupScaled(self, tuple key, float scaleX, float scaleY):
+        cdef GeometryRealization realization = <GeometryRealization>self.lookup(key)
+        if realization is None:
+            return None
+        if (fabs(scaleX / realization.scaleX - 1) > self.scaleTolerance
+                or fabs(scaleY / realization.scaleY - 1) > self.scaleTolerance):
+            # Scaled this far, the bitmap would look blurred or blocky, so it
+            # is rendered again at the new scale.
+            self.discard(key)
+            self.hits -= 1
+            self.misses += 1
+            self.invalidations += 1
+            return None
+        return realization
 
 
 _dwrite_factory = None
@@ -803,7 +4997,63 @@ def GetDWriteFactory():
 class DirectWriteError(COMError):
     pass
 
+cdef class TextLayoutCache(ResourceCache):
+    pass
+
+
+cdef class TextFormatCache(ResourceCache):
+    cdef object lock
+
+    def __init__(self, Py_ssize_t maxEntries=256, Py_ssize_t maxBytes=0):
+        from threading import Lock
+        ResourceCache.__init__(self, maxEntries, maxBytes)
+        self.lock = Lock()
+
+
+cdef enum:
+    # The number of DWRITE_TEXT_METRICS fields written per string by MeasureTexts.
+    TEXT_METRICS_FIELDS = 9
+
+
+cdef HRESULT measureTexts(
+        IDWriteFactory *factory,
+        IDWriteTextFormat *fmt,
+        const wchar_t **texts,
+        const UINT32 *lengths,
+        Py_ssize_t count,
+        float maxWidth,
+        float maxHeight,
+        float *metrics) noexcept nogil:
+    # Lays out each text in turn and writes its metrics as a row of floats.
+    cdef IDWriteTextLayout *layout
+    cdef DWRITE_TEXT_METRICS tm
+    cdef HRESULT res
+    cdef Py_ssize_t i
+    for i in range(count):
+        res = factory.CreateTextLayout(<WCHAR*>texts[i], lengths[i], fmt, maxWidth, maxHeight, &layout)
+        if FAILED(res):
+            return res
+        res = layout.GetMetrics(&tm)
+        (<IUnknown*>layout).Release()
+        if FAILED(res):
+            return res
+        metrics[0] = tm.left
+        metrics[1] = tm.top
+        metrics[2] = tm.width
+        metrics[3] = tm.widthIncludingTrailingWhitespace
+        metrics[4] = tm.height
+        metrics[5] = tm.layoutWidth
+        metrics[6] = tm.layoutHeight
+        metrics[7] = tm.maxBidiReorderingDepth
+        metrics[8] = tm.lineCount
+        metrics += TEXT_METRICS_FIELDS
+    return 0
+
+
 cdef class DWriteFactory(COMObject):
+    cdef TextLayoutCache textLayoutCache
+    cdef TextFormatCache textFormatCache
+
     def __init__(self, int factoryType=0):
         cdef IDWriteFactory* factory
         res = DWriteCreateFactory(
@@ -813,52 +5063,166 @@ cdef class DWriteFactory(COMObject):
         if FAILED(res):
             raise DirectWriteError(res)
         self.ptr = <void*>factory
+        self.textFormatCache = TextFormatCache()
 
-    def CreateTextFormat(self, str familyName, float size, int weight=500, int style=0, int stretch=5):
+    def CreateTextFormat(
+            self,
+            str familyName,
+            float size,
+            int weight=500,
+            int style=0,
+            int stretch=5,
+            str locale=""):
         cdef IDWriteTextFormat *fmt
         cdef wchar_t *familyBuf
+        cdef wchar_t *localeBuf
         familyBuf = PyUnicode_AsWideCharString(familyName, NULL)
         if familyBuf == NULL:
             raise MemoryError
-        cdef wchar_t[1] localeBuf
-        localeBuf[0] = 0
-        res = (<IDWriteFactory*>self.ptr).CreateTextFormat(
-            familyBuf,
-            NULL,
-            <DWRITE_FONT_WEIGHT>weight,
-            <DWRITE_FONT_STYLE>style,
-            <DWRITE_FONT_STRETCH>stretch,
-            size,
-            localeBuf,
-            <IDWriteTextFormat**>&fmt)
+        localeBuf = PyUnicode_AsWideCharString(locale, NULL)
+        if localeBuf == NULL:
+            PyMem_Free(<void*>familyBuf)
+            raise MemoryError
+        cdef HRESULT res
+        with nogil:
+            res = (<IDWriteFactory*>self.ptr).CreateTextFormat(
+                familyBuf,
+                NULL,
+                <DWRITE_FONT_WEIGHT>weight,
+                <DWRITE_FONT_STYLE>style,
+                <DWRITE_FONT_STRETCH>stretch,
+                size,
+                localeBuf,
+                <IDWriteTextFormat**>&fmt)
         PyMem_Free(<void*>familyBuf)
+        PyMem_Free(<void*>localeBuf)
         if FAILED(res):
             raise DirectWriteError(res)
         cdef TextFormat obj = TextFormat.__new__(TextFormat)
         obj.ptr = <void*>fmt
         return obj
 
-    def CreateTextLayout(self, str text, TextFormat textFormat, float maxWidth, float maxHeight):
+    def CreateTextLayout(self, text, TextFormat textFormat, float maxWidth, float maxHeight):
         cdef IDWriteTextLayout* layout
         cdef wchar_t *stringBuf
         cdef Py_ssize_t stringBufLen
-        stringBuf = PyUnicode_AsWideCharString(text, &stringBufLen)
-        if stringBuf == NULL:
-            raise MemoryError
-        res = (<IDWriteFactory*>self.ptr).CreateTextLayout(
-            stringBuf,
-            <UINT32>stringBufLen,
-            <IDWriteTextFormat*>textFormat.ptr,
-            maxWidth,
-            maxHeight,
-            &layout)
-        PyMem_Free(stringBuf)
+        cdef bint owned
+        cdef tuple key = None
+        cdef TextLayout cached
+        if self.textLayoutCache is not None:
+            key = (str(text), textFormat, maxWidth, maxHeight)
+            cached = <TextLayout>self.textLayoutCache.lookup(key)
+            if cached is not None:
+                return cached
+        stringBuf = wideText(text, &stringBufLen, &owned)
+        cdef HRESULT res
+        cdef IDWriteTextFormat *fmt = <IDWriteTextFormat*>textFormat.ptr
+        with nogil:
+            res = (<IDWriteFactory*>self.ptr).CreateTextLayout(
+                stringBuf,
+                <UINT32>stringBufLen,
+                fmt,
+                maxWidth,
+                maxHeight,
+                &layout)
+        if owned:
+            PyMem_Free(stringBuf)
         if FAILED(res):
             raise DirectWriteError(res)
         cdef TextLayout obj = TextLayout.__new__(TextLayout)
         obj.ptr = <void*>layout
+        objectTotals.textLayouts += 1
+        if key is not None:
+            self.textLayoutCache.store(key, obj, stringBufLen * sizeof(wchar_t))
         return obj
 
+    def DisableTextLayoutCache(self):
+        self.textLayoutCache = None
+
+    def EnableTextFormatCache(self, Py_ssize_t maxEntries=256, Py_ssize_t maxBytes=0):
+        self.textFormatCache = TextFormatCache(maxEntries, maxBytes)
+        return self.textFormatCache
+
+    def EnableTextLayoutCache(self, Py_ssize_t maxEntries=4096, Py_ssize_t maxBytes=0):
+        self.textLayoutCache = TextLayoutCache(maxEntries, maxBytes)
+        return self.textLayoutCache
+
+    def GetTextFormat(
+            self,
+            str familyName,
+            float size,
+            int weight=500,
+            int style=0,
+            int stretch=5,
+            str locale=""):
+        cdef TextFormatCache cache = self.GetTextFormatCache()
+        cdef tuple key = (familyName, size, weight, style, stretch, locale)
+        cdef TextFormat obj
+        # The lock makes threads asking for the same format at once share
+        # the one that is created first.
+        with cache.lock:
+            obj = <TextFormat>cache.lookup(key)
+            if obj is None:
+                obj = self.CreateTextFormat(familyName, size, weight, style, stretch, locale)
+                cache.store(key, obj, (len(familyName) + len(locale) + 2) * sizeof(wchar_t))
+        return obj
+
+    def GetTextFormatCache(self):
+        return self.textFormatCache
+
+    def GetTextLayoutCache(self):
+        return self.textLayoutCache
+
+    def MeasureTexts(self, strings, TextFormat textFormat, float maxWidth, float maxHeight, out=None):
+        cdef list items = list(strings)
+        cdef Py_ssize_t count = len(items)
+        cdef Py_ssize_t i, size, offset = 0, total = 0
+        cdef object item
+        for item in items:
+            if not isinstance(item, PreparedText):
+                total += PyUnicode_AsWideChar(<str?>item, NULL, 0)
+        cdef Py_buffer view
+        cdef float *metrics
+        if out is None:
+            from array import array
+            out = array("f", bytes(count * TEXT_METRICS_FIELDS * sizeof(float)))
+        if getFloatRows(out, &view, TEXT_METRICS_FIELDS, "out", PyBUF_WRITABLE) != count:
+            PyBuffer_Release(&view)
+            raise ValueError("out must have one row per string")
+        metrics = <float*>view.buf
+        # Strings are converted into one buffer; PreparedText buffers are used as-is.
+        cdef wchar_t *textBuf = <wchar_t*>PyMem_Malloc(total * sizeof(wchar_t))
+        cdef const wchar_t **texts = <const wchar_t**>PyMem_Malloc(count * sizeof(wchar_t*))
+        cdef UINT32 *lengths = <UINT32*>PyMem_Malloc(count * sizeof(UINT32))
+        cdef HRESULT res = 0
+        cdef IDWriteFactory *factory = <IDWriteFactory*>self.ptr
+        cdef IDWriteTextFormat *fmt = <IDWriteTextFormat*>textFormat.ptr
+        try:
+            if textBuf == NULL or texts == NULL or lengths == NULL:
+                raise MemoryError
+            for i in range(count):
+                item = items[i]
+                if isinstance(item, PreparedText):
+                    texts[i] = (<PreparedText>item).buf
+                    lengths[i] = <UINT32>(<PreparedText>item).length
+                else:
+                    size = PyUnicode_AsWideChar(item, textBuf + offset, total - offset)
+                    texts[i] = textBuf + offset
+                    lengths[i] = <UINT32>size
+                    offset += size + 1
+            objectTotals.charactersConverted += offset - count
+            with nogil:
+                res = measureTexts(factory, fmt, texts, lengths, count, maxWidth, maxHeight, metrics)
+        finally:
+            PyMem_Free(textBuf)
+            PyMem_Free(texts)
+            PyMem_Free(lengths)
+            PyBuffer_Release(&view)
+        if FAILED(res):
+            raise DirectWriteError(res)
+        objectTotals.textLayouts += count
+        return out
+
 
 cdef class FontFace(COMObject):
     pass
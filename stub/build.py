@@ -0,0 +1,56 @@
+"""
+Builds pyd2d against the stub Windows, Direct2D and DirectWrite headers in
+this directory, so that the extension can be tested and benchmarked on any
+platform with a C++ compiler.
+
+Run `python stub/build.py` from anywhere; the extension module and a copy of
+the _pyd2d_const module are written to the repository root, where test.py
+and benchmark.py import them from.
+Stub builds have private `_stub_*` functions to count and trace the calls
+made to the stubs and to make methods return failure HRESULTs.
+"""
+
+import os
+import shutil
+import sys
+
+from Cython.Build import cythonize
+from setuptools import Extension, setup
+
+STUB_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(STUB_DIR)
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+BUILD_DIR = os.path.join(ROOT_DIR, "build", "stub")
+
+
+def main():
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    with open(os.path.join(SRC_DIR, "pyd2d.pyx"), encoding="utf-8") as f:
+        source = f.read()
+    # Build a copy of the module with the stub controls appended.
+    with open(os.path.join(BUILD_DIR, "pyd2d.pyx"), "w", encoding="utf-8") as f:
+        f.write(source)
+        f.write('\n\ninclude "stub.pxi"\n')
+    # Run from the build directory so that setuptools does not pick up
+    # the project configuration in pyproject.toml.
+    os.chdir(BUILD_DIR)
+    extension = Extension(
+        "pyd2d",
+        ["pyd2d.pyx"],
+        language="c++",
+        include_dirs=[STUB_DIR],
+        extra_compile_args=[] if sys.platform == "win32" else ["-std=c++17"],
+    )
+    # The constants are imported by the extension on first use.
+    shutil.copy(os.path.join(SRC_DIR, "_pyd2d_const.py"), ROOT_DIR)
+    setup(
+        name="pyd2d-stub",
+        ext_modules=cythonize(
+            [extension], include_path=[SRC_DIR, STUB_DIR], quiet=True
+        ),
+        script_args=["build_ext", "--build-lib", ROOT_DIR, "--build-temp", "."],
+    )
+
+
+if __name__ == "__main__":
+    main()
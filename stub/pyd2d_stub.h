@@ -0,0 +1,1055 @@
+// Stub implementation of the Windows, Direct2D and DirectWrite declarations
+// used by pyd2d.pyx, for building and benchmarking the extension without
+// Windows. Every interface method is a no-op that can be counted and traced,
+// and every HRESULT-returning method can be made to fail on demand.
+#pragma once
+
+#include <atomic>
+#include <chrono>
+#include <cmath>
+#include <cstdarg>
+#include <cstdint>
+#include <cstdio>
+#include <cstring>
+#include <cwchar>
+#include <map>
+#include <mutex>
+#include <string>
+#include <vector>
+
+#define PYD2D_STUB 1
+
+typedef int32_t HRESULT;
+typedef uint32_t ULONG;
+typedef void *HWND;
+typedef uint32_t UINT32;
+typedef float FLOAT;
+typedef uint64_t UINT64;
+typedef uint32_t UINT;
+typedef wchar_t WCHAR;
+typedef int BOOL;
+
+struct GUID {
+    unsigned long Data1;
+    unsigned short Data2;
+    unsigned short Data3;
+    unsigned char Data4[8];
+};
+
+#define S_OK ((HRESULT)0)
+#define E_INVALIDARG ((HRESULT)0x80070057L)
+#define D2DERR_WRONG_STATE ((HRESULT)0x88990001L)
+#define D2DERR_RECREATE_TARGET ((HRESULT)0x8899000CL)
+#define WINCODEC_ERR_ALREADYLOCKED ((HRESULT)0x88982F0DL)
+#define SUCCEEDED(hr) (((HRESULT)(hr)) >= 0)
+#define FAILED(hr) (((HRESULT)(hr)) < 0)
+
+namespace pyd2d_stub {
+
+struct State {
+    std::mutex lock;
+    // Fast-path flag: set while recording is on or any result is overridden.
+    std::atomic<bool> active{false};
+    bool recording = false;
+    bool tracing = false;
+    std::map<std::string, long> calls;
+    std::map<std::string, HRESULT> results;
+    std::string trace;
+    std::atomic<long> liveObjects{0};
+};
+
+inline State &state() {
+    static State s;
+    return s;
+}
+
+inline void updateActive(State &s) {
+    s.active = s.recording || s.tracing || !s.results.empty();
+}
+
+// Counts a call to `name` and returns the HRESULT configured for it.
+inline HRESULT call(const char *name) {
+    State &s = state();
+    if (!s.active.load(std::memory_order_relaxed))
+        return S_OK;
+    std::lock_guard<std::mutex> guard(s.lock);
+    if (s.recording)
+        s.calls[name]++;
+    auto it = s.results.find(name);
+    return it == s.results.end() ? S_OK : it->second;
+}
+
+inline void trace(const char *fmt, ...) {
+    State &s = state();
+    if (!s.tracing)
+        return;
+    char buf[512];
+    va_list args;
+    va_start(args, fmt);
+    vsnprintf(buf, sizeof(buf), fmt, args);
+    va_end(args);
+    std::lock_guard<std::mutex> guard(s.lock);
+    s.trace += buf;
+    s.trace += '\n';
+}
+
+template <class T> const GUID &uuid() {
+    static GUID g = {0, 0, 0, {0}};
+    return g;
+}
+
+}  // namespace pyd2d_stub
+
+// Control functions exposed to Python by stub.pxi.
+inline void pyd2dStubReset() {
+    pyd2d_stub::State &s = pyd2d_stub::state();
+    std::lock_guard<std::mutex> guard(s.lock);
+    s.recording = false;
+    s.tracing = false;
+    s.calls.clear();
+    s.results.clear();
+    s.trace.clear();
+    pyd2d_stub::updateActive(s);
+}
+
+inline void pyd2dStubSetRecording(bool recording, bool tracing) {
+    pyd2d_stub::State &s = pyd2d_stub::state();
+    std::lock_guard<std::mutex> guard(s.lock);
+    s.recording = recording;
+    s.tracing = tracing;
+    pyd2d_stub::updateActive(s);
+}
+
+inline void pyd2dStubSetResult(const char *name, HRESULT hr) {
+    pyd2d_stub::State &s = pyd2d_stub::state();
+    std::lock_guard<std::mutex> guard(s.lock);
+    if (hr == S_OK)
+        s.results.erase(name);
+    else
+        s.results[name] = hr;
+    pyd2d_stub::updateActive(s);
+}
+
+inline long pyd2dStubCallCount(const char *name) {
+    pyd2d_stub::State &s = pyd2d_stub::state();
+    std::lock_guard<std::mutex> guard(s.lock);
+    auto it = s.calls.find(name);
+    return it == s.calls.end() ? 0 : it->second;
+}
+
+inline std::string pyd2dStubTakeTrace() {
+    pyd2d_stub::State &s = pyd2d_stub::state();
+    std::lock_guard<std::mutex> guard(s.lock);
+    std::string out;
+    out.swap(s.trace);
+    return out;
+}
+
+inline long pyd2dStubLiveObjects() {
+    return pyd2d_stub::state().liveObjects.load();
+}
+
+#define __uuidof(T) (pyd2d_stub::uuid<T>())
+
+// Knows the messages of the few HRESULTs the stub itself returns.
+inline unsigned int FormatMessageW(
+    unsigned long, void *, unsigned long messageId, unsigned long, wchar_t *buffer,
+    unsigned long size, void *) {
+    const wchar_t *message;
+    switch ((HRESULT)messageId) {
+    case E_INVALIDARG:
+        message = L"The parameter is incorrect.";
+        break;
+    case D2DERR_WRONG_STATE:
+        message = L"The object was not in the correct state to process the method.";
+        break;
+    case D2DERR_RECREATE_TARGET:
+        message = L"There has been a presentation error that may be recoverable.";
+        break;
+    case WINCODEC_ERR_ALREADYLOCKED:
+        message = L"The bitmap is already locked.";
+        break;
+    default:
+        return 0;
+    }
+    int n = swprintf(buffer, size, L"%ls\r\n", message);
+    return n < 0 ? 0 : (unsigned int)n;
+}
+
+union LARGE_INTEGER {
+    long long QuadPart;
+};
+
+inline int QueryPerformanceCounter(LARGE_INTEGER *count) {
+    count->QuadPart = (long long)std::chrono::duration_cast<std::chrono::nanoseconds>(
+        std::chrono::steady_clock::now().time_since_epoch()).count();
+    return 1;
+}
+
+inline int QueryPerformanceFrequency(LARGE_INTEGER *frequency) {
+    frequency->QuadPart = 1000000000LL;
+    return 1;
+}
+
+// ---------------------------------------------------------------------------
+// COM
+
+inline HRESULT CoInitializeEx(void *, unsigned long) {
+    return pyd2d_stub::call("CoInitializeEx");
+}
+
+inline void CoUninitialize() {}
+
+struct IUnknown {
+    ULONG refs = 1;
+    IUnknown() { pyd2d_stub::state().liveObjects++; }
+    virtual ~IUnknown() { pyd2d_stub::state().liveObjects--; }
+    virtual ULONG AddRef() { return ++refs; }
+    virtual ULONG Release() {
+        ULONG r = --refs;
+        if (r == 0)
+            delete this;
+        return r;
+    }
+};
+
+inline HRESULT CoCreateInstance(const GUID &, IUnknown *, unsigned long, const GUID &, void **);
+
+// ---------------------------------------------------------------------------
+// Windows Imaging Component
+
+typedef unsigned char BYTE;
+typedef GUID WICPixelFormatGUID;
+typedef int WICBitmapCreateCacheOption;
+
+struct WICRect {
+    int X;
+    int Y;
+    int Width;
+    int Height;
+};
+
+const GUID CLSID_WICImagingFactory = {0, 0, 0, {0}};
+const GUID IID_IWICImagingFactory = {0, 0, 0, {0}};
+const GUID GUID_WICPixelFormat32bppPBGRA = {0, 0, 0, {0}};
+
+struct IWICBitmapSource : IUnknown {};
+
+struct IWICBitmapLock;
+
+// Holds real 32bpp pixel memory, so that what the stub render target
+// draws into it can be read back.
+struct IWICBitmap : IWICBitmapSource {
+    UINT width = 0;
+    UINT height = 0;
+    UINT stride = 0;
+    std::vector<BYTE> pixels;
+    int readLocks = 0;
+    virtual HRESULT Lock(const WICRect *, unsigned long flags, IWICBitmapLock **lock);
+};
+
+struct IWICBitmapLock : IUnknown {
+    IWICBitmap *bitmap;
+    explicit IWICBitmapLock(IWICBitmap *b) : bitmap(b) {
+        bitmap->AddRef();
+        bitmap->readLocks++;
+    }
+    ~IWICBitmapLock() {
+        bitmap->readLocks--;
+        bitmap->Release();
+    }
+    virtual HRESULT GetDataPointer(UINT *size, BYTE **data) {
+        HRESULT hr = pyd2d_stub::call("IWICBitmapLock::GetDataPointer");
+        *size = (UINT)bitmap->pixels.size();
+        *data = bitmap->pixels.data();
+        return hr;
+    }
+    virtual HRESULT GetSize(UINT *width, UINT *height) {
+        HRESULT hr = pyd2d_stub::call("IWICBitmapLock::GetSize");
+        *width = bitmap->width;
+        *height = bitmap->height;
+        return hr;
+    }
+    virtual HRESULT GetStride(UINT *stride) {
+        HRESULT hr = pyd2d_stub::call("IWICBitmapLock::GetStride");
+        *stride = bitmap->stride;
+        return hr;
+    }
+};
+
+inline HRESULT IWICBitmap::Lock(const WICRect *, unsigned long flags, IWICBitmapLock **lock) {
+    HRESULT hr = pyd2d_stub::call("IWICBitmap::Lock");
+    if (FAILED(hr))
+        return hr;
+    pyd2d_stub::trace("Lock %lu", flags);
+    *lock = new IWICBitmapLock(this);
+    return hr;
+}
+
+struct IWICImagingFactory : IUnknown {
+    // Rows are padded to a multiple of 16 bytes to exercise strided reads.
+    virtual HRESULT CreateBitmap(
+        UINT width, UINT height, const WICPixelFormatGUID &, WICBitmapCreateCacheOption,
+        IWICBitmap **bitmap) {
+        HRESULT hr = pyd2d_stub::call("IWICImagingFactory::CreateBitmap");
+        if (FAILED(hr))
+            return hr;
+        IWICBitmap *b = new IWICBitmap();
+        b->width = width;
+        b->height = height;
+        b->stride = (width * 4 + 15) & ~15u;
+        b->pixels.assign((size_t)b->stride * height, 0);
+        *bitmap = b;
+        return hr;
+    }
+};
+
+inline HRESULT CoCreateInstance(const GUID &, IUnknown *, unsigned long, const GUID &, void **object) {
+    HRESULT hr = pyd2d_stub::call("CoCreateInstance");
+    if (FAILED(hr))
+        return hr;
+    *object = new IWICImagingFactory();
+    return hr;
+}
+
+// ---------------------------------------------------------------------------
+// DirectWrite
+
+typedef int DWRITE_FACTORY_TYPE;
+typedef int DWRITE_FONT_STYLE;
+typedef int DWRITE_FONT_WEIGHT;
+typedef int DWRITE_FONT_STRETCH;
+
+struct DWRITE_TEXT_METRICS {
+    FLOAT left;
+    FLOAT top;
+    FLOAT width;
+    FLOAT widthIncludingTrailingWhitespace;
+    FLOAT height;
+    FLOAT layoutWidth;
+    FLOAT layoutHeight;
+    UINT32 maxBidiReorderingDepth;
+    UINT32 lineCount;
+};
+
+struct IDWriteFontCollection : IUnknown {};
+
+struct IDWriteTextFormat : IUnknown {
+    FLOAT fontSize = 12.0f;
+};
+
+// Text is measured as a single line of fixed-width glyphs half as wide
+// as the font size, so results are deterministic.
+struct IDWriteTextLayout : IDWriteTextFormat {
+    UINT32 length = 0;
+    FLOAT maxWidth = 0;
+    FLOAT maxHeight = 0;
+    virtual FLOAT GetMaxWidth() {
+        pyd2d_stub::call("IDWriteTextLayout::GetMaxWidth");
+        return maxWidth;
+    }
+    virtual HRESULT GetMetrics(DWRITE_TEXT_METRICS *m) {
+        HRESULT hr = pyd2d_stub::call("IDWriteTextLayout::GetMetrics");
+        m->left = 0;
+        m->top = 0;
+        m->width = m->widthIncludingTrailingWhitespace = length * fontSize * 0.5f;
+        m->height = fontSize * 1.25f;
+        m->layoutWidth = maxWidth;
+        m->layoutHeight = maxHeight;
+        m->maxBidiReorderingDepth = 1;
+        m->lineCount = 1;
+        return hr;
+    }
+};
+
+struct IDWriteFactory : IUnknown {
+    virtual HRESULT CreateTextFormat(
+        const WCHAR *, IDWriteFontCollection *, DWRITE_FONT_WEIGHT, DWRITE_FONT_STYLE,
+        DWRITE_FONT_STRETCH, FLOAT size, const WCHAR *locale, IDWriteTextFormat **format) {
+        HRESULT hr = pyd2d_stub::call("IDWriteFactory::CreateTextFormat");
+        if (FAILED(hr))
+            return hr;
+        pyd2d_stub::trace("CreateTextFormat %g %ls", size, locale);
+        IDWriteTextFormat *f = new IDWriteTextFormat();
+        f->fontSize = size;
+        *format = f;
+        return hr;
+    }
+    virtual HRESULT CreateTextLayout(
+        const WCHAR *, UINT32 length, IDWriteTextFormat *format, FLOAT maxWidth,
+        FLOAT maxHeight, IDWriteTextLayout **layout) {
+        HRESULT hr = pyd2d_stub::call("IDWriteFactory::CreateTextLayout");
+        if (FAILED(hr))
+            return hr;
+        IDWriteTextLayout *l = new IDWriteTextLayout();
+        l->fontSize = format->fontSize;
+        l->length = length;
+        l->maxWidth = maxWidth;
+        l->maxHeight = maxHeight;
+        *layout = l;
+        return hr;
+    }
+};
+
+inline HRESULT DWriteCreateFactory(DWRITE_FACTORY_TYPE, const GUID &, IUnknown **factory) {
+    HRESULT hr = pyd2d_stub::call("DWriteCreateFactory");
+    if (FAILED(hr))
+        return hr;
+    *factory = new IDWriteFactory();
+    return hr;
+}
+
+// ---------------------------------------------------------------------------
+// Direct2D
+
+typedef int D2D1_DEBUG_LEVEL;
+typedef int D2D1_FACTORY_TYPE;
+typedef int D2D1_RENDER_TARGET_TYPE;
+typedef int DXGI_FORMAT;
+typedef int D2D1_ALPHA_MODE;
+typedef int D2D1_RENDER_TARGET_USAGE;
+typedef int D2D1_FEATURE_LEVEL;
+typedef int D2D1_PRESENT_OPTIONS;
+typedef int D2D1_CAP_STYLE;
+typedef int D2D1_LINE_JOIN;
+typedef int D2D1_DASH_STYLE;
+typedef int D2D1_SWEEP_DIRECTION;
+typedef int D2D1_ARC_SIZE;
+typedef int D2D1_FILL_MODE;
+typedef int D2D1_ANTIALIAS_MODE;
+typedef int D2D1_BITMAP_INTERPOLATION_MODE;
+typedef int D2D1_DRAW_TEXT_OPTIONS;
+typedef int DWRITE_MEASURING_MODE;
+typedef int D2D1_FIGURE_BEGIN;
+typedef int D2D1_FIGURE_END;
+typedef int D2D1_LAYER_OPTIONS;
+typedef int D2D1_COMPATIBLE_RENDER_TARGET_OPTIONS;
+
+struct D2D1_FACTORY_OPTIONS {
+    D2D1_DEBUG_LEVEL debugLevel;
+};
+struct D2D1_PIXEL_FORMAT {
+    DXGI_FORMAT format;
+    D2D1_ALPHA_MODE alphaMode;
+};
+struct D2D1_RENDER_TARGET_PROPERTIES {
+    D2D1_RENDER_TARGET_TYPE type;
+    D2D1_PIXEL_FORMAT pixelFormat;
+    FLOAT dpiX;
+    FLOAT dpiY;
+    D2D1_RENDER_TARGET_USAGE usage;
+    D2D1_FEATURE_LEVEL minLevel;
+};
+struct D2D1_SIZE_U {
+    UINT32 width;
+    UINT32 height;
+};
+struct D2D1_SIZE_F {
+    FLOAT width;
+    FLOAT height;
+};
+struct D2D1_HWND_RENDER_TARGET_PROPERTIES {
+    HWND hwnd;
+    D2D1_SIZE_U pixelSize;
+    D2D1_PRESENT_OPTIONS presentOptions;
+};
+struct D3DCOLORVALUE {
+    FLOAT r;
+    FLOAT g;
+    FLOAT b;
+    FLOAT a;
+};
+typedef D3DCOLORVALUE D2D1_COLOR_F;
+struct D2D1_MATRIX_3X2_F {
+    FLOAT m11;
+    FLOAT m12;
+    FLOAT m21;
+    FLOAT m22;
+    FLOAT dx;
+    FLOAT dy;
+};
+struct D2D1_BRUSH_PROPERTIES {
+    FLOAT opacity;
+    D2D1_MATRIX_3X2_F transform;
+};
+struct D2D1_RECT_F {
+    FLOAT left;
+    FLOAT top;
+    FLOAT right;
+    FLOAT bottom;
+};
+typedef UINT64 D2D1_TAG;
+struct D2D1_STROKE_STYLE_PROPERTIES {
+    D2D1_CAP_STYLE startCap;
+    D2D1_CAP_STYLE endCap;
+    D2D1_CAP_STYLE dashCap;
+    D2D1_LINE_JOIN lineJoin;
+    FLOAT miterLimit;
+    D2D1_DASH_STYLE dashStyle;
+    FLOAT dashOffset;
+};
+struct D2D1_POINT_2F {
+    FLOAT x;
+    FLOAT y;
+};
+struct D2D1_BEZIER_SEGMENT {
+    D2D1_POINT_2F point1;
+    D2D1_POINT_2F point2;
+    D2D1_POINT_2F point3;
+};
+struct D2D1_ARC_SEGMENT {
+    D2D1_POINT_2F point;
+    D2D1_SIZE_F size;
+    FLOAT rotationAngle;
+    D2D1_SWEEP_DIRECTION sweepDirection;
+    D2D1_ARC_SIZE arcSize;
+};
+struct D2D1_QUADRATIC_BEZIER_SEGMENT {
+    D2D1_POINT_2F point1;
+    D2D1_POINT_2F point2;
+};
+struct D2D1_ELLIPSE {
+    D2D1_POINT_2F point;
+    FLOAT radiusX;
+    FLOAT radiusY;
+};
+struct D2D1_BITMAP_PROPERTIES {
+    D2D1_PIXEL_FORMAT pixelFormat;
+    FLOAT dpiX;
+    FLOAT dpiY;
+};
+
+const GUID IID_ID2D1Factory = {0, 0, 0, {0}};
+
+struct ID2D1Resource : IUnknown {};
+
+struct ID2D1Image : ID2D1Resource {};
+
+struct D2D1_RECT_U {
+    UINT32 left;
+    UINT32 top;
+    UINT32 right;
+    UINT32 bottom;
+};
+
+struct ID2D1Bitmap : ID2D1Image {
+    D2D1_SIZE_U size = {0, 0};
+    D2D1_PIXEL_FORMAT format = {0, 0};
+    FLOAT dpiX = 96.0f;
+    FLOAT dpiY = 96.0f;
+    virtual HRESULT CopyFromMemory(const D2D1_RECT_U *r, const void *, UINT32 pitch) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Bitmap::CopyFromMemory");
+        pyd2d_stub::trace("CopyFromMemory %u %u %u %u %u", r->left, r->top, r->right, r->bottom, pitch);
+        return hr;
+    }
+    virtual D2D1_PIXEL_FORMAT GetPixelFormat() {
+        pyd2d_stub::call("ID2D1Bitmap::GetPixelFormat");
+        return format;
+    }
+    virtual D2D1_SIZE_U GetPixelSize() {
+        pyd2d_stub::call("ID2D1Bitmap::GetPixelSize");
+        return size;
+    }
+    virtual D2D1_SIZE_F GetSize() {
+        pyd2d_stub::call("ID2D1Bitmap::GetSize");
+        return {size.width * 96.0f / dpiX, size.height * 96.0f / dpiY};
+    }
+};
+
+struct ID2D1Brush : ID2D1Resource {
+    FLOAT opacity = 1.0f;
+    virtual FLOAT GetOpacity() {
+        pyd2d_stub::call("ID2D1Brush::GetOpacity");
+        return opacity;
+    }
+};
+
+struct ID2D1SolidColorBrush : ID2D1Brush {
+    D2D1_COLOR_F color = {0, 0, 0, 1};
+    virtual void SetColor(const D2D1_COLOR_F *c) {
+        pyd2d_stub::call("ID2D1SolidColorBrush::SetColor");
+        color = *c;
+    }
+};
+
+struct ID2D1StrokeStyle : ID2D1Resource {};
+
+// The bounds are those of the points given to the sink (Bezier control
+// points included), and the hit tests treat the geometry as its bounds.
+struct ID2D1Geometry : ID2D1Resource {
+    D2D1_RECT_F bounds = {0, 0, 0, 0};
+    bool empty = true;
+    void include(D2D1_POINT_2F p) {
+        if (empty) {
+            bounds = {p.x, p.y, p.x, p.y};
+            empty = false;
+            return;
+        }
+        bounds.left = p.x < bounds.left ? p.x : bounds.left;
+        bounds.top = p.y < bounds.top ? p.y : bounds.top;
+        bounds.right = p.x > bounds.right ? p.x : bounds.right;
+        bounds.bottom = p.y > bounds.bottom ? p.y : bounds.bottom;
+    }
+    bool inside(D2D1_POINT_2F p, FLOAT grow) {
+        return !empty && p.x >= bounds.left - grow && p.x <= bounds.right + grow && p.y >= bounds.top - grow &&
+               p.y <= bounds.bottom + grow;
+    }
+    virtual HRESULT GetBounds(const D2D1_MATRIX_3X2_F *, D2D1_RECT_F *r) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Geometry::GetBounds");
+        *r = bounds;
+        return hr;
+    }
+    virtual HRESULT GetWidenedBounds(FLOAT strokeWidth, ID2D1StrokeStyle *, const D2D1_MATRIX_3X2_F *, FLOAT, D2D1_RECT_F *r) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Geometry::GetWidenedBounds");
+        FLOAT half = strokeWidth / 2;
+        *r = {bounds.left - half, bounds.top - half, bounds.right + half, bounds.bottom + half};
+        return hr;
+    }
+    virtual HRESULT FillContainsPoint(D2D1_POINT_2F p, const D2D1_MATRIX_3X2_F *, FLOAT, BOOL *contains) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Geometry::FillContainsPoint");
+        *contains = inside(p, 0);
+        return hr;
+    }
+    virtual HRESULT StrokeContainsPoint(
+        D2D1_POINT_2F p, FLOAT strokeWidth, ID2D1StrokeStyle *, const D2D1_MATRIX_3X2_F *, FLOAT, BOOL *contains) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Geometry::StrokeContainsPoint");
+        *contains = inside(p, strokeWidth / 2) && !inside(p, -strokeWidth / 2);
+        return hr;
+    }
+};
+
+// Tracks figure state so that misuse makes Close() fail as in Direct2D.
+struct ID2D1SimplifiedGeometrySink : IUnknown {
+    bool inFigure = false;
+    bool closed = false;
+    HRESULT error = S_OK;
+    ID2D1Geometry *geometry = nullptr;
+    ~ID2D1SimplifiedGeometrySink() {
+        if (geometry)
+            geometry->Release();
+    }
+    void check(bool ok) {
+        if (!ok && error == S_OK)
+            error = D2DERR_WRONG_STATE;
+    }
+    void include(D2D1_POINT_2F p) {
+        if (geometry)
+            geometry->include(p);
+    }
+    virtual void SetFillMode(D2D1_FILL_MODE fillMode) {
+        pyd2d_stub::call("ID2D1GeometrySink::SetFillMode");
+        pyd2d_stub::trace("SetFillMode %d", fillMode);
+        check(!inFigure && !closed);
+    }
+    virtual void BeginFigure(D2D1_POINT_2F p, D2D1_FIGURE_BEGIN figureBegin) {
+        pyd2d_stub::call("ID2D1GeometrySink::BeginFigure");
+        pyd2d_stub::trace("BeginFigure %g %g %d", p.x, p.y, figureBegin);
+        check(!inFigure && !closed);
+        inFigure = true;
+        include(p);
+    }
+    virtual void AddLines(const D2D1_POINT_2F *points, UINT32 count) {
+        pyd2d_stub::call("ID2D1GeometrySink::AddLines");
+        for (UINT32 i = 0; i < count; i++) {
+            pyd2d_stub::trace("AddLine %g %g", points[i].x, points[i].y);
+            include(points[i]);
+        }
+        check(inFigure);
+    }
+    virtual void AddBeziers(const D2D1_BEZIER_SEGMENT *b, UINT32 count) {
+        pyd2d_stub::call("ID2D1GeometrySink::AddBeziers");
+        for (UINT32 i = 0; i < count; i++)
+            pyd2d_stub::trace(
+                "AddBezier %g %g %g %g %g %g", b[i].point1.x, b[i].point1.y, b[i].point2.x,
+                b[i].point2.y, b[i].point3.x, b[i].point3.y);
+        for (UINT32 i = 0; i < count; i++) {
+            include(b[i].point1);
+            include(b[i].point2);
+            include(b[i].point3);
+        }
+        check(inFigure);
+    }
+    virtual void EndFigure(D2D1_FIGURE_END figureEnd) {
+        pyd2d_stub::call("ID2D1GeometrySink::EndFigure");
+        pyd2d_stub::trace("EndFigure %d", figureEnd);
+        check(inFigure);
+        inFigure = false;
+    }
+    virtual HRESULT Close() {
+        HRESULT hr = pyd2d_stub::call("ID2D1GeometrySink::Close");
+        check(!inFigure && !closed);
+        closed = true;
+        return FAILED(hr) ? hr : error;
+    }
+};
+
+struct ID2D1GeometrySink : ID2D1SimplifiedGeometrySink {
+    virtual void AddLine(D2D1_POINT_2F p) { AddLines(&p, 1); }
+    virtual void AddBezier(const D2D1_BEZIER_SEGMENT *b) { AddBeziers(b, 1); }
+    virtual void AddQuadraticBeziers(const D2D1_QUADRATIC_BEZIER_SEGMENT *b, UINT32 count) {
+        pyd2d_stub::call("ID2D1GeometrySink::AddQuadraticBeziers");
+        for (UINT32 i = 0; i < count; i++)
+            pyd2d_stub::trace(
+                "AddQuadraticBezier %g %g %g %g", b[i].point1.x, b[i].point1.y, b[i].point2.x,
+                b[i].point2.y);
+        for (UINT32 i = 0; i < count; i++) {
+            include(b[i].point1);
+            include(b[i].point2);
+        }
+        check(inFigure);
+    }
+    virtual void AddQuadraticBezier(const D2D1_QUADRATIC_BEZIER_SEGMENT *b) { AddQuadraticBeziers(b, 1); }
+    virtual void AddArc(const D2D1_ARC_SEGMENT *a) {
+        pyd2d_stub::call("ID2D1GeometrySink::AddArc");
+        pyd2d_stub::trace(
+            "AddArc %g %g %g %g %g %d %d", a->point.x, a->point.y, a->size.width, a->size.height,
+            a->rotationAngle, a->sweepDirection, a->arcSize);
+        include(a->point);
+        check(inFigure);
+    }
+};
+
+struct ID2D1Layer : ID2D1Resource {};
+
+struct D2D1_LAYER_PARAMETERS {
+    D2D1_RECT_F contentBounds;
+    ID2D1Geometry *geometricMask;
+    D2D1_ANTIALIAS_MODE maskAntialiasMode;
+    D2D1_MATRIX_3X2_F maskTransform;
+    FLOAT opacity;
+    ID2D1Brush *opacityBrush;
+    D2D1_LAYER_OPTIONS layerOptions;
+};
+
+struct ID2D1PathGeometry : ID2D1Geometry {
+    virtual HRESULT Open(ID2D1GeometrySink **sink) {
+        HRESULT hr = pyd2d_stub::call("ID2D1PathGeometry::Open");
+        if (FAILED(hr))
+            return hr;
+        *sink = new ID2D1GeometrySink();
+        (*sink)->geometry = this;
+        AddRef();
+        return hr;
+    }
+};
+
+struct ID2D1BitmapRenderTarget;
+
+struct ID2D1RenderTarget : ID2D1Resource {
+    D2D1_MATRIX_3X2_F transform = {1, 0, 0, 1, 0, 0};
+    D2D1_ANTIALIAS_MODE antialiasMode = 0;
+    D2D1_SIZE_U size = {0, 0};
+    bool drawing = false;
+    int clipDepth = 0;
+
+    virtual void BeginDraw() {
+        pyd2d_stub::call("ID2D1RenderTarget::BeginDraw");
+        drawing = true;
+    }
+    virtual HRESULT EndDraw(D2D1_TAG *tag1, D2D1_TAG *tag2) {
+        HRESULT hr = pyd2d_stub::call("ID2D1RenderTarget::EndDraw");
+        if (tag1)
+            *tag1 = 0;
+        if (tag2)
+            *tag2 = 0;
+        // Direct2D requires every pushed clip to be popped before EndDraw.
+        if (SUCCEEDED(hr) && (!drawing || clipDepth != 0))
+            hr = D2DERR_WRONG_STATE;
+        clipDepth = 0;
+        drawing = false;
+        return hr;
+    }
+    virtual void Clear(const D2D1_COLOR_F *c) {
+        pyd2d_stub::call("ID2D1RenderTarget::Clear");
+        pyd2d_stub::trace("Clear %g %g %g %g", c->r, c->g, c->b, c->a);
+    }
+    virtual HRESULT CreateBitmap(
+        D2D1_SIZE_U size, const void *data, UINT32 pitch, const D2D1_BITMAP_PROPERTIES *props,
+        ID2D1Bitmap **bitmap) {
+        HRESULT hr = pyd2d_stub::call("ID2D1RenderTarget::CreateBitmap");
+        if (FAILED(hr))
+            return hr;
+        // The first byte of the pixels, so tests can tell where they came from.
+        pyd2d_stub::trace(
+            "CreateBitmap %u %u %u %d", size.width, size.height, pitch,
+            data ? static_cast<const unsigned char *>(data)[0] : -1);
+        ID2D1Bitmap *b = new ID2D1Bitmap();
+        b->size = size;
+        b->format = props->pixelFormat;
+        b->dpiX = props->dpiX;
+        b->dpiY = props->dpiY;
+        *bitmap = b;
+        return hr;
+    }
+    virtual HRESULT CreateBitmapFromWicBitmap(
+        IWICBitmapSource *, const D2D1_BITMAP_PROPERTIES *, ID2D1Bitmap **bitmap) {
+        HRESULT hr = pyd2d_stub::call("ID2D1RenderTarget::CreateBitmapFromWicBitmap");
+        if (FAILED(hr))
+            return hr;
+        *bitmap = new ID2D1Bitmap();
+        return hr;
+    }
+    virtual HRESULT CreateCompatibleRenderTarget(
+        const D2D1_SIZE_F *desiredSize, const D2D1_SIZE_U *desiredPixelSize, const D2D1_PIXEL_FORMAT *,
+        D2D1_COMPATIBLE_RENDER_TARGET_OPTIONS, ID2D1BitmapRenderTarget **target);
+    virtual HRESULT CreateLayer(const D2D1_SIZE_F *, ID2D1Layer **layer) {
+        HRESULT hr = pyd2d_stub::call("ID2D1RenderTarget::CreateLayer");
+        if (FAILED(hr))
+            return hr;
+        *layer = new ID2D1Layer();
+        return hr;
+    }
+    virtual HRESULT CreateSolidColorBrush(
+        const D2D1_COLOR_F *color, const D2D1_BRUSH_PROPERTIES *props,
+        ID2D1SolidColorBrush **brush) {
+        HRESULT hr = pyd2d_stub::call("ID2D1RenderTarget::CreateSolidColorBrush");
+        if (FAILED(hr))
+            return hr;
+        ID2D1SolidColorBrush *b = new ID2D1SolidColorBrush();
+        b->color = *color;
+        if (props)
+            b->opacity = props->opacity;
+        *brush = b;
+        return hr;
+    }
+    virtual void DrawBitmap(
+        ID2D1Bitmap *, const D2D1_RECT_F &r, FLOAT opacity, D2D1_BITMAP_INTERPOLATION_MODE,
+        const D2D1_RECT_F *) {
+        pyd2d_stub::call("ID2D1RenderTarget::DrawBitmap");
+        pyd2d_stub::trace("DrawBitmap %g %g %g %g %g", r.left, r.top, r.right, r.bottom, opacity);
+    }
+    virtual void DrawEllipse(const D2D1_ELLIPSE *e, ID2D1Brush *, FLOAT strokeWidth, ID2D1StrokeStyle *) {
+        pyd2d_stub::call("ID2D1RenderTarget::DrawEllipse");
+        pyd2d_stub::trace(
+            "DrawEllipse %g %g %g %g %g", e->point.x, e->point.y, e->radiusX, e->radiusY,
+            strokeWidth);
+    }
+    virtual void DrawGeometry(ID2D1Geometry *, ID2D1Brush *, FLOAT strokeWidth, ID2D1StrokeStyle *) {
+        pyd2d_stub::call("ID2D1RenderTarget::DrawGeometry");
+        pyd2d_stub::trace("DrawGeometry %g", strokeWidth);
+    }
+    virtual void DrawLine(
+        D2D1_POINT_2F p0, D2D1_POINT_2F p1, ID2D1Brush *, FLOAT strokeWidth, ID2D1StrokeStyle *) {
+        pyd2d_stub::call("ID2D1RenderTarget::DrawLine");
+        pyd2d_stub::trace("DrawLine %g %g %g %g %g", p0.x, p0.y, p1.x, p1.y, strokeWidth);
+    }
+    virtual void DrawRectangle(const D2D1_RECT_F *r, ID2D1Brush *, FLOAT strokeWidth, ID2D1StrokeStyle *) {
+        pyd2d_stub::call("ID2D1RenderTarget::DrawRectangle");
+        pyd2d_stub::trace(
+            "DrawRectangle %g %g %g %g %g", r->left, r->top, r->right, r->bottom, strokeWidth);
+    }
+    virtual void DrawTextW(
+        const WCHAR *, UINT length, IDWriteTextFormat *, const D2D1_RECT_F &r, ID2D1Brush *,
+        D2D1_DRAW_TEXT_OPTIONS, DWRITE_MEASURING_MODE) {
+        pyd2d_stub::call("ID2D1RenderTarget::DrawText");
+        pyd2d_stub::trace("DrawText %u %g %g %g %g", length, r.left, r.top, r.right, r.bottom);
+    }
+    virtual void DrawTextLayout(D2D1_POINT_2F p, IDWriteTextLayout *, ID2D1Brush *, D2D1_DRAW_TEXT_OPTIONS) {
+        pyd2d_stub::call("ID2D1RenderTarget::DrawTextLayout");
+        pyd2d_stub::trace("DrawTextLayout %g %g", p.x, p.y);
+    }
+    virtual void FillEllipse(const D2D1_ELLIPSE *e, ID2D1Brush *) {
+        pyd2d_stub::call("ID2D1RenderTarget::FillEllipse");
+        pyd2d_stub::trace("FillEllipse %g %g %g %g", e->point.x, e->point.y, e->radiusX, e->radiusY);
+    }
+    virtual void FillGeometry(ID2D1Geometry *, ID2D1Brush *, ID2D1Brush *) {
+        pyd2d_stub::call("ID2D1RenderTarget::FillGeometry");
+        pyd2d_stub::trace("FillGeometry");
+    }
+    virtual void FillRectangle(const D2D1_RECT_F *r, ID2D1Brush *) {
+        pyd2d_stub::call("ID2D1RenderTarget::FillRectangle");
+        pyd2d_stub::trace("FillRectangle %g %g %g %g", r->left, r->top, r->right, r->bottom);
+    }
+    virtual void GetDpi(FLOAT *dpiX, FLOAT *dpiY) {
+        pyd2d_stub::call("ID2D1RenderTarget::GetDpi");
+        *dpiX = 96.0f;
+        *dpiY = 96.0f;
+    }
+    virtual D2D1_SIZE_F GetSize() {
+        pyd2d_stub::call("ID2D1RenderTarget::GetSize");
+        return {(FLOAT)size.width, (FLOAT)size.height};
+    }
+    virtual void GetTransform(D2D1_MATRIX_3X2_F *m) {
+        pyd2d_stub::call("ID2D1RenderTarget::GetTransform");
+        *m = transform;
+    }
+    virtual void PopAxisAlignedClip() {
+        pyd2d_stub::call("ID2D1RenderTarget::PopAxisAlignedClip");
+        pyd2d_stub::trace("PopAxisAlignedClip");
+        clipDepth--;
+    }
+    virtual void PopLayer() {
+        pyd2d_stub::call("ID2D1RenderTarget::PopLayer");
+        pyd2d_stub::trace("PopLayer");
+        clipDepth--;
+    }
+    virtual void PushAxisAlignedClip(const D2D1_RECT_F *r, D2D1_ANTIALIAS_MODE mode) {
+        pyd2d_stub::call("ID2D1RenderTarget::PushAxisAlignedClip");
+        pyd2d_stub::trace(
+            "PushAxisAlignedClip %g %g %g %g %d", r->left, r->top, r->right, r->bottom, mode);
+        clipDepth++;
+    }
+    virtual void PushLayer(const D2D1_LAYER_PARAMETERS *p, ID2D1Layer *) {
+        pyd2d_stub::call("ID2D1RenderTarget::PushLayer");
+        pyd2d_stub::trace(
+            "PushLayer %g %g %g %g %s %g", p->contentBounds.left, p->contentBounds.top,
+            p->contentBounds.right, p->contentBounds.bottom, p->geometricMask ? "mask" : "none",
+            p->opacity);
+        clipDepth++;
+    }
+    virtual void SetTransform(const D2D1_MATRIX_3X2_F *m) {
+        pyd2d_stub::call("ID2D1RenderTarget::SetTransform");
+        pyd2d_stub::trace(
+            "SetTransform %g %g %g %g %g %g", m->m11, m->m12, m->m21, m->m22, m->dx, m->dy);
+        transform = *m;
+    }
+    virtual void SetAntialiasMode(D2D1_ANTIALIAS_MODE mode) {
+        pyd2d_stub::call("ID2D1RenderTarget::SetAntialiasMode");
+        pyd2d_stub::trace("SetAntialiasMode %d", mode);
+        antialiasMode = mode;
+    }
+};
+
+// Renders into a bitmap that is the size of the target at 96 DPI.
+struct ID2D1BitmapRenderTarget : ID2D1RenderTarget {
+    ID2D1Bitmap *bitmap;
+    explicit ID2D1BitmapRenderTarget(D2D1_SIZE_U pixelSize) : bitmap(new ID2D1Bitmap()) {
+        size = pixelSize;
+        bitmap->size = pixelSize;
+        bitmap->format = {87, 1};
+    }
+    ~ID2D1BitmapRenderTarget() { bitmap->Release(); }
+    virtual HRESULT GetBitmap(ID2D1Bitmap **b) {
+        HRESULT hr = pyd2d_stub::call("ID2D1BitmapRenderTarget::GetBitmap");
+        if (FAILED(hr))
+            return hr;
+        bitmap->AddRef();
+        *b = bitmap;
+        return hr;
+    }
+};
+
+inline HRESULT ID2D1RenderTarget::CreateCompatibleRenderTarget(
+    const D2D1_SIZE_F *desiredSize, const D2D1_SIZE_U *desiredPixelSize, const D2D1_PIXEL_FORMAT *,
+    D2D1_COMPATIBLE_RENDER_TARGET_OPTIONS, ID2D1BitmapRenderTarget **target) {
+    HRESULT hr = pyd2d_stub::call("ID2D1RenderTarget::CreateCompatibleRenderTarget");
+    if (FAILED(hr))
+        return hr;
+    D2D1_SIZE_U pixelSize = size;
+    if (desiredPixelSize)
+        pixelSize = *desiredPixelSize;
+    else if (desiredSize)
+        pixelSize = {(UINT32)std::ceil(desiredSize->width), (UINT32)std::ceil(desiredSize->height)};
+    pyd2d_stub::trace("CreateCompatibleRenderTarget %u %u", pixelSize.width, pixelSize.height);
+    *target = new ID2D1BitmapRenderTarget(pixelSize);
+    return hr;
+}
+
+struct ID2D1HwndRenderTarget : ID2D1RenderTarget {
+    virtual HRESULT Resize(const D2D1_SIZE_U *pixelSize) {
+        HRESULT hr = pyd2d_stub::call("ID2D1HwndRenderTarget::Resize");
+        if (SUCCEEDED(hr))
+            size = *pixelSize;
+        return hr;
+    }
+};
+
+// Draws Clear and FillRectangle with solid color brushes into the pixels of
+// its WIC bitmap as premultiplied BGRA, overwriting rather than blending.
+// The transform is ignored.
+struct ID2D1WicBitmapRenderTarget : ID2D1RenderTarget {
+    IWICBitmap *bitmap;
+    explicit ID2D1WicBitmapRenderTarget(IWICBitmap *b) : bitmap(b) {
+        bitmap->AddRef();
+        size = {b->width, b->height};
+    }
+    ~ID2D1WicBitmapRenderTarget() { bitmap->Release(); }
+    void fill(FLOAT left, FLOAT top, FLOAT right, FLOAT bottom, const D2D1_COLOR_F &c) {
+        auto channel = [&](FLOAT v) {
+            FLOAT x = v * c.a * 255.0f + 0.5f;
+            return (BYTE)(x < 0 ? 0 : x > 255 ? 255 : x);
+        };
+        BYTE bgra[4] = {channel(c.b), channel(c.g), channel(c.r), channel(1.0f)};
+        auto clamp = [](FLOAT v, UINT limit) {
+            return v < 0 ? 0u : v > limit ? limit : (UINT)(v + 0.5f);
+        };
+        UINT x0 = clamp(left, bitmap->width), x1 = clamp(right, bitmap->width);
+        UINT y0 = clamp(top, bitmap->height), y1 = clamp(bottom, bitmap->height);
+        for (UINT y = y0; y < y1; y++)
+            for (UINT x = x0; x < x1; x++)
+                memcpy(&bitmap->pixels[(size_t)y * bitmap->stride + x * 4], bgra, 4);
+    }
+    HRESULT EndDraw(D2D1_TAG *tag1, D2D1_TAG *tag2) override {
+        HRESULT hr = ID2D1RenderTarget::EndDraw(tag1, tag2);
+        // Direct2D cannot write into a bitmap that is locked for reading.
+        if (SUCCEEDED(hr) && bitmap->readLocks > 0)
+            hr = WINCODEC_ERR_ALREADYLOCKED;
+        return hr;
+    }
+    void Clear(const D2D1_COLOR_F *c) override {
+        ID2D1RenderTarget::Clear(c);
+        fill(0, 0, (FLOAT)bitmap->width, (FLOAT)bitmap->height, *c);
+    }
+    void FillRectangle(const D2D1_RECT_F *r, ID2D1Brush *brush) override {
+        ID2D1RenderTarget::FillRectangle(r, brush);
+        if (auto solid = dynamic_cast<ID2D1SolidColorBrush *>(brush))
+            fill(r->left, r->top, r->right, r->bottom, solid->color);
+    }
+};
+
+struct ID2D1Factory : IUnknown {
+    virtual HRESULT CreateHwndRenderTarget(
+        const D2D1_RENDER_TARGET_PROPERTIES *props,
+        const D2D1_HWND_RENDER_TARGET_PROPERTIES *hwndProps, ID2D1HwndRenderTarget **target) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Factory::CreateHwndRenderTarget");
+        if (FAILED(hr))
+            return hr;
+        if (props->minLevel != 0 && props->minLevel != 0x9100 && props->minLevel != 0xa000)
+            return E_INVALIDARG;
+        ID2D1HwndRenderTarget *t = new ID2D1HwndRenderTarget();
+        t->size = hwndProps->pixelSize;
+        *target = t;
+        return hr;
+    }
+    virtual HRESULT CreateWicBitmapRenderTarget(
+        IWICBitmap *bitmap, const D2D1_RENDER_TARGET_PROPERTIES *, ID2D1RenderTarget **target) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Factory::CreateWicBitmapRenderTarget");
+        if (FAILED(hr))
+            return hr;
+        *target = new ID2D1WicBitmapRenderTarget(bitmap);
+        return hr;
+    }
+    virtual HRESULT CreatePathGeometry(ID2D1PathGeometry **geometry) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Factory::CreatePathGeometry");
+        if (FAILED(hr))
+            return hr;
+        *geometry = new ID2D1PathGeometry();
+        return hr;
+    }
+    virtual HRESULT CreateStrokeStyle(
+        const D2D1_STROKE_STYLE_PROPERTIES *p, const FLOAT *dashes, UINT count, ID2D1StrokeStyle **style) {
+        HRESULT hr = pyd2d_stub::call("ID2D1Factory::CreateStrokeStyle");
+        if (FAILED(hr))
+            return hr;
+        if ((p->dashStyle == 5) != (dashes != nullptr && count > 0))
+            return E_INVALIDARG;
+        std::string pattern;
+        char buf[32];
+        for (UINT i = 0; i < count; i++) {
+            snprintf(buf, sizeof(buf), " %g", dashes[i]);
+            pattern += buf;
+        }
+        pyd2d_stub::trace("CreateStrokeStyle %d%s", p->dashStyle, pattern.c_str());
+        *style = new ID2D1StrokeStyle();
+        return hr;
+    }
+};
+
+inline HRESULT D2D1CreateFactory(
+    D2D1_FACTORY_TYPE, const GUID &, const D2D1_FACTORY_OPTIONS *, void **factory) {
+    HRESULT hr = pyd2d_stub::call("D2D1CreateFactory");
+    if (FAILED(hr))
+        return hr;
+    *factory = new ID2D1Factory();
+    return hr;
+}
@@ -0,0 +1,44 @@
+# Included at the end of pyd2d.pyx by stub/build.py.
+# Exposes the controls of the stub backend as private module functions.
+
+from libcpp cimport bool as cppbool
+from libcpp.string cimport string as cppstring
+
+cdef extern from "pyd2d_stub.h":
+    void pyd2dStubReset()
+    void pyd2dStubSetRecording(cppbool recording, cppbool tracing)
+    void pyd2dStubSetResult(const char *name, HRESULT hr)
+    long pyd2dStubCallCount(const char *name)
+    cppstring pyd2dStubTakeTrace()
+    long pyd2dStubLiveObjects()
+
+
+def _stub_reset():
+    # Stops recording and forgets all counts, traces and configured results.
+    pyd2dStubReset()
+
+
+def _stub_record(bint calls=True, bint trace=False):
+    # Counts calls to stub methods, and optionally traces their arguments.
+    pyd2dStubSetRecording(calls, trace)
+
+
+def _stub_set_result(str method, long long hr):
+    # Makes the named method (e.g. "ID2D1RenderTarget::EndDraw") return hr,
+    # given either signed or as an unsigned 32-bit value like 0x8899000C.
+    # Pass 0 to make it succeed again.
+    pyd2dStubSetResult(method.encode("ascii"), <HRESULT><uint32_t>(hr & 0xFFFFFFFF))
+
+
+def _stub_call_count(str method):
+    return pyd2dStubCallCount(method.encode("ascii"))
+
+
+def _stub_take_trace():
+    # Returns and clears the traced calls, one string per call.
+    return pyd2dStubTakeTrace().decode("ascii").splitlines()
+
+
+def _stub_live_objects():
+    # Returns the number of stub COM objects that have not been released.
+    return pyd2dStubLiveObjects()
@@ -0,0 +1,2 @@
+// Stub for building pyd2d without Windows; see pyd2d_stub.h.
+#include "pyd2d_stub.h"
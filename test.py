@@ -1,32 +1,45 @@
+import array
+import asyncio
+import concurrent.futures
 import ctypes
+import subprocess
+import sys
+import types
 import unittest
 from ctypes import wintypes
 
 import pyd2d
 
-user32 = ctypes.windll.user32
-CreateWindowExW = user32.CreateWindowExW
-CreateWindowExW.argtypes = [
-    wintypes.DWORD,
-    wintypes.LPCWSTR,
-    wintypes.LPCWSTR,
-    wintypes.DWORD,
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.c_int,
-    wintypes.HWND,
-    wintypes.HMENU,
-    wintypes.HINSTANCE,
-    wintypes.LPVOID,
-]
-CreateWindowExW.restype = wintypes.HWND
+# Builds against the stub backend (see stub/build.py) have _stub_* helpers
+# and accept any window handle.
+STUB = hasattr(pyd2d, "_stub_reset")
+
+if sys.platform == "win32":
+    user32 = ctypes.windll.user32
+    CreateWindowExW = user32.CreateWindowExW
+    CreateWindowExW.argtypes = [
+        wintypes.DWORD,
+        wintypes.LPCWSTR,
+        wintypes.LPCWSTR,
+        wintypes.DWORD,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        wintypes.HWND,
+        wintypes.HMENU,
+        wintypes.HINSTANCE,
+        wintypes.LPVOID,
+    ]
+    CreateWindowExW.restype = wintypes.HWND
 
 
 def create_test_window(
     class_name: str = "BUTTON",
     window_name: str = "Test Window",
 ):
+    if sys.platform != "win32":
+        return 1
     hwnd = CreateWindowExW(
         0,
         class_name,
@@ -45,7 +58,8 @@ def create_test_window(
 
 
 def destroy_test_window(hwnd):
-    user32.DestroyWindow(hwnd)
+    if sys.platform == "win32":
+        user32.DestroyWindow(hwnd)
 
 
 class PyD2DTest(unittest.TestCase):
@@ -106,6 +120,50 @@ class TestD2DFactory(PyD2DTest):
         geometry = factory.CreatePathGeometry()
         self.assertIsInstance(geometry, pyd2d.PathGeometry)
 
+    def test_factory_create_path_geometry_from_polyline(self):
+        factory = pyd2d.GetD2DFactory()
+        geometry = factory.CreatePathGeometryFromPolyline(
+            array.array("f", [0, 0, 100, 0, 100, 100, 0, 100]),
+            closed=True,
+            fillMode=pyd2d.FILL_MODE.WINDING,
+        )
+        self.assertIsInstance(geometry, pyd2d.PathGeometry)
+
+    def test_factory_create_path_geometry_from_polyline_empty(self):
+        factory = pyd2d.GetD2DFactory()
+        with self.assertRaises(ValueError):
+            factory.CreatePathGeometryFromPolyline(array.array("f"))
+
+    def test_factory_create_path_geometry_from_svg(self):
+        factory = pyd2d.GetD2DFactory()
+        geometry = factory.CreatePathGeometryFromSvg(
+            "M10 10 L20,20 h5 v-5z m1 1 c1 2 3 4 5 6 s1 1 2 2 q1 1 2 2 t3 3"
+            " a5 5 30 1 0 10 10 A0 5 0 0 1 1 1 l1e1-1.5.5.5 Z L3 3",
+            fillMode=pyd2d.FILL_MODE.WINDING,
+        )
+        self.assertIsInstance(geometry, pyd2d.PathGeometry)
+
+    def test_factory_create_path_geometry_from_svg_invalid(self):
+        factory = pyd2d.GetD2DFactory()
+        for d in ["L1 1", "M1", "M1 1 X 2", "M1 1 a1 1 0 2 0 1 1", "M1 1 z 3"]:
+            with self.subTest(d=d), self.assertRaises(ValueError):
+                factory.CreatePathGeometryFromSvg(d)
+
+    def test_factory_svg_path_cache(self):
+        factory = pyd2d.D2DFactory()
+        cache = factory.EnableSvgPathCache(maxEntries=16)
+        self.assertIs(factory.GetSvgPathCache(), cache)
+        geometry = factory.CreatePathGeometryFromSvg("M0 0 L10 10")
+        self.assertIs(factory.CreatePathGeometryFromSvg("M0 0 L10 10"), geometry)
+        self.assertIsNot(
+            factory.CreatePathGeometryFromSvg("M0 0 L10 10", pyd2d.FILL_MODE.WINDING),
+            geometry,
+        )
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 2)
+        factory.DisableSvgPathCache()
+        self.assertIsNone(factory.GetSvgPathCache())
+
     def test_factory_create_stroke_style(self):
         factory = pyd2d.GetD2DFactory()
         stroke_style = factory.CreateStrokeStyle(
@@ -119,6 +177,44 @@ class TestD2DFactory(PyD2DTest):
         )
         self.assertIsInstance(stroke_style, pyd2d.StrokeStyle)
 
+    def test_factory_create_stroke_style_dashes(self):
+        factory = pyd2d.GetD2DFactory()
+        stroke_style = factory.CreateStrokeStyle(dashes=[4, 2, 1, 2])
+        self.assertIsInstance(stroke_style, pyd2d.StrokeStyle)
+        with self.assertRaises(ValueError):
+            factory.CreateStrokeStyle(dashes=[])
+        with self.assertRaises(ValueError):
+            factory.CreateStrokeStyle(dashStyle=pyd2d.DASH_STYLE.DOT, dashes=[1, 1])
+        with self.assertRaises(ValueError):
+            factory.CreateStrokeStyle(dashStyle=pyd2d.DASH_STYLE.CUSTOM)
+
+    def test_factory_stroke_style_cache(self):
+        factory = pyd2d.D2DFactory()
+        self.assertIsInstance(factory.GetStrokeStyleCache(), pyd2d.StrokeStyleCache)
+        cache = factory.EnableStrokeStyleCache(maxEntries=16)
+        self.assertIs(factory.GetStrokeStyleCache(), cache)
+        stroke_style = factory.CreateStrokeStyle(lineJoin=pyd2d.LINE_JOIN.ROUND)
+        self.assertIs(
+            factory.CreateStrokeStyle(lineJoin=pyd2d.LINE_JOIN.ROUND), stroke_style
+        )
+        dashed = factory.CreateStrokeStyle(dashes=(2, 1))
+        self.assertIs(factory.CreateStrokeStyle(dashes=[2.0, 1.0]), dashed)
+        self.assertIsNot(factory.CreateStrokeStyle(dashes=[2, 2]), dashed)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 3, 3))
+        factory.DisableStrokeStyleCache()
+        self.assertIsNone(factory.GetStrokeStyleCache())
+        self.assertIsNot(
+            factory.CreateStrokeStyle(lineJoin=pyd2d.LINE_JOIN.ROUND), stroke_style
+        )
+
+    def test_factory_create_wic_bitmap_render_target(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateWicBitmapRenderTarget(64, 32, dpiX=96, dpiY=96)
+        self.assertIsInstance(render_target, pyd2d.RenderTarget)
+        self.assertEqual((render_target.width, render_target.height), (64, 32))
+        with self.assertRaises(ValueError):
+            factory.CreateWicBitmapRenderTarget(0, 32)
+
 
 class TestDWriteFactory(PyD2DTest):
     def test_get_dwrite_factory(self):
@@ -136,6 +232,31 @@ class TestDWriteFactory(PyD2DTest):
         )
         self.assertIsInstance(text_format, pyd2d.TextFormat)
 
+    def test_factory_get_text_format(self):
+        factory = pyd2d.DWriteFactory()
+        text_format = factory.GetTextFormat("Arial", 12.0)
+        self.assertIsInstance(text_format, pyd2d.TextFormat)
+        self.assertIs(factory.GetTextFormat("Arial", 12.0), text_format)
+        self.assertIsNot(
+            factory.GetTextFormat("Arial", 12.0, locale="en-us"), text_format
+        )
+        cache = factory.GetTextFormatCache()
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 2))
+        cache = factory.EnableTextFormatCache(maxEntries=1)
+        self.assertIs(factory.GetTextFormatCache(), cache)
+        factory.GetTextFormat("Arial", 12.0)
+        factory.GetTextFormat("Arial", 14.0)
+        self.assertEqual((len(cache), cache.evictions), (1, 1))
+
+    def test_factory_get_text_format_threads(self):
+        factory = pyd2d.DWriteFactory()
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            formats = list(
+                executor.map(lambda i: factory.GetTextFormat("Arial", 12.0), range(64))
+            )
+        self.assertTrue(all(f is formats[0] for f in formats))
+        self.assertEqual(factory.GetTextFormatCache().misses, 1)
+
     def test_factory_create_text_layout(self):
         factory = pyd2d.GetDWriteFactory()
         text_layout = factory.CreateTextLayout(
@@ -146,9 +267,105 @@ class TestDWriteFactory(PyD2DTest):
         )
         self.assertIsInstance(text_layout, pyd2d.TextLayout)
 
+    def test_factory_create_text_layout_prepared_text(self):
+        factory = pyd2d.GetDWriteFactory()
+        text_layout = factory.CreateTextLayout(
+            text=pyd2d.PreparedText("Hello, World!"),
+            textFormat=factory.CreateTextFormat("Arial", 12.0),
+            maxWidth=100.0,
+            maxHeight=100.0,
+        )
+        self.assertIsInstance(text_layout, pyd2d.TextLayout)
+
+    def test_factory_text_layout_cache(self):
+        factory = pyd2d.DWriteFactory()
+        text_format = factory.CreateTextFormat("Arial", 12.0)
+        cache = factory.EnableTextLayoutCache(maxEntries=2)
+        self.assertIs(factory.GetTextLayoutCache(), cache)
+        layout = factory.CreateTextLayout("a", text_format, 100.0, 100.0)
+        self.assertIs(factory.CreateTextLayout("a", text_format, 100.0, 100.0), layout)
+        self.assertIsNot(
+            factory.CreateTextLayout("a", text_format, 50.0, 100.0), layout
+        )
+        factory.CreateTextLayout("b", text_format, 100.0, 100.0)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(cache.evictions, 1)
+        cache.Clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.bytes, 0)
+        factory.DisableTextLayoutCache()
+        self.assertIsNone(factory.GetTextLayoutCache())
+
+    def test_factory_text_layout_cache_max_bytes(self):
+        factory = pyd2d.DWriteFactory()
+        text_format = factory.CreateTextFormat("Arial", 12.0)
+        cache = factory.EnableTextLayoutCache(maxEntries=0, maxBytes=64)
+        for i in range(10):
+            factory.CreateTextLayout("text %d" % i, text_format, 100.0, 100.0)
+        self.assertLessEqual(cache.bytes, 64)
+        self.assertGreater(cache.evictions, 0)
+
+    def test_factory_measure_texts(self):
+        factory = pyd2d.GetDWriteFactory()
+        text_format = factory.CreateTextFormat("Arial", 12.0)
+        texts = ["Hello", pyd2d.PreparedText("World!"), ""]
+        metrics = factory.MeasureTexts(texts, text_format, 100.0, 50.0)
+        self.assertIsInstance(metrics, array.array)
+        self.assertEqual(len(metrics), 9 * len(texts))
+        for i, text in enumerate(texts):
+            layout = factory.CreateTextLayout(text, text_format, 100.0, 50.0)
+            expected = layout.GetMetrics()
+            row = metrics[i * 9 : i * 9 + 9]
+            self.assertEqual(row[2], expected.width)
+            self.assertEqual(row[4], expected.height)
+            self.assertEqual(row[5], 100.0)
+            self.assertEqual(row[8], expected.lineCount)
+
+    def test_factory_measure_texts_out(self):
+        factory = pyd2d.GetDWriteFactory()
+        text_format = factory.CreateTextFormat("Arial", 12.0)
+        out = array.array("f", [0.0] * 18)
+        self.assertIs(factory.MeasureTexts(["a", "b"], text_format, 10, 10, out), out)
+        with self.assertRaises(ValueError):
+            factory.MeasureTexts(["a"], text_format, 10, 10, out)
+
 
 class TestBitmap(PyD2DTest):
-    pass
+    def setUp(self):
+        self.factory = pyd2d.GetD2DFactory()
+        self.window = create_test_window()
+        self.render_target = self.factory.CreateHwndRenderTarget(self.window, 100, 100)
+        self.bitmap = self.render_target.CreateBitmap(4, 3, bytes(4 * 4 * 3))
+
+    def tearDown(self):
+        destroy_test_window(self.window)
+
+    def test_bitmap_copy_from_memory(self):
+        self.bitmap.CopyFromMemory(bytearray(4 * 4 * 3))
+        self.bitmap.CopyFromMemory(array.array("B", [255] * 2 * 4 * 2), (1, 1, 3, 3))
+        self.bitmap.CopyFromMemory(memoryview(bytes(32 * 3)), pitch=32)
+
+    def test_bitmap_copy_from_memory_invalid(self):
+        with self.assertRaises(ValueError):
+            self.bitmap.CopyFromMemory(bytes(4 * 4 * 3 - 1))
+        with self.assertRaises(ValueError):
+            self.bitmap.CopyFromMemory(bytes(64), (2, 0, 5, 1))
+        with self.assertRaises(ValueError):
+            self.bitmap.CopyFromMemory(bytes(64), pitch=8)
+
+    def test_bitmap_get_pixel_format(self):
+        self.assertEqual(
+            self.bitmap.GetPixelFormat(),
+            (pyd2d.DXGI_FORMAT.B8G8R8A8_UNORM, pyd2d.ALPHA_MODE.PREMULTIPLIED),
+        )
+
+    def test_bitmap_get_pixel_size(self):
+        self.assertEqual(self.bitmap.GetPixelSize(), (4, 3))
+
+    def test_bitmap_get_size(self):
+        self.assertEqual(self.bitmap.GetSize(), (4.0, 3.0))
 
 
 class TestBrush(PyD2DTest):
@@ -165,10 +382,201 @@ class TestBrush(PyD2DTest):
         self.assertEqual(brush.GetOpacity(), 0.875)
 
 
+class TestColorF(PyD2DTest):
+    def test_color_f(self):
+        color = pyd2d.ColorF(0.5, 0.25, 1.0)
+        self.assertEqual(tuple(color), (0.5, 0.25, 1.0, 1.0))
+        color.a = 0.5
+        self.assertEqual(color.a, 0.5)
+        self.assertEqual(color, pyd2d.ColorF(0.5, 0.25, 1.0, 0.5))
+
+    def test_color_f_from_rgba(self):
+        color = pyd2d.ColorF.FromRGBA(0xFF0000FF)
+        self.assertEqual(color, pyd2d.ColorF(1.0, 0.0, 0.0, 1.0))
+        with self.assertRaises(TypeError):
+            pyd2d.ColorF.FromRGBA(1.5)
+
+
+class TestDrawList(PyD2DTest):
+    def setUp(self):
+        self.factory = pyd2d.GetD2DFactory()
+        self.window = create_test_window()
+        self.render_target = self.factory.CreateHwndRenderTarget(self.window, 100, 100)
+        self.brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+
+    def tearDown(self):
+        destroy_test_window(self.window)
+
+    def test_draw_list_record(self):
+        draw_list = pyd2d.DrawList()
+        draw_list.Clear(0.0, 0.0, 0.0)
+        draw_list.FillRectangle(0.0, 0.0, 10.0, 10.0, self.brush)
+        draw_list.SetTransform(dx=5.0, dy=5.0)
+        draw_list.SetAntialiasMode(pyd2d.ANTIALIAS_MODE.ALIASED)
+        self.assertEqual(len(draw_list), 4)
+        self.assertListEqual(
+            draw_list.GetCommands(),
+            [
+                ("Clear", (0.0, 0.0, 0.0, 1.0)),
+                ("FillRectangle", (0.0, 0.0, 10.0, 10.0, self.brush)),
+                ("SetTransform", (1.0, 0.0, 0.0, 1.0, 5.0, 5.0)),
+                ("SetAntialiasMode", (pyd2d.ANTIALIAS_MODE.ALIASED,)),
+            ],
+        )
+
+    def test_draw_list_record_index(self):
+        draw_list = pyd2d.DrawList()
+        self.assertEqual(draw_list.Clear(0.0, 0.0, 0.0), 0)
+        self.assertEqual(draw_list.FillRectangle(0.0, 0.0, 10.0, 10.0, self.brush), 1)
+
+    def test_draw_list_record_text(self):
+        text_format = pyd2d.GetDWriteFactory().CreateTextFormat("Arial", 12.0)
+        draw_list = pyd2d.DrawList()
+        draw_list.DrawText("Hello, World!", text_format, 0, 0, 100, 100, self.brush)
+        prepared = pyd2d.PreparedText("Prepared")
+        draw_list.DrawText(prepared, text_format, 0, 0, 100, 100, self.brush)
+        del prepared
+        commands = draw_list.GetCommands()
+        self.assertEqual(commands[0][1][0], "Hello, World!")
+        self.assertEqual(commands[1][1][0], "Prepared")
+
+    def test_draw_list_record_value_types(self):
+        draw_list = pyd2d.DrawList()
+        draw_list.Clear(0x000000FF)
+        draw_list.FillRectangle(pyd2d.RectF(0.0, 0.0, 10.0, 10.0), self.brush)
+        draw_list.DrawLine(pyd2d.Point2F(0, 0), pyd2d.Point2F(5, 5), self.brush, 2.0)
+        self.assertListEqual(
+            draw_list.GetCommands(),
+            [
+                ("Clear", (0.0, 0.0, 0.0, 1.0)),
+                ("FillRectangle", (0.0, 0.0, 10.0, 10.0, self.brush)),
+                ("DrawLine", (0.0, 0.0, 5.0, 5.0, self.brush, 2.0, None)),
+            ],
+        )
+
+    def test_draw_list_reset(self):
+        draw_list = pyd2d.DrawList()
+        draw_list.FillEllipse(50.0, 50.0, 10.0, 10.0, self.brush)
+        draw_list.Reset()
+        self.assertEqual(len(draw_list), 0)
+
+    def test_draw_list_record_released_object(self):
+        draw_list = pyd2d.DrawList()
+        draw_list.Clear(0.0, 0.0, 0.0)
+        self.brush.Release()
+        with self.assertRaises(ValueError):
+            draw_list.FillRectangle(0.0, 0.0, 10.0, 10.0, self.brush)
+        with self.assertRaises(TypeError):
+            draw_list.DrawLine(0.0, 0.0, 5.0, 5.0, None)
+        with self.assertRaises(TypeError):
+            draw_list.FillGeometry(self.factory.CreatePathGeometry(), None)
+        self.assertEqual(len(draw_list), 1)
+        self.assertListEqual(draw_list.GetCommands(), [("Clear", (0.0, 0.0, 0.0, 1.0))])
+        self.render_target.BeginDraw()
+        self.render_target.Replay(draw_list)
+        self.render_target.EndDraw()
+
+
+class TestEllipse(PyD2DTest):
+    def test_ellipse(self):
+        ellipse = pyd2d.Ellipse(50.0, 40.0, 10.0, 5.0)
+        self.assertEqual(tuple(ellipse), (50.0, 40.0, 10.0, 5.0))
+        ellipse.rx = 20.0
+        self.assertEqual(ellipse.rx, 20.0)
+        self.assertNotEqual(ellipse, pyd2d.Ellipse(50.0, 40.0, 10.0, 5.0))
+
+
 class TestFontFace(PyD2DTest):
     pass
 
 
+class TestFrameScheduler(PyD2DTest):
+    def setUp(self):
+        self.window = create_test_window()
+        self.factory = pyd2d.GetD2DFactory()
+        self.render_target = self.factory.CreateHwndRenderTarget(self.window, 100, 100)
+        self.now = 0.0
+        self.draw_cost = 0.0
+        self.alphas = []
+
+    def tearDown(self):
+        destroy_test_window(self.window)
+
+    def draw(self, target, alpha):
+        self.assertIs(target, self.render_target)
+        self.alphas.append(alpha)
+        self.now += self.draw_cost
+
+    def scheduler(self, **kwargs):
+        return pyd2d.FrameScheduler(
+            self.render_target, self.draw, clock=lambda: self.now, **kwargs
+        )
+
+    def test_frame_scheduler_tick(self):
+        changes = [True, False, False]
+        scheduler = self.scheduler(
+            update=lambda dt: changes.pop(0) if changes else False, timestep=0.01
+        )
+        self.assertTrue(scheduler.Tick())
+        self.now = 0.015
+        self.assertTrue(scheduler.Tick())
+        self.assertEqual(scheduler.updates, 1)
+        self.assertAlmostEqual(scheduler.alpha, 0.5)
+        self.now = 0.035
+        self.assertFalse(scheduler.Tick())
+        self.assertEqual((scheduler.frames, scheduler.skippedFrames), (2, 1))
+        self.assertEqual(scheduler.updates, 3)
+        scheduler.Invalidate()
+        self.assertTrue(scheduler.Tick())
+        self.now = 1.0
+        scheduler.Tick()
+        self.assertEqual((scheduler.updates, scheduler.droppedUpdates), (8, 91))
+        self.assertEqual(len(self.alphas), 3)
+
+    def test_frame_scheduler_next_tick(self):
+        scheduler = self.scheduler()
+        self.assertEqual(scheduler.NextTick(), 0.0)
+        self.assertTrue(scheduler.Tick())
+        self.assertIsNone(scheduler.NextTick())
+        self.assertFalse(scheduler.Tick())
+        scheduler.Invalidate()
+        self.assertEqual(scheduler.NextTick(), 0.0)
+        scheduler = self.scheduler(update=lambda dt: False, timestep=0.01)
+        scheduler.Tick()
+        self.now += 0.004
+        self.assertAlmostEqual(scheduler.NextTick(), 0.006)
+        with self.assertRaises(ValueError):
+            self.scheduler(timestep=0)
+
+    def test_frame_scheduler_adaptive_frame_rate(self):
+        scheduler = self.scheduler(update=lambda dt: True, maxFrameRate=60)
+        self.draw_cost = 0.02
+        for _ in range(30):
+            scheduler.Tick()
+            self.now += scheduler.NextTick()
+        self.assertEqual(scheduler.frameRate, 30)
+        self.assertAlmostEqual(scheduler.GetFrameTimePercentiles((50,))[0], 1 / 30)
+        self.draw_cost = 0.002
+        for _ in range(60):
+            scheduler.Tick()
+            self.now += scheduler.NextTick()
+        self.assertEqual(scheduler.frameRate, 60)
+        self.assertAlmostEqual(scheduler.GetFrameTimePercentiles((50,))[0], 1 / 60)
+
+    def test_frame_scheduler_get_frame_time_percentiles(self):
+        scheduler = self.scheduler(historySize=4)
+        self.assertEqual(scheduler.GetFrameTimePercentiles(), (0.0, 0.0, 0.0))
+        for interval in [0.25, 0.25, 0.5, 0.75, 1.0, 1.25]:
+            scheduler.DrawFrame()
+            self.now += interval
+        scheduler.DrawFrame()
+        self.assertEqual(
+            scheduler.GetFrameTimePercentiles((0, 50, 100)), (0.5, 0.75, 1.25)
+        )
+        with self.assertRaises(ValueError):
+            scheduler.GetFrameTimePercentiles((101,))
+
+
 class TestGeometry(PyD2DTest):
     pass
 
@@ -200,16 +608,39 @@ class TestGeometrySink(PyD2DTest):
         self.sink.AddBezier(x1=0.0, y1=0.0, x2=50.0, y2=50.0, x3=100.0, y3=100.0)
         self.sink.EndFigure(pyd2d.FIGURE_END.OPEN)
 
+    def test_geometry_sink_add_beziers(self):
+        self.sink.BeginFigure(0.0, 0.0, pyd2d.FIGURE_BEGIN.FILLED)
+        self.sink.AddBeziers(
+            array.array("f", [0, 0, 50, 50, 100, 100, 100, 100, 150, 50, 200, 0])
+        )
+        self.sink.EndFigure(pyd2d.FIGURE_END.OPEN)
+
     def test_geometry_sink_add_line(self):
         self.sink.BeginFigure(0.0, 0.0, pyd2d.FIGURE_BEGIN.FILLED)
         self.sink.AddLine(100.0, 100.0)
         self.sink.EndFigure(pyd2d.FIGURE_END.OPEN)
 
+    def test_geometry_sink_add_lines(self):
+        self.sink.BeginFigure(0.0, 0.0, pyd2d.FIGURE_BEGIN.FILLED)
+        self.sink.AddLines(array.array("f", [100, 0, 100, 100, 0, 100]))
+        self.sink.EndFigure(pyd2d.FIGURE_END.CLOSED)
+
+    def test_geometry_sink_add_lines_invalid_buffer(self):
+        with self.assertRaises(ValueError):
+            self.sink.AddLines(array.array("f", [100, 0, 100]))
+
     def test_geometry_sink_add_quadratic_bezier(self):
         self.sink.BeginFigure(0.0, 0.0, pyd2d.FIGURE_BEGIN.FILLED)
         self.sink.AddQuadraticBezier(x1=50.0, y1=50.0, x2=100.0, y2=100.0)
         self.sink.EndFigure(pyd2d.FIGURE_END.OPEN)
 
+    def test_geometry_sink_add_quadratic_beziers(self):
+        self.sink.BeginFigure(0.0, 0.0, pyd2d.FIGURE_BEGIN.FILLED)
+        self.sink.AddQuadraticBeziers(
+            array.array("f", [50, 50, 100, 0, 150, 50, 200, 0])
+        )
+        self.sink.EndFigure(pyd2d.FIGURE_END.OPEN)
+
 
 class TestHwndRenderTarget(PyD2DTest):
     def setUp(self):
@@ -220,14 +651,94 @@ class TestHwndRenderTarget(PyD2DTest):
     def tearDown(self):
         destroy_test_window(self.window)
 
+    def test_hwnd_render_target_enable_device_recovery(self):
+        self.assertIsNone(self.render_target.GetDeviceRecovery())
+        recovery = self.render_target.EnableDeviceRecovery()
+        self.assertIs(self.render_target.GetDeviceRecovery(), recovery)
+        brush = self.render_target.CreateSolidColorBrush(1, 0, 0)
+        self.render_target.CreateLayer()
+        self.assertEqual(len(recovery), 1)
+        self.assertEqual(recovery.deviceLosses, 0)
+        self.assertEqual(recovery.pendingResources, 0)
+        self.assertFalse(recovery.lost)
+        del brush
+        self.assertEqual(len(recovery), 0)
+        self.render_target.DisableDeviceRecovery()
+        self.assertIsNone(self.render_target.GetDeviceRecovery())
+
     def test_hwnd_render_target_resize(self):
         self.render_target.Resize(width=200, height=200)
 
+    def test_hwnd_render_target_resize_async(self):
+        asyncio.run(self.render_target.ResizeAsync(width=200, height=200))
+
 
 class TestImage(PyD2DTest):
     pass
 
 
+class TestImport(unittest.TestCase):
+    def test_import_is_lazy(self):
+        code = (
+            "import sys, pyd2d\n"
+            "lazy = ['_pyd2d_const', 'array', 'collections', 'weakref', 'asyncio']\n"
+            "print([name for name in lazy if name in sys.modules])\n"
+            "print(getattr(pyd2d, '_stub_live_objects', lambda: 0)())\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(output.split("\n")[:2], ["[]", "0"])
+
+    def test_import_constants(self):
+        self.assertEqual(pyd2d.DASH_STYLE.CUSTOM, 5)
+        self.assertIn("FILL_MODE", dir(pyd2d))
+        self.assertFalse(hasattr(pyd2d, "NO_SUCH_CONSTANT"))
+
+    def test_import_star(self):
+        namespace = {}
+        exec("from pyd2d import *", namespace)
+        self.assertIs(namespace["DXGI_FORMAT"], pyd2d.DXGI_FORMAT)
+        self.assertIs(namespace["RenderTarget"], pyd2d.RenderTarget)
+        self.assertLessEqual(set(pyd2d.__all__), set(namespace))
+
+    def test_import_all(self):
+        public = {
+            name
+            for name in dir(pyd2d)
+            if not name.startswith("_")
+            and not isinstance(getattr(pyd2d, name), types.ModuleType)
+        }
+        self.assertSetEqual(public, set(pyd2d.__all__))
+
+
+class TestMatrix3x2F(PyD2DTest):
+    def test_matrix_3x2f_multiply(self):
+        translate = pyd2d.Matrix3x2F.Translation(5.0, 0.0)
+        scale = pyd2d.Matrix3x2F.Scale(2.0, 2.0)
+        self.assertEqual(tuple(translate * scale), (2.0, 0.0, 0.0, 2.0, 10.0, 0.0))
+        self.assertEqual(
+            (translate * scale).TransformPoint(1.0, 1.0), pyd2d.Point2F(12.0, 2.0)
+        )
+
+    def test_matrix_3x2f_invert(self):
+        matrix = pyd2d.Matrix3x2F.Scale(2.0, 4.0) * pyd2d.Matrix3x2F.Translation(3, 1)
+        self.assertTrue((matrix * matrix.Invert()).IsIdentity())
+        with self.assertRaises(ValueError):
+            pyd2d.Matrix3x2F(0.0, 0.0, 0.0, 0.0).Invert()
+
+    def test_matrix_3x2f_rotation(self):
+        matrix = pyd2d.Matrix3x2F.Rotation(90.0, pyd2d.Point2F(10.0, 10.0))
+        point = matrix.TransformPoint(pyd2d.Point2F(20.0, 10.0))
+        self.assertAlmostEqual(point.x, 10.0, places=5)
+        self.assertAlmostEqual(point.y, 20.0, places=5)
+
+    def test_matrix_3x2f_transform_points(self):
+        points = array.array("f", [1.0, 1.0, 2.0, 3.0])
+        pyd2d.Matrix3x2F.Skew(45.0, 0.0).TransformPoints(points)
+        self.assertEqual(points.tolist(), [2.0, 1.0, 5.0, 3.0])
+
+
 class TestPathGeometry(PyD2DTest):
     def setUp(self):
         self.factory = pyd2d.GetD2DFactory()
@@ -239,6 +750,57 @@ class TestPathGeometry(PyD2DTest):
         sink.Close()
 
 
+class TestPixelBuffer(PyD2DTest):
+    def setUp(self):
+        self.factory = pyd2d.GetD2DFactory()
+        self.render_target = self.factory.CreateWicBitmapRenderTarget(5, 3)
+        self.pixels = self.render_target.ReadPixels()
+
+    def tearDown(self):
+        self.pixels.Release()
+
+    def test_pixel_buffer_memoryview(self):
+        view = memoryview(self.pixels)
+        self.assertTrue(view.readonly)
+        self.assertEqual(view.format, "B")
+        self.assertEqual(view.shape, (3, 5, 4))
+        self.assertEqual(view.strides, (self.pixels.stride, 4, 1))
+        self.assertEqual(len(view.tobytes()), 5 * 3 * 4)
+        view.release()
+
+    def test_pixel_buffer_release(self):
+        view = memoryview(self.pixels)
+        with self.assertRaises(BufferError):
+            self.pixels.Release()
+        view.release()
+        self.pixels.Release()
+        with self.assertRaises(ValueError):
+            memoryview(self.pixels)
+
+    def test_pixel_buffer_context_manager(self):
+        with self.render_target.ReadPixels() as pixels:
+            self.assertEqual((pixels.width, pixels.height), (5, 3))
+        with self.assertRaises(ValueError):
+            memoryview(pixels)
+
+
+class TestPoint2F(PyD2DTest):
+    def test_point_2f(self):
+        point = pyd2d.Point2F(1.0, 2.0)
+        self.assertEqual(tuple(point), (1.0, 2.0))
+        point.x = 3.0
+        self.assertEqual(point, pyd2d.Point2F(3.0, 2.0))
+        self.assertEqual(repr(point), "Point2F(3.0, 2.0)")
+
+
+class TestRectF(PyD2DTest):
+    def test_rect_f(self):
+        rect = pyd2d.RectF(0.0, 0.0, 10.0, 20.0)
+        self.assertEqual(tuple(rect), (0.0, 0.0, 10.0, 20.0))
+        rect.bottom = 30.0
+        self.assertEqual(rect, pyd2d.RectF(0.0, 0.0, 10.0, 30.0))
+
+
 class TestRenderTarget(PyD2DTest):
     def setUp(self):
         self.window = create_test_window()
@@ -263,10 +825,62 @@ class TestRenderTarget(PyD2DTest):
         )
         self.assertIsInstance(brush, pyd2d.Brush)
         self.assertEqual(brush.GetOpacity(), 0.75)
+        with self.assertRaises(TypeError):
+            self.render_target.CreateSolidColorBrush(1.0, 0.0)
+
+    def test_render_target_create_bitmap(self):
+        bitmap = self.render_target.CreateBitmap(
+            2,
+            2,
+            array.array("f", [0.5] * 16),
+            pixelFormat=pyd2d.DXGI_FORMAT.R32G32B32A32_FLOAT,
+        )
+        self.assertIsInstance(bitmap, pyd2d.Bitmap)
+        self.assertEqual(bitmap.GetPixelSize(), (2, 2))
+        with self.assertRaises(ValueError):
+            self.render_target.CreateBitmap(2, 2, bytes(15))
 
     def test_render_target_draw_bitmap(self):
-        # TODO: Add WIC interface
-        pass
+        bitmap = self.render_target.CreateBitmap(2, 2, bytes(16))
+        self.render_target.BeginDraw()
+        self.render_target.DrawBitmap(bitmap, 0.0, 0.0, 50.0, 50.0)
+        self.render_target.DrawBitmap(
+            bitmap, pyd2d.RectF(0.0, 0.0, 50.0, 50.0), 0.5, srcRect=(0, 0, 1, 1)
+        )
+        self.render_target.EndDraw()
+
+    def test_render_target_draw_damaged(self):
+        rects = []
+        self.render_target.EnableDamageTracking()
+        # Everything is dirty until the first frame has been drawn.
+        self.assertTrue(
+            self.render_target.DrawDamaged(lambda target, rect: rects.append(rect))
+        )
+        self.assertEqual(rects, [pyd2d.RectF(0, 0, *self.render_target.GetSize())])
+        self.assertFalse(
+            self.render_target.DrawDamaged(lambda target, rect: rects.append(rect))
+        )
+        self.render_target.Invalidate(10.5, 10, 20, 19.5)
+        self.render_target.Invalidate(pyd2d.RectF(20, 10, 30, 20))
+        del rects[:]
+        self.assertTrue(
+            self.render_target.DrawDamaged(lambda target, rect: rects.append(rect))
+        )
+        self.assertEqual(rects, [pyd2d.RectF(10, 10, 30, 20)])
+        self.assertEqual(self.render_target.GetDamageRects(), [])
+
+    def test_render_target_draw_damaged_error(self):
+        def draw(target, rect):
+            raise RuntimeError
+
+        self.render_target.EnableDamageTracking()
+        self.render_target.DrawDamaged(lambda target, rect: None)
+        self.render_target.Invalidate(0, 0, 10, 10)
+        with self.assertRaises(RuntimeError):
+            self.render_target.DrawDamaged(draw)
+        self.assertEqual(
+            self.render_target.GetDamageRects(), [pyd2d.RectF(0, 0, 10, 10)]
+        )
 
     def test_render_target_draw_ellipse(self):
         self.render_target.BeginDraw()
@@ -281,6 +895,26 @@ class TestRenderTarget(PyD2DTest):
         )
         self.render_target.EndDraw()
 
+    def test_render_target_draw_ellipses(self):
+        self.render_target.BeginDraw()
+        self.render_target.DrawEllipses(
+            ellipses=array.array("f", [50, 50, 10, 10, 20, 20, 5, 5]),
+            brush=self.render_target.CreateSolidColorBrush(1, 1, 1),
+            strokeWidth=1.0,
+            strokeStyle=self.factory.CreateStrokeStyle(),
+        )
+        self.render_target.EndDraw()
+
+    def test_render_target_draw_frame_async(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+
+        def draw(target):
+            target.FillRectangle(0.0, 0.0, 10.0, 10.0, brush)
+            return "drawn"
+
+        result = asyncio.run(self.render_target.DrawFrameAsync(draw))
+        self.assertEqual(result, "drawn")
+
     def test_render_target_draw_geometry(self):
         geometry = self.factory.CreatePathGeometry()
         geometry.Open().Close()
@@ -306,6 +940,29 @@ class TestRenderTarget(PyD2DTest):
         )
         self.render_target.EndDraw()
 
+    def test_render_target_draw_lines(self):
+        brushes = [
+            self.render_target.CreateSolidColorBrush(1, 0, 0),
+            self.render_target.CreateSolidColorBrush(0, 0, 1),
+        ]
+        self.render_target.BeginDraw()
+        self.render_target.DrawLines(
+            segments=memoryview(array.array("f", [0, 0, 100, 100, 0, 100, 100, 0])),
+            brush=brushes,
+            strokeWidth=2.0,
+            brushIndices=array.array("I", [0, 1]),
+        )
+        self.render_target.EndDraw()
+
+    def test_render_target_draw_lines_invalid_brush_index(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        with self.assertRaisesRegex(ValueError, "out of range"):
+            self.render_target.DrawLines(
+                array.array("f", [0, 0, 100, 100]),
+                [brush, brush],
+                brushIndices=array.array("I", [2]),
+            )
+
     def test_render_target_draw_rectangle(self):
         self.render_target.BeginDraw()
         self.render_target.DrawRectangle(
@@ -334,6 +991,17 @@ class TestRenderTarget(PyD2DTest):
         )
         self.render_target.EndDraw()
 
+    def test_render_target_draw_text_prepared_text(self):
+        text = pyd2d.PreparedText("Hello, \U0001f600!")
+        # The emoji is a surrogate pair where wchar_t is 16 bits wide.
+        self.assertEqual(len(text), 10 if ctypes.sizeof(ctypes.c_wchar) == 2 else 9)
+        self.assertEqual(text.text, "Hello, \U0001f600!")
+        text_format = pyd2d.GetDWriteFactory().CreateTextFormat("Arial", 12.0)
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        self.render_target.BeginDraw()
+        self.render_target.DrawText(text, text_format, 0.0, 0.0, 100.0, 100.0, brush)
+        self.render_target.EndDraw()
+
     def test_render_target_draw_text_layout(self):
         self.render_target.BeginDraw()
         text_layout = pyd2d.GetDWriteFactory().CreateTextLayout(
@@ -351,6 +1019,34 @@ class TestRenderTarget(PyD2DTest):
         )
         self.render_target.EndDraw()
 
+    def test_render_target_enable_geometry_realization_cache(self):
+        cache = self.render_target.EnableGeometryRealizationCache(scaleTolerance=0.5)
+        self.assertIs(self.render_target.GetGeometryRealizationCache(), cache)
+        geometry = self.factory.CreatePathGeometryFromPolyline(
+            array.array("f", [0, 0, 40, 0, 40, 30]), closed=True
+        )
+        brush = self.render_target.CreateSolidColorBrush(1, 0, 0)
+        self.render_target.BeginDraw()
+        self.render_target.FillGeometry(geometry, brush)
+        self.render_target.FillGeometry(geometry, brush)
+        self.render_target.SetTransform(pyd2d.Matrix3x2F.Translation(10, 5))
+        self.render_target.FillGeometry(geometry, brush)
+        self.render_target.SetTransform(pyd2d.Matrix3x2F.Scale(2, 2))
+        self.render_target.FillGeometry(geometry, brush)
+        self.render_target.EndDraw()
+        self.assertEqual((cache.hits, cache.misses, cache.invalidations), (2, 2, 1))
+        self.assertEqual(len(cache), 1)
+        self.assertGreater(cache.bytes, 0)
+        self.render_target.DisableGeometryRealizationCache()
+        self.assertIsNone(self.render_target.GetGeometryRealizationCache())
+
+    def test_render_target_end_draw_async(self):
+        async def main():
+            self.render_target.BeginDraw()
+            await self.render_target.EndDrawAsync()
+
+        asyncio.run(main())
+
     def test_render_target_fill_ellipse(self):
         self.render_target.BeginDraw()
         self.render_target.FillEllipse(
@@ -383,17 +1079,326 @@ class TestRenderTarget(PyD2DTest):
         )
         self.render_target.EndDraw()
 
+    def test_render_target_fill_rectangles(self):
+        self.render_target.BeginDraw()
+        self.render_target.FillRectangles(
+            rects=array.array("f", [0, 0, 10, 10, 20, 20, 30, 30]),
+            brush=self.render_target.CreateSolidColorBrush(1, 1, 1),
+        )
+        self.render_target.EndDraw()
+
+    def test_render_target_fill_rectangles_invalid_buffer(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        with self.assertRaises(ValueError):
+            self.render_target.FillRectangles(array.array("d", [0, 0, 1, 1]), brush)
+        with self.assertRaises(ValueError):
+            self.render_target.FillRectangles(array.array("f", [0, 0, 1]), brush)
+        cube = memoryview(array.array("f", [0] * 16)).cast("B").cast("f", (2, 2, 4))
+        with self.assertRaises(ValueError):
+            self.render_target.FillRectangles(cube, brush)
+        self.render_target.BeginDraw()
+        self.render_target.FillRectangles(cube.cast("B").cast("f", (4, 4)), brush)
+        self.render_target.EndDraw()
+
+    def test_render_target_get_frame_stats(self):
+        self.assertIsNone(self.render_target.GetFrameStats())
+        self.render_target.EnableFrameStats(historySize=2)
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        text_format = pyd2d.GetDWriteFactory().CreateTextFormat("Arial", 12)
+        for _ in range(3):
+            self.render_target.BeginDraw()
+            self.render_target.Clear(0, 0, 0)
+            self.render_target.SetTransform(dx=1.0)
+            self.render_target.FillRectangles(array.array("f", [0] * 12), brush)
+            self.render_target.DrawText("Hello", text_format, 0, 0, 100, 100, brush)
+            self.render_target.GetSolidColorBrush(0.1, 0.2, 0.3)
+            self.render_target.EndDraw()
+        stats = self.render_target.GetFrameStats()
+        self.assertIsInstance(stats, pyd2d.FrameStats)
+        self.assertEqual(stats.frames, 3)
+        self.assertEqual(stats.drawCalls["Clear"], 1)
+        self.assertEqual(stats.drawCalls["FillRectangle"], 3)
+        self.assertEqual(stats.drawCalls["DrawEllipse"], 0)
+        self.assertEqual(stats.textDraws, 1)
+        self.assertEqual(stats.charactersConverted, 5)
+        self.assertEqual(stats.brushesCreated, 0)
+        self.assertEqual(stats.transformChanges, 1)
+        self.assertGreaterEqual(stats.frameTime, stats.endDrawTime)
+        self.assertEqual(len(stats.frameTimes), 2)
+        self.assertEqual(sum(count for _, count in stats.histogram), 2)
+        self.render_target.DisableFrameStats()
+        self.assertIsNone(self.render_target.GetFrameStats())
+
+    def test_render_target_get_frame_stats_threads(self):
+        self.render_target.EnableFrameStats()
+        self.render_target.BeginDraw()
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            executor.submit(self.render_target.CreateSolidColorBrush, 1, 1, 1).result()
+        self.render_target.CreateSolidColorBrush(0, 0, 0)
+        self.render_target.EndDraw()
+        self.assertEqual(self.render_target.GetFrameStats().brushesCreated, 1)
+
+    def test_render_target_get_solid_color_brush(self):
+        brush = self.render_target.GetSolidColorBrush(0.5, 0.25, 1.0)
+        self.assertIsInstance(brush, pyd2d.SolidColorBrush)
+        self.assertIs(self.render_target.GetSolidColorBrush(0.5, 0.25, 1.0), brush)
+        self.assertIs(self.render_target.GetSolidColorBrush(0.5001, 0.25, 1.0), brush)
+        self.assertIsNot(self.render_target.GetSolidColorBrush(0.5, 0.5, 1.0), brush)
+        self.render_target.ClearBrushPool()
+        self.assertIsNot(self.render_target.GetSolidColorBrush(0.5, 0.25, 1.0), brush)
+
+    def test_render_target_get_solid_color_brush_shared(self):
+        brush = self.render_target.GetSolidColorBrush(1.0, 0.0, 0.0)
+        with self.assertRaises(ValueError):
+            brush.SetColor(0.0, 1.0, 0.0)
+        with self.assertRaises(ValueError):
+            brush.Release()
+        self.assertIs(self.render_target.GetSolidColorBrush(1.0, 0.0, 0.0), brush)
+        self.render_target.BeginDraw()
+        self.render_target.FillRectangle(0, 0, 10, 10, brush)
+        self.render_target.EndDraw()
+
+    def test_render_target_get_solid_color_brush_limit(self):
+        self.render_target.SetBrushPoolLimit(1)
+        brush = self.render_target.GetSolidColorBrush(1.0, 0.0, 0.0)
+        self.render_target.GetSolidColorBrush(0.0, 1.0, 0.0)
+        self.assertIsNot(self.render_target.GetSolidColorBrush(1.0, 0.0, 0.0), brush)
+
+    def test_render_target_get_damage_rects(self):
+        self.render_target.EnableDamageTracking(maxRects=2)
+        self.render_target.DrawDamaged(lambda target, rect: None)
+        self.render_target.Invalidate(0, 0, 10, 10)
+        self.render_target.Invalidate(50, 50, 60, 60)
+        self.render_target.Invalidate(2, 2, 5, 5)
+        self.render_target.Invalidate(12, 0, 20, 10)
+        self.assertEqual(
+            sorted(tuple(rect) for rect in self.render_target.GetDamageRects()),
+            [(0, 0, 20, 10), (50, 50, 60, 60)],
+        )
+        self.render_target.InvalidateAll()
+        self.assertEqual(len(self.render_target.GetDamageRects()), 1)
+        self.render_target.DisableDamageTracking()
+        with self.assertRaises(ValueError):
+            self.render_target.GetDamageRects()
+        with self.assertRaises(ValueError):
+            self.render_target.Invalidate(0, 0, 10, 10)
+
+    def test_render_target_get_size(self):
+        width, height = self.render_target.GetSize()
+        self.assertGreater(width, 0)
+        self.assertGreater(height, 0)
+
     def test_render_target_get_transform(self):
         matrix = self.render_target.GetTransform()
         self.assertIsInstance(matrix, tuple)
         self.assertTupleEqual(matrix, (1.0, 0.0, 0.0, 1.0, 0.0, 0.0))
 
+    def test_render_target_push_axis_aligned_clip(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        self.render_target.BeginDraw()
+        self.render_target.PushAxisAlignedClip(0.0, 0.0, 50.0, 50.0)
+        self.render_target.PushAxisAlignedClip(
+            pyd2d.RectF(10, 10, 20, 20), pyd2d.ANTIALIAS_MODE.ALIASED
+        )
+        self.render_target.FillRectangle(0.0, 0.0, 100.0, 100.0, brush)
+        with self.assertRaises(ValueError):
+            self.render_target.PopLayer()
+        self.render_target.PopAxisAlignedClip()
+        self.render_target.PopAxisAlignedClip()
+        with self.assertRaises(ValueError):
+            self.render_target.PopAxisAlignedClip()
+        self.render_target.EndDraw()
+
+    def test_render_target_push_layer(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        geometry = self.factory.CreatePathGeometry()
+        sink = geometry.Open()
+        sink.BeginFigure(0.0, 0.0)
+        sink.AddLine(50.0, 0.0)
+        sink.AddLine(25.0, 50.0)
+        sink.EndFigure(pyd2d.FIGURE_END.CLOSED)
+        sink.Close()
+        layer = self.render_target.CreateLayer()
+        self.render_target.BeginDraw()
+        self.render_target.PushLayer(layer, geometricMask=geometry, opacity=0.5)
+        self.render_target.PushLayer(contentBounds=(0, 0, 20, 20))
+        self.render_target.FillRectangle(0.0, 0.0, 100.0, 100.0, brush)
+        with self.assertRaises(ValueError):
+            self.render_target.PopAxisAlignedClip()
+        self.render_target.PopLayer()
+        self.render_target.PopLayer()
+        self.render_target.EndDraw()
+
+    def test_render_target_push_transform_pop_transform(self):
+        self.render_target.SetTransform(pyd2d.Matrix3x2F.Translation(10.0, 0.0))
+        self.render_target.PushTransform(pyd2d.Matrix3x2F.Scale(2.0, 2.0))
+        self.render_target.PushTransform(pyd2d.Matrix3x2F.Translation(5.0, 0.0))
+        self.assertTupleEqual(
+            self.render_target.GetTransform(), (2.0, 0.0, 0.0, 2.0, 20.0, 0.0)
+        )
+        self.render_target.PopTransform()
+        self.render_target.PopTransform()
+        self.assertTupleEqual(
+            self.render_target.GetTransform(), (1.0, 0.0, 0.0, 1.0, 10.0, 0.0)
+        )
+        with self.assertRaises(ValueError):
+            self.render_target.PopTransform()
+
+    def test_render_target_run_frames_async(self):
+        frames = []
+
+        def draw(target):
+            frames.append(target)
+            return len(frames) < 3
+
+        count = asyncio.run(pyd2d.RunFramesAsync(self.render_target, draw))
+        self.assertEqual(count, 3)
+        count = asyncio.run(
+            pyd2d.RunFramesAsync(self.render_target, lambda target: None, frames=2)
+        )
+        self.assertEqual(count, 2)
+
+    def test_render_target_draw_scene(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        scene = pyd2d.Scene()
+        scene.FillRectangle(10.0, 10.0, 20.0, 20.0, brush)
+        scene.FillRectangle(1000.0, 1000.0, 1010.0, 1010.0, brush)
+        self.render_target.BeginDraw()
+        self.assertEqual(self.render_target.DrawScene(scene), 1)
+        self.assertEqual(self.render_target.DrawScene(scene, (0, 0, 2000, 2000)), 2)
+        self.render_target.SetTransform(dx=-990.0, dy=-990.0)
+        self.assertEqual(self.render_target.DrawScene(scene), 1)
+        self.render_target.EndDraw()
+        brush.Release()
+        with self.assertRaises(ValueError):
+            self.render_target.DrawScene(scene)
+
+    def test_render_target_replay(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        draw_list = pyd2d.DrawList()
+        draw_list.Clear(0.5, 0.5, 0.5)
+        draw_list.SetTransform(dx=10.0, dy=10.0)
+        draw_list.FillRectangle(0.0, 0.0, 10.0, 10.0, brush)
+        draw_list.DrawLine(0.0, 0.0, 10.0, 10.0, brush, 2.0)
+        draw_list.DrawEllipse(50.0, 50.0, 10.0, 10.0, brush)
+        self.render_target.BeginDraw()
+        self.render_target.Replay(draw_list)
+        self.render_target.EndDraw()
+        self.assertTupleEqual(
+            self.render_target.GetTransform(), (1.0, 0.0, 0.0, 1.0, 10.0, 10.0)
+        )
+
+    def test_render_target_replay_released_object(self):
+        brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+        draw_list = pyd2d.DrawList()
+        draw_list.FillRectangle(0.0, 0.0, 10.0, 10.0, brush)
+        brush.Release()
+        with self.assertRaises(ValueError):
+            self.render_target.Replay(draw_list)
+
     def test_render_target_set_transform(self):
         self.render_target.SetTransform(0.5, 0.5, 0.5, 0.5, 0.5, 0.5)
         matrix = self.render_target.GetTransform()
         self.assertTupleEqual(matrix, (0.5, 0.5, 0.5, 0.5, 0.5, 0.5))
 
 
+class TestScene(PyD2DTest):
+    def setUp(self):
+        self.factory = pyd2d.GetD2DFactory()
+        self.window = create_test_window()
+        self.render_target = self.factory.CreateHwndRenderTarget(self.window, 100, 100)
+        self.brush = self.render_target.CreateSolidColorBrush(1, 1, 1)
+
+    def tearDown(self):
+        destroy_test_window(self.window)
+
+    def test_scene_hit_test(self):
+        scene = pyd2d.Scene()
+        rect = scene.FillRectangle(0.0, 0.0, 50.0, 50.0, self.brush)
+        ellipse = scene.FillEllipse(40.0, 40.0, 20.0, 10.0, self.brush)
+        line = scene.DrawLine(0.0, 100.0, 500.0, 100.0, self.brush, 4.0)
+        outline = scene.DrawRectangle(300.0, 300.0, 400.0, 400.0, self.brush, 2.0)
+        self.assertEqual(scene.HitTest(10.0, 10.0), rect)
+        self.assertEqual(scene.HitTest(45.0, 42.0), ellipse)
+        self.assertEqual(scene.HitTest(59.0, 49.0), None)
+        self.assertEqual(scene.HitTest(250.0, 101.5), line)
+        self.assertEqual(scene.HitTest(250.0, 103.0), None)
+        self.assertEqual(scene.HitTest(250.0, 103.0, tolerance=2.0), line)
+        self.assertEqual(scene.HitTest(300.5, 350.0), outline)
+        self.assertEqual(scene.HitTest(350.0, 350.0), None)
+
+    def test_scene_hit_test_stroke_tolerance(self):
+        scene = pyd2d.Scene()
+        outline = scene.DrawRectangle(0.0, 0.0, 100.0, 100.0, self.brush, 2.0)
+        # The stroke covers 1 DIP either side of the edge at x = 0.
+        self.assertEqual(scene.HitTest(3.9, 50.0, tolerance=3.0), outline)
+        self.assertEqual(scene.HitTest(4.1, 50.0, tolerance=3.0), None)
+        self.assertEqual(scene.HitTest(6.0, 50.0, tolerance=3.0), None)
+        self.assertEqual(scene.HitTest(-3.9, 50.0, tolerance=3.0), outline)
+        self.assertEqual(scene.HitTest(-4.1, 50.0, tolerance=3.0), None)
+
+    def test_scene_query(self):
+        scene = pyd2d.Scene(cellSize=64.0)
+        for i in range(10):
+            scene.FillRectangle(i * 100.0, 0.0, i * 100.0 + 10.0, 10.0, self.brush)
+        big = scene.FillRectangle(-5000.0, -5000.0, 5000.0, 5000.0, self.brush)
+        self.assertListEqual(scene.Query(150.0, 0.0, 350.0, 5.0), [2, 3, big])
+        self.assertListEqual(
+            scene.Query(pyd2d.RectF(-1e6, -1e6, 1e6, 1e6)), list(range(11))
+        )
+        self.assertEqual(scene.GetBounds(big), pyd2d.RectF(-5000, -5000, 5000, 5000))
+
+    def test_scene_remove(self):
+        scene = pyd2d.Scene()
+        bottom = scene.FillRectangle(0.0, 0.0, 50.0, 50.0, self.brush)
+        top = scene.FillRectangle(0.0, 0.0, 50.0, 50.0, self.brush)
+        self.assertEqual(scene.HitTest(10.0, 10.0), top)
+        scene.Remove(top)
+        self.assertEqual(len(scene), 1)
+        self.assertEqual(scene.HitTest(10.0, 10.0), bottom)
+        self.assertIsNone(scene.GetCommands()[top])
+        with self.assertRaises(IndexError):
+            scene.Remove(top)
+        with self.assertRaises(IndexError):
+            scene.GetBounds(5)
+
+    def test_scene_reset(self):
+        scene = pyd2d.Scene()
+        scene.FillRectangle(0.0, 0.0, 50.0, 50.0, self.brush)
+        scene.HitTest(10.0, 10.0)
+        scene.Reset()
+        self.assertEqual(len(scene), 0)
+        self.assertIsNone(scene.HitTest(10.0, 10.0))
+
+    def test_scene_state_commands(self):
+        scene = pyd2d.Scene()
+        with self.assertRaises(TypeError):
+            scene.Clear(0.0, 0.0, 0.0)
+        with self.assertRaises(TypeError):
+            scene.SetTransform(dx=5.0)
+        with self.assertRaises(TypeError):
+            scene.SetAntialiasMode(pyd2d.ANTIALIAS_MODE.ALIASED)
+        with self.assertRaises(ValueError):
+            pyd2d.Scene(cellSize=0.0)
+
+    def test_scene_translate(self):
+        scene = pyd2d.Scene()
+        node = scene.FillRectangle(0.0, 0.0, 50.0, 50.0, self.brush)
+        self.assertEqual(scene.HitTest(10.0, 10.0), node)
+        scene.Translate(node, 1000.0, 0.0)
+        self.assertIsNone(scene.HitTest(10.0, 10.0))
+        self.assertEqual(scene.HitTest(1010.0, 10.0), node)
+        self.assertEqual(scene.GetBounds(node), pyd2d.RectF(1000, 0, 1050, 50))
+        geometry = self.factory.CreatePathGeometry()
+        sink = geometry.Open()
+        sink.BeginFigure(0.0, 0.0)
+        sink.AddLine(10.0, 10.0)
+        sink.EndFigure()
+        sink.Close()
+        with self.assertRaises(ValueError):
+            scene.Translate(scene.FillGeometry(geometry, self.brush), 1.0, 1.0)
+
+
 class TestSimplifiedGeometrySink(PyD2DTest):
     def setUp(self):
         self.factory = pyd2d.GetD2DFactory()
@@ -429,6 +1434,379 @@ class TestStrokeStyle(PyD2DTest):
     pass
 
 
+@unittest.skipUnless(STUB, "requires a stub build")
+class TestStub(PyD2DTest):
+    def tearDown(self):
+        pyd2d._stub_reset()
+
+    def test_stub_call_count(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        brush = render_target.CreateSolidColorBrush(1, 1, 1)
+        pyd2d._stub_record(trace=True)
+        render_target.BeginDraw()
+        render_target.FillRectangles(array.array("f", [0, 0, 1, 2] * 3), brush)
+        render_target.EndDraw()
+        self.assertEqual(pyd2d._stub_call_count("ID2D1RenderTarget::FillRectangle"), 3)
+        self.assertEqual(pyd2d._stub_take_trace(), ["FillRectangle 0 0 1 2"] * 3)
+
+    def test_stub_live_objects(self):
+        live = pyd2d._stub_live_objects()
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        render_target.GetSolidColorBrush(1, 0, 0)
+        self.assertEqual(pyd2d._stub_live_objects(), live + 2)
+        del render_target
+        self.assertEqual(pyd2d._stub_live_objects(), live)
+
+    def test_stub_value_types(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        brush = render_target.CreateSolidColorBrush(pyd2d.ColorF(1, 1, 1), 0.5)
+        self.assertEqual(brush.GetOpacity(), 0.5)
+        pyd2d._stub_record(trace=True)
+        render_target.BeginDraw()
+        render_target.Clear(0x336699FF)
+        render_target.Clear(0.2, 0.4, 0.6)
+        render_target.FillRectangle(pyd2d.RectF(1, 2, 3, 4), brush)
+        render_target.FillRectangle(1, 2, 3, 4, brush)
+        render_target.FillEllipse(pyd2d.Ellipse(5, 6, 7, 8), brush)
+        render_target.FillEllipse(5, 6, 7, 8, brush)
+        render_target.DrawLine(pyd2d.Point2F(1, 2), pyd2d.Point2F(3, 4), brush, 2.0)
+        render_target.DrawLine(1, 2, 3, 4, brush, 2.0)
+        render_target.EndDraw()
+        trace = pyd2d._stub_take_trace()
+        self.assertEqual(trace[0], trace[1])
+        self.assertEqual(trace[2], trace[3])
+        self.assertEqual(trace[4], trace[5])
+        self.assertEqual(trace[6], trace[7])
+
+    def test_stub_draw_damaged(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        render_target.EnableDamageTracking()
+        render_target.DrawDamaged(lambda target, rect: None)
+        render_target.Invalidate(10, 10, 20, 20)
+        render_target.Invalidate(40, 40, 50, 50)
+        pyd2d._stub_record(trace=True)
+        render_target.DrawDamaged(lambda target, rect: target.Clear(1, 1, 1))
+        self.assertEqual(
+            pyd2d._stub_take_trace(),
+            [
+                "SetTransform 1 0 0 1 0 0",
+                "PushAxisAlignedClip 10 10 20 20 1",
+                "SetTransform 1 0 0 1 0 0",
+                "Clear 1 1 1 1",
+                "PopAxisAlignedClip",
+                "SetTransform 1 0 0 1 0 0",
+                "PushAxisAlignedClip 40 40 50 50 1",
+                "SetTransform 1 0 0 1 0 0",
+                "Clear 1 1 1 1",
+                "PopAxisAlignedClip",
+            ],
+        )
+        render_target.Resize(200, 150)
+        self.assertEqual(render_target.GetDamageRects(), [pyd2d.RectF(0, 0, 200, 150)])
+
+    def test_stub_draw_damaged_transform(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        brush = render_target.CreateSolidColorBrush(1, 1, 1)
+        render_target.EnableDamageTracking()
+        render_target.DrawDamaged(lambda target, rect: None)
+        render_target.SetTransform(dx=5.0)
+        render_target.Invalidate(10, 10, 20, 20)
+        transforms = []
+
+        def draw(target, rect):
+            transforms.append(target.GetTransform())
+            # At 10..20 in target coordinates, inside the damaged rectangle.
+            target.FillRectangle(5, 10, 15, 20, brush)
+
+        pyd2d._stub_record(trace=True)
+        render_target.DrawDamaged(draw)
+        self.assertEqual(transforms, [(1.0, 0.0, 0.0, 1.0, 5.0, 0.0)])
+        self.assertEqual(
+            pyd2d._stub_take_trace(),
+            [
+                "SetTransform 1 0 0 1 0 0",
+                "PushAxisAlignedClip 10 10 20 20 1",
+                "SetTransform 1 0 0 1 5 0",
+                "FillRectangle 5 10 15 20",
+                "PopAxisAlignedClip",
+            ],
+        )
+
+    def test_stub_draw_scene(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        brush = render_target.CreateSolidColorBrush(1, 1, 1)
+        geometry = factory.CreatePathGeometry()
+        sink = geometry.Open()
+        sink.BeginFigure(50.0, 50.0)
+        sink.AddLine(70.0, 60.0)
+        sink.EndFigure()
+        sink.Close()
+        scene = pyd2d.Scene()
+        scene.FillRectangle(200.0, 0.0, 210.0, 10.0, brush)
+        node = scene.FillGeometry(geometry, brush)
+        scene.DrawEllipse(10.0, 10.0, 5.0, 5.0, brush)
+        self.assertEqual(scene.GetBounds(node), pyd2d.RectF(50, 50, 70, 60))
+        self.assertEqual(scene.HitTest(60.0, 55.0), node)
+        pyd2d._stub_record(trace=True)
+        render_target.BeginDraw()
+        render_target.DrawScene(scene)
+        render_target.EndDraw()
+        self.assertEqual(
+            pyd2d._stub_take_trace(), ["FillGeometry", "DrawEllipse 10 10 5 5 1"]
+        )
+
+    def test_stub_clip_culling(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        brush = render_target.CreateSolidColorBrush(1, 1, 1)
+        draw_list = pyd2d.DrawList()
+        draw_list.FillEllipse(200.0, 200.0, 5.0, 5.0, brush)
+        draw_list.FillEllipse(30.0, 30.0, 5.0, 5.0, brush)
+        render_target.EnableFrameStats()
+        pyd2d._stub_record(trace=True)
+        render_target.BeginDraw()
+        render_target.PushAxisAlignedClip(0.0, 0.0, 50.0, 50.0)
+        render_target.FillRectangle(60.0, 0.0, 70.0, 10.0, brush)
+        render_target.DrawLine(52.0, 0.0, 52.0, 10.0, brush, 2.0)
+        render_target.FillRectangles(
+            array.array("f", [0, 0, 5, 5, 90, 90, 95, 95]), brush
+        )
+        render_target.Replay(draw_list)
+        render_target.PushTransform(pyd2d.Matrix3x2F.Translation(-60.0, 0.0))
+        render_target.FillRectangle(60.0, 0.0, 70.0, 10.0, brush)
+        render_target.PopTransform()
+        render_target.PushLayer(contentBounds=(0, 0, 10, 10))
+        render_target.FillRectangle(20.0, 20.0, 30.0, 30.0, brush)
+        render_target.PopLayer()
+        render_target.PopAxisAlignedClip()
+        render_target.FillRectangle(60.0, 0.0, 70.0, 10.0, brush)
+        render_target.EndDraw()
+        self.assertEqual(
+            pyd2d._stub_take_trace(),
+            [
+                "PushAxisAlignedClip 0 0 50 50 0",
+                "DrawLine 52 0 52 10 2",
+                "FillRectangle 0 0 5 5",
+                "FillEllipse 30 30 5 5",
+                "SetTransform 1 0 0 1 -60 0",
+                "FillRectangle 60 0 70 10",
+                "SetTransform 1 0 0 1 0 0",
+                "PushLayer 0 0 10 10 none 1",
+                "PopLayer",
+                "PopAxisAlignedClip",
+                "FillRectangle 60 0 70 10",
+            ],
+        )
+        stats = render_target.GetFrameStats()
+        self.assertEqual(stats.culledDraws, 4)
+        self.assertEqual(stats.drawCalls["FillRectangle"], 3)
+
+    def test_stub_device_recovery(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        render_target.EnableDamageTracking()
+        recovery = render_target.EnableDeviceRecovery()
+        brush = render_target.CreateSolidColorBrush(1, 0, 0)
+        bitmap = render_target.CreateBitmap(2, 2, bytes(16))
+        pooled = render_target.GetSolidColorBrush(0, 1, 0)
+        draw_list = pyd2d.DrawList()
+        draw_list.FillRectangle(0, 0, 1, 1, pooled)
+        render_target.DrawDamaged(lambda target, rect: None)
+        live = pyd2d._stub_live_objects()
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0x8899000C)
+        render_target.BeginDraw()
+        render_target.EndDraw()
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0)
+        # The resources are released at once, the target on its next use.
+        self.assertEqual(pyd2d._stub_live_objects(), live - 3)
+        self.assertTrue(recovery.lost)
+        self.assertEqual(recovery.deviceLosses, 1)
+        self.assertEqual(recovery.pendingResources, 3)
+        self.assertEqual(render_target.GetDamageRects(), [pyd2d.RectF(0, 0, 100, 100)])
+        pyd2d._stub_record()
+        render_target.Resize(200, 100)
+        render_target.BeginDraw()
+        self.assertFalse(recovery.lost)
+        create_count = pyd2d._stub_call_count("ID2D1Factory::CreateHwndRenderTarget")
+        self.assertEqual(create_count, 1)
+        self.assertEqual(pyd2d._stub_call_count("ID2D1HwndRenderTarget::Resize"), 0)
+        self.assertEqual(render_target.GetSize(), (200, 100))
+        render_target.FillRectangle(0, 0, 5, 5, brush)
+        render_target.Replay(draw_list)
+        render_target.EndDraw()
+        # Only the resources that were drawn with have been recreated.
+        self.assertEqual(recovery.recreatedResources, 2)
+        self.assertEqual(recovery.pendingResources, 1)
+        self.assertGreater(recovery.recoveryTime, 0)
+        self.assertIs(render_target.GetSolidColorBrush(0, 1, 0), pooled)
+        self.assertEqual(bitmap.GetPixelSize(), (2, 2))
+        self.assertEqual(recovery.pendingResources, 0)
+        self.assertEqual(pyd2d._stub_live_objects(), live)
+        brush.Release()
+        with self.assertRaises(ValueError):
+            render_target.FillRectangle(0, 0, 1, 1, brush)
+
+    def test_stub_device_recovery_bitmap_pixels(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        render_target.EnableDeviceRecovery()
+        pixels = bytearray([7] * 16)
+        bitmap = render_target.CreateBitmap(2, 2, pixels)
+        # Neither the caller's buffer nor later writes to it are used.
+        self.assertEqual(sys.getrefcount(pixels), 2)
+        pixels[0] = 9
+        bitmap.CopyFromMemory(bytes([5] * 4), (0, 0, 1, 1))
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0x8899000C)
+        render_target.BeginDraw()
+        self.assertFalse(render_target.EndDraw())
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0)
+        pyd2d._stub_record(trace=True)
+        render_target.BeginDraw()
+        render_target.DrawBitmap(bitmap, 0, 0, 2, 2)
+        self.assertTrue(render_target.EndDraw())
+        self.assertEqual(pyd2d._stub_take_trace()[0], "CreateBitmap 2 2 8 5")
+
+    def test_stub_geometry_realization(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        render_target.EnableGeometryRealizationCache()
+        geometry = factory.CreatePathGeometryFromPolyline(
+            array.array("f", [0, 0, 10, 0, 10, 10]), closed=True
+        )
+        brush = render_target.CreateSolidColorBrush(1, 0, 0)
+        pyd2d._stub_record(trace=True)
+        render_target.BeginDraw()
+        render_target.FillGeometry(geometry, brush)
+        render_target.FillGeometry(geometry, brush)
+        render_target.SetTransform(pyd2d.Matrix3x2F.Rotation(45))
+        render_target.FillGeometry(geometry, brush)
+        render_target.SetTransform(pyd2d.Matrix3x2F.Scale(2, 2))
+        render_target.DrawGeometry(geometry, brush, 2)
+        render_target.EndDraw()
+        self.assertEqual(
+            pyd2d._stub_take_trace(),
+            [
+                "CreateCompatibleRenderTarget 12 12",
+                "Clear 0 0 0 0",
+                "SetTransform 1 0 0 1 1 1",
+                "FillGeometry",
+                "DrawBitmap -1 -1 11 11 1",
+                "DrawBitmap -1 -1 11 11 1",
+                "SetTransform 0.707107 0.707107 -0.707107 0.707107 0 0",
+                "FillGeometry",
+                "SetTransform 2 0 0 2 0 0",
+                "CreateCompatibleRenderTarget 26 26",
+                "Clear 0 0 0 0",
+                "SetTransform 2 0 0 2 3 3",
+                "DrawGeometry 2",
+                "DrawBitmap -1.5 -1.5 11.5 11.5 1",
+            ],
+        )
+
+    def test_stub_geometry_realization_pixel_aligned(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        render_target.EnableGeometryRealizationCache()
+        geometry = factory.CreatePathGeometryFromPolyline(
+            array.array("f", [0, 0, 10, 0, 10, 10]), closed=True
+        )
+        brush = render_target.CreateSolidColorBrush(1, 0, 0)
+        render_target.BeginDraw()
+        for dx, dy in [(0.3, 0.6), (12.25, 7.75), (-3.4, 0.5)]:
+            render_target.SetTransform(dx=dx, dy=dy)
+            pyd2d._stub_record(trace=True)
+            render_target.FillGeometry(geometry, brush)
+            draw = [line for line in pyd2d._stub_take_trace() if "DrawBitmap" in line]
+            left, top, right, bottom = map(float, draw[0].split()[1:5])
+            self.assertAlmostEqual(left + dx, round(left + dx), places=4)
+            self.assertAlmostEqual(top + dy, round(top + dy), places=4)
+            self.assertAlmostEqual(right - left, 12.0, places=4)
+            self.assertLessEqual(abs(left + 1), 0.5)
+        render_target.EndDraw()
+
+    def test_stub_stroke_style_dashes(self):
+        factory = pyd2d.D2DFactory()
+        pyd2d._stub_record(trace=True)
+        factory.CreateStrokeStyle(dashes=[4, 2.5])
+        factory.CreateStrokeStyle(dashStyle=pyd2d.DASH_STYLE.DOT)
+        self.assertEqual(
+            pyd2d._stub_take_trace(),
+            ["CreateStrokeStyle 5 4 2.5", "CreateStrokeStyle 2"],
+        )
+
+    def test_stub_get_text_format(self):
+        factory = pyd2d.DWriteFactory()
+        pyd2d._stub_record(trace=True)
+        factory.GetTextFormat("Arial", 12.0, locale="en-us")
+        factory.GetTextFormat("Arial", 12.0, locale="en-us")
+        factory.CreateTextFormat("Arial", 10.0)
+        self.assertEqual(
+            pyd2d._stub_take_trace(),
+            ["CreateTextFormat 12 en-us", "CreateTextFormat 10 "],
+        )
+
+    def test_stub_end_draw_async_error(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0x8899000C)
+        with self.assertRaises(pyd2d.Direct2DError):
+            asyncio.run(render_target.DrawFrameAsync(lambda target: None))
+
+    def test_stub_set_result(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateHwndRenderTarget(create_test_window(), 100, 100)
+        pyd2d._stub_set_result("ID2D1RenderTarget::EndDraw", 0x8899000C)
+        render_target.BeginDraw()
+        with self.assertRaises(pyd2d.Direct2DError) as cm:
+            render_target.EndDraw()
+        self.assertEqual(cm.exception.hresult & 0xFFFFFFFF, 0x8899000C)
+
+    def test_stub_read_pixels(self):
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateWicBitmapRenderTarget(3, 2)
+        brush = render_target.CreateSolidColorBrush(0, 0, 1, 0.5)
+        render_target.BeginDraw()
+        render_target.Clear(1, 0, 0)
+        render_target.FillRectangle(1, 0, 2, 1, brush)
+        render_target.EndDraw()
+        with render_target.ReadPixels() as pixels:
+            # The stub pads rows to 16 bytes, so the view is strided.
+            self.assertEqual(pixels.stride, 16)
+            view = memoryview(pixels)
+            self.assertFalse(view.c_contiguous)
+            self.assertEqual(
+                view.tolist(),
+                [
+                    [[0, 0, 255, 255], [128, 0, 0, 128], [0, 0, 255, 255]],
+                    [[0, 0, 255, 255], [0, 0, 255, 255], [0, 0, 255, 255]],
+                ],
+            )
+            with self.assertRaises(BufferError):
+                render_target.CreateBitmap(3, 2, pixels, pitch=16)
+            render_target.BeginDraw()
+            with self.assertRaises(pyd2d.COMError):
+                render_target.EndDraw()
+            view.release()
+
+    def test_stub_read_pixels_released_target(self):
+        live = pyd2d._stub_live_objects()
+        factory = pyd2d.GetD2DFactory()
+        render_target = factory.CreateWicBitmapRenderTarget(3, 2)
+        pixels = render_target.ReadPixels()
+        render_target.Release()
+        with self.assertRaises(ValueError):
+            render_target.ReadPixels()
+        self.assertEqual(len(memoryview(pixels).tobytes()), 3 * 2 * 4)
+        pixels.Release()
+        self.assertEqual(pyd2d._stub_live_objects(), live)
+
+
 class TestTextFormat(PyD2DTest):
     pass
 
@@ -460,5 +1838,22 @@ class TestTextLayout(PyD2DTest):
         self.assertIsInstance(metrics.lineCount, int)
 
 
+class TestWICBitmapRenderTarget(PyD2DTest):
+    def setUp(self):
+        self.factory = pyd2d.GetD2DFactory()
+        self.render_target = self.factory.CreateWicBitmapRenderTarget(16, 8)
+
+    def test_wic_bitmap_render_target_read_pixels(self):
+        self.render_target.BeginDraw()
+        self.render_target.Clear(0, 0, 0, 0)
+        self.render_target.EndDraw()
+        with self.render_target.ReadPixels() as pixels:
+            view = memoryview(pixels)
+            self.assertEqual(view.shape, (8, 16, 4))
+            self.assertGreaterEqual(pixels.stride, 16 * 4)
+            self.assertEqual(view[0, 0, 3], 0)
+            view.release()
+
+
 if __name__ == "__main__":
     unittest.main()